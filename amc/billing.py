@@ -0,0 +1,271 @@
+"""
+Batch billing of non-comprehensive AMC contracts for a period.
+
+One invoice per contract covers its uninvoiced spare parts (created in the
+period) and its completed, uninvoiced service visits (planned in the
+period). Contracts are billed in batches, each in its own transaction:
+
+- the batch's spare parts and visits are read (and locked) in one query
+  each, and every invoice with its totals is built in memory
+- each invoice is one INSERT plus one bulk_create per line table
+- the billed spare parts and visits are linked to their invoices with one
+  UPDATE per table for the whole batch
+
+A failing batch is rolled back and reported; batches already committed
+stay billed, and re-running the period only picks up what is still
+uninvoiced.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from api.dates import start_of_day
+from invoice.models import CompanyProfile, HighSideInvoiceItem, Invoice, LowSideInvoiceItem
+from invoice.service import TWO_PLACES, apply_invoice_totals, next_invoice_no
+
+from .models import AMCContract, AMCServiceVisit, AMCSparePart
+
+logger = logging.getLogger(__name__)
+
+BILLABLE_AMC_TYPE = 'NON_COMPREHENSIVE'
+
+# SAC heading for maintenance and repair services, used on visit lines
+AMC_VISIT_SAC = '9987'
+AMC_VISIT_GST_PERCENT = Decimal('18')
+
+DEFAULT_BATCH_SIZE = 100
+
+
+class BillingConflict(Exception):
+    """Rows of a batch were billed by someone else while it was running."""
+
+
+def _uninvoiced_spare_parts(date_from, date_to):
+    # Half-open range on the raw column: no DATE() cast, index friendly
+    return AMCSparePart.objects.filter(
+        invoice__isnull=True,
+        created_at__gte=start_of_day(date_from),
+        created_at__lt=start_of_day(date_to + timedelta(days=1)),
+        amc_contract__amc_type=BILLABLE_AMC_TYPE,
+    )
+
+
+def _uninvoiced_visits(date_from, date_to):
+    return AMCServiceVisit.objects.filter(
+        invoice__isnull=True,
+        status=AMCServiceVisit.STATUS_COMPLETED,
+        planned_date__range=(date_from, date_to),
+        amount__gt=0,
+        amc_contract__amc_type=BILLABLE_AMC_TYPE,
+    )
+
+
+def billable_contract_ids(date_from, date_to, contract_ids=None):
+    """Ids of contracts with anything to bill in the period, ascending."""
+    ids = set()
+    for qs in (_uninvoiced_spare_parts(date_from, date_to), _uninvoiced_visits(date_from, date_to)):
+        if contract_ids is not None:
+            qs = qs.filter(amc_contract_id__in=contract_ids)
+        ids.update(qs.values_list('amc_contract_id', flat=True).distinct())
+    return sorted(ids)
+
+
+def _invoice_numbers():
+    """INV-YYYY-XXXX numbers following the last invoice, without a query per invoice."""
+    prefix, _, number = next_invoice_no().rpartition('-')
+    number = int(number)
+    while True:
+        yield f'{prefix}-{number:04d}'
+        number += 1
+
+
+def _line(model, is_no_gst, gst_percent, quantity, rate, **fields):
+    return model(
+        gst_percent=Decimal('0') if is_no_gst else gst_percent,
+        quantity=quantity,
+        rate=rate,
+        # bulk_create skips save(), so amount is set here
+        amount=quantity * rate,
+        **fields,
+    )
+
+
+def _spare_part_line(part, is_no_gst):
+    item = part.inventory_item.item
+    return _line(
+        LowSideInvoiceItem, is_no_gst, part.gst_percent, part.quantity_used, part.rate_per_unit,
+        item_id=item.id,
+        description=part.description or item.item_code,
+        hsn_sac=part.hsn_sac or None,
+        unit=part.unit,
+    )
+
+
+def _visit_line(visit, contract, is_no_gst):
+    # The visit is billed against the unit the contract covers
+    return _line(
+        HighSideInvoiceItem, is_no_gst, AMC_VISIT_GST_PERCENT, Decimal('1'), visit.amount,
+        product_variant_id=contract.product_variant_id,
+        description=f'AMC service visit #{visit.visit_number} ({visit.planned_date:%d-%m-%Y}) - {contract.contract_number}',
+        hsn_sac=AMC_VISIT_SAC,
+        unit='NOS',
+    )
+
+
+def build_contract_invoice(contract, parts, visits, header):
+    """(unsaved Invoice with its totals, high side lines, low side lines)."""
+    customer = contract.customer
+    invoice = Invoice(
+        customer=customer,
+        buyer_name=customer.name,
+        buyer_address=customer.address or '',
+        buyer_gstin=customer.gst or None,
+        buyer_state=customer.state or None,
+        **header,
+    )
+    is_no_gst = invoice.gst_type == 'NO_GST'
+    high_rows = [_visit_line(visit, contract, is_no_gst) for visit in visits]
+    low_rows = [_spare_part_line(part, is_no_gst) for part in parts]
+
+    taxable_value = Decimal('0')
+    gst_total = Decimal('0')
+    for row in (*high_rows, *low_rows):
+        taxable_value += row.amount
+        gst_total += (row.amount * row.gst_percent) / Decimal('100')
+    apply_invoice_totals(invoice, taxable_value, gst_total)
+    return invoice, high_rows, low_rows
+
+
+def _link_to_invoices(model, rows_by_contract, invoices):
+    """One UPDATE setting invoice_id on every billed row of the batch."""
+    ids = [row.pk for rows in rows_by_contract.values() for row in rows]
+    if not ids:
+        return 0
+    invoice_id = Case(
+        *[When(amc_contract_id=contract_id, then=Value(invoices[contract_id].pk)) for contract_id in rows_by_contract],
+        output_field=IntegerField(),
+    )
+    updated = model.objects.filter(pk__in=ids, invoice__isnull=True).update(invoice_id=invoice_id)
+    if updated != len(ids):
+        raise BillingConflict(f'{len(ids) - updated} {model._meta.verbose_name_plural} were billed meanwhile')
+    return updated
+
+
+def _bill_batch(contract_ids, date_from, date_to, header, numbers, dry_run):
+    contracts = {
+        contract.pk: contract
+        for contract in AMCContract.objects.select_related('customer').filter(
+            pk__in=contract_ids, amc_type=BILLABLE_AMC_TYPE
+        )
+    }
+
+    parts = defaultdict(list)
+    for part in (
+        _uninvoiced_spare_parts(date_from, date_to)
+        .filter(amc_contract_id__in=list(contracts))
+        .select_related('inventory_item__item')
+        .select_for_update(of=('self',))
+        .order_by('amc_contract_id', 'created_at', 'pk')
+    ):
+        parts[part.amc_contract_id].append(part)
+
+    visits = defaultdict(list)
+    for visit in (
+        _uninvoiced_visits(date_from, date_to)
+        .filter(amc_contract_id__in=list(contracts))
+        .select_for_update()
+        .order_by('amc_contract_id', 'visit_number')
+    ):
+        visits[visit.amc_contract_id].append(visit)
+
+    results = []
+    invoices = {}
+    for contract_id in sorted(set(parts) | set(visits)):
+        contract = contracts[contract_id]
+        invoice_header = dict(
+            header,
+            invoice_no=next(numbers),
+            work_description=f'AMC billing {contract.contract_number} ({date_from:%d-%m-%Y} to {date_to:%d-%m-%Y})',
+        )
+        invoice, high_rows, low_rows = build_contract_invoice(
+            contract, parts[contract_id], visits[contract_id], invoice_header
+        )
+        if not dry_run:
+            invoice.save()
+            for row in (*high_rows, *low_rows):
+                row.invoice = invoice
+            HighSideInvoiceItem.objects.bulk_create(high_rows)
+            LowSideInvoiceItem.objects.bulk_create(low_rows)
+        invoices[contract_id] = invoice
+        results.append({
+            'amc_contract_id': contract_id,
+            'contract_number': contract.contract_number,
+            'customer_id': contract.customer_id,
+            'invoice_id': invoice.pk,
+            'invoice_no': invoice.invoice_no,
+            'spare_parts': len(parts[contract_id]),
+            'service_visits': len(visits[contract_id]),
+            'taxable_value': invoice.taxable_value.quantize(TWO_PLACES),
+            'grand_total': invoice.grand_total.quantize(TWO_PLACES),
+        })
+
+    if not dry_run:
+        _link_to_invoices(AMCSparePart, parts, invoices)
+        _link_to_invoices(AMCServiceVisit, visits, invoices)
+    return results
+
+
+def bill_amc_contracts(date_from, date_to, invoice_date=None, contract_ids=None,
+                       gst_type='CGST_SGST', batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Invoice every non-comprehensive contract with something to bill in
+    [date_from, date_to], optionally only those in `contract_ids`.
+
+    Returns {"invoices": [per contract summary], "failed": [{"contracts",
+    "error"}], "spare_parts", "service_visits", "taxable_value",
+    "grand_total"}. With dry_run nothing is written and the invoice
+    numbers are the ones the run would have used.
+    """
+    header = {
+        'invoice_date': invoice_date or date_to,
+        'gst_type': gst_type,
+    }
+    company = CompanyProfile.objects.first()
+    if company:
+        header.update(
+            bank_name=company.bank_name,
+            account_no=company.account_no,
+            ifsc_code=company.ifsc_code,
+            declaration=company.declaration,
+        )
+
+    ids = billable_contract_ids(date_from, date_to, contract_ids)
+    batch_size = max(batch_size, 1)
+    # A dry run saves nothing, so its numbers continue across batches
+    dry_run_numbers = _invoice_numbers() if dry_run else None
+    invoices = []
+    failed = []
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        try:
+            with transaction.atomic():
+                # Numbered inside the transaction, after the previous batch committed
+                numbers = dry_run_numbers or _invoice_numbers()
+                invoices.extend(_bill_batch(batch, date_from, date_to, header, numbers, dry_run))
+        except (BillingConflict, DatabaseError, ValidationError) as e:
+            logger.exception(f'AMC billing failed for contracts {batch[0]}..{batch[-1]}: {str(e)}')
+            failed.append({'contracts': batch, 'error': str(e)})
+
+    return {
+        'invoices': invoices,
+        'failed': failed,
+        'spare_parts': sum(row['spare_parts'] for row in invoices),
+        'service_visits': sum(row['service_visits'] for row in invoices),
+        'taxable_value': sum((row['taxable_value'] for row in invoices), Decimal('0.00')),
+        'grand_total': sum((row['grand_total'] for row in invoices), Decimal('0.00')),
+    }
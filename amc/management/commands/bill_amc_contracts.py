@@ -0,0 +1,96 @@
+"""
+Management command to invoice non-comprehensive AMC contracts for a period.
+
+Every contract with uninvoiced spare parts (added in the period) or
+completed, uninvoiced service visits (planned in the period) gets one
+invoice. Contracts are billed in batches of --batch-size, one transaction
+per batch; a failing batch is reported and the others are kept.
+
+Usage:
+    python manage.py bill_amc_contracts --from 2026-04-01 --to 2026-04-30
+    python manage.py bill_amc_contracts --from 2026-04-01 --to 2026-04-30 --dry-run
+    python manage.py bill_amc_contracts --from 2026-04-01 --to 2026-04-30 --contract 12 --contract 15
+
+Schedule (cron example - run on the 1st of every month for the previous month):
+    0 6 1 * * cd /app && python manage.py bill_amc_contracts --last-month >> /var/log/amc_billing.log 2>&1
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from amc.billing import DEFAULT_BATCH_SIZE, bill_amc_contracts
+from invoice.models import Invoice
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date: {value}')
+
+
+class Command(BaseCommand):
+    help = 'Invoice uninvoiced AMC spare parts and completed service visits for a period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day of the period (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last day of the period (YYYY-MM-DD)')
+        parser.add_argument('--last-month', action='store_true', help='Bill the previous calendar month')
+        parser.add_argument('--invoice-date', help='Invoice date (YYYY-MM-DD, default: end of the period)')
+        parser.add_argument('--contract', dest='contracts', type=int, action='append',
+                            help='Only this contract id (repeatable)')
+        parser.add_argument('--gst-type', choices=[choice for choice, _ in Invoice.GST_TYPE_CHOICES],
+                            default='CGST_SGST', help='GST type of the invoices')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Contracts billed per transaction')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the invoices that would be created without saving them',
+        )
+
+    def handle(self, *args, **options):
+        if options['last_month']:
+            date_to = timezone.now().date().replace(day=1) - timedelta(days=1)
+            date_from = date_to.replace(day=1)
+        elif options['date_from'] and options['date_to']:
+            date_from = _date(options['date_from'])
+            date_to = _date(options['date_to'])
+        else:
+            raise CommandError('Give --from and --to, or --last-month')
+        if date_from > date_to:
+            raise CommandError('--to must be on or after --from')
+
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be saved'))
+
+        self.stdout.write(f'Billing AMC contracts for {date_from} to {date_to}')
+        result = bill_amc_contracts(
+            date_from,
+            date_to,
+            invoice_date=_date(options['invoice_date']) if options['invoice_date'] else None,
+            contract_ids=options['contracts'],
+            gst_type=options['gst_type'],
+            batch_size=options['batch_size'],
+            dry_run=dry_run,
+        )
+
+        for row in result['invoices']:
+            self.stdout.write(
+                f'  {row["invoice_no"]}  {row["contract_number"]}: {row["spare_parts"]} spare parts, '
+                f'{row["service_visits"]} visits, total {row["grand_total"]}'
+            )
+        for failure in result['failed']:
+            self.stdout.write(self.style.ERROR(
+                f'  Contracts {failure["contracts"]} not billed: {failure["error"]}'
+            ))
+
+        self.stdout.write(
+            f'{len(result["invoices"])} invoices, {result["spare_parts"]} spare parts, '
+            f'{result["service_visits"]} visits, taxable {result["taxable_value"]}, '
+            f'total {result["grand_total"]}'
+        )
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amc', '0015_amcservicevisit_amount'),
+        ('invoice', '0016_receivables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amcservicevisit',
+            name='invoice',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='amc_service_visits', to='invoice.invoice'),
+        ),
+    ]
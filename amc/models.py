@@ -467,6 +467,13 @@ class AMCServiceVisit(models.Model):
         blank=True,
         related_name='amc_service_visit',
     )
+    invoice = models.ForeignKey(
+        'invoice.Invoice',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='amc_service_visits',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -14,6 +14,9 @@ from quotation.serializers import (
     QuotationSerializer as QuotationSerializerBase
 )
 from quotation.models import Quotation, QuotationVersion
+from invoice.models import Invoice
+
+from .billing import DEFAULT_BATCH_SIZE
 
 
 class CustomerSearchSerializer(serializers.ModelSerializer):
@@ -485,6 +488,7 @@ class AMCServiceVisitSerializer(serializers.ModelSerializer):
             'work_date',
             'payment_status',
             'is_allocated',
+            'invoice',
             'created_at',
             'updated_at',
         ]
@@ -494,6 +498,7 @@ class AMCServiceVisitSerializer(serializers.ModelSerializer):
             'amount',
             'status',
             'technician_work_record',
+            'invoice',
             'created_at',
             'updated_at',
         ]
@@ -522,3 +527,20 @@ class AMCServiceVisitUpdateSerializer(serializers.ModelSerializer):
                 'Cannot edit a visit that is already allocated to a technician.'
             )
         return attrs
+
+
+class AMCBatchBillingSerializer(serializers.Serializer):
+    """Period and options of a batch AMC billing run."""
+
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    invoice_date = serializers.DateField(required=False, allow_null=True)
+    contracts = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    gst_type = serializers.ChoiceField(choices=Invoice.GST_TYPE_CHOICES, default='CGST_SGST')
+    batch_size = serializers.IntegerField(min_value=1, max_value=500, default=DEFAULT_BATCH_SIZE)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'date_to': 'Must be on or after date_from.'})
+        return attrs
@@ -1,3 +1,205 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from unittest import mock
+
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from inventory.models import InventoryItem
+from invoice.models import Invoice
+from lead_management.models import Customer
+from product_management.models import (
+    ProductModel,
+    ProductVariant,
+    acSubTypes,
+    acType,
+    brand,
+    item,
+    item_type,
+    material_type,
+)
+
+from . import billing
+from .billing import BillingConflict, bill_amc_contracts
+from .models import AMCContract, AMCServiceVisit, AMCSparePart
+
+DATE_FROM = date(2026, 10, 1)
+DATE_TO = date(2026, 10, 31)
+
+
+class AMCBillingTests(TestCase):
+    """Batch billing of non-comprehensive contracts for a period."""
+
+    @classmethod
+    def setUpTestData(cls):
+        product_model = ProductModel.objects.create(
+            name="Model",
+            ac_sub_type_id=acSubTypes.objects.create(ac_type_id=acType.objects.create(name="Split"), name="Wall"),
+            brand_id=brand.objects.create(name="Brand"),
+            model_no="M1",
+        )
+        cls.variant = ProductVariant.objects.create(product_model=product_model, capacity="1.5T", sku="AMC-TEST-1")
+        copper = material_type.objects.create(name="Copper")
+        pipe = item_type.objects.create(name="Pipe")
+        cls.stock = [
+            InventoryItem.objects.create(
+                item=item.objects.create(item_code=f"AMC-TEST-{i}", material_type_id=copper, item_type_id=pipe),
+                quantity=Decimal("100"),
+            )
+            for i in range(2)
+        ]
+
+    def _contract(self, number, amc_type="NON_COMPREHENSIVE"):
+        customer = Customer.objects.create(name=f"Customer {number}", contact_number=f"90000046{number:02d}")
+        return AMCContract.objects.create(
+            customer=customer,
+            amc_type=amc_type,
+            visit_frequency="QUARTERLY",
+            product_variant=self.variant,
+            sale_date=date(2025, 1, 1),
+            warranty_end_date=date(2025, 12, 31),
+            amc_start_date=date(2026, 1, 1),
+            amc_end_date=date(2026, 12, 31),
+            amc_cost=Decimal("4000"),
+        )
+
+    def _part(self, contract, quantity="2", rate="150", gst_percent="18", created_at=None, stock=0):
+        part = AMCSparePart.objects.create(
+            amc_contract=contract,
+            inventory_item=self.stock[stock],
+            quantity_used=Decimal(quantity),
+            rate_per_unit=Decimal(rate),
+            gst_percent=Decimal(gst_percent),
+        )
+        if created_at is not None:
+            AMCSparePart.objects.filter(pk=part.pk).update(created_at=created_at)
+        return part
+
+    def _visit(self, contract, number, planned_date=date(2026, 10, 5), status=AMCServiceVisit.STATUS_COMPLETED):
+        return AMCServiceVisit.objects.create(
+            amc_contract=contract, visit_number=number, planned_date=planned_date,
+            amount=Decimal("1000"), status=status,
+        )
+
+    @staticmethod
+    def _local(day, at):
+        return timezone.make_aware(datetime.combine(day, at), timezone.get_current_timezone())
+
+    def test_one_invoice_per_contract(self):
+        contract = self._contract(1)
+        parts = [
+            self._part(contract),
+            self._part(contract, quantity="1", rate="100", gst_percent="12", stock=1),
+            # Last minute of the period (local time) is in, the next midnight is not
+            self._part(contract, quantity="1", rate="50", created_at=self._local(DATE_TO, time(23, 59))),
+        ]
+        late_part = self._part(contract, created_at=self._local(date(2026, 11, 1), time.min))
+        visit = self._visit(contract, 1)
+        scheduled = self._visit(contract, 2, status=AMCServiceVisit.STATUS_SCHEDULED)
+        outside = self._visit(contract, 3, planned_date=date(2026, 9, 30))
+        visit_only = self._contract(2)
+        other_visit = self._visit(visit_only, 1)
+        comprehensive = self._contract(3, amc_type="COMPREHENSIVE")
+        self._visit(comprehensive, 1)
+
+        result = bill_amc_contracts(DATE_FROM, DATE_TO)
+
+        self.assertEqual(result["failed"], [])
+        self.assertEqual([row["amc_contract_id"] for row in result["invoices"]], [contract.pk, visit_only.pk])
+        self.assertEqual((result["spare_parts"], result["service_visits"]), (3, 2))
+
+        invoice = Invoice.objects.get(pk=result["invoices"][0]["invoice_id"])
+        self.assertEqual(invoice.customer_id, contract.customer_id)
+        self.assertEqual(invoice.invoice_date, DATE_TO)
+        self.assertEqual(invoice.high_side_items.count(), 1)
+        self.assertEqual(
+            sorted(line.amount for line in invoice.low_side_items.all()),
+            [Decimal("50"), Decimal("100"), Decimal("300")],
+        )
+        # 1000 + 300 + 100 + 50 taxable; 180 + 54 + 12 + 9 GST
+        self.assertEqual(invoice.taxable_value, Decimal("1450.00"))
+        self.assertEqual((invoice.cgst_amount, invoice.sgst_amount), (Decimal("127.50"), Decimal("127.50")))
+        self.assertEqual(invoice.grand_total, Decimal("1705.00"))
+        self.assertEqual(result["invoices"][0]["grand_total"], Decimal("1705.00"))
+
+        for part in parts:
+            part.refresh_from_db()
+            self.assertEqual(part.invoice_id, invoice.pk)
+        visit.refresh_from_db()
+        self.assertEqual(visit.invoice_id, invoice.pk)
+        other_visit.refresh_from_db()
+        self.assertEqual(other_visit.invoice_id, result["invoices"][1]["invoice_id"])
+        for unbilled in (late_part, scheduled, outside):
+            unbilled.refresh_from_db()
+            self.assertIsNone(unbilled.invoice_id)
+
+        # Nothing left to bill in the period
+        again = bill_amc_contracts(DATE_FROM, DATE_TO)
+        self.assertEqual((again["invoices"], again["failed"]), ([], []))
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_dry_run_writes_nothing(self):
+        contracts = [self._contract(number) for number in range(1, 4)]
+        for contract in contracts:
+            self._part(contract)
+
+        dry_run = bill_amc_contracts(DATE_FROM, DATE_TO, batch_size=1, dry_run=True)
+
+        self.assertFalse(Invoice.objects.exists())
+        self.assertFalse(AMCSparePart.objects.filter(invoice__isnull=False).exists())
+        numbers = [row["invoice_no"] for row in dry_run["invoices"]]
+        prefix = numbers[0].rpartition("-")[0]
+        self.assertEqual(numbers, [f"{prefix}-{n:04d}" for n in range(1, 4)])
+        self.assertEqual({row["invoice_id"] for row in dry_run["invoices"]}, {None})
+
+        # The real run uses the numbers the dry run announced
+        billed = bill_amc_contracts(DATE_FROM, DATE_TO, batch_size=1)
+        self.assertEqual([row["invoice_no"] for row in billed["invoices"]], numbers)
+        self.assertEqual(billed["grand_total"], dry_run["grand_total"])
+
+    def test_conflict_rolls_back_only_its_batch(self):
+        conflicted, billed = self._contract(1), self._contract(2)
+        conflicted_part = self._part(conflicted)
+        self._visit(conflicted, 1)
+        self._part(billed)
+        link_to_invoices = billing._link_to_invoices
+
+        def billed_meanwhile(model, rows_by_contract, invoices):
+            # Someone else billed one of the batch's parts after it was read
+            if model is AMCSparePart and conflicted.pk in rows_by_contract:
+                AMCSparePart.objects.filter(pk=conflicted_part.pk).update(invoice=invoices[conflicted.pk])
+            return link_to_invoices(model, rows_by_contract, invoices)
+
+        with mock.patch.object(billing, "_link_to_invoices", side_effect=billed_meanwhile), \
+                self.assertLogs("amc.billing", level="ERROR"):
+            result = bill_amc_contracts(DATE_FROM, DATE_TO, batch_size=1)
+
+        self.assertEqual(len(result["failed"]), 1)
+        self.assertEqual(result["failed"][0]["contracts"], [conflicted.pk])
+        self.assertIsInstance(result["failed"][0]["error"], str)
+        self.assertEqual([row["amc_contract_id"] for row in result["invoices"]], [billed.pk])
+
+        # The failed batch left nothing behind; the other one is committed
+        self.assertEqual(list(Invoice.objects.values_list("customer_id", flat=True)), [billed.customer_id])
+        self.assertFalse(AMCSparePart.objects.filter(amc_contract=conflicted, invoice__isnull=False).exists())
+        self.assertFalse(AMCServiceVisit.objects.filter(amc_contract=conflicted, invoice__isnull=False).exists())
+        self.assertTrue(AMCSparePart.objects.filter(amc_contract=billed, invoice__isnull=False).exists())
+
+        # A re-run bills the contract that failed
+        retry = bill_amc_contracts(DATE_FROM, DATE_TO)
+        self.assertEqual([row["amc_contract_id"] for row in retry["invoices"]], [conflicted.pk])
+
+    def test_link_refuses_rows_billed_meanwhile(self):
+        contract = self._contract(1)
+        billed, unbilled = self._part(contract), self._part(contract, stock=1)
+        invoice = Invoice.objects.get(pk=bill_amc_contracts(DATE_FROM, DATE_TO)["invoices"][0]["invoice_id"])
+        AMCSparePart.objects.filter(pk=unbilled.pk).update(invoice=None)
 
-# Create your tests here.
+        # Every row of the batch or none: the batch's transaction is rolled back
+        with self.assertRaisesMessage(BillingConflict, "1 amc spare parts were billed meanwhile"), \
+                transaction.atomic():
+            billing._link_to_invoices(AMCSparePart, {contract.pk: [billed, unbilled]}, {contract.pk: invoice})
+        self.assertEqual(
+            billing._link_to_invoices(AMCSparePart, {contract.pk: [unbilled]}, {contract.pk: invoice}), 1
+        )
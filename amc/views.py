@@ -25,7 +25,9 @@ from .serializers import (
     TechnicianAllocationDraftSerializer,
     AMCServiceVisitSerializer,
     AMCServiceVisitUpdateSerializer,
+    AMCBatchBillingSerializer,
 )
+from .billing import bill_amc_contracts
 from .visit_service import get_service_record_for_amc_contract, sync_amc_service_visits
 
 from .models import ServiceManagementRecord, ServiceManagementMaterial
@@ -464,6 +466,30 @@ class AMCContractViewSet(viewsets.ModelViewSet):
 
         return Response({'updated': updated})
 
+    @action(detail=False, methods=['post'], url_path='batch-invoice')
+    def batch_invoice(self, request):
+        """
+        Invoice every non-comprehensive contract with uninvoiced spare parts
+        or completed service visits in the period, in one call.
+        """
+        serializer = AMCBatchBillingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        result = bill_amc_contracts(
+            data['date_from'],
+            data['date_to'],
+            invoice_date=data.get('invoice_date'),
+            contract_ids=data.get('contracts'),
+            gst_type=data['gst_type'],
+            batch_size=data['batch_size'],
+            dry_run=data['dry_run'],
+        )
+        result['dry_run'] = data['dry_run']
+        if data['dry_run'] or not result['invoices']:
+            return Response(result)
+        return Response(result, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['get'], url_path='technician-allocation-draft')
     def technician_allocation_draft(self, request, pk=None):
         """Return auto-filled customer/payment data for technician allocation."""
@@ -92,8 +92,9 @@ def sync_amc_service_visits(contract):
                 if visit.service_record_id is None and service_record:
                     visit.service_record = service_record
                     update_fields.append('service_record')
-                # Keep allocated visits' amount in sync with current AMC cost split
-                if visit.amount != visit_amount:
+                # Keep allocated visits' amount in sync with current AMC cost split,
+                # unless the visit has already been billed
+                if visit.amount != visit_amount and visit.invoice_id is None:
                     visit.amount = visit_amount
                     update_fields.append('amount')
                 visit.save(update_fields=update_fields)
@@ -0,0 +1,13 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+
+
+def start_of_day(value):
+    """
+    Midnight of the date `value` in the server timezone, as an aware
+    datetime. Date ranges on DateTimeFields are filtered as
+    [start_of_day(date_from), start_of_day(date_to + 1 day)) on the raw
+    column, which keeps them index friendly (no DATE() cast).
+    """
+    return timezone.make_aware(datetime.combine(value, time.min), timezone.get_current_timezone())
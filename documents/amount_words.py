@@ -0,0 +1,90 @@
+"""
+Amounts in words with Indian numbering (lakh / crore) for invoices,
+purchase orders and quotations.
+
+number_in_words() produces exactly what num2words(n, lang="en_IN") does
+("one lakh, twenty-three thousand, four hundred and five") without going
+through num2words' generic splitting and merging, and keeps going past
+num2words' limit of 10^10 by counting crores in words ("one thousand
+crore"). Both functions are LRU-cached: documents repeat the same totals
+over and over (every PDF render of an invoice, the list of a PO's
+revisions), so most calls are a dictionary lookup.
+"""
+from decimal import ROUND_DOWN, Decimal
+from functools import lru_cache
+
+_ONES = (
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine",
+    "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen",
+    "seventeen", "eighteen", "nineteen",
+)
+
+_TENS = ("", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety")
+
+_GROUPS = ((10 ** 7, "crore"), (10 ** 5, "lakh"), (1000, "thousand"), (100, "hundred"))
+
+PAISE = Decimal("0.01")
+
+
+@lru_cache(maxsize=4096)
+def number_in_words(number):
+    """
+    A non-negative integer in lowercase words, Indian numbering.
+
+    Groups are joined with ", " and the last part below one hundred with
+    " and ", as num2words' en_IN converter does.
+    """
+    number = int(number)
+    if number < 0:
+        raise ValueError(f"Cannot write a negative number in words: {number}")
+    if number < 20:
+        return _ONES[number]
+    if number < 100:
+        tens, ones = divmod(number, 10)
+        return f"{_TENS[tens]}-{_ONES[ones]}" if ones else _TENS[tens]
+
+    parts = []
+    for value, name in _GROUPS:
+        if number >= value:
+            count, number = divmod(number, value)
+            parts.append(f"{number_in_words(count)} {name}")
+    words = ", ".join(parts)
+    if number:
+        words = f"{words} and {number_in_words(number)}"
+    return words
+
+
+def _to_decimal(amount):
+    if isinstance(amount, Decimal):
+        return amount
+    # str() first so floats such as 1050.1 keep the digits they print with
+    return Decimal(str(amount))
+
+
+@lru_cache(maxsize=4096)
+def _amount_in_words(amount):
+    rupees = int(amount)
+    paise = int((amount - rupees) * 100)
+
+    words = f"{number_in_words(rupees).title()} Rupees"
+    if paise > 0:
+        words = f"{words} and {number_in_words(paise).title()} Paise"
+    return f"{words} Only"
+
+
+def amount_in_words(amount):
+    """
+    "One Lakh, Five Thousand Rupees and Fifty Paise Only" for 105000.50.
+
+    Fractions of a paisa are dropped, not rounded, the way invoice
+    amount_in_words has always been computed. Accepts Decimal, int, float
+    or a numeric string; raises ValueError for negative or non-numeric
+    amounts.
+    """
+    try:
+        amount = _to_decimal(amount)
+    except ArithmeticError:
+        raise ValueError(f"Not an amount: {amount!r}")
+    if not amount.is_finite() or amount < 0:
+        raise ValueError(f"Cannot write {amount} in words")
+    return _amount_in_words(amount.quantize(PAISE, rounding=ROUND_DOWN))
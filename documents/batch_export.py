@@ -0,0 +1,166 @@
+"""
+Month-end batch export of PDFs as a single streamed ZIP.
+
+Documents are selected by branch, date range and type, renders are fanned
+out over a process pool and every PDF is written into the ZIP as soon as it
+is ready (cached PDFs and issued invoices, from their archive, go straight
+in). The ZIP is produced incrementally, so neither the web worker nor the
+client ever holds the whole archive.
+"""
+import re
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+
+from .pdf_cache import PDFCache, pdf_cache_key
+from .pdf_jobs import submit_render
+from .registry import build_document
+
+EXPORT_DOC_TYPES = ('invoice', 'purchase_order', 'delivery_challan')
+
+
+def export_selection(doc_types, branch_id=None, date_from=None, date_to=None):
+    """Yield (doc_type, pk) for every document matching the filter."""
+    from inventory.models import DeliveryChallan, PurchaseOrder
+    from invoice.models import Invoice
+
+    for doc_type in doc_types:
+        if doc_type == 'invoice':
+            qs = Invoice.objects.all()
+            date_field = 'invoice_date'
+            branch_q = Q(branch_id=branch_id)
+        elif doc_type == 'purchase_order':
+            qs = PurchaseOrder.objects.filter(is_current=True)
+            date_field = 'po_date'
+            branch_q = Q(branch_id=branch_id)
+        elif doc_type == 'delivery_challan':
+            qs = DeliveryChallan.objects.all()
+            date_field = 'dispatch_date'
+            # Older challans only carry the branch on their material issue
+            branch_q = Q(branch_id=branch_id) | Q(branch__isnull=True, material_issue__branch_id=branch_id)
+        else:
+            raise ValueError(f"Unsupported document type: {doc_type}")
+
+        if branch_id:
+            qs = qs.filter(branch_q)
+        if date_from:
+            qs = qs.filter(**{f"{date_field}__gte": date_from})
+        if date_to:
+            qs = qs.filter(**{f"{date_field}__lte": date_to})
+
+        for pk in qs.order_by(date_field, 'pk').values_list('pk', flat=True):
+            yield doc_type, pk
+
+
+def _safe_name(filename):
+    return re.sub(r'[\\/:*?"<>|]+', '-', filename).strip() or 'document.pdf'
+
+
+def iter_export_pdfs(selection, base_url=None, executor=None, window=None):
+    """
+    Yield (arcname, pdf, error) in completion order.
+
+    At most `window` renders are in flight, so HTML for a large export is
+    built just ahead of the pool instead of all up front.
+    """
+    cache = PDFCache()
+    if window is None:
+        window = max(getattr(settings, 'PDF_RENDER_WORKERS', 0), 1) * 2
+
+    used_names = set()
+    pending = {}
+
+    def arcname_for(doc_type, filename):
+        name = f"{doc_type}/{_safe_name(filename)}"
+        stem, dot, ext = name.rpartition('.')
+        counter = 1
+        while name in used_names:
+            counter += 1
+            name = f"{stem}-{counter}{dot}{ext}"
+        used_names.add(name)
+        return name
+
+    def drain(block_until):
+        while len(pending) > block_until:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                arcname = pending.pop(future)
+                try:
+                    yield arcname, future.result(), None
+                except Exception as e:
+                    yield arcname, None, str(e)
+
+    for doc_type, pk in selection:
+        # The response is already streaming: a document that cannot be built
+        # goes to errors.txt instead of cutting the ZIP short
+        try:
+            source = build_document(doc_type, pk, endpoint='pdf_export')
+            key = None if source.pdf is not None else pdf_cache_key(source.html, base_url, engine=source.engine)
+            pdf = source.pdf if key is None else cache.get(key)
+        except Http404 as e:
+            yield f"{doc_type}/{pk}", None, str(e) or "Not found"
+            continue
+        except Exception as e:
+            yield f"{doc_type}/{pk}", None, str(e) or type(e).__name__
+            continue
+
+        arcname = arcname_for(doc_type, source.filename)
+        if pdf is not None:
+            yield arcname, pdf, None
+            continue
+
+        future = submit_render(
+            source.html, base_url, key, executor=executor, return_pdf=True, renderer=source.renderer
+        )
+        pending[future] = arcname
+        yield from drain(window - 1)
+
+    yield from drain(0)
+
+
+class _ZipStream:
+    """Write-only, non-seekable file object that hands back what was written."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(results):
+    """
+    Turn (arcname, pdf, error) tuples into ZIP bytes, yielding after each
+    member. Failed documents are listed in errors.txt at the end.
+    """
+    stream = _ZipStream()
+    errors = []
+    # PDFs are already compressed, deflating them again only burns CPU
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as zf:
+        for arcname, pdf, error in results:
+            if error is not None:
+                errors.append(f"{arcname}: {error}")
+                continue
+            zf.writestr(arcname, pdf)
+            yield stream.pop()
+
+        if errors:
+            zf.writestr('errors.txt', "\n".join(errors) + "\n")
+    yield stream.pop()
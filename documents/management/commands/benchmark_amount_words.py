@@ -0,0 +1,113 @@
+"""
+Benchmark documents.amount_words against num2words.
+
+All three modes write the same random invoice-like amounts (rupees and
+paise) in words. "num2words" is the per-call num2words(lang="en_IN")
+formatting invoices used before; "cold" is amount_in_words() with its
+caches cleared before every pass; "cached" is amount_in_words() with the
+caches filled by a previous pass, which is what repeated PDF renders and
+saves of the same documents hit. Every pass also checks that the output
+of the formatter is identical to num2words'.
+
+Usage:
+    python manage.py benchmark_amount_words
+    python manage.py benchmark_amount_words --count 50000 --distinct 500 --repeat 5
+"""
+
+import random
+import time
+from decimal import Decimal
+from statistics import median
+
+from django.core.management.base import BaseCommand, CommandError
+from num2words import num2words
+
+from documents.amount_words import _amount_in_words, amount_in_words, number_in_words
+
+
+def _num2words_amount(amount):
+    rupees = int(amount)
+    paise = int((amount - rupees) * 100)
+    words = f'{num2words(rupees, lang="en_IN").title()} Rupees'
+    if paise > 0:
+        words = f'{words} and {num2words(paise, lang="en_IN").title()} Paise'
+    return f'{words} Only'
+
+
+def _clear_caches():
+    number_in_words.cache_clear()
+    _amount_in_words.cache_clear()
+
+
+class Command(BaseCommand):
+    help = 'Compare amount-in-words formatting time of num2words and documents.amount_words'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=20000,
+            help='Amounts formatted per pass',
+        )
+        parser.add_argument(
+            '--distinct',
+            type=int,
+            default=1000,
+            help='Distinct amounts among them (repeats are what the cache serves)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Passes per mode (median is reported)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the amounts',
+        )
+
+    def handle(self, *args, **options):
+        count = max(options['count'], 1)
+        repeat = max(options['repeat'], 1)
+        rng = random.Random(options['seed'])
+
+        pool = [
+            Decimal(rng.randrange(10 ** rng.randint(1, 11))) / 100
+            for _ in range(max(options['distinct'], 1))
+        ]
+        amounts = [rng.choice(pool) for _ in range(count)]
+
+        expected = [_num2words_amount(amount) for amount in amounts]
+        _clear_caches()
+        if [amount_in_words(amount) for amount in amounts] != expected:
+            raise CommandError('amount_in_words output differs from num2words')
+
+        modes = {
+            'num2words': (_num2words_amount, None),
+            'cold': (amount_in_words, _clear_caches),
+            'cached': (amount_in_words, None),
+        }
+
+        self.stdout.write(f'{"mode":>10} {"amounts":>8} {"median s":>9} {"us/amount":>10}')
+        medians = {}
+        for mode, (formatter, before_pass) in modes.items():
+            timings = []
+            for _ in range(repeat):
+                if before_pass:
+                    before_pass()
+                started = time.perf_counter()
+                for amount in amounts:
+                    formatter(amount)
+                timings.append(time.perf_counter() - started)
+            medians[mode] = median(timings)
+            self.stdout.write(
+                f'{mode:>10} {count:>8} {medians[mode]:>9.3f} {medians[mode] / count * 1e6:>10.2f}'
+            )
+
+        for mode in ('cold', 'cached'):
+            if medians[mode]:
+                self.stdout.write(f'{mode:>10} is {medians["num2words"] / medians[mode]:.1f}x num2words')
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
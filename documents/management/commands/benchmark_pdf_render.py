@@ -0,0 +1,117 @@
+"""
+Benchmark the WeasyPrint render service against a plain WeasyPrint render.
+
+Both modes render the same synthetic invoice HTML (see benchmark_invoice_pdf)
+in a fresh process each. "plain" is HTML(string=...).write_pdf() as the PDF
+endpoints used to call it; "preloaded" is documents.pdf_render.render_pdf
+after warm_up(), i.e. with the logo, fonts and template CSS already loaded.
+The first render and the median of the following renders are reported, the
+difference of the medians is the fixed cost saved on every PDF.
+
+Usage:
+    python manage.py benchmark_pdf_render
+    python manage.py benchmark_pdf_render --sizes 1 10 100 --repeat 10
+    python manage.py benchmark_pdf_render --base-url http://localhost:8000/
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import median
+
+from django.core.management.base import BaseCommand
+
+MODES = ('plain', 'preloaded')
+
+
+def _init_worker():
+    # No render warm-up here, so "plain" really starts cold
+    import django
+    django.setup()
+
+
+def _measure(mode, lines, repeat, base_url):
+    """Runs in a fresh process: (setup s, first render s, median render s, PDF size)."""
+    from weasyprint import HTML
+
+    from documents.pdf_render import render_pdf, warm_up
+    from invoice.management.commands.benchmark_invoice_pdf import _synthetic_invoice
+    from invoice.utils.pdf_generator import render_invoice_html
+
+    invoice, data = _synthetic_invoice(lines)
+    html = render_invoice_html(invoice, data=data)
+
+    started = time.perf_counter()
+    if mode == 'preloaded':
+        warm_up(base_url)
+        render = lambda: render_pdf(html, base_url)  # noqa: E731
+    else:
+        render = lambda: HTML(string=html, base_url=base_url).write_pdf()  # noqa: E731
+    setup = time.perf_counter() - started
+
+    timings = []
+    pdf = b''
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        pdf = render()
+        timings.append(time.perf_counter() - started)
+
+    return setup, timings[0], median(timings[1:]), len(pdf)
+
+
+class Command(BaseCommand):
+    help = 'Compare per-render time of plain WeasyPrint and the preloading render service'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[1, 10, 100],
+            help='Invoice line counts to benchmark',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='Renders after the first one (median is reported)',
+        )
+        parser.add_argument(
+            '--base-url',
+            default='http://localhost:8000/',
+            help='Base URL passed to WeasyPrint, as the PDF endpoints do',
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(options['repeat'], 1)
+
+        self.stdout.write(
+            f'{"mode":>10} {"lines":>6} {"setup s":>8} {"first s":>8} {"median s":>9} {"PDF KB":>7}'
+        )
+        for size in options['sizes']:
+            medians = {}
+            for mode in MODES:
+                with ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                ) as pool:
+                    try:
+                        setup, first, med, pdf_bytes = pool.submit(
+                            _measure, mode, size, repeat, options['base_url']
+                        ).result()
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f'{mode:>10} {size:>6} failed: {str(e)}'))
+                        continue
+
+                medians[mode] = med
+                self.stdout.write(
+                    f'{mode:>10} {size:>6} {setup:>8.3f} {first:>8.3f} {med:>9.3f} {pdf_bytes / 1024:>7.0f}'
+                )
+
+            if len(medians) == len(MODES):
+                saved = medians['plain'] - medians['preloaded']
+                share = saved / medians['plain'] * 100 if medians['plain'] else 0
+                self.stdout.write(f'{"":>10} {size:>6} saved {saved * 1000:.1f} ms per render ({share:.0f}%)')
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,83 @@
+"""
+Export invoice, purchase order and delivery challan PDFs to one ZIP file.
+
+Renders run in parallel on a process pool (one process per CPU core by
+default) and PDFs already in the PDF cache are reused.
+
+Usage:
+    python manage.py export_pdfs --branch 1 --from 2026-03-01 --to 2026-03-31 --output march.zip
+    python manage.py export_pdfs --type invoice --type purchase_order --output invoices.zip --workers 4
+    python manage.py export_pdfs --branch 1 --from 2026-03-01 --to 2026-03-31 --dry-run
+
+Pass --base-url with the public site URL (e.g. https://erp.example.com/) so
+cache entries written by the web PDF endpoints are hit.
+"""
+
+import os
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.batch_export import EXPORT_DOC_TYPES, export_selection, iter_export_pdfs, stream_zip
+from documents.pdf_jobs import new_render_pool
+
+
+class Command(BaseCommand):
+    help = 'Export invoice / PO / delivery challan PDFs for a branch and date range as a ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', dest='doc_types', action='append', choices=EXPORT_DOC_TYPES,
+                            help='Document type to include (repeatable, default: all)')
+        parser.add_argument('--branch', type=int, help='Branch id')
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat, help='Start date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help='End date (YYYY-MM-DD)')
+        parser.add_argument('--output', default='documents.zip', help='ZIP file to write')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Render processes (default: CPU count)')
+        parser.add_argument('--base-url', default=None, help='Base URL used to resolve template assets')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the matching documents',
+        )
+
+    def handle(self, *args, **options):
+        doc_types = options['doc_types'] or list(EXPORT_DOC_TYPES)
+        if options['date_from'] and options['date_to'] and options['date_from'] > options['date_to']:
+            raise CommandError('--from must be on or before --to')
+
+        selection = list(export_selection(
+            doc_types,
+            branch_id=options['branch'],
+            date_from=options['date_from'],
+            date_to=options['date_to'],
+        ))
+        self.stdout.write(f'{len(selection)} documents match')
+        if options['dry_run'] or not selection:
+            return
+
+        workers = max(options['workers'], 1)
+        started = time.perf_counter()
+        written = failed = 0
+
+        with new_render_pool(workers) as pool, open(options['output'], 'wb') as fh:
+            results = iter_export_pdfs(selection, base_url=options['base_url'], executor=pool, window=workers * 2)
+
+            def counted(results):
+                nonlocal written, failed
+                for arcname, pdf, error in results:
+                    if error is None:
+                        written += 1
+                    else:
+                        failed += 1
+                        self.stdout.write(self.style.WARNING(f'  {arcname}: {error}'))
+                    yield arcname, pdf, error
+
+            for chunk in stream_zip(counted(results)):
+                fh.write(chunk)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} PDFs to {options["output"]} in {elapsed:.1f}s ({failed} failed)'
+        ))
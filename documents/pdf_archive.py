@@ -0,0 +1,59 @@
+"""
+Write-once store for issued PDFs.
+
+Unlike the render cache (pdf_cache.py), which is keyed by the HTML and
+evicts old entries, an archive file is named by the SHA-256 of the PDF
+bytes themselves. A stored file therefore never changes, identical PDFs
+are stored once, and nothing is ever evicted: the database row that
+references the hash is the record of what was issued.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+
+def pdf_sha256(pdf):
+    return hashlib.sha256(pdf).hexdigest()
+
+
+class PDFArchive:
+    """Content-addressed PDF files under PDF_ARCHIVE_DIR."""
+
+    def __init__(self, root=None):
+        self.root = Path(root or getattr(settings, 'PDF_ARCHIVE_DIR', Path(settings.MEDIA_ROOT) / 'pdf_archive'))
+
+    def path_for(self, sha256):
+        return self.root / sha256[:2] / f"{sha256}.pdf"
+
+    def exists(self, sha256):
+        return self.path_for(sha256).exists()
+
+    def put(self, pdf):
+        """Store the PDF (once per distinct content) and return its SHA-256."""
+        sha256 = pdf_sha256(pdf)
+        path = self.path_for(sha256)
+        if path.exists():
+            return sha256
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial PDF
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(pdf)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return sha256
+
+    def open(self, sha256):
+        """Binary file object of the stored PDF, None if it is missing."""
+        try:
+            return open(self.path_for(sha256), 'rb')
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,132 @@
+"""
+Content-addressed cache for rendered PDFs.
+
+PDFs are keyed by a SHA-256 of the rendered HTML (plus base_url and
+PDF_CACHE_VERSION), so any change to the document data or template produces
+a new key and stale entries are never served. Files live on disk under
+PDF_CACHE_DIR and are evicted least-recently-used first once the size or
+file-count caps are exceeded.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .pdf_render import render_pdf
+
+logger = logging.getLogger(__name__)
+
+
+def pdf_cache_key(html_string, base_url=None, engine='weasyprint'):
+    """
+    Hash of everything that affects the rendered PDF bytes. For non-HTML
+    engines the HTML still stands in for the document data, the engine name
+    keeps their output apart from the WeasyPrint render.
+    """
+    digest = hashlib.sha256()
+    if engine != 'weasyprint':
+        digest.update(engine.encode())
+        digest.update(b'\0')
+    digest.update(str(getattr(settings, 'PDF_CACHE_VERSION', '1')).encode())
+    digest.update(b'\0')
+    digest.update((base_url or '').encode())
+    digest.update(b'\0')
+    digest.update(html_string.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PDFCache:
+    """On-disk PDF store with LRU eviction (file mtime is the access clock)."""
+
+    def __init__(self, root=None, max_bytes=None, max_files=None):
+        self.root = Path(root or getattr(settings, 'PDF_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'pdf_cache'))
+        self.max_bytes = max_bytes if max_bytes is not None else getattr(settings, 'PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+        self.max_files = max_files if max_files is not None else getattr(settings, 'PDF_CACHE_MAX_FILES', 5000)
+
+    def path_for(self, key):
+        return self.root / key[:2] / f"{key}.pdf"
+
+    def exists(self, key):
+        return self.path_for(key).exists()
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            pdf = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path, None)  # mark as recently used
+        except OSError:
+            pass
+        return pdf
+
+    def put(self, key, pdf):
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial PDF
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(pdf)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.evict()
+        return path
+
+    def evict(self):
+        """Delete least recently used files until both caps are satisfied."""
+        entries = []
+        total_bytes = 0
+        for path in self.root.glob('*/*.pdf'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        if total_bytes <= self.max_bytes and len(entries) <= self.max_files:
+            return 0
+
+        entries.sort()
+        removed = 0
+        remaining = len(entries)
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes and remaining <= self.max_files:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            remaining -= 1
+            removed += 1
+        return removed
+
+
+def get_or_render_pdf(html_string, base_url=None, cache=None, key=None, render=None):
+    """
+    Return (cache key, PDF bytes), rendering only on a cache miss. `render`
+    replaces the WeasyPrint render (pass a matching `key`).
+    """
+    cache = cache or PDFCache()
+    key = key or pdf_cache_key(html_string, base_url)
+
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = render() if render is not None else render_pdf(html_string, base_url)
+        try:
+            cache.put(key, pdf)
+        except OSError as e:
+            # A full or read-only disk must not break PDF downloads
+            logger.warning(f"Could not write PDF cache entry {key}: {str(e)}")
+    return key, pdf
@@ -0,0 +1,205 @@
+"""
+Background PDF rendering.
+
+WeasyPrint is CPU bound and slow for large documents, so rendering runs in a
+local process pool (PDF_RENDER_WORKERS processes per web worker) instead of
+the request thread. HTML is still built in the web process, where the ORM and
+templates live; only the HTML -> PDF step is shipped to the pool. Results are
+written to the shared PDFCache and job state is kept in the Django cache, so
+any web worker can answer status and download requests for a job.
+
+PDF_RENDER_WORKERS = 0 renders inline (useful for local development).
+"""
+import logging
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache as job_store
+from django.utils.module_loading import import_string
+
+from .pdf_cache import PDFCache, pdf_cache_key, render_pdf
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = 'pending'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# key -> Future, so concurrent requests for the same document share one render
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+    from .pdf_render import warm_up
+    try:
+        warm_up()
+    except Exception as e:
+        # Renders still work, they just load the assets themselves
+        logger.warning(f"PDF render warm-up failed: {str(e)}")
+
+
+def _render_to_cache(html_string, base_url, key, return_pdf=False, renderer=None):
+    """
+    Runs in a pool process. Returns None once the PDF is in the cache, or
+    the PDF bytes when return_pdf is set (or the cache write failed).
+
+    `renderer` is an optional ("dotted.path", *args) used instead of
+    WeasyPrint, e.g. the Reportlab invoice engine.
+    """
+    if renderer is not None:
+        pdf = import_string(renderer[0])(*renderer[1:])
+    else:
+        pdf = render_pdf(html_string, base_url)
+    try:
+        PDFCache().put(key, pdf)
+    except OSError as e:
+        # Hand the bytes back so a waiting request can still be served
+        logger.warning(f"Could not write PDF cache entry {key}: {str(e)}")
+        return pdf
+    return pdf if return_pdf else None
+
+
+def new_render_pool(max_workers):
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        # spawn: never fork a process holding DB/Redis connections
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = new_render_pool(settings.PDF_RENDER_WORKERS)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def submit_render(html_string, base_url, key, executor=None, return_pdf=False, renderer=None):
+    """Queue one HTML -> PDF render and return its Future."""
+    if executor is None and getattr(settings, 'PDF_RENDER_WORKERS', 0) <= 0:
+        future = Future()
+        try:
+            future.set_result(_render_to_cache(html_string, base_url, key, return_pdf, renderer))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    if executor is not None:
+        return executor.submit(_render_to_cache, html_string, base_url, key, return_pdf, renderer)
+
+    try:
+        return get_pool().submit(_render_to_cache, html_string, base_url, key, return_pdf, renderer)
+    except BrokenProcessPool:
+        # A worker died (OOM, segfault); start a fresh pool and retry once
+        logger.error("PDF render pool was broken, restarting it")
+        _reset_pool()
+        return get_pool().submit(_render_to_cache, html_string, base_url, key, return_pdf, renderer)
+
+
+def _job_cache_key(job_id):
+    return f"pdf_job:{job_id}"
+
+
+def _save_job(job_id, job):
+    job_store.set(_job_cache_key(job_id), job, timeout=settings.PDF_JOB_TTL)
+
+
+def get_job(job_id):
+    return job_store.get(_job_cache_key(job_id))
+
+
+class PDFJob:
+    """Handle returned by submit_pdf_job; wait() is only usable in the submitting process."""
+
+    def __init__(self, job_id, key, future=None):
+        self.id = job_id
+        self.key = key
+        self.future = future
+
+    def wait(self, timeout):
+        """
+        Wait up to `timeout` seconds. Returns PDF bytes when rendering is
+        finished, None if it is still running. Render errors are raised.
+        """
+        if self.future is None:
+            return PDFCache().get(self.key)
+        try:
+            pdf = self.future.result(timeout=timeout)
+        except FutureTimeout:
+            return None
+        return pdf if pdf is not None else PDFCache().get(self.key)
+
+
+def submit_pdf_job(html_string, filename, base_url=None, key=None, renderer=None):
+    """Queue a render for the given HTML and return a PDFJob."""
+    key = key or pdf_cache_key(html_string, base_url)
+    job_id = uuid.uuid4().hex
+    job = {
+        'status': JOB_PENDING,
+        'key': key,
+        'filename': filename,
+        'error': None,
+    }
+
+    if PDFCache().exists(key):
+        job['status'] = JOB_DONE
+        _save_job(job_id, job)
+        return PDFJob(job_id, key)
+
+    _save_job(job_id, job)
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        started = future is None
+        if started:
+            future = submit_render(html_string, base_url, key, renderer=renderer)
+            _inflight[key] = future
+
+    if started:
+        # Outside the lock: an inline render is already done, and
+        # add_done_callback() then runs _forget_inflight() right away
+        future.add_done_callback(lambda f: _forget_inflight(key, f))
+    future.add_done_callback(lambda f: _finish_job(job_id, job, f))
+    return PDFJob(job_id, key, future)
+
+
+def _forget_inflight(key, future):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def _finish_job(job_id, job, future):
+    error = future.exception()
+    if error is not None:
+        logger.error(f"PDF render job {job_id} failed: {str(error)}")
+        job['status'] = JOB_FAILED
+        job['error'] = str(error)
+    elif future.result() is not None:
+        # Rendered but could not be stored, nothing to download later
+        job['status'] = JOB_FAILED
+        job['error'] = "Rendered PDF could not be stored"
+    else:
+        job['status'] = JOB_DONE
+    _save_job(job_id, job)
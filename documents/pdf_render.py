@@ -0,0 +1,171 @@
+"""
+WeasyPrint render service.
+
+Every PDF template carries the same fixed assets: a large inline <style>
+block, the company logo (file:///app/static/images/ka-logo.png, or
+<base_url>static/... over HTTP) and the system fonts. A plain
+HTML(...).write_pdf() re-parses the CSS, re-reads and re-decodes the logo
+and re-initialises fontconfig on every render. This module keeps them per
+render process (per thread when rendering inline):
+
+- static assets are read once and served from memory by the URL fetcher,
+  whatever host or /app prefix the template URL uses,
+- the <style> block is parsed once into a CSS object and passed as a
+  stylesheet, the HTML is rendered without it (the templates have no other
+  author styles than that block and style attributes, so the cascade is
+  unchanged),
+- one FontConfiguration and one image cache are shared by all renders.
+
+warm_up() loads all of it up front; the render pool runs it when a worker
+starts, so the first request does not pay for it either.
+"""
+import hashlib
+import logging
+import mimetypes
+import re
+import threading
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.template.loader import get_template
+from weasyprint import CSS, HTML
+from weasyprint.text.fonts import FontConfiguration
+from weasyprint.urls import URLFetcher, URLFetcherResponse
+
+logger = logging.getLogger(__name__)
+
+PDF_TEMPLATES = (
+    'pdf/quotation.html',
+    'pdf/invoice.html',
+    'pdf/purchase_order.html',
+    'pdf/delivery_challan.html',
+)
+
+STYLE_RE = re.compile(r'<style[^>]*>(.*?)</style>', re.DOTALL | re.IGNORECASE)
+
+# url path -> (bytes, content type), shared by every thread of the process
+_assets = {}
+_assets_lock = threading.Lock()
+
+_local = threading.local()
+
+
+def _asset_dirs():
+    dirs = getattr(settings, 'PDF_ASSET_DIRS', None)
+    if dirs is None:
+        dirs = [Path(settings.BASE_DIR) / 'static', Path(settings.STATIC_ROOT)]
+    return [Path(d) for d in dirs]
+
+
+def _static_path(url):
+    """'static/images/x.png' for any URL whose path goes through /static/."""
+    path = unquote(urlsplit(url).path)
+    marker = '/static/'
+    if marker not in path:
+        return None
+    return path[path.index(marker) + 1:]
+
+
+def load_asset(static_path):
+    """(bytes, content type) of a static file, read from disk once per process."""
+    asset = _assets.get(static_path)
+    if asset is not None:
+        return asset
+
+    relative = static_path[len('static/'):]
+    for directory in _asset_dirs():
+        candidate = directory / relative
+        if candidate.is_file():
+            content_type = mimetypes.guess_type(candidate.name)[0] or 'application/octet-stream'
+            asset = (candidate.read_bytes(), content_type)
+            with _assets_lock:
+                _assets[static_path] = asset
+            return asset
+    return None
+
+
+class AssetURLFetcher(URLFetcher):
+    """Serves /static/ assets from memory; anything else is fetched normally."""
+
+    def fetch(self, url, headers=None):
+        static_path = _static_path(url)
+        if static_path is not None:
+            asset = load_asset(static_path)
+            if asset is not None:
+                body, content_type = asset
+                return URLFetcherResponse(url, body, {'Content-Type': content_type})
+        return super().fetch(url, headers)
+
+
+def _state():
+    """Per thread fetcher, font configuration, image cache and parsed CSS."""
+    state = getattr(_local, 'state', None)
+    if state is None:
+        state = {
+            'url_fetcher': AssetURLFetcher(),
+            'font_config': FontConfiguration(),
+            'image_cache': {},
+            'stylesheets': {},
+        }
+        _local.state = state
+    return state
+
+
+def split_inline_style(html_string):
+    """(css text, html without its <style> blocks); css is None when there are none."""
+    blocks = STYLE_RE.findall(html_string)
+    if not blocks:
+        return None, html_string
+    return '\n'.join(blocks), STYLE_RE.sub('', html_string)
+
+
+def _stylesheet(css_text, base_url):
+    state = _state()
+    # Only relative url()s depend on base_url; without them one parsed
+    # stylesheet serves every host the request came in on
+    if 'url(' not in css_text:
+        base_url = None
+    key = hashlib.sha256(f'{base_url}\0{css_text}'.encode('utf-8')).hexdigest()
+    stylesheet = state['stylesheets'].get(key)
+    if stylesheet is None:
+        stylesheet = CSS(
+            string=css_text,
+            base_url=base_url,
+            url_fetcher=state['url_fetcher'],
+            font_config=state['font_config'],
+        )
+        state['stylesheets'][key] = stylesheet
+    return stylesheet
+
+
+def render_pdf(html_string, base_url=None):
+    """HTML -> PDF bytes using the preloaded assets. Output matches a plain WeasyPrint render."""
+    state = _state()
+    css_text, body = split_inline_style(html_string)
+    stylesheets = [_stylesheet(css_text, base_url)] if css_text else None
+    return HTML(string=body, base_url=base_url, url_fetcher=state['url_fetcher']).write_pdf(
+        stylesheets=stylesheets,
+        font_config=state['font_config'],
+        cache=state['image_cache'],
+    )
+
+
+def warm_up(base_url=None):
+    """Load fonts, static assets and the PDF template stylesheets for this process."""
+    for directory in _asset_dirs():
+        images = directory / 'images'
+        if images.is_dir():
+            for path in images.iterdir():
+                if path.is_file():
+                    load_asset(f'static/images/{path.name}')
+
+    for template_name in PDF_TEMPLATES:
+        try:
+            source = get_template(template_name).template.source
+        except Exception as e:
+            logger.warning(f"Could not preload stylesheet of {template_name}: {str(e)}")
+            continue
+        css_text, _ = split_inline_style(source)
+        if css_text:
+            _stylesheet(css_text, base_url)
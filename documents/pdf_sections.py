@@ -0,0 +1,53 @@
+"""
+Render a long document as a series of smaller HTML documents and merge
+their pages.
+
+WeasyPrint keeps the whole box tree of a document in memory until
+write_pdf() returns, so peak memory grows with the page count. Rendering
+each section on its own bounds it by the largest section; only the
+finished section PDFs (a small fraction of that) are kept for the merge.
+Sections are expected to start on a new page anyway (the templates break
+before each annexure).
+"""
+from collections import deque
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+
+from .pdf_render import render_pdf
+
+
+def iter_section_pdfs(html_sections, base_url=None, executor=None, window=2):
+    """
+    Yield the PDF bytes of each section, in order. With an `executor` at
+    most `window` sections are rendered at a time; the HTML of later
+    sections is only built once a slot is free.
+    """
+    if executor is None:
+        for html in html_sections:
+            yield render_pdf(html, base_url)
+        return
+
+    pending = deque()
+    for html in html_sections:
+        pending.append(executor.submit(render_pdf, html, base_url))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def merge_pdfs(pdfs, target):
+    """Append the pages of every PDF in `pdfs` to one document written to `target`."""
+    writer = PdfWriter()
+    for pdf in pdfs:
+        writer.append(PdfReader(BytesIO(pdf)))
+    writer.write(target)
+    return writer
+
+
+def render_sectioned_pdf(html_sections, base_url=None, executor=None, window=2):
+    """Render `html_sections` one by one (or `window` at a time) and return the merged PDF bytes."""
+    output = BytesIO()
+    merge_pdfs(iter_section_pdfs(html_sections, base_url, executor=executor, window=window), output)
+    return output.getvalue()
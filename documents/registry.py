@@ -0,0 +1,100 @@
+"""
+PDF document types that can be rendered by id.
+
+Each loader returns a DocumentSource for one object, using the same HTML
+builders as the per-app PDF endpoints so cache keys are shared with them.
+Issued invoices come back with the archived PDF itself, which is served as
+is instead of rendering the current data.
+"""
+import logging
+
+from typing import NamedTuple, Optional
+
+from django.shortcuts import get_object_or_404
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentSource(NamedTuple):
+    html: str
+    filename: str
+    engine: str = 'weasyprint'
+    # ("dotted.path", *args) run in the worker instead of WeasyPrint
+    renderer: Optional[tuple] = None
+    # Already issued PDF (archived invoices): never rendered again
+    pdf: Optional[bytes] = None
+
+
+def _quotation(object_id, version_id=None, endpoint=None):
+    from quotation.models import Quotation, QuotationVersion
+    from quotation.utils.pdf_generator import quotation_pdf_source
+
+    quotation = get_object_or_404(Quotation.objects.select_related('customer', 'site'), pk=object_id)
+    if version_id:
+        version = get_object_or_404(QuotationVersion, pk=version_id, quotation=quotation)
+    else:
+        version = get_object_or_404(QuotationVersion, quotation=quotation, is_active=True)
+    html, engine, renderer = quotation_pdf_source(quotation, version)
+    return DocumentSource(
+        html,
+        f"quotation_{quotation.quotation_no}_v{version.version_no}.pdf",
+        engine,
+        renderer,
+    )
+
+
+def _invoice(object_id, version_id=None, endpoint=None):
+    from invoice.archive import latest_invoice_pdf
+    from invoice.models import Invoice
+    from invoice.utils.pdf_generator import PDF_ENGINE_REPORTLAB, invoice_pdf_engine, render_invoice_html
+
+    from .pdf_archive import PDFArchive
+
+    invoice = get_object_or_404(Invoice.objects.select_related("customer", "branch", "site"), pk=object_id)
+    filename = f"INV-{invoice.invoice_no}.pdf"
+
+    archive = latest_invoice_pdf(invoice)
+    if archive is not None:
+        fh = PDFArchive().open(archive.sha256)
+        if fh is not None:
+            with fh:
+                return DocumentSource("", filename, "archive", pdf=fh.read())
+        logger.error(f"Archived PDF {archive.sha256} of invoice {invoice.pk} is missing, rendering it instead")
+
+    # Not issued yet: the current data is all there is
+    html = render_invoice_html(invoice)
+
+    if invoice_pdf_engine(endpoint) == PDF_ENGINE_REPORTLAB:
+        return DocumentSource(
+            html, filename, PDF_ENGINE_REPORTLAB,
+            ("invoice.utils.pdf_generator.render_invoice_pdf_by_id", invoice.pk),
+        )
+    return DocumentSource(html, filename)
+
+
+def _purchase_order(object_id, version_id=None, endpoint=None):
+    from inventory.models import PurchaseOrder
+    from inventory.pdf_generator import render_purchase_order_html
+
+    po = get_object_or_404(PurchaseOrder, pk=object_id)
+    return DocumentSource(render_purchase_order_html(po), f"PO-{po.purchase_order_no}.pdf")
+
+
+def _delivery_challan(object_id, version_id=None, endpoint=None):
+    from inventory.pdf_generator import delivery_challan_pdf_queryset, render_delivery_challan_html
+
+    dc = get_object_or_404(delivery_challan_pdf_queryset(), pk=object_id)
+    return DocumentSource(render_delivery_challan_html(dc), f"DC-{dc.dc_number}.pdf")
+
+
+DOCUMENT_TYPES = {
+    'quotation': _quotation,
+    'invoice': _invoice,
+    'purchase_order': _purchase_order,
+    'delivery_challan': _delivery_challan,
+}
+
+
+def build_document(doc_type, object_id, version_id=None, endpoint=None):
+    """DocumentSource for one object; `endpoint` selects per-endpoint engines."""
+    return DOCUMENT_TYPES[doc_type](object_id, version_id=version_id, endpoint=endpoint)
@@ -0,0 +1,110 @@
+"""HTTP helpers shared by the PDF endpoints."""
+import logging
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
+
+from .pdf_archive import PDFArchive
+from .pdf_cache import PDFCache, get_or_render_pdf, pdf_cache_key
+from .pdf_jobs import submit_pdf_job
+
+logger = logging.getLogger(__name__)
+
+# Archived PDFs under a URL naming their hash never change
+ARCHIVE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+def pdf_job_accepted(request, job):
+    """202 telling the client where to poll for a queued render."""
+    status_url = request.build_absolute_uri(reverse('pdf-jobs-detail', args=[job.id]))
+    download_url = request.build_absolute_uri(reverse('pdf-jobs-download', args=[job.id]))
+    response = JsonResponse(
+        {
+            'job_id': job.id,
+            'status': 'pending',
+            'status_url': status_url,
+            'download_url': download_url,
+        },
+        status=202,
+    )
+    response['Location'] = status_url
+    return response
+
+
+def pdf_file_response(pdf, filename, etag, as_attachment=False):
+    response = HttpResponse(pdf, content_type='application/pdf')
+    disposition = 'attachment' if as_attachment else 'inline'
+    response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+    response['ETag'] = etag
+    # Documents are private; let the browser keep a copy but revalidate via ETag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def pdf_response(request, html_string, filename, base_url=None, as_attachment=False,
+                 engine='weasyprint', render=None, renderer=None):
+    """
+    Serve a PDF for the given HTML from the cache. On a miss the render is
+    queued on the worker pool and the request waits up to
+    PDF_RENDER_WAIT_TIMEOUT seconds for it; if it takes longer (or the
+    client passed ?async=1) a 202 with the job id is returned instead.
+    Clients that already hold this exact document get a 304.
+
+    Fast engines pass `render` (a callable returning PDF bytes) and are
+    rendered inline, the HTML is then only used for the cache key. Other
+    engines pass `renderer` ("dotted.path", *args), run in the render pool
+    in place of the WeasyPrint render.
+    """
+    key = pdf_cache_key(html_string, base_url, engine=engine)
+    etag = quote_etag(key)
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    if render is not None:
+        _, pdf = get_or_render_pdf(html_string, base_url, key=key, render=render)
+        return pdf_file_response(pdf, filename, etag, as_attachment=as_attachment)
+
+    pdf = PDFCache().get(key)
+    if pdf is None:
+        job = submit_pdf_job(html_string, filename, base_url=base_url, key=key, renderer=renderer)
+        timeout = 0 if request.GET.get('async') else settings.PDF_RENDER_WAIT_TIMEOUT
+        pdf = job.wait(timeout)
+        if pdf is None:
+            return pdf_job_accepted(request, job)
+
+    return pdf_file_response(pdf, filename, etag, as_attachment=as_attachment)
+
+
+def archived_pdf_response(request, sha256, filename, as_attachment=False, immutable=False):
+    """
+    Serve an archived PDF straight from disk, no rendering. `immutable` is
+    for URLs that name the content hash, the browser keeps those for a
+    year; any other URL is revalidated against the hash as ETag.
+    """
+    etag = quote_etag(sha256)
+    cache_control = f'private, max-age={ARCHIVE_MAX_AGE}, immutable' if immutable else 'private, no-cache'
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        fh = PDFArchive().open(sha256)
+        if fh is None:
+            logger.error(f"Archived PDF {sha256} is missing from {PDFArchive().root}")
+            raise Http404('The archived PDF file is missing.')
+        response = FileResponse(fh, content_type='application/pdf', as_attachment=as_attachment, filename=filename)
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
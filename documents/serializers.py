@@ -0,0 +1,26 @@
+from rest_framework import serializers
+
+from .batch_export import EXPORT_DOC_TYPES
+from .registry import DOCUMENT_TYPES
+
+
+class PDFJobCreateSerializer(serializers.Serializer):
+    doc_type = serializers.ChoiceField(choices=sorted(DOCUMENT_TYPES))
+    object_id = serializers.IntegerField(min_value=1)
+    version_id = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+
+
+class PDFExportSerializer(serializers.Serializer):
+    doc_type = serializers.ListField(
+        child=serializers.ChoiceField(choices=EXPORT_DOC_TYPES),
+        required=False,
+    )
+    branch = serializers.IntegerField(min_value=1, required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get("date_from") and attrs.get("date_to") and attrs["date_from"] > attrs["date_to"]:
+            raise serializers.ValidationError({"date_to": "date_to must be on or after date_from"})
+        attrs["doc_type"] = attrs.get("doc_type") or list(EXPORT_DOC_TYPES)
+        return attrs
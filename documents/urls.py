@@ -0,0 +1,12 @@
+from rest_framework.routers import DefaultRouter
+
+from .views import PDFExportViewSet, PDFJobViewSet
+
+router = DefaultRouter()
+
+router.register(r'pdf-jobs', PDFJobViewSet, basename='pdf-jobs')
+router.register(r'pdf-export', PDFExportViewSet, basename='pdf-export')
+
+urlpatterns = []
+
+urlpatterns += router.urls
@@ -0,0 +1,120 @@
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import quote_etag
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .batch_export import export_selection, iter_export_pdfs, stream_zip
+from .pdf_archive import pdf_sha256
+from .pdf_cache import PDFCache, pdf_cache_key
+from .pdf_jobs import JOB_DONE, get_job, submit_pdf_job
+from .registry import build_document
+from .responses import pdf_file_response
+from .serializers import PDFExportSerializer, PDFJobCreateSerializer
+
+
+class PDFJobViewSet(viewsets.ViewSet):
+    """
+    Queue PDF renders and poll for the result.
+
+    POST   /documents/pdf-jobs/                 {"doc_type", "object_id", "version_id"?}
+    GET    /documents/pdf-jobs/<job_id>/        status
+    GET    /documents/pdf-jobs/<job_id>/download/
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def _job_payload(self, request, job_id, job):
+        payload = {
+            "job_id": job_id,
+            "status": job["status"],
+            "filename": job["filename"],
+            "error": job["error"],
+        }
+        if job["status"] == JOB_DONE:
+            payload["download_url"] = request.build_absolute_uri(reverse("pdf-jobs-download", args=[job_id]))
+        return payload
+
+    def create(self, request):
+        serializer = PDFJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        source = build_document(
+            data["doc_type"], data["object_id"], version_id=data.get("version_id"), endpoint="pdf_jobs"
+        )
+        base_url = request.build_absolute_uri("/")
+        if source.pdf is not None:
+            # Issued document: the job is done as soon as the bytes are in the cache
+            key = pdf_cache_key(pdf_sha256(source.pdf), engine=source.engine)
+            PDFCache().put(key, source.pdf)
+        else:
+            key = pdf_cache_key(source.html, base_url, engine=source.engine)
+        job = submit_pdf_job(source.html, source.filename, base_url=base_url, key=key, renderer=source.renderer)
+
+        payload = {
+            "job_id": job.id,
+            "status": get_job(job.id)["status"],
+            "filename": source.filename,
+            "status_url": request.build_absolute_uri(reverse("pdf-jobs-detail", args=[job.id])),
+        }
+        return Response(payload, status=status.HTTP_202_ACCEPTED)
+
+    def retrieve(self, request, pk=None):
+        job = get_job(pk)
+        if job is None:
+            return Response({"detail": "Job not found or expired"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._job_payload(request, pk, job))
+
+    @action(detail=True, methods=["get"], url_path="download")
+    def download(self, request, pk=None):
+        job = get_job(pk)
+        if job is None:
+            return Response({"detail": "Job not found or expired"}, status=status.HTTP_404_NOT_FOUND)
+        if job["status"] != JOB_DONE:
+            return Response(self._job_payload(request, pk, job), status=status.HTTP_409_CONFLICT)
+
+        pdf = PDFCache().get(job["key"])
+        if pdf is None:
+            # Evicted since the job finished; the client should queue it again
+            return Response({"detail": "PDF no longer available, submit the job again"}, status=status.HTTP_410_GONE)
+
+        return pdf_file_response(
+            pdf,
+            job["filename"],
+            quote_etag(job["key"]),
+            as_attachment=bool(request.GET.get("download")),
+        )
+
+
+class PDFExportViewSet(viewsets.ViewSet):
+    """
+    Stream every matching invoice / PO / delivery challan PDF as one ZIP.
+
+    GET /documents/pdf-export/?branch=1&date_from=2026-03-01&date_to=2026-03-31
+        &doc_type=invoice&doc_type=purchase_order
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        serializer = PDFExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        selection = export_selection(
+            data["doc_type"],
+            branch_id=data.get("branch"),
+            date_from=data.get("date_from"),
+            date_to=data.get("date_to"),
+        )
+        results = iter_export_pdfs(selection, base_url=request.build_absolute_uri("/"))
+
+        filename = f"documents-{timezone.localdate():%Y%m%d}.zip"
+        response = StreamingHttpResponse(stream_zip(results), content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
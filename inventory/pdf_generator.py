@@ -0,0 +1,136 @@
+# inventory/pdf_generator.py
+from decimal import Decimal
+from django.template.loader import render_to_string
+
+from .models import DeliveryChallan, PurchaseOrderProduct
+from .serializers import get_inventory_item_display_name, get_inventory_item_rate
+from .utils import format_amount_in_words
+
+
+def render_purchase_order_html(po):
+    """Render templates/pdf/purchase_order.html for a purchase order."""
+
+    products = list(po.products.select_related(
+        "item__material_type_id",
+        "item__item_type_id",
+        "item__feature_type_id",
+        "item__item_class_id",
+        "product_variant__product_model"
+    ).all())
+
+    # Dynamically renumber products for rendering/PDF display
+    section_counter = 0
+    child_counter = 0
+    for p in products:
+        if p.is_section:
+            section_counter += 1
+            child_counter = 0
+            p.serial_no = str(section_counter)
+        else:
+            if section_counter > 0:
+                child_counter += 1
+                p.serial_no = f"{section_counter}.{child_counter}"
+            else:
+                child_counter += 1
+                p.serial_no = str(child_counter)
+
+    gst_amount = (po.subtotal * po.gst_percentage) / Decimal("100")
+
+    # Convert total amount to words
+    total_in_words = format_amount_in_words(po.grand_total)
+
+    return render_to_string(
+        "pdf/purchase_order.html",
+        {
+            "po": po,
+            "products": products,
+            "gst_amount": gst_amount,
+            "total_in_words": total_in_words,
+        }
+    )
+
+
+def delivery_challan_pdf_queryset():
+    """Delivery challans with everything the PDF template reads."""
+    return DeliveryChallan.objects.select_related(
+        "material_issue",
+        "material_issue__site",
+        "material_issue__branch",
+        "branch",
+        "site",
+    ).prefetch_related(
+        "items__material_issue_item__inventory_item__product_variant__product_model__brand_id",
+        "items__material_issue_item__inventory_item__product_variant__product_model__ac_sub_type_id__ac_type_id",
+        "items__material_issue_item__inventory_item__item__material_type_id",
+        "items__material_issue_item__inventory_item__item__item_type_id",
+    )
+
+
+def render_delivery_challan_html(dc):
+    """Render templates/pdf/delivery_challan.html for a delivery challan."""
+
+    items = dc.items.all()
+
+    grand_total = 0
+    contact_person = dc.delivery_person_name or ""
+    contact_no = dc.delivery_person_phone or ""
+
+    if dc.destination_type == "branch" and dc.branch_id:
+        destination_name = dc.branch.name
+    elif dc.destination_type == "site" and dc.site_id:
+        destination_name = dc.site.name
+    elif dc.material_issue and dc.material_issue.site_id:
+        destination_name = dc.material_issue.site.name
+    else:
+        destination_name = ""
+
+    for dc_item in items:
+        inventory_item = dc_item.material_issue_item.inventory_item
+
+        # Same display name as DC form / Material Issue view
+        dc_item.product_name = get_inventory_item_display_name(inventory_item)
+        dc_item.uom = (
+            dc_item.material_issue_item.uom
+            or (inventory_item.uom if inventory_item else None)
+            or "Nos"
+        )
+
+        # Rate: latest PO rate, else variant DP/MRP (same helper as form)
+        rate = get_inventory_item_rate(inventory_item)
+        dc_item.rate = rate or 0
+        dc_item.amount = (dc_item.quantity or 0) * (dc_item.rate or 0)
+
+        # Fallback contact from PO if delivery person not set
+        if not contact_person or not contact_no:
+            po_product = None
+            if inventory_item and inventory_item.product_variant_id:
+                po_product = PurchaseOrderProduct.objects.filter(
+                    product_variant=inventory_item.product_variant,
+                    is_section=False,
+                ).order_by("-id").first()
+            elif inventory_item and inventory_item.item_id:
+                po_product = PurchaseOrderProduct.objects.filter(
+                    item=inventory_item.item,
+                    is_section=False,
+                ).order_by("-id").first()
+
+            if po_product and po_product.purchase_order:
+                if not contact_person:
+                    contact_person = po_product.purchase_order.contact_name or ""
+                if not contact_no:
+                    contact_no = po_product.purchase_order.contact_no or ""
+
+        grand_total += dc_item.amount
+
+    return render_to_string(
+        "pdf/delivery_challan.html",
+        {
+            "dc": dc,
+            "items": items,
+            "grand_total": grand_total,
+            "contact_person": contact_person,
+            "contact_no": contact_no,
+            "destination_name": destination_name,
+            "delivery_partner_name": dc.delivery_partner_name or "",
+        }
+    )
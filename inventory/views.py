@@ -118,74 +118,25 @@ class PurchaseOrderHistoryViewSet(ReadOnlyModelViewSet):
             status=status.HTTP_204_NO_CONTENT
         )
     
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from django.contrib.staticfiles import finders
-from weasyprint import HTML
-from decimal import Decimal
-from .models import PurchaseOrder
-from .utils import format_amount_in_words
+from .pdf_generator import (
+    render_purchase_order_html,
+    render_delivery_challan_html,
+    delivery_challan_pdf_queryset,
+)
+from documents.responses import pdf_response
 
 
 def purchase_order_pdf(request, pk):
 
     po = PurchaseOrder.objects.get(pk=pk)
-    products = list(po.products.select_related(
-        "item__material_type_id",
-        "item__item_type_id",
-        "item__feature_type_id",
-        "item__item_class_id",
-        "product_variant__product_model"
-    ).all())
-
-    # Dynamically renumber products for rendering/PDF display
-    section_counter = 0
-    child_counter = 0
-    for p in products:
-        if p.is_section:
-            section_counter += 1
-            child_counter = 0
-            p.serial_no = str(section_counter)
-        else:
-            if section_counter > 0:
-                child_counter += 1
-                p.serial_no = f"{section_counter}.{child_counter}"
-            else:
-                child_counter += 1
-                p.serial_no = str(child_counter)
-
-    gst_amount = (po.subtotal * po.gst_percentage) / Decimal("100")
-
-    # Convert total amount to words
-    total_in_words = format_amount_in_words(po.grand_total)
-
-    # logo_path = finders.find("images/ka-logo.png")
-
-    html_string = render_to_string(
-        "pdf/purchase_order.html",
-        {
-            "po": po,
-            "products": products,
-            "gst_amount": gst_amount,
-            "total_in_words": total_in_words,  # Add total in words
-            # "logo_path": logo_path,
-        }
-    )
-
-    # print("LOGO PATH:", logo_path)
-
-    pdf = HTML(
-        string=html_string,
-        base_url=request.build_absolute_uri("/")
-    ).write_pdf()
 
-    response = HttpResponse(pdf, content_type="application/pdf")
-    if request.GET.get("download"):
-        response["Content-Disposition"] = f'attachment; filename="PO-{po.purchase_order_no}.pdf"'
-    else:
-        response["Content-Disposition"] = f'inline; filename="PO-{po.purchase_order_no}.pdf"'
-
-    return response
+    return pdf_response(
+        request,
+        render_purchase_order_html(po),
+        f"PO-{po.purchase_order_no}.pdf",
+        base_url=request.build_absolute_uri("/"),
+        as_attachment=bool(request.GET.get("download")),
+    )
 
 
 
@@ -458,111 +409,14 @@ class DeliveryChallanViewSet(ModelViewSet):
             {"message": "Delivery Completed"}
         )
 
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from weasyprint import HTML
-
-from .models import DeliveryChallan, PurchaseOrderProduct
-
-
 def delivery_challan_pdf(request, pk):
 
-    dc = DeliveryChallan.objects.select_related(
-        "material_issue",
-        "material_issue__site",
-        "material_issue__branch",
-        "branch",
-        "site",
-    ).prefetch_related(
-        "items__material_issue_item__inventory_item__product_variant__product_model__brand_id",
-        "items__material_issue_item__inventory_item__product_variant__product_model__ac_sub_type_id__ac_type_id",
-        "items__material_issue_item__inventory_item__item__material_type_id",
-        "items__material_issue_item__inventory_item__item__item_type_id",
-    ).get(pk=pk)
-
-    items = dc.items.all()
-
-    grand_total = 0
-    contact_person = dc.delivery_person_name or ""
-    contact_no = dc.delivery_person_phone or ""
-
-    if dc.destination_type == "branch" and dc.branch_id:
-        destination_name = dc.branch.name
-    elif dc.destination_type == "site" and dc.site_id:
-        destination_name = dc.site.name
-    elif dc.material_issue and dc.material_issue.site_id:
-        destination_name = dc.material_issue.site.name
-    else:
-        destination_name = ""
-
-    for dc_item in items:
-        inventory_item = dc_item.material_issue_item.inventory_item
-
-        # Same display name as DC form / Material Issue view
-        dc_item.product_name = get_inventory_item_display_name(inventory_item)
-        dc_item.uom = (
-            dc_item.material_issue_item.uom
-            or (inventory_item.uom if inventory_item else None)
-            or "Nos"
-        )
-
-        # Rate: latest PO rate, else variant DP/MRP (same helper as form)
-        rate = get_inventory_item_rate(inventory_item)
-        dc_item.rate = rate or 0
-        dc_item.amount = (dc_item.quantity or 0) * (dc_item.rate or 0)
-
-        # Fallback contact from PO if delivery person not set
-        if not contact_person or not contact_no:
-            po_product = None
-            if inventory_item and inventory_item.product_variant_id:
-                po_product = PurchaseOrderProduct.objects.filter(
-                    product_variant=inventory_item.product_variant,
-                    is_section=False,
-                ).order_by("-id").first()
-            elif inventory_item and inventory_item.item_id:
-                po_product = PurchaseOrderProduct.objects.filter(
-                    item=inventory_item.item,
-                    is_section=False,
-                ).order_by("-id").first()
-
-            if po_product and po_product.purchase_order:
-                if not contact_person:
-                    contact_person = po_product.purchase_order.contact_name or ""
-                if not contact_no:
-                    contact_no = po_product.purchase_order.contact_no or ""
-
-        grand_total += dc_item.amount
-
-    html_string = render_to_string(
-        "pdf/delivery_challan.html",
-        {
-            "dc": dc,
-            "items": items,
-            "grand_total": grand_total,
-            "contact_person": contact_person,
-            "contact_no": contact_no,
-            "destination_name": destination_name,
-            "delivery_partner_name": dc.delivery_partner_name or "",
-        }
-    )
-
-    pdf = HTML(
-        string=html_string,
-        base_url=request.build_absolute_uri("/")
-    ).write_pdf()
+    dc = delivery_challan_pdf_queryset().get(pk=pk)
 
-    response = HttpResponse(
-        pdf,
-        content_type="application/pdf"
+    return pdf_response(
+        request,
+        render_delivery_challan_html(dc),
+        f"DC-{dc.dc_number}.pdf",
+        base_url=request.build_absolute_uri("/"),
+        as_attachment=bool(request.GET.get("download")),
     )
-
-    if request.GET.get("download"):
-        response["Content-Disposition"] = (
-            f'attachment; filename="DC-{dc.dc_number}.pdf"'
-        )
-    else:
-        response["Content-Disposition"] = (
-            f'inline; filename="DC-{dc.dc_number}.pdf"'
-        )
-
-    return response
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Issued invoice PDFs.
+
+An invoice is rendered once, right after the transaction that created it
+commits (on the render pool, like any other PDF job), and the PDF bytes
+are archived with their SHA-256 as revision 1. Every download is a read of
+that file, so changes to the invoice, product names, terms and conditions
+or the template no longer alter invoices that have already gone out. A new
+rendering is made only by reissue_invoice_pdf(), which adds a revision and
+keeps the earlier ones.
+
+Rendering happens outside any transaction; only the insert of the revision
+row takes the invoice row lock, so saving an invoice never waits for a
+render.
+"""
+from django.db import transaction
+
+from documents.pdf_archive import PDFArchive
+from documents.pdf_cache import get_or_render_pdf, pdf_cache_key
+from documents.pdf_jobs import submit_pdf_job
+
+from .models import Invoice, InvoicePDFArchive
+from .utils.pdf_generator import (
+    PDF_ENGINE_REPORTLAB,
+    generate_invoice_pdf,
+    invoice_pdf_data,
+    invoice_pdf_engine,
+    render_invoice_html,
+)
+
+FIRST_ISSUE_REASON = "First issue"
+
+
+def render_invoice_pdf(invoice, base_url=None, engine=None):
+    """(PDF bytes, engine) of the invoice as it is now, through the render cache."""
+    engine = engine or invoice_pdf_engine("invoice_pdf")
+    data = invoice_pdf_data(invoice)
+    html = render_invoice_html(invoice, data=data)
+
+    render = None
+    if engine == PDF_ENGINE_REPORTLAB:
+        render = lambda: generate_invoice_pdf(invoice, data=data)  # noqa: E731
+    _, pdf = get_or_render_pdf(html, base_url, key=pdf_cache_key(html, base_url, engine=engine), render=render)
+    return pdf, engine
+
+
+def _issue(invoice, base_url, user, reason, reissue):
+    pdf, engine = render_invoice_pdf(invoice, base_url)
+    sha256 = PDFArchive().put(pdf)
+
+    with transaction.atomic():
+        # Serialises the revision numbers per invoice; a first issue that
+        # lost the race returns the revision the winner inserted
+        Invoice.objects.select_for_update().filter(pk=invoice.pk).values_list("pk", flat=True).first()
+        latest = invoice.pdf_archives.order_by("-revision").first()
+        if latest is not None and not reissue:
+            return latest
+        return InvoicePDFArchive.objects.create(
+            invoice=invoice,
+            revision=latest.revision + 1 if latest else 1,
+            sha256=sha256,
+            size=len(pdf),
+            engine=engine,
+            reason=reason,
+            issued_by=user,
+        )
+
+
+def latest_invoice_pdf(invoice):
+    """The latest archived PDF record of the invoice, None until it is issued."""
+    return invoice.pdf_archives.order_by("-revision").first()
+
+
+def issue_invoice_pdf(invoice_id):
+    """
+    Archive revision 1 of the invoice unless it has one, and return the PDF
+    bytes of its latest revision. Runs in the render pool (it is the
+    renderer of first_issue_job), so it only takes the id.
+    """
+    invoice = Invoice.objects.select_related("customer", "branch", "site").get(pk=invoice_id)
+    archive = latest_invoice_pdf(invoice) or _issue(invoice, None, None, FIRST_ISSUE_REASON, reissue=False)
+    with PDFArchive().open(archive.sha256) as fh:
+        return fh.read()
+
+
+def first_issue_job(invoice):
+    """
+    Queue the first issue of the invoice on the render pool and return the
+    PDFJob. Requests for the same invoice share one render while it runs.
+    """
+    return submit_pdf_job(
+        "",
+        f"INV-{invoice.invoice_no}.pdf",
+        key=pdf_cache_key(f"invoice:{invoice.pk}:first-issue", engine="archive"),
+        renderer=("invoice.archive.issue_invoice_pdf", invoice.pk),
+    )
+
+
+def schedule_first_issue(invoice):
+    """Issue a new invoice once the transaction that created it (and its lines) commits."""
+    transaction.on_commit(lambda: first_issue_job(invoice))
+
+
+def reissue_invoice_pdf(invoice, base_url=None, user=None, reason=""):
+    """Render the invoice from current data as a new revision."""
+    return _issue(invoice, base_url, user, reason, reissue=True)
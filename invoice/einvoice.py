@@ -0,0 +1,296 @@
+"""
+GST e-invoice (INV-01) JSON payloads of invoices, in batch.
+
+Every B2B invoice (buyer with a GSTIN) dated in a period is turned into
+the government JSON schema from the invoice header, its branch (seller),
+customer (buyer) and its high side / low side lines. Line and invoice
+amounts come from compute_invoice_totals(), the engine the invoice totals
+are saved with, so the payload agrees with the printed invoice.
+
+Invoices are read in batches with their lines prefetched (a few queries
+per batch, whatever the number of lines). Payloads are built in the web
+process, where the ORM lives; validation against the bundled JSON schema
+(invoice/schemas/) is CPU bound and runs in a process pool
+(EINVOICE_VALIDATION_WORKERS processes, 0 = validate inline), a bounded
+number of batches ahead of the output. Results are streamed as NDJSON,
+one record per invoice in invoice date order:
+
+    {"invoice_id", "invoice_no", "invoice_date", "valid", "errors", "payload"}
+
+Invalid payloads are still written, with their schema errors, so missing
+master data (PIN codes, HSN codes, cities) can be fixed in one pass.
+"""
+import multiprocessing
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .einvoice_schema import EINVOICE_SCHEMA_VERSION, einvoice_errors_many
+from .gst_returns import _registered
+from .models import CompanyProfile, HighSideInvoiceItem, Invoice, LowSideInvoiceItem
+from .service import TWO_PLACES, compute_invoice_totals
+
+DEFAULT_BATCH_SIZE = 200
+
+# SAC codes (chapter 99) are services; HSN codes are goods
+SAC_PREFIX = "99"
+
+_PIN = re.compile(r"(?<!\d)([1-9]\d{2})\s?(\d{3})(?!\d)")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _amount(value):
+    return float(Decimal(value).quantize(TWO_PLACES, rounding=ROUND_HALF_UP))
+
+
+def _text(value, limit):
+    return " ".join(str(value or "").split())[:limit]
+
+
+def _digits(value):
+    return "".join(char for char in str(value or "") if char.isdigit())
+
+
+def _compact(fields):
+    # Optional schema fields are left out rather than sent empty
+    return {key: value for key, value in fields.items() if value not in (None, "")}
+
+
+def _pin(*candidates):
+    """First six digit PIN code in the candidates (a PIN field, then free-text addresses)."""
+    for candidate in candidates:
+        match = _PIN.search(str(candidate or ""))
+        if match:
+            return int("".join(match.groups()))
+    return None
+
+
+def _state_code(state_code, gstin):
+    # The first two digits of a GSTIN are the state code
+    code = _digits(state_code) or _digits((gstin or "")[:2])
+    return str(int(code)) if code and int(code) else None
+
+
+def _phone(value):
+    digits = _digits(value)
+    return digits if 6 <= len(digits) <= 12 else None
+
+
+def _address(address):
+    text = _text(address, 200)
+    rest = text[100:].strip()
+    return {"Addr1": text[:100], "Addr2": rest if len(rest) >= 3 else None}
+
+
+def _seller(invoice, company):
+    branch = invoice.branch
+    gstin = (branch.gst_no if branch and branch.gst_no else company.gstin if company else "") or ""
+    address = branch.address if branch else company.address if company else ""
+    return _compact({
+        "Gstin": gstin.strip().upper(),
+        "LglNm": _text(company.name if company else branch.name if branch else "", 100),
+        **_address(address),
+        "Loc": _text(branch.city, 50) if branch else None,
+        "Pin": _pin(branch.pincode if branch else None, address),
+        "Stcd": _state_code(branch.state_code if branch else None, gstin),
+        "Ph": _phone(branch.primary_contact) if branch else None,
+        "Em": branch.email if branch else None,
+    })
+
+
+def _buyer(invoice, seller):
+    customer = invoice.customer
+    site = invoice.site
+    gstin = invoice.buyer_gstin.strip().upper()
+    state_code = _state_code(invoice.buyer_state_code, gstin)
+    return _compact({
+        "Gstin": gstin,
+        "LglNm": _text(invoice.buyer_name, 100),
+        # Intra-state (CGST + SGST) supplies are made in the seller's state
+        "Pos": seller.get("Stcd") if invoice.gst_type == "CGST_SGST" else state_code,
+        **_address(invoice.buyer_address),
+        "Loc": _text(customer.city or (site.city if site else ""), 50),
+        "Pin": _pin(customer.pin_code, invoice.buyer_address),
+        "Stcd": state_code,
+        "Ph": _phone(customer.contact_number),
+        "Em": customer.email,
+    })
+
+
+def _description(line):
+    if line.description:
+        return line.description
+    if isinstance(line, HighSideInvoiceItem):
+        variant = line.product_variant
+        return f"{variant.product_model.model_no} {variant.sku or ''}"
+    return line.complete_item_name
+
+
+def _items(invoice, lines, totals):
+    no_gst = invoice.gst_type == "NO_GST"
+    items = []
+    for number, (line, line_totals) in enumerate(zip(lines, totals.lines), 1):
+        gst_rate = Decimal("0") if no_gst else line.gst_percent
+        # Split from the unrounded tax, as Invoice.cgst_amount / sgst_amount are
+        tax = line.quantity * line.rate * gst_rate / Decimal("100")
+        split = tax / 2 if invoice.gst_type == "CGST_SGST" else Decimal("0")
+        hsn = _digits(line.hsn_sac)
+        items.append(_compact({
+            "SlNo": str(number),
+            "PrdDesc": _text(_description(line), 300),
+            "IsServc": "Y" if hsn.startswith(SAC_PREFIX) else "N",
+            "HsnCd": hsn,
+            "Qty": float(line.quantity),
+            "Unit": _text(line.unit, 8).upper() or None,
+            "UnitPrice": float(line.rate),
+            "TotAmt": float(line_totals.amount),
+            "AssAmt": float(line_totals.amount),
+            "GstRt": float(gst_rate),
+            "IgstAmt": float(line_totals.gst_amount) if invoice.gst_type == "IGST" else 0.0,
+            "CgstAmt": _amount(split),
+            "SgstAmt": _amount(split),
+            "TotItemVal": float(line_totals.amount + line_totals.gst_amount),
+        }))
+    return items
+
+
+def einvoice_payload(invoice, company=None):
+    """
+    The INV-01 payload of one invoice. Reads invoice.high_side_items and
+    low_side_items, so prefetch them (einvoice_queryset does) when building
+    many.
+    """
+    lines = [*invoice.high_side_items.all(), *invoice.low_side_items.all()]
+    totals = compute_invoice_totals(
+        invoice.gst_type, [(line.quantity, line.rate, line.gst_percent) for line in lines]
+    )
+    seller = _seller(invoice, company)
+    return {
+        "Version": EINVOICE_SCHEMA_VERSION,
+        "TranDtls": {"TaxSch": "GST", "SupTyp": "B2B", "RegRev": "N", "IgstOnIntra": "N"},
+        "DocDtls": {"Typ": "INV", "No": invoice.invoice_no, "Dt": f"{invoice.invoice_date:%d/%m/%Y}"},
+        "SellerDtls": seller,
+        "BuyerDtls": _buyer(invoice, seller),
+        "ItemList": _items(invoice, lines, totals),
+        "ValDtls": {
+            "AssVal": float(totals.taxable_value),
+            "CgstVal": float(totals.cgst_amount),
+            "SgstVal": float(totals.sgst_amount),
+            "IgstVal": float(totals.igst_amount),
+            "TotInvVal": float(totals.grand_total),
+        },
+    }
+
+
+def einvoice_queryset(date_from, date_to, branch_id=None):
+    """B2B invoices dated in [date_from, date_to] with everything a payload reads."""
+    queryset = (
+        Invoice.objects.filter(_registered(), invoice_date__range=(date_from, date_to))
+        .select_related("customer", "branch", "site")
+        .prefetch_related(
+            Prefetch(
+                "high_side_items",
+                queryset=HighSideInvoiceItem.objects.select_related("product_variant__product_model").order_by("id"),
+            ),
+            Prefetch(
+                "low_side_items",
+                queryset=LowSideInvoiceItem.objects.select_related(
+                    "item__material_type_id", "item__item_type_id", "item__feature_type_id", "item__item_class_id"
+                ).order_by("id"),
+            ),
+        )
+        .order_by("invoice_date", "pk")
+    )
+    if branch_id:
+        queryset = queryset.filter(branch_id=branch_id)
+    return queryset
+
+
+def new_validation_pool(max_workers):
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        # spawn: never fork a process holding DB/Redis connections; the
+        # workers only import invoice.einvoice_schema, which needs no Django
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def get_validation_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = new_validation_pool(settings.EINVOICE_VALIDATION_WORKERS)
+        return _pool
+
+
+def _validate(payloads, executor):
+    if executor is None:
+        future = Future()
+        try:
+            future.set_result(einvoice_errors_many(payloads))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return executor.submit(einvoice_errors_many, payloads)
+
+
+def _records(batch, future):
+    for (invoice, payload), errors in zip(batch, future.result()):
+        yield {
+            "invoice_id": invoice.pk,
+            "invoice_no": invoice.invoice_no,
+            "invoice_date": invoice.invoice_date.isoformat(),
+            "valid": not errors,
+            "errors": errors,
+            "payload": payload,
+        }
+
+
+def iter_einvoices(date_from, date_to, branch_id=None, batch_size=DEFAULT_BATCH_SIZE,
+                   executor=None, inline=None, window=None):
+    """
+    Yield one record per B2B invoice of the period, in invoice date order.
+
+    Validation runs on `executor`, else on the shared pool; `inline` (by
+    default: EINVOICE_VALIDATION_WORKERS is 0) validates in this process.
+    At most `window` batches are being validated at a time, so a long
+    period is never held in memory.
+    """
+    workers = getattr(settings, "EINVOICE_VALIDATION_WORKERS", 0)
+    if inline is None:
+        inline = executor is None and workers <= 0
+    if inline:
+        executor = None
+    elif executor is None:
+        executor = get_validation_pool()
+    if window is None:
+        window = max(workers, 1) * 2
+
+    company = CompanyProfile.objects.first()
+    invoices = einvoice_queryset(date_from, date_to, branch_id).iterator(chunk_size=batch_size)
+    pending = deque()
+    while True:
+        batch = [(invoice, einvoice_payload(invoice, company)) for invoice in islice(invoices, batch_size)]
+        if not batch:
+            break
+        pending.append((batch, _validate([payload for _, payload in batch], executor)))
+        if len(pending) >= window:
+            yield from _records(*pending.popleft())
+    while pending:
+        yield from _records(*pending.popleft())
+
+
+def iter_einvoice_ndjson(records):
+    """The records as NDJSON, one line per invoice."""
+    encode = DjangoJSONEncoder(separators=(",", ":")).encode
+    for record in records:
+        yield f"{encode(record)}\n"
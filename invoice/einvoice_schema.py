@@ -0,0 +1,39 @@
+"""
+Local validation of e-invoice payloads against the bundled JSON schema.
+
+Kept free of Django imports: the functions here run in the worker
+processes of invoice.einvoice, which only need jsonschema and the schema
+file, not a configured Django project.
+"""
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from jsonschema import Draft7Validator
+
+EINVOICE_SCHEMA_VERSION = "1.1"
+
+EINVOICE_SCHEMA_PATH = Path(__file__).resolve().parent / "schemas" / f"einvoice-{EINVOICE_SCHEMA_VERSION}.json"
+
+
+@lru_cache(maxsize=None)
+def einvoice_validator():
+    """Compiled validator of the bundled schema, once per process."""
+    with open(EINVOICE_SCHEMA_PATH, encoding="utf-8") as f:
+        schema = json.load(f)
+    Draft7Validator.check_schema(schema)
+    return Draft7Validator(schema)
+
+
+def einvoice_errors(payload):
+    """Schema errors of one payload as "Path.To.Field: message", ordered by path."""
+    errors = sorted(einvoice_validator().iter_errors(payload), key=lambda error: list(error.absolute_path))
+    return [
+        f"{'.'.join(str(part) for part in error.absolute_path) or '$'}: {error.message}"
+        for error in errors
+    ]
+
+
+def einvoice_errors_many(payloads):
+    """einvoice_errors() of each payload; the unit of work sent to a worker process."""
+    return [einvoice_errors(payload) for payload in payloads]
@@ -1,5 +1,8 @@
 import django_filters
+from rest_framework import filters
+
 from .models import Invoice
+from .search import search_invoices
 
 
 class InvoiceFilter(django_filters.FilterSet):
@@ -31,3 +34,14 @@ class InvoiceFilter(django_filters.FilterSet):
             "date_to",
             "gst_type",
         ]
+
+
+class InvoiceSearchFilter(filters.SearchFilter):
+    """
+    ?search= over the invoice search document (number, buyer, GSTIN,
+    phone, site, line descriptions and item codes) instead of OR-ed
+    icontains over search_fields. Every term has to match.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return search_invoices(queryset, self.get_search_terms(request))
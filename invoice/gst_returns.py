@@ -0,0 +1,272 @@
+"""
+GSTR-1 export: the B2B, B2C and HSN summary tables of a filing period.
+
+Every table is a GROUP BY over HighSideInvoiceItem and LowSideInvoiceItem
+(one aggregate query per line table, merged here), so the cost depends on
+the number of output rows, not on serializing every invoice. Tax is taken
+from quantity * rate * gst_percent and split by the invoice's gst_type,
+the same way apply_invoice_totals computes Invoice.total_tax, and every
+table is reconciled against the sum of total_tax of its invoices.
+
+- b2b: one row per invoice and tax rate, buyers with a GSTIN
+- b2c: one row per place of supply, supply type and tax rate, buyers
+  without a GSTIN (large inter-state B2C invoices are not split out)
+- hsn: one row per HSN/SAC, unit and tax rate, all invoices
+"""
+import csv
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+
+from .models import HighSideInvoiceItem, Invoice, LowSideInvoiceItem
+from .service import TWO_PLACES
+
+LINE_MODELS = (HighSideInvoiceItem, LowSideInvoiceItem)
+
+GSTR1_TABLES = ("b2b", "b2c", "hsn")
+
+GSTR1_COLUMNS = {
+    "b2b": (
+        "gstin", "receiver_name", "invoice_no", "invoice_date", "invoice_value",
+        "place_of_supply", "reverse_charge", "rate", "taxable_value", "igst", "cgst", "sgst",
+    ),
+    "b2c": ("place_of_supply", "supply_type", "rate", "taxable_value", "igst", "cgst", "sgst"),
+    "hsn": (
+        "hsn_sac", "uqc", "total_quantity", "rate", "total_value",
+        "taxable_value", "igst", "cgst", "sgst",
+    ),
+}
+
+TOTAL_COLUMNS = ("taxable_value", "igst", "cgst", "sgst")
+
+
+_AMOUNT = DecimalField(max_digits=24, decimal_places=6)
+
+
+def _registered(prefix=""):
+    """Buyer registered for GST -> B2B."""
+    return Q(**{f"{prefix}buyer_gstin__isnull": False}) & ~Q(**{f"{prefix}buyer_gstin": ""})
+
+
+_GROUP_KEYS = {
+    "b2b": (
+        "invoice_id", "invoice__invoice_no", "invoice__invoice_date", "invoice__buyer_gstin",
+        "invoice__buyer_name", "invoice__buyer_state_code", "invoice__buyer_state",
+        "invoice__grand_total", "tax_rate",
+    ),
+    "b2c": ("invoice__buyer_state_code", "invoice__buyer_state", "invoice__gst_type", "tax_rate"),
+    "hsn": ("hsn_sac", "unit", "tax_rate"),
+}
+
+
+def _money(value):
+    return Decimal(value or 0).quantize(TWO_PLACES)
+
+
+def _line_aggregates(table):
+    base = ExpressionWrapper(F("quantity") * F("rate"), output_field=_AMOUNT)
+    tax = ExpressionWrapper(F("quantity") * F("rate") * F("gst_percent") / Value(Decimal("100")), output_field=_AMOUNT)
+
+    def tax_for(gst_type):
+        return Sum(Case(When(invoice__gst_type=gst_type, then=tax), default=Value(Decimal("0")), output_field=_AMOUNT))
+
+    aggregates = {
+        "taxable_value": Sum(base),
+        "igst": tax_for("IGST"),
+        # Split in half after the sum, as Invoice.cgst_amount / sgst_amount are
+        "cgst_sgst": tax_for("CGST_SGST"),
+    }
+    if table == "hsn":
+        aggregates["total_quantity"] = Sum("quantity")
+    return aggregates
+
+
+def _grouped_lines(table, date_from, date_to, branch_id=None):
+    """{group key: summed row} over both line tables."""
+    keys = _GROUP_KEYS[table]
+    merged = {}
+    for model in LINE_MODELS:
+        qs = model.objects.filter(invoice__invoice_date__range=(date_from, date_to))
+        if branch_id:
+            qs = qs.filter(invoice__branch_id=branch_id)
+        if table == "b2b":
+            qs = qs.filter(_registered("invoice__"))
+        elif table == "b2c":
+            qs = qs.exclude(_registered("invoice__"))
+
+        rows = (
+            qs.annotate(tax_rate=Case(
+                # No tax is charged on NO_GST invoices whatever the line says
+                When(invoice__gst_type="NO_GST", then=Value(Decimal("0"))),
+                default=F("gst_percent"),
+                output_field=DecimalField(max_digits=5, decimal_places=2),
+            ))
+            .values(*keys)
+            .annotate(**_line_aggregates(table))
+            .order_by()
+        )
+        for row in rows:
+            key = tuple(row[name] for name in keys)
+            if key in merged:
+                for name in _line_aggregates(table):
+                    merged[key][name] = (merged[key][name] or 0) + (row[name] or 0)
+            else:
+                merged[key] = row
+    return merged
+
+
+def _place_of_supply(state_code, state):
+    if state_code:
+        return f"{state_code}-{state}" if state else state_code
+    return state or ""
+
+
+def _tax_columns(row):
+    half = Decimal(row["cgst_sgst"] or 0) / 2
+    return {
+        "taxable_value": _money(row["taxable_value"]),
+        "igst": _money(row["igst"]),
+        "cgst": _money(half),
+        "sgst": _money(half),
+    }
+
+
+def _b2b_row(row):
+    return {
+        "gstin": row["invoice__buyer_gstin"].strip().upper(),
+        "receiver_name": row["invoice__buyer_name"],
+        "invoice_no": row["invoice__invoice_no"],
+        "invoice_date": row["invoice__invoice_date"],
+        "invoice_value": _money(row["invoice__grand_total"]),
+        "place_of_supply": _place_of_supply(row["invoice__buyer_state_code"], row["invoice__buyer_state"]),
+        "reverse_charge": "N",
+        "rate": _money(row["tax_rate"]),
+        **_tax_columns(row),
+    }
+
+
+def _b2c_row(row):
+    return {
+        "place_of_supply": _place_of_supply(row["invoice__buyer_state_code"], row["invoice__buyer_state"]),
+        "supply_type": "INTER" if row["invoice__gst_type"] == "IGST" else "INTRA",
+        "rate": _money(row["tax_rate"]),
+        **_tax_columns(row),
+    }
+
+
+def _hsn_row(row):
+    taxes = _tax_columns(row)
+    return {
+        "hsn_sac": (row["hsn_sac"] or "").strip(),
+        "uqc": row["unit"],
+        "total_quantity": _money(row["total_quantity"]),
+        "rate": _money(row["tax_rate"]),
+        "total_value": taxes["taxable_value"] + taxes["igst"] + taxes["cgst"] + taxes["sgst"],
+        **taxes,
+    }
+
+
+_ROW_BUILDERS = {"b2b": _b2b_row, "b2c": _b2c_row, "hsn": _hsn_row}
+
+_SORT_KEYS = {
+    "b2b": lambda row: (row["invoice_date"], row["invoice_no"], row["rate"]),
+    "b2c": lambda row: (row["place_of_supply"], row["supply_type"], row["rate"]),
+    "hsn": lambda row: (row["hsn_sac"], row["uqc"], row["rate"]),
+}
+
+
+def _invoice_totals(date_from, date_to, branch_id=None):
+    """Invoice count and sum of total_tax per table, in one query."""
+    qs = Invoice.objects.filter(invoice_date__range=(date_from, date_to))
+    if branch_id:
+        qs = qs.filter(branch_id=branch_id)
+    registered = _registered()
+    sums = qs.aggregate(
+        b2b_invoices=Count("pk", filter=registered),
+        b2b_tax=Sum("total_tax", filter=registered),
+        b2c_invoices=Count("pk", filter=~registered),
+        b2c_tax=Sum("total_tax", filter=~registered),
+        hsn_invoices=Count("pk"),
+        hsn_tax=Sum("total_tax"),
+    )
+    return {
+        table: {"invoices": sums[f"{table}_invoices"], "total_tax": _money(sums[f"{table}_tax"])}
+        for table in GSTR1_TABLES
+    }
+
+
+def build_gstr1(date_from, date_to, tables=GSTR1_TABLES, branch_id=None):
+    """
+    {"period", "tables": {name: {"columns", "count", "totals", "rows"}},
+    "reconciliation": {name: {...}}} for the invoices dated in the period.
+
+    Each exported amount and each invoice's total_tax is rounded to paise
+    once, so a table reconciles when its tax is within half a paisa per
+    rounded figure of the invoices' total_tax.
+    """
+    invoice_totals = _invoice_totals(date_from, date_to, branch_id)
+    report = {
+        "period": {"date_from": date_from, "date_to": date_to, "branch": branch_id},
+        "tables": {},
+        "reconciliation": {},
+    }
+    for table in tables:
+        rows = sorted(
+            (_ROW_BUILDERS[table](row) for row in _grouped_lines(table, date_from, date_to, branch_id).values()),
+            key=_SORT_KEYS[table],
+        )
+        totals = {name: sum((row[name] for row in rows), Decimal("0.00")) for name in TOTAL_COLUMNS}
+        report["tables"][table] = {
+            "columns": GSTR1_COLUMNS[table],
+            "count": len(rows),
+            "totals": totals,
+            "rows": rows,
+        }
+
+        exported_tax = totals["igst"] + totals["cgst"] + totals["sgst"]
+        expected = invoice_totals[table]
+        difference = exported_tax - expected["total_tax"]
+        tolerance = Decimal("0.005") * (expected["invoices"] + 3 * len(rows))
+        report["reconciliation"][table] = {
+            "invoices": expected["invoices"],
+            "invoice_total_tax": expected["total_tax"],
+            "exported_tax": exported_tax,
+            "difference": difference,
+            "reconciled": abs(difference) <= tolerance,
+        }
+    return report
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_gstr1_csv(report, table):
+    """CSV lines of one table: header, rows, then a total row."""
+    data = report["tables"][table]
+    columns = data["columns"]
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in data["rows"]:
+        yield writer.writerow([row[name] for name in columns])
+    totals = dict(data["totals"], **{columns[0]: f"Total ({data['count']} rows)"})
+    yield writer.writerow([totals.get(name, "") for name in columns])
+
+
+def iter_gstr1_json(report):
+    """The report as JSON, one row per chunk."""
+    encode = DjangoJSONEncoder().encode
+    yield f'{{"period": {encode(report["period"])}, "tables": {{'
+    for index, (table, data) in enumerate(report["tables"].items()):
+        yield (
+            f'{"," if index else ""}{encode(table)}: {{"columns": {encode(data["columns"])}, '
+            f'"count": {data["count"]}, "totals": {encode(data["totals"])}, "rows": ['
+        )
+        for row_index, row in enumerate(data["rows"]):
+            yield f'{"," if row_index else ""}{encode(row)}'
+        yield "]}"
+    yield f'}}, "reconciliation": {encode(report["reconciliation"])}}}'
@@ -0,0 +1,175 @@
+"""
+Benchmark the two invoice PDF engines (WeasyPrint template vs Reportlab).
+
+Each engine / size pair runs in a fresh process on a synthetic, unsaved
+invoice so peak RSS is measured per engine and not polluted by the previous
+run or by the database.
+
+Usage:
+    python manage.py benchmark_invoice_pdf
+    python manage.py benchmark_invoice_pdf --sizes 10 100 1000 --repeat 3
+    python manage.py benchmark_invoice_pdf --engines reportlab
+"""
+
+import resource
+import time
+from decimal import Decimal
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import BranchManagement, SiteManagement
+from documents.pdf_cache import render_pdf
+from documents.pdf_jobs import new_render_pool
+from invoice.models import HighSideInvoiceItem, Invoice, LowSideInvoiceItem
+from invoice.utils.pdf_generator import (
+    PDF_ENGINE_REPORTLAB,
+    PDF_ENGINES,
+    generate_invoice_pdf,
+    render_invoice_html,
+)
+from lead_management.models import Customer
+from product_management.models import (
+    ProductModel,
+    ProductVariant,
+    acSubTypes,
+    acType,
+    brand,
+    item,
+    item_type,
+    material_type,
+)
+
+
+def _synthetic_invoice(lines):
+    branch = BranchManagement(
+        id=1, name='Krishna Airconditioning - Pune', email='pune@example.com',
+        primary_contact='9999999999', address='Shivaji Nagar', city='Pune',
+        state='Maharashtra', pincode='411005', state_code='27',
+        gst_no='27ABCDE1234F1Z5', company_pan='ABCDE1234F',
+    )
+    customer = Customer(
+        id=1, name='Benchmark Customer', contact_number='9999999998',
+        email='buyer@example.com', address='Baner Road', city='Pune',
+    )
+    site = SiteManagement(id=1, name='Benchmark Site', site_shortcut='BENCH')
+    invoice = Invoice(
+        id=1, invoice_no='KA/INV/26/0001', customer=customer, branch=branch, site=site,
+        invoice_date=timezone.localdate(), buyer_name=customer.name,
+        buyer_address=customer.address, buyer_state='Maharashtra', buyer_state_code='27',
+        bank_name='HDFC Bank', account_no='000000000000', ifsc_code='HDFC0000001',
+        gst_type='CGST_SGST', gst_percentage=Decimal('18'),
+    )
+
+    split = acSubTypes(id=1, name='Hi-Wall', ac_type_id=acType(id=1, name='Split AC'))
+    model = ProductModel(
+        id=1, name='Hi-Wall Split', ac_sub_type_id=split, brand_id=brand(id=1, name='Daikin'),
+        model_no='FTKM50', inverter=True,
+    )
+    variant = ProductVariant(id=1, product_model=model, capacity='1.5', unit='TR', sku='SKU-1')
+    low_item = item(
+        id=1, item_code='CU-PI-12.7MM', material_type_id=material_type(id=1, name='Copper'),
+        item_type_id=item_type(id=1, name='Pipe'), size='12.7', size_unit='mm',
+    )
+
+    products = []
+    for i in range(lines):
+        if i % 2:
+            line = LowSideInvoiceItem(
+                id=i + 1, item=low_item, description='Insulated copper piping',
+                hsn_sac='7411', gst_percent=Decimal('18'), quantity=Decimal('10'),
+                unit='RMT', rate=Decimal('850.00'),
+            )
+        else:
+            line = HighSideInvoiceItem(
+                id=i + 1, product_variant=variant, description='Supply of indoor and outdoor unit',
+                hsn_sac='8415', gst_percent=Decimal('18'), quantity=Decimal('2'),
+                unit='NOS', rate=Decimal('45000.00'),
+            )
+        line.amount = line.quantity * line.rate
+        products.append(line)
+
+    taxable = sum(p.amount for p in products)
+    invoice.taxable_value = taxable
+    invoice.cgst_amount = invoice.sgst_amount = taxable * Decimal('0.09')
+    invoice.total_tax = invoice.cgst_amount + invoice.sgst_amount
+    invoice.grand_total = taxable + invoice.total_tax
+    invoice.amount_in_words = 'Benchmark amount in words'
+
+    data = {
+        "products": products,
+        "total_qty": sum(p.quantity for p in products),
+        "total_tax_in_words": 'Benchmark tax in words',
+        "cgst": Decimal('9'),
+        "sgst": Decimal('9'),
+        "igst": None,
+        "invoice_payment_terms": [],
+        "invoice_delivery_terms": [],
+    }
+    return invoice, data
+
+
+def _measure(engine, lines, repeat):
+    """Runs in a fresh worker process: (median seconds, peak RSS MB, PDF size)."""
+    invoice, data = _synthetic_invoice(lines)
+
+    timings = []
+    pdf = b''
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if engine == PDF_ENGINE_REPORTLAB:
+            pdf = generate_invoice_pdf(invoice, data=data)
+        else:
+            pdf = render_pdf(render_invoice_html(invoice, data=data), base_url='/')
+        timings.append(time.perf_counter() - started)
+
+    # ru_maxrss is in KB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return median(timings), peak_mb, len(pdf)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark invoice PDF render time and peak RSS for the WeasyPrint and Reportlab engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10, 100, 1000],
+            help='Invoice line counts to benchmark',
+        )
+        parser.add_argument(
+            '--engines',
+            nargs='+',
+            choices=PDF_ENGINES,
+            default=list(PDF_ENGINES),
+            help='Engines to benchmark',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Renders per engine and size (median is reported)',
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(options['repeat'], 1)
+
+        self.stdout.write(f'{"engine":>11} {"lines":>6} {"median s":>10} {"peak RSS MB":>12} {"PDF KB":>8}')
+        for size in options['sizes']:
+            for engine in options['engines']:
+                # New process per run so ru_maxrss is this engine's peak only
+                with new_render_pool(1) as pool:
+                    try:
+                        elapsed, peak_mb, pdf_bytes = pool.submit(_measure, engine, size, repeat).result()
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f'{engine:>11} {size:>6} failed: {str(e)}'))
+                        continue
+
+                self.stdout.write(
+                    f'{engine:>11} {size:>6} {elapsed:>10.3f} {peak_mb:>12.1f} {pdf_bytes / 1024:>8.0f}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,95 @@
+"""
+Export the e-invoice (INV-01) JSON payloads of the B2B invoices of a period.
+
+Writes one NDJSON file (one line per invoice: its payload, whether it is
+valid against the bundled schema and the schema errors) and prints the
+number of valid and invalid invoices with the errors of the invalid ones.
+Payloads are validated in a pool of --workers processes (0 = in this
+process).
+
+Usage:
+    python manage.py export_einvoices --from 2026-04-01 --to 2026-04-30
+    python manage.py export_einvoices --from 2026-04-01 --to 2026-04-30 --branch 2 --output-dir exports/
+    python manage.py export_einvoices --from 2026-04-01 --to 2026-04-30 --workers 4 --batch-size 500
+"""
+
+import os
+import time
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoice.einvoice import DEFAULT_BATCH_SIZE, iter_einvoice_ndjson, iter_einvoices, new_validation_pool
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date: {value}')
+
+
+class Command(BaseCommand):
+    help = 'Export validated e-invoice JSON payloads of the B2B invoices of a period as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, help='First invoice date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', required=True, help='Last invoice date (YYYY-MM-DD)')
+        parser.add_argument('--branch', type=int, help='Only invoices of this branch id')
+        parser.add_argument('--output-dir', default='.', help='Directory for the export file')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Validation processes (0 = validate in this process)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Invoices read and validated together')
+
+    def handle(self, *args, **options):
+        date_from = _date(options['date_from'])
+        date_to = _date(options['date_to'])
+        if date_from > date_to:
+            raise CommandError('--to must be on or after --from')
+
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f'einvoice-{date_from:%Y%m%d}-{date_to:%Y%m%d}.ndjson'
+
+        workers = max(options['workers'], 0)
+        pool = new_validation_pool(workers) if workers else None
+        invalid = []
+        count = 0
+
+        def counted(records):
+            nonlocal count
+            for record in records:
+                count += 1
+                if not record['valid']:
+                    invalid.append((record['invoice_no'], record['errors']))
+                yield record
+
+        started = time.perf_counter()
+        try:
+            records = iter_einvoices(
+                date_from,
+                date_to,
+                branch_id=options['branch'],
+                batch_size=max(options['batch_size'], 1),
+                executor=pool,
+                inline=not workers,
+                window=max(workers, 1) * 2,
+            )
+            with open(path, 'w') as fh:
+                fh.writelines(iter_einvoice_ndjson(counted(records)))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'Wrote {path}')
+        for invoice_no, errors in invalid:
+            self.stdout.write(self.style.ERROR(f'  {invoice_no}:'))
+            for error in errors:
+                self.stdout.write(f'    {error}')
+        line = f'{count} invoices, {count - len(invalid)} valid, {len(invalid)} invalid'
+        self.stdout.write(self.style.ERROR(line) if invalid else self.style.SUCCESS(line))
+        self.stdout.write(f'Built in {elapsed:.2f}s')
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,83 @@
+"""
+Export the GSTR-1 B2B, B2C and HSN summary tables of a period.
+
+Writes one CSV per table (or a single JSON file) and prints the row count,
+totals, time taken and the reconciliation of each table against the
+invoices' total_tax.
+
+Usage:
+    python manage.py export_gstr1 --from 2026-04-01 --to 2026-04-30
+    python manage.py export_gstr1 --from 2025-04-01 --to 2026-03-31 --table hsn --output-dir exports/
+    python manage.py export_gstr1 --from 2026-04-01 --to 2026-04-30 --branch 2 --json
+"""
+
+import time
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoice.gst_returns import GSTR1_TABLES, build_gstr1, iter_gstr1_csv, iter_gstr1_json
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date: {value}')
+
+
+class Command(BaseCommand):
+    help = 'Export GSTR-1 B2B / B2C / HSN summary tables for a period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, help='First invoice date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', required=True, help='Last invoice date (YYYY-MM-DD)')
+        parser.add_argument('--branch', type=int, help='Only invoices of this branch id')
+        parser.add_argument('--table', dest='tables', choices=GSTR1_TABLES, action='append',
+                            help='Table to export (repeatable, default: all)')
+        parser.add_argument('--output-dir', default='.', help='Directory for the export files')
+        parser.add_argument('--json', action='store_true', help='Write one JSON file instead of CSVs')
+
+    def handle(self, *args, **options):
+        date_from = _date(options['date_from'])
+        date_to = _date(options['date_to'])
+        if date_from > date_to:
+            raise CommandError('--to must be on or after --from')
+        tables = tuple(options['tables'] or GSTR1_TABLES)
+
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stem = f'gstr1-{date_from:%Y%m%d}-{date_to:%Y%m%d}'
+
+        started = time.perf_counter()
+        report = build_gstr1(date_from, date_to, tables=tables, branch_id=options['branch'])
+        elapsed = time.perf_counter() - started
+
+        if options['json']:
+            path = output_dir / f'{stem}.json'
+            with open(path, 'w') as fh:
+                fh.writelines(iter_gstr1_json(report))
+            self.stdout.write(f'Wrote {path}')
+        else:
+            for table in tables:
+                path = output_dir / f'{stem}-{table}.csv'
+                with open(path, 'w', newline='') as fh:
+                    fh.writelines(iter_gstr1_csv(report, table))
+                self.stdout.write(f'Wrote {path}')
+
+        for table in tables:
+            totals = report['tables'][table]['totals']
+            check = report['reconciliation'][table]
+            self.stdout.write(
+                f'{table:>4}: {report["tables"][table]["count"]} rows, taxable {totals["taxable_value"]}, '
+                f'IGST {totals["igst"]}, CGST {totals["cgst"]}, SGST {totals["sgst"]}'
+            )
+            line = (
+                f'      {check["invoices"]} invoices, total_tax {check["invoice_total_tax"]}, '
+                f'exported {check["exported_tax"]}, difference {check["difference"]}'
+            )
+            self.stdout.write(self.style.SUCCESS(line) if check['reconciled'] else self.style.ERROR(line))
+
+        self.stdout.write(f'Built in {elapsed:.2f}s')
+        self.stdout.write(self.style.SUCCESS('Done!'))
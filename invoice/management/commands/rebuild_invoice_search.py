@@ -0,0 +1,41 @@
+"""
+Rebuild the invoice search documents used by the invoice list search.
+
+Documents are refreshed whenever an invoice or its customer is saved; run
+this once after deploying the search table (to index existing invoices)
+and after invoice lines, sites or items were changed outside the API.
+
+Usage:
+    python manage.py rebuild_invoice_search
+    python manage.py rebuild_invoice_search --dry-run
+"""
+
+from django.core.management.base import BaseCommand
+
+from invoice.search import rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuild invoice search documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the documents that are missing or out of date',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Invoices indexed per batch',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be saved'))
+
+        stale = rebuild_search_documents(batch_size=max(options['batch_size'], 1), dry_run=options['dry_run'])
+
+        self.stdout.write(f'{stale} invoice search documents out of date')
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,37 @@
+"""
+Recompute invoice receivables and customer balances from invoices,
+payment allocations and payments.
+
+The balances are maintained incrementally on every invoice save and
+payment; run this once after deploying the receivables tables (to
+backfill existing invoices) and whenever the balances are suspected to
+have drifted, e.g. after invoices were edited outside the API.
+
+Usage:
+    python manage.py rebuild_receivables
+    python manage.py rebuild_receivables --dry-run
+"""
+
+from django.core.management.base import BaseCommand
+
+from invoice.receivables import rebuild_receivables
+
+
+class Command(BaseCommand):
+    help = 'Rebuild invoice receivables and customer balances'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the rows that are missing or wrong',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be saved'))
+
+        invoices, customers = rebuild_receivables(dry_run=options['dry_run'])
+
+        self.stdout.write(f'{invoices} invoice receivables and {customers} customer balances out of date')
+        self.stdout.write(self.style.SUCCESS('Done!'))
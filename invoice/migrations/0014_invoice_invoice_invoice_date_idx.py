@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_customuser_staff_profile_fields'),
+        ('inventory', '0022_purchaseorderproduct_hsn_sac'),
+        ('invoice', '0013_alter_invoice_buyer_gstin'),
+        ('lead_management', '0022_customer_salutation_designation_remark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['invoice_date'], name='invoice_invoice_date_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0014_invoice_invoice_invoice_date_idx'),
+        ('quotation', '0006_copy_on_write_version_lines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='quotation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoices', to='quotation.quotation'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FULLTEXT_INDEX = 'invoice_search_content_ft'
+
+
+def add_fulltext_index(apps, schema_editor):
+    # Django has no FULLTEXT index type; other databases search with icontains
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        f'CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON invoice_invoicesearchdocument (content)'
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(f'DROP INDEX {FULLTEXT_INDEX} ON invoice_invoicesearchdocument')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0016_receivables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSearchDocument',
+            fields=[
+                ('invoice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='invoice.invoice')),
+                ('content', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+    ]
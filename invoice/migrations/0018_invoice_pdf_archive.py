@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0017_invoice_search_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoicePDFArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveIntegerField()),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveIntegerField()),
+                ('engine', models.CharField(max_length=20)),
+                ('reason', models.TextField(blank=True, default='')),
+                ('issued_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pdf_archives', to='invoice.invoice')),
+                ('issued_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='issued_invoice_pdfs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-revision'],
+                'constraints': [models.UniqueConstraint(fields=('invoice', 'revision'), name='invoice_pdf_archive_revision')],
+            },
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.db import models
-from api.models import  BranchManagement, SiteManagement
+from api.models import  BranchManagement, CustomUser, SiteManagement
 from inventory.models import TermsConditions
 # Create your models here.
 
@@ -99,6 +99,15 @@ class Invoice(models.Model):
     # ===== WORK DESCRIPTION =====
     work_description = models.TextField(blank=True, null=True)
 
+    # Quotation this invoice bills (set by the quotation conversion)
+    quotation = models.ForeignKey(
+        "quotation.Quotation",
+        on_delete=models.SET_NULL,
+        related_name="invoices",
+        null=True,
+        blank=True
+    )
+
     # ===== TAX TOTALS =====
     gst_type = models.CharField(max_length=20, choices=GST_TYPE_CHOICES,default="CGST_SGST")
     gst_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
@@ -114,8 +123,17 @@ class Invoice(models.Model):
 
     amount_in_words = models.TextField(blank=True, null=True)
 
+    # Payment due date; ageing falls back to invoice_date when empty
+    due_date = models.DateField(blank=True, null=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Date range filters on the invoice list
+            models.Index(fields=["invoice_date"], name="invoice_invoice_date_idx"),
+        ]
+
 
 
 
@@ -206,4 +224,163 @@ class LowSideInvoiceItem(models.Model):
         return " ".join(parts) if parts else self.item.item_code
 
 
+# =====================================================
+# RECEIVABLES
+# =====================================================
+class Payment(models.Model):
+    """Money received from a customer, allocated to one or more invoices."""
+
+    MODE_CHOICES = (
+        ("BANK_TRANSFER", "Bank Transfer"),
+        ("CHEQUE", "Cheque"),
+        ("UPI", "UPI"),
+        ("CASH", "Cash"),
+        ("CARD", "Card"),
+    )
+
+    customer = models.ForeignKey(
+        "lead_management.Customer",
+        on_delete=models.PROTECT,
+        related_name="payments"
+    )
+    payment_date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default="BANK_TRANSFER")
+    reference_no = models.CharField(max_length=100, blank=True, null=True)
+    notes = models.TextField(blank=True, null=True)
+
+    # Part of the amount not allocated to any invoice (customer credit)
+    unallocated_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "payment_date"], name="invoice_payment_cust_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} {self.payment_date} {self.amount}"
+
+
+class PaymentAllocation(models.Model):
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name="allocations"
+    )
+    invoice = models.ForeignKey(
+        Invoice,
+        on_delete=models.PROTECT,
+        related_name="allocations"
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["payment", "invoice"], name="invoice_allocation_unique"),
+        ]
+
+
+class InvoiceReceivable(models.Model):
+    """
+    Outstanding balance of one invoice, kept up to date by
+    invoice/receivables.py whenever the invoice or an allocation changes.
+    Narrow on purpose: ageing reads only this table's index.
+    """
+
+    invoice = models.OneToOneField(
+        Invoice,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="receivable"
+    )
+    customer = models.ForeignKey(
+        "lead_management.Customer",
+        on_delete=models.CASCADE,
+        related_name="receivables"
+    )
+    due_date = models.DateField()
+    invoice_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "due_date", "outstanding"], name="invoice_receivable_ageing_idx"),
+        ]
+
+
+class CustomerBalance(models.Model):
+    """Running receivable totals per customer, updated with every invoice / payment change."""
+
+    customer = models.OneToOneField(
+        "lead_management.Customer",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="receivable_balance"
+    )
+    invoiced = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Payments received but not allocated to an invoice yet
+    unallocated = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.customer_id} {self.outstanding}"
+
+
+class InvoiceSearchDocument(models.Model):
+    """
+    Denormalized text of one invoice for the list search: number, buyer,
+    GSTIN, phone, site and every line's description and item code.
+    Rebuilt by invoice/search.py after the invoice is saved; on MySQL
+    `content` carries a FULLTEXT index (see migration 0017).
+    """
+
+    invoice = models.OneToOneField(
+        Invoice,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document"
+    )
+    content = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class InvoicePDFArchive(models.Model):
+    """
+    One issued rendering of an invoice. The PDF itself is stored once per
+    distinct content under PDF_ARCHIVE_DIR (documents/pdf_archive.py);
+    invoice_pdf serves the latest revision and only an explicit reissue
+    adds a new one.
+    """
+
+    invoice = models.ForeignKey(
+        Invoice,
+        on_delete=models.CASCADE,
+        related_name="pdf_archives"
+    )
+    revision = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveIntegerField()
+    engine = models.CharField(max_length=20)
+    reason = models.TextField(blank=True, default="")
+    issued_by = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="issued_invoice_pdfs"
+    )
+    issued_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-revision"]
+        constraints = [
+            models.UniqueConstraint(fields=["invoice", "revision"], name="invoice_pdf_archive_revision"),
+        ]
 
+    def __str__(self):
+        return f"{self.invoice_id} r{self.revision} {self.sha256[:12]}"
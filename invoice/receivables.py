@@ -0,0 +1,338 @@
+"""
+Receivables ledger: payments, their allocation to invoices and the running
+outstanding balances.
+
+Balances are maintained incrementally. Every change applies its delta to
+InvoiceReceivable (one row per invoice) and CustomerBalance (one row per
+customer) with F() expressions, inside the caller's transaction, so no
+report ever has to add up invoices and payments. Ageing groups the open
+receivable rows through the (customer, due_date, outstanding) index.
+rebuild_receivables recomputes both tables from scratch (backfill /
+repair).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import CustomerBalance, Invoice, InvoiceReceivable, Payment, PaymentAllocation
+
+ZERO = Decimal("0")
+
+# (key, first day overdue, last day overdue); not yet due counts as 0-30
+AGEING_BUCKETS = (
+    ("0_30", None, 30),
+    ("31_60", 31, 60),
+    ("61_90", 61, 90),
+    ("90_plus", 91, None),
+)
+
+
+class AllocationError(ValueError):
+    pass
+
+
+def invoice_due_date(invoice):
+    return invoice.due_date or invoice.invoice_date
+
+
+def adjust_customer_balance(customer_id, invoiced=ZERO, paid=ZERO, outstanding=ZERO, unallocated=ZERO):
+    """Add the deltas to the customer's running totals (row created on first use)."""
+    if not any((invoiced, paid, outstanding, unallocated)):
+        return
+    CustomerBalance.objects.get_or_create(customer_id=customer_id)
+    CustomerBalance.objects.filter(customer_id=customer_id).update(
+        invoiced=F("invoiced") + invoiced,
+        paid=F("paid") + paid,
+        outstanding=F("outstanding") + outstanding,
+        unallocated=F("unallocated") + unallocated,
+        updated_at=timezone.now(),
+    )
+
+
+@transaction.atomic
+def sync_invoice_receivable(invoice):
+    """
+    Bring the invoice's receivable row in line with its grand total, due
+    date and customer, and move the difference into the customer balance.
+    Called on every invoice save.
+    """
+    due_date = invoice_due_date(invoice)
+    total = invoice.grand_total or ZERO
+
+    receivable = InvoiceReceivable.objects.select_for_update().filter(invoice_id=invoice.pk).first()
+    if receivable is None:
+        InvoiceReceivable.objects.create(
+            invoice_id=invoice.pk,
+            customer_id=invoice.customer_id,
+            due_date=due_date,
+            invoice_total=total,
+            outstanding=total,
+        )
+        adjust_customer_balance(invoice.customer_id, invoiced=total, outstanding=total)
+        return
+
+    outstanding = total - receivable.paid
+    if receivable.customer_id != invoice.customer_id:
+        adjust_customer_balance(
+            receivable.customer_id,
+            invoiced=-receivable.invoice_total,
+            paid=-receivable.paid,
+            outstanding=-receivable.outstanding,
+        )
+        adjust_customer_balance(
+            invoice.customer_id, invoiced=total, paid=receivable.paid, outstanding=outstanding
+        )
+    else:
+        adjust_customer_balance(
+            invoice.customer_id,
+            invoiced=total - receivable.invoice_total,
+            outstanding=outstanding - receivable.outstanding,
+        )
+
+    if (receivable.customer_id, receivable.due_date, receivable.invoice_total, receivable.outstanding) != (
+        invoice.customer_id, due_date, total, outstanding
+    ):
+        InvoiceReceivable.objects.filter(invoice_id=invoice.pk).update(
+            customer_id=invoice.customer_id,
+            due_date=due_date,
+            invoice_total=total,
+            outstanding=outstanding,
+        )
+        # Don't let a select_related() copy answer with the old balance
+        relation = Invoice._meta.get_field("receivable")
+        if relation.is_cached(invoice):
+            relation.delete_cached_value(invoice)
+
+
+def remove_invoice_receivable(invoice):
+    """Take a deleted invoice out of its customer's balance (the row itself cascades)."""
+    receivable = InvoiceReceivable.objects.filter(invoice_id=invoice.pk).first()
+    if receivable is not None:
+        adjust_customer_balance(
+            receivable.customer_id,
+            invoiced=-receivable.invoice_total,
+            paid=-receivable.paid,
+            outstanding=-receivable.outstanding,
+        )
+
+
+def _oldest_first(customer_id, amount):
+    """Allocate `amount` to the customer's open invoices, oldest due date first."""
+    allocations = {}
+    for invoice_id, outstanding in (
+        InvoiceReceivable.objects.filter(customer_id=customer_id, outstanding__gt=0)
+        .order_by("due_date", "invoice_id")
+        .values_list("invoice_id", "outstanding")
+    ):
+        if amount <= 0:
+            break
+        share = min(amount, outstanding)
+        allocations[invoice_id] = share
+        amount -= share
+    return allocations
+
+
+@transaction.atomic
+def allocate_payment(payment, allocations=None):
+    """
+    Allocate (more of) a payment: `allocations` maps invoice id -> amount,
+    None allocates whatever is unallocated to the oldest open invoices.
+    Raises AllocationError when an invoice is not the payment customer's,
+    is over-allocated, or the payment has too little left.
+    """
+    payment = Payment.objects.select_for_update().get(pk=payment.pk)
+    if allocations is None:
+        allocations = _oldest_first(payment.customer_id, payment.unallocated_amount)
+    allocations = {int(invoice_id): Decimal(amount) for invoice_id, amount in allocations.items() if amount}
+    if not allocations:
+        return payment
+
+    if any(amount < 0 for amount in allocations.values()):
+        raise AllocationError("Allocation amounts must be positive")
+    total = sum(allocations.values(), ZERO)
+    if total > payment.unallocated_amount:
+        raise AllocationError(
+            f"Allocations total {total} but only {payment.unallocated_amount} of the payment is unallocated"
+        )
+
+    receivables = {
+        receivable.invoice_id: receivable
+        for receivable in InvoiceReceivable.objects.select_for_update().filter(invoice_id__in=allocations)
+    }
+    for invoice_id, amount in allocations.items():
+        receivable = receivables.get(invoice_id)
+        if receivable is None or receivable.customer_id != payment.customer_id:
+            raise AllocationError(f"Invoice {invoice_id} is not an invoice of this customer")
+        if amount > receivable.outstanding:
+            raise AllocationError(
+                f"Invoice {invoice_id} has {receivable.outstanding} outstanding, cannot allocate {amount}"
+            )
+
+    existing = {
+        allocation.invoice_id: allocation
+        for allocation in PaymentAllocation.objects.filter(payment=payment, invoice_id__in=allocations)
+    }
+    for allocation in existing.values():
+        allocation.amount += allocations[allocation.invoice_id]
+    PaymentAllocation.objects.bulk_update(existing.values(), ["amount"])
+    PaymentAllocation.objects.bulk_create([
+        PaymentAllocation(payment=payment, invoice_id=invoice_id, amount=amount)
+        for invoice_id, amount in allocations.items()
+        if invoice_id not in existing
+    ])
+
+    for invoice_id, amount in allocations.items():
+        InvoiceReceivable.objects.filter(invoice_id=invoice_id).update(
+            paid=F("paid") + amount,
+            outstanding=F("outstanding") - amount,
+        )
+    Payment.objects.filter(pk=payment.pk).update(unallocated_amount=F("unallocated_amount") - total)
+    adjust_customer_balance(payment.customer_id, paid=total, outstanding=-total, unallocated=-total)
+
+    payment.refresh_from_db()
+    return payment
+
+
+@transaction.atomic
+def record_payment(customer, amount, payment_date, allocations=None, auto_allocate=False, **fields):
+    """
+    Store a payment and allocate it: explicitly with `allocations`
+    ({invoice id: amount}), oldest invoices first with `auto_allocate`,
+    or not at all (the amount stays as customer credit).
+    """
+    payment = Payment.objects.create(
+        customer=customer,
+        amount=amount,
+        payment_date=payment_date,
+        unallocated_amount=amount,
+        **fields,
+    )
+    adjust_customer_balance(customer.pk, unallocated=amount)
+    if allocations:
+        payment = allocate_payment(payment, allocations)
+    elif auto_allocate:
+        payment = allocate_payment(payment)
+    return payment
+
+
+@transaction.atomic
+def delete_payment(payment):
+    """Delete a payment and give its allocated amounts back to the invoices."""
+    payment = Payment.objects.select_for_update().get(pk=payment.pk)
+    allocated = ZERO
+    for invoice_id, amount in payment.allocations.values_list("invoice_id", "amount"):
+        InvoiceReceivable.objects.filter(invoice_id=invoice_id).update(
+            paid=F("paid") - amount,
+            outstanding=F("outstanding") + amount,
+        )
+        allocated += amount
+    adjust_customer_balance(
+        payment.customer_id, paid=-allocated, outstanding=allocated, unallocated=-payment.unallocated_amount
+    )
+    payment.delete()
+
+
+def ageing(as_of=None, customer_id=None):
+    """
+    Open balances per customer split into ageing buckets by days past the
+    due date on `as_of` (default today): one grouped query over the open
+    receivable rows. Returns (rows, totals).
+    """
+    as_of = as_of or timezone.localdate()
+    amount = DecimalField(max_digits=14, decimal_places=2)
+
+    buckets = {}
+    for key, first_day, last_day in AGEING_BUCKETS:
+        # days overdue in [first_day, last_day] <=> due_date in [as_of - last_day, as_of - first_day]
+        condition = Q()
+        if last_day is not None:
+            condition &= Q(due_date__gte=as_of - timedelta(days=last_day))
+        if first_day is not None:
+            condition &= Q(due_date__lte=as_of - timedelta(days=first_day))
+        buckets[key] = Sum(Case(When(condition, then=F("outstanding")), default=Value(ZERO), output_field=amount))
+
+    qs = InvoiceReceivable.objects.filter(outstanding__gt=0)
+    if customer_id:
+        qs = qs.filter(customer_id=customer_id)
+    rows = list(
+        qs.values("customer_id", "customer__name")
+        .annotate(total=Sum("outstanding"), **buckets)
+        .order_by("-total", "customer_id")
+    )
+
+    totals = defaultdict(lambda: ZERO)
+    for row in rows:
+        row["customer_name"] = row.pop("customer__name")
+        for key in (*buckets, "total"):
+            row[key] = Decimal(row[key] or 0).quantize(Decimal("0.01"))
+            totals[key] += row[key]
+    return rows, {key: totals[key] for key in (*buckets, "total")}
+
+
+@transaction.atomic
+def rebuild_receivables(dry_run=False):
+    """
+    Recompute every receivable row and customer balance from invoices,
+    allocations and payments. Returns the number of invoice rows and
+    customer balances that were wrong (and, unless dry_run, fixed).
+    """
+    paid = defaultdict(lambda: ZERO)
+    for invoice_id, amount in PaymentAllocation.objects.values("invoice_id").annotate(
+        amount=Sum("amount")
+    ).values_list("invoice_id", "amount"):
+        paid[invoice_id] = amount
+
+    current = {receivable.invoice_id: receivable for receivable in InvoiceReceivable.objects.all()}
+    balances = defaultdict(lambda: {"invoiced": ZERO, "paid": ZERO, "outstanding": ZERO, "unallocated": ZERO})
+    create, update = [], []
+    for invoice in Invoice.objects.only("pk", "customer_id", "invoice_date", "due_date", "grand_total"):
+        expected = InvoiceReceivable(
+            invoice_id=invoice.pk,
+            customer_id=invoice.customer_id,
+            due_date=invoice_due_date(invoice),
+            invoice_total=invoice.grand_total,
+            paid=paid[invoice.pk],
+            outstanding=invoice.grand_total - paid[invoice.pk],
+        )
+        balance = balances[invoice.customer_id]
+        balance["invoiced"] += expected.invoice_total
+        balance["paid"] += expected.paid
+        balance["outstanding"] += expected.outstanding
+
+        row = current.get(invoice.pk)
+        if row is None:
+            create.append(expected)
+        elif (row.customer_id, row.due_date, row.invoice_total, row.paid, row.outstanding) != (
+            expected.customer_id, expected.due_date, expected.invoice_total, expected.paid, expected.outstanding
+        ):
+            update.append(expected)
+
+    for customer_id, unallocated in Payment.objects.values("customer_id").annotate(
+        unallocated=Sum("unallocated_amount")
+    ).values_list("customer_id", "unallocated"):
+        balances[customer_id]["unallocated"] += unallocated
+
+    stored = {balance.customer_id: balance for balance in CustomerBalance.objects.all()}
+    wrong_balances = [
+        CustomerBalance(customer_id=customer_id, **values)
+        for customer_id, values in balances.items()
+        if customer_id not in stored
+        or any(getattr(stored[customer_id], name) != value for name, value in values.items())
+    ]
+
+    if not dry_run:
+        InvoiceReceivable.objects.bulk_create(create, batch_size=1000)
+        InvoiceReceivable.objects.bulk_update(
+            update, ["customer", "due_date", "invoice_total", "paid", "outstanding"], batch_size=1000
+        )
+        CustomerBalance.objects.filter(customer_id__in=[b.customer_id for b in wrong_balances]).delete()
+        CustomerBalance.objects.bulk_create(wrong_balances, batch_size=1000)
+        CustomerBalance.objects.exclude(customer_id__in=list(balances)).update(
+            invoiced=0, paid=0, outstanding=0, unallocated=0
+        )
+
+    return len(create) + len(update), len(wrong_balances)
@@ -0,0 +1,163 @@
+"""
+Invoice list search over InvoiceSearchDocument.
+
+Each invoice has one search document: its number, buyer name, GSTIN,
+customer phone, site name and the description / item code of every line,
+as one text column. The document is rebuilt when the transaction that
+saved the invoice commits, so lines written after the invoice row (bulk
+inserts in convert_quotation_version, AMC billing) are included.
+
+On MySQL the search is a single MATCH ... AGAINST over the FULLTEXT index
+of that column; terms the index cannot match (shorter than the minimum
+token size) and other databases fall back to icontains on the document.
+"""
+import re
+from collections import defaultdict
+
+from django.db import connections, transaction
+from django.db.models import F, FloatField, Func, Value
+
+from .models import HighSideInvoiceItem, Invoice, InvoiceSearchDocument, LowSideInvoiceItem
+
+# innodb_ft_min_token_size: shorter words are not in the FULLTEXT index
+MIN_TOKEN_LENGTH = 3
+
+_WORD = re.compile(r"\w+")
+
+
+class MatchAgainst(Func):
+    """MATCH (column) AGAINST (query IN BOOLEAN MODE); relevance > 0 means a match."""
+
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        column, query = self.get_source_expressions()
+        column_sql, column_params = compiler.compile(column)
+        query_sql, query_params = compiler.compile(query)
+        return f"MATCH ({column_sql}) AGAINST ({query_sql} IN BOOLEAN MODE)", (*column_params, *query_params)
+
+
+def boolean_query(terms):
+    """
+    (boolean mode query, terms it cannot match). Every term is required: a
+    multi-word term ("INV-2026-0012", a quoted phrase) as a phrase, a
+    single word as a prefix. Boolean operators typed by the user are
+    dropped with the rest of the punctuation.
+    """
+    parts = []
+    unmatched = []
+    for term in terms:
+        words = _WORD.findall(term)
+        if len(words) > 1 and all(len(word) >= MIN_TOKEN_LENGTH for word in words):
+            parts.append(f'+"{" ".join(words)}"')
+        elif len(words) == 1 and len(words[0]) >= MIN_TOKEN_LENGTH:
+            parts.append(f"+{words[0]}*")
+        elif words:
+            unmatched.append(term)
+    return " ".join(parts), unmatched
+
+
+def search_invoices(queryset, terms):
+    """Invoices whose search document contains every term."""
+    terms = [term for term in terms if term.strip()]
+    if not terms:
+        return queryset
+
+    if connections[queryset.db].vendor == "mysql":
+        query, terms = boolean_query(terms)
+        if query:
+            queryset = queryset.alias(
+                search_relevance=MatchAgainst(F("search_document__content"), Value(query))
+            ).filter(search_relevance__gt=0)
+
+    for term in terms:
+        queryset = queryset.filter(search_document__content__icontains=term)
+    return queryset
+
+
+def _join(values):
+    # Repeated item codes / descriptions add nothing to the match
+    words = (str(value).strip() for value in values if value)
+    return " ".join(dict.fromkeys(word for word in words if word))
+
+
+def search_contents(invoice_ids):
+    """{invoice id: search document text}, in four queries whatever the count."""
+    invoices = (
+        Invoice.objects.filter(pk__in=invoice_ids)
+        .select_related("customer", "site")
+        .only("invoice_no", "buyer_name", "buyer_gstin", "customer__contact_number", "site__name")
+    )
+    lines = defaultdict(list)
+    for invoice_id, *values in HighSideInvoiceItem.objects.filter(invoice_id__in=invoice_ids).order_by("id").values_list(
+        "invoice_id", "description", "product_variant__sku", "product_variant__product_model__model_no"
+    ):
+        lines[invoice_id].extend(values)
+    for invoice_id, *values in LowSideInvoiceItem.objects.filter(invoice_id__in=invoice_ids).order_by("id").values_list(
+        "invoice_id", "description", "item__item_code"
+    ):
+        lines[invoice_id].extend(values)
+
+    return {
+        invoice.pk: _join([
+            invoice.invoice_no,
+            invoice.buyer_name,
+            invoice.buyer_gstin,
+            invoice.customer.contact_number if invoice.customer_id else None,
+            invoice.site.name if invoice.site_id else None,
+            *lines[invoice.pk],
+        ])
+        for invoice in invoices
+    }
+
+
+def refresh_search_documents(invoice_ids):
+    """Rebuild the search documents of these invoices (one upsert)."""
+    contents = search_contents(list(invoice_ids))
+    features = connections[InvoiceSearchDocument.objects.db].features
+    InvoiceSearchDocument.objects.bulk_create(
+        [InvoiceSearchDocument(invoice_id=invoice_id, content=content) for invoice_id, content in contents.items()],
+        update_conflicts=True,
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+        unique_fields=["invoice"] if features.supports_update_conflicts_with_target else None,
+        update_fields=["content", "updated_at"],
+    )
+    return len(contents)
+
+
+def schedule_search_refresh(invoice):
+    """Rebuild the invoice's document once the current transaction commits."""
+    if getattr(invoice, "_search_refresh_pending", False):
+        return
+    invoice._search_refresh_pending = True
+
+    def refresh():
+        invoice._search_refresh_pending = False
+        refresh_search_documents([invoice.pk])
+
+    transaction.on_commit(refresh)
+
+
+def schedule_customer_search_refresh(customer_id):
+    """Customer phone is part of the documents of all their invoices."""
+    transaction.on_commit(
+        lambda: refresh_search_documents(Invoice.objects.filter(customer_id=customer_id).values_list("pk", flat=True))
+    )
+
+
+def rebuild_search_documents(batch_size=500, dry_run=False):
+    """Number of invoices whose search document is missing or out of date; fixes them unless dry_run."""
+    stale = 0
+    invoice_ids = list(Invoice.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(invoice_ids), batch_size):
+        batch = invoice_ids[start:start + batch_size]
+        stored = dict(InvoiceSearchDocument.objects.filter(invoice_id__in=batch).values_list("invoice_id", "content"))
+        changed = [
+            invoice_id
+            for invoice_id, content in search_contents(batch).items()
+            if stored.get(invoice_id) != content
+        ]
+        stale += len(changed)
+        if changed and not dry_run:
+            refresh_search_documents(changed)
+    return stale
@@ -1,21 +1,32 @@
+from django.urls import reverse
 from rest_framework import serializers
 from django.db import transaction
-from num2words import num2words
 from decimal import Decimal
 from inventory.models import TermsConditions,TermsConditionType
 from .models import (
     Invoice,
     
     CompanyProfile,
+    CustomerBalance,
     HighSideInvoiceItem,
-    LowSideInvoiceItem
+    InvoicePDFArchive,
+    LowSideInvoiceItem,
+    Payment,
+    PaymentAllocation,
 )
+from quotation.models import QuotationVersion
+from .gst_returns import GSTR1_TABLES
+from .receivables import AllocationError, record_payment
+from .service import invoice_line_totals, next_invoice_no, reconcile_invoice_lines, set_invoice_totals
 
 
 
 
 class HighSideInvoiceItemSerializer(serializers.ModelSerializer):
 
+    # Writable so an invoice update can address existing lines
+    id = serializers.IntegerField(required=False)
+
     ac_type_name = serializers.CharField(
         source="product_variant.product_model.ac_sub_type_id.ac_type_id.name",
         read_only=True
@@ -48,6 +59,8 @@ class HighSideInvoiceItemSerializer(serializers.ModelSerializer):
 
 class LowSideInvoiceItemSerializer(serializers.ModelSerializer):
 
+    id = serializers.IntegerField(required=False)
+
     item_code = serializers.CharField(
         source="item.item_code",
         read_only=True
@@ -79,6 +92,71 @@ class LowSideInvoiceItemSerializer(serializers.ModelSerializer):
         model = LowSideInvoiceItem
         fields = "__all__"
         read_only_fields = ("invoice", "amount")
+# =====================================================
+# INVOICE LIST SERIALIZER
+# =====================================================
+
+class InvoiceListSerializer(serializers.ModelSerializer):
+    """Row of the invoice grid: header fields only, no lines or terms."""
+
+    branch_name = serializers.CharField(source="branch.name", read_only=True)
+    site_name = serializers.CharField(source="site.name", read_only=True)
+    customer_phone = serializers.CharField(source="customer.contact_number", read_only=True)
+    outstanding = serializers.DecimalField(
+        source="receivable.outstanding", max_digits=12, decimal_places=2, read_only=True
+    )
+
+    class Meta:
+        model = Invoice
+        fields = (
+            "id",
+            "invoice_no",
+            "invoice_date",
+            "due_date",
+            "customer",
+            "customer_phone",
+            "buyer_name",
+            "buyer_gstin",
+            "branch",
+            "branch_name",
+            "site",
+            "site_name",
+            "quotation",
+            "gst_type",
+            "taxable_value",
+            "total_tax",
+            "grand_total",
+            "outstanding",
+            "created_at",
+        )
+        read_only_fields = fields
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """One query per page: the columns above plus the joined names and balance."""
+        return queryset.select_related("customer", "branch", "site", "receivable").only(
+            "id",
+            "invoice_no",
+            "invoice_date",
+            "due_date",
+            "customer",
+            "buyer_name",
+            "buyer_gstin",
+            "branch",
+            "site",
+            "quotation",
+            "gst_type",
+            "taxable_value",
+            "total_tax",
+            "grand_total",
+            "created_at",
+            "customer__contact_number",
+            "branch__name",
+            "site__name",
+            "receivable__outstanding",
+        )
+
+
 # =====================================================
 # 🔥 PRO INVOICE SERIALIZER
 # =====================================================
@@ -90,7 +168,10 @@ class InvoiceSerializer(serializers.ModelSerializer):
     
     high_side_items = HighSideInvoiceItemSerializer(many=True, required=False)
     low_side_items = LowSideInvoiceItemSerializer(many=True, required=False)
-    site_name = serializers.CharField(source="site.site_name", read_only=True)
+    site_name = serializers.CharField(source="site.name", read_only=True)
+    outstanding = serializers.DecimalField(
+        source="receivable.outstanding", max_digits=12, decimal_places=2, read_only=True
+    )
 
     terms_conditions = serializers.PrimaryKeyRelatedField(
         queryset=TermsConditions.objects.all(),
@@ -123,6 +204,19 @@ class InvoiceSerializer(serializers.ModelSerializer):
             "created_at",
         )
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Lines with every FK the item serializers read, and terms with their type."""
+        return queryset.select_related("customer", "branch", "site", "receivable").prefetch_related(
+            "terms_conditions__terms_condition_type",
+            "high_side_items__product_variant__product_model__brand_id",
+            "high_side_items__product_variant__product_model__ac_sub_type_id__ac_type_id",
+            "low_side_items__item__material_type_id",
+            "low_side_items__item__item_type_id",
+            "low_side_items__item__feature_type_id",
+            "low_side_items__item__item_class_id",
+        )
+
     def get_terms_conditions_details(self, obj):
     
         data = []
@@ -137,118 +231,71 @@ class InvoiceSerializer(serializers.ModelSerializer):
     
         return data        
 
+    # =====================================================
+    # LINE VALIDATION
+    # =====================================================
+    LINE_RELATIONS = (
+        ("high_side_items", "product_variant"),
+        ("low_side_items", "item"),
+    )
+
+    def validate(self, attrs):
+        errors = {}
+        for relation, product_field in self.LINE_RELATIONS:
+            rows = attrs.get(relation)
+            if rows is None:
+                continue
+
+            if self.instance is None:
+                # Nothing to update yet; ids copied from another invoice are ignored
+                for row in rows:
+                    row.pop("id", None)
+            else:
+                ids = [row["id"] for row in rows if row.get("id") is not None]
+                # .all() so the viewset's prefetched lines are reused
+                known = {line.pk for line in getattr(self.instance, relation).all()}
+                unknown = sorted(set(ids) - known)
+                if unknown:
+                    errors[relation] = f"Lines not in this invoice: {unknown}"
+                    continue
+                if len(ids) != len(set(ids)):
+                    errors[relation] = "Each line may only be submitted once"
+                    continue
+
+            # A PATCH makes every field optional, new lines still need these
+            missing = {
+                name
+                for row in rows if row.get("id") is None
+                for name in (product_field, "quantity", "rate")
+                if name not in row
+            }
+            if missing:
+                errors[relation] = f"New lines require: {', '.join(sorted(missing))}"
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
     # =====================================================
     # 🔥 CALCULATION ENGINE
     # =====================================================
-    def calculate_totals(self, invoice, high_items, low_items):
-    
-        taxable_value = Decimal("0")
-        gst_total = Decimal("0")
-        
-    
-        invoice.high_side_items.all().delete()
-        invoice.low_side_items.all().delete()
-        
-    
-        # ================= HIGH SIDE =================
-        for item in high_items:
-    
-            qty = Decimal(str(item.get("quantity", 0)))
-            rate = Decimal(str(item.get("rate", 0)))
-            gst_percent = Decimal(str(item.get("gst_percent", 0)))
-    
-            base = qty * rate
-            gst_amount = (base * gst_percent) / Decimal("100")
-    
-            taxable_value += base
-            gst_total += gst_amount
-    
-            HighSideInvoiceItem.objects.create(
-                invoice=invoice,
-                product_variant=item.get("product_variant"),
-                description=item.get("description"),
-                hsn_sac=item.get("hsn_sac"),
-                gst_percent=gst_percent,
-                quantity=qty,
-                unit=item.get("unit"),
-                rate=rate
-            )
-    
-            
-    
-        # ================= LOW SIDE =================
-        for item in low_items:
-    
-            qty = Decimal(str(item.get("quantity", 0)))
-            rate = Decimal(str(item.get("rate", 0)))
-            gst_percent = Decimal(str(item.get("gst_percent", 0)))
-    
-            base = qty * rate
-            gst_amount = (base * gst_percent) / Decimal("100")
-    
-            taxable_value += base
-            gst_total += gst_amount
-    
-            LowSideInvoiceItem.objects.create(
-                invoice=invoice,
-                item=item.get("item"),
-                description=item.get("description"),
-                gst_percent=gst_percent,
-                quantity=qty,
-                unit=item.get("unit"),
-                rate=rate
-            )
-    
-            
-         
-    
-            # ================= FINAL TOTAL =================
-        invoice.taxable_value = taxable_value
-        
-        # ================= NO GST =================
-        if invoice.gst_type == "NO_GST":
-        
-            invoice.cgst_amount = Decimal("0")
-            invoice.sgst_amount = Decimal("0")
-            invoice.igst_amount = Decimal("0")
-            invoice.total_tax = Decimal("0")
-            invoice.gst_percentage = Decimal("0")
-            invoice.grand_total = taxable_value
-        
-        
-        # ================= CGST + SGST =================
-        elif invoice.gst_type == "CGST_SGST":
-        
-            invoice.cgst_amount = gst_total / Decimal("2")
-            invoice.sgst_amount = gst_total / Decimal("2")
-            invoice.igst_amount = Decimal("0")
-            invoice.gst_percentage = gst_total / taxable_value * Decimal("100") if taxable_value > 0 else Decimal("0")
-            invoice.total_tax = gst_total
-            invoice.grand_total = taxable_value + gst_total
-        
-        
-        # ================= IGST =================
-        elif invoice.gst_type == "IGST":
-        
-            invoice.igst_amount = gst_total
-            invoice.cgst_amount = Decimal("0")
-            invoice.sgst_amount = Decimal("0")
-            invoice.gst_percentage = gst_total / taxable_value * Decimal("100") if taxable_value > 0 else Decimal("0")
-            invoice.total_tax = gst_total
-            invoice.grand_total = taxable_value + gst_total   
+    def calculate_totals(self, invoice, high_items=None, low_items=None):
+        """
+        Reconcile the submitted lines with the stored ones and set the
+        totals from the final line set. None leaves that side's lines as
+        they are (e.g. a PATCH of header fields only).
+        """
+        lines = []
+        for model_items, relation in (
+            (high_items, invoice.high_side_items),
+            (low_items, invoice.low_side_items),
+        ):
+            if model_items is None:
+                lines.extend(relation.all())
+            else:
+                lines.extend(reconcile_invoice_lines(invoice, relation.model, model_items, relation.all()))
 
-        
-        # ================= AMOUNT IN WORDS =================
-        rupees = int(invoice.grand_total)
-        paise = int((invoice.grand_total - rupees) * 100)
-        
-        words = num2words(rupees, lang="en_IN").title()
-        
-        if paise > 0:
-            paise_words = num2words(paise, lang="en_IN").title()
-            invoice.amount_in_words = f"{words} Rupees and {paise_words} Paise Only"
-        else:
-            invoice.amount_in_words = f"{words} Rupees Only"                 
+        set_invoice_totals(invoice, invoice_line_totals(invoice.gst_type, lines))
         invoice.save()    
     # =====================================================
     # CREATE
@@ -262,24 +309,7 @@ class InvoiceSerializer(serializers.ModelSerializer):
         
         # Auto-generate invoice_no if not provided
         if not validated_data.get("invoice_no"):
-            # Get the last invoice number
-            last_invoice = Invoice.objects.order_by('-id').first()
-            if last_invoice and last_invoice.invoice_no:
-                # Try to extract number from last invoice_no
-                try:
-                    # Assuming format like INV-0001, INV-0002, etc.
-                    last_num = int(last_invoice.invoice_no.split('-')[-1])
-                    new_num = last_num + 1
-                except (ValueError, IndexError):
-                    # If parsing fails, start from 1
-                    new_num = 1
-            else:
-                new_num = 1
-            
-            # Generate new invoice number with format INV-YYYY-XXXX
-            from datetime import datetime
-            year = datetime.now().year
-            validated_data["invoice_no"] = f"INV-{year}-{new_num:04d}"
+            validated_data["invoice_no"] = next_invoice_no()
     
         invoice = Invoice.objects.create(**validated_data)
     
@@ -296,20 +326,279 @@ class InvoiceSerializer(serializers.ModelSerializer):
     @transaction.atomic
     def update(self, instance, validated_data):
     
-        high_items = validated_data.pop("high_side_items", [])
-        low_items = validated_data.pop("low_side_items", [])
-        terms = validated_data.pop("terms_conditions", [])
+        # Missing keys (PATCH) keep the stored lines / terms
+        high_items = validated_data.pop("high_side_items", None)
+        low_items = validated_data.pop("low_side_items", None)
+        terms = validated_data.pop("terms_conditions", None)
     
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
     
-        instance.save()
-    
         if terms is not None:
             instance.terms_conditions.set(terms)
     
+        # Saves the instance once, with its new totals
         self.calculate_totals(instance, high_items, low_items)
     
         return instance
 
 
+
+
+# =====================================================
+# QUOTATION -> INVOICE CONVERSION
+# =====================================================
+class QuotationInvoiceConversionSerializer(serializers.Serializer):
+    """
+    Input of the from-quotation endpoint. Only the active revision can be
+    billed. Quantities are keyed by quotation line id; lines left out are
+    billed in full, 0 skips a line.
+    """
+
+    quotation_version = serializers.PrimaryKeyRelatedField(
+        queryset=QuotationVersion.objects.select_related("quotation__customer", "quotation__site")
+    )
+    high_side_quantities = serializers.DictField(
+        child=serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0),
+        required=False
+    )
+    low_side_quantities = serializers.DictField(
+        child=serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0),
+        required=False
+    )
+
+    invoice_no = serializers.CharField(required=False, allow_blank=True)
+    invoice_date = serializers.DateField(required=False)
+    bank_name = serializers.CharField(required=False)
+    account_no = serializers.CharField(required=False)
+    ifsc_code = serializers.CharField(required=False)
+    buyer_gstin = serializers.CharField(required=False, allow_blank=True)
+    buyer_state = serializers.CharField(required=False, allow_blank=True)
+    buyer_state_code = serializers.CharField(required=False, allow_blank=True)
+    ship_to_address = serializers.CharField(required=False, allow_blank=True)
+    work_description = serializers.CharField(required=False, allow_blank=True)
+    terms_conditions = serializers.PrimaryKeyRelatedField(
+        queryset=TermsConditions.objects.all(),
+        many=True,
+        required=False
+    )
+
+    def _validate_line_ids(self, version, quantities, relation, label):
+        try:
+            line_ids = {int(line_id) for line_id in quantities}
+        except (TypeError, ValueError):
+            raise serializers.ValidationError({label: "Keys must be quotation line ids"})
+        known = set(
+            getattr(version, relation).filter(pk__in=line_ids).values_list("pk", flat=True)
+        )
+        unknown = sorted(line_ids - known)
+        if unknown:
+            raise serializers.ValidationError(
+                {label: f"Lines not in this quotation version: {unknown}"}
+            )
+        return {int(line_id): quantity for line_id, quantity in quantities.items()}
+
+    def validate_quotation_version(self, version):
+        if not version.is_active:
+            raise serializers.ValidationError("Only the active revision of a quotation can be billed")
+        return version
+
+    def validate(self, attrs):
+        version = attrs["quotation_version"]
+        for label, relation in (
+            ("high_side_quantities", "high_side_items"),
+            ("low_side_quantities", "low_side_items"),
+        ):
+            if attrs.get(label):
+                attrs[label] = self._validate_line_ids(version, attrs[label], relation, label)
+        return attrs
+
+
+# =====================================================
+# GSTR-1 EXPORT
+# =====================================================
+class GSTR1ExportSerializer(serializers.Serializer):
+    """Query parameters of the GSTR-1 export; CSV holds one table per file."""
+
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    branch = serializers.IntegerField(min_value=1, required=False)
+    table = serializers.ChoiceField(choices=GSTR1_TABLES, required=False)
+    # Not "format": DRF reserves it for renderer selection
+    output = serializers.ChoiceField(choices=("json", "csv"), default="json")
+
+    def validate(self, attrs):
+        if attrs["date_from"] > attrs["date_to"]:
+            raise serializers.ValidationError({"date_to": "date_to must be on or after date_from"})
+        if attrs["output"] == "csv" and not attrs.get("table"):
+            raise serializers.ValidationError({"table": "Choose a table for CSV output"})
+        return attrs
+
+
+class EInvoiceExportSerializer(serializers.Serializer):
+    """Query parameters of the e-invoice payload export."""
+
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    branch = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs["date_from"] > attrs["date_to"]:
+            raise serializers.ValidationError({"date_to": "date_to must be on or after date_from"})
+        return attrs
+
+
+# =====================================================
+# RECEIVABLES
+# =====================================================
+class PaymentAllocationSerializer(serializers.ModelSerializer):
+    invoice_no = serializers.CharField(source="invoice.invoice_no", read_only=True)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal("0.01"))
+
+    class Meta:
+        model = PaymentAllocation
+        fields = ("id", "invoice", "invoice_no", "amount")
+
+
+def _allocation_map(allocations):
+    """[{invoice, amount}] -> {invoice id: amount}, rejecting repeated invoices."""
+    result = {}
+    for allocation in allocations:
+        invoice_id = allocation["invoice"].pk
+        if invoice_id in result:
+            raise serializers.ValidationError({"allocations": f"Invoice {invoice_id} is listed twice"})
+        result[invoice_id] = allocation["amount"]
+    return result
+
+
+class PaymentSerializer(serializers.ModelSerializer):
+    """
+    A payment and its allocations. Without allocations the amount is kept
+    as customer credit, unless auto_allocate settles the oldest invoices.
+    """
+
+    customer_name = serializers.CharField(source="customer.name", read_only=True)
+    allocations = PaymentAllocationSerializer(many=True, required=False)
+    auto_allocate = serializers.BooleanField(write_only=True, default=False)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal("0.01"))
+
+    class Meta:
+        model = Payment
+        fields = "__all__"
+        read_only_fields = ("unallocated_amount", "created_at")
+
+    def validate(self, attrs):
+        attrs["allocations"] = _allocation_map(attrs.get("allocations", []))
+        if attrs["allocations"] and attrs["auto_allocate"]:
+            raise serializers.ValidationError({"auto_allocate": "Pass allocations or auto_allocate, not both"})
+        return attrs
+
+    def create(self, validated_data):
+        try:
+            return record_payment(**validated_data)
+        except AllocationError as e:
+            raise serializers.ValidationError({"allocations": str(e)})
+
+
+class PaymentAllocateSerializer(serializers.Serializer):
+    """Allocate a payment's remaining credit; no allocations = oldest invoices first."""
+
+    allocations = PaymentAllocationSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        attrs["allocations"] = _allocation_map(attrs.get("allocations", [])) or None
+        return attrs
+
+
+class CustomerBalanceSerializer(serializers.ModelSerializer):
+    customer_name = serializers.CharField(source="customer.name", read_only=True)
+    customer_phone = serializers.CharField(source="customer.contact_number", read_only=True)
+
+    class Meta:
+        model = CustomerBalance
+        fields = (
+            "customer",
+            "customer_name",
+            "customer_phone",
+            "invoiced",
+            "paid",
+            "outstanding",
+            "unallocated",
+            "updated_at",
+        )
+        read_only_fields = fields
+
+
+class AgeingQuerySerializer(serializers.Serializer):
+    as_of = serializers.DateField(required=False)
+    customer = serializers.IntegerField(min_value=1, required=False)
+
+
+class InvoicePDFArchiveSerializer(serializers.ModelSerializer):
+    issued_by_email = serializers.CharField(source="issued_by.email", read_only=True, default=None)
+    pdf_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InvoicePDFArchive
+        fields = (
+            "id",
+            "revision",
+            "sha256",
+            "size",
+            "engine",
+            "reason",
+            "issued_by",
+            "issued_by_email",
+            "issued_at",
+            "pdf_url",
+        )
+        read_only_fields = fields
+
+    def get_pdf_url(self, obj):
+        url = reverse("invoice_pdf_revision", args=[obj.invoice_id, obj.sha256])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
+class InvoicePDFReissueSerializer(serializers.Serializer):
+    reason = serializers.CharField()
+
+
+# =====================================================
+# TOTALS PREVIEW
+# =====================================================
+class InvoiceTotalsPreviewLineSerializer(serializers.Serializer):
+    # Only what the totals depend on; other line fields sent by the form are ignored
+    quantity = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0"))
+    rate = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0"))
+    gst_percent = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=Decimal("0"))
+
+
+class InvoiceTotalsPreviewSerializer(serializers.Serializer):
+    """Draft invoice lines to total; validated without any database lookup."""
+
+    gst_type = serializers.ChoiceField(choices=Invoice.GST_TYPE_CHOICES, default="CGST_SGST")
+    high_side_items = InvoiceTotalsPreviewLineSerializer(many=True, required=False, default=list)
+    low_side_items = InvoiceTotalsPreviewLineSerializer(many=True, required=False, default=list)
+
+
+class InvoiceLineTotalsSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=None, decimal_places=2)
+    gst_amount = serializers.DecimalField(max_digits=None, decimal_places=2)
+    total = serializers.DecimalField(max_digits=None, decimal_places=2)
+
+
+class InvoiceTotalsSerializer(serializers.Serializer):
+    """Preview result, formatted like the same fields of InvoiceSerializer."""
+
+    gst_type = serializers.CharField()
+    taxable_value = serializers.DecimalField(max_digits=None, decimal_places=2)
+    cgst_amount = serializers.DecimalField(max_digits=None, decimal_places=2)
+    sgst_amount = serializers.DecimalField(max_digits=None, decimal_places=2)
+    igst_amount = serializers.DecimalField(max_digits=None, decimal_places=2)
+    total_tax = serializers.DecimalField(max_digits=None, decimal_places=2)
+    gst_percentage = serializers.DecimalField(max_digits=None, decimal_places=2)
+    grand_total = serializers.DecimalField(max_digits=None, decimal_places=2)
+    amount_in_words = serializers.CharField()
+    high_side_items = InvoiceLineTotalsSerializer(many=True)
+    low_side_items = InvoiceLineTotalsSerializer(many=True)
@@ -0,0 +1,329 @@
+# service.py
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import NamedTuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from documents.amount_words import amount_in_words
+
+from .models import CompanyProfile, HighSideInvoiceItem, Invoice, LowSideInvoiceItem
+
+
+def next_invoice_no():
+    """INV-YYYY-XXXX, continuing from the last invoice number."""
+    last_invoice = Invoice.objects.order_by('-id').first()
+    if last_invoice and last_invoice.invoice_no:
+        # Try to extract number from last invoice_no
+        try:
+            # Assuming format like INV-0001, INV-0002, etc.
+            new_num = int(last_invoice.invoice_no.split('-')[-1]) + 1
+        except (ValueError, IndexError):
+            # If parsing fails, start from 1
+            new_num = 1
+    else:
+        new_num = 1
+
+    year = datetime.now().year
+    return f"INV-{year}-{new_num:04d}"
+
+
+# Invoice money columns are DECIMAL(..., 2); MySQL rounds half up on insert
+TWO_PLACES = Decimal("0.01")
+
+
+def _paise(value):
+    return Decimal(value).quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+
+class LineTotals(NamedTuple):
+    amount: Decimal
+    gst_amount: Decimal
+
+
+class InvoiceTotals(NamedTuple):
+    taxable_value: Decimal
+    cgst_amount: Decimal
+    sgst_amount: Decimal
+    igst_amount: Decimal
+    total_tax: Decimal
+    gst_percentage: Decimal
+    grand_total: Decimal
+    amount_in_words: str
+    lines: tuple = ()
+
+
+# InvoiceTotals fields that are Invoice columns
+INVOICE_TOTAL_FIELDS = InvoiceTotals._fields[:-1]
+
+
+def invoice_totals(gst_type, taxable_value, gst_total):
+    """
+    Tax split, grand total and amount in words from the unrounded sums of
+    the lines. Every figure is computed from those sums and rounded to
+    paise the way its column stores it, so the result is what a saved
+    invoice reads back; the words are those of the rounded grand total.
+    """
+    zero = Decimal("0")
+    cgst = sgst = igst = zero
+    if gst_type == "NO_GST":
+        gst_total = zero
+    elif gst_type == "CGST_SGST":
+        cgst = sgst = gst_total / Decimal("2")
+    elif gst_type == "IGST":
+        igst = gst_total
+
+    gst_percentage = gst_total / taxable_value * Decimal("100") if taxable_value > 0 else zero
+    grand_total = _paise(taxable_value + gst_total)
+    return InvoiceTotals(
+        taxable_value=_paise(taxable_value),
+        cgst_amount=_paise(cgst),
+        sgst_amount=_paise(sgst),
+        igst_amount=_paise(igst),
+        total_tax=_paise(gst_total),
+        gst_percentage=_paise(gst_percentage),
+        grand_total=grand_total,
+        amount_in_words=amount_in_words(grand_total),
+    )
+
+
+def compute_invoice_totals(gst_type, lines):
+    """
+    The invoice calculation engine: InvoiceTotals of (quantity, rate,
+    gst_percent) Decimal tuples, with a LineTotals per line in `lines`.
+    Pure - it reads no model and touches no database, so the save path and
+    the totals preview share it.
+    """
+    no_gst = gst_type == "NO_GST"
+    taxable_value = Decimal("0")
+    gst_total = Decimal("0")
+    line_totals = []
+    for quantity, rate, gst_percent in lines:
+        base = quantity * rate
+        gst = Decimal("0") if no_gst else (base * gst_percent) / Decimal("100")
+        taxable_value += base
+        gst_total += gst
+        line_totals.append(LineTotals(_paise(base), _paise(gst)))
+    return invoice_totals(gst_type, taxable_value, gst_total)._replace(lines=tuple(line_totals))
+
+
+def set_invoice_totals(invoice, totals):
+    """Copy InvoiceTotals onto the invoice (does not save)."""
+    for field in INVOICE_TOTAL_FIELDS:
+        setattr(invoice, field, getattr(totals, field))
+
+
+def apply_invoice_totals(invoice, taxable_value, gst_total):
+    """Set the tax split, grand total and amount in words (does not save)."""
+    set_invoice_totals(invoice, invoice_totals(invoice.gst_type, taxable_value, gst_total))
+
+
+# Editable columns of each invoice line model, as accepted by the serializer
+INVOICE_LINE_FIELDS = {
+    HighSideInvoiceItem: ("product_variant", "description", "hsn_sac", "gst_percent", "quantity", "unit", "rate"),
+    LowSideInvoiceItem: ("item", "description", "hsn_sac", "gst_percent", "quantity", "unit", "rate"),
+}
+
+
+def invoice_line_totals(gst_type, lines):
+    """compute_invoice_totals() of invoice line instances."""
+    return compute_invoice_totals(gst_type, [(line.quantity, line.rate, line.gst_percent) for line in lines])
+
+
+def _field_value(line, field):
+    if field.is_relation:
+        return getattr(line, field.attname)
+    return getattr(line, field.name)
+
+
+def reconcile_invoice_lines(invoice, model, rows, existing=None):
+    """
+    Make the `model` lines of `invoice` match `rows` (validated serializer
+    data) and return the resulting lines.
+
+    Rows with the `id` of an existing line update it, rows without one are
+    added and existing lines not in `rows` are removed: at most one
+    bulk_update (changed lines only), one bulk_create and one DELETE.
+    `existing` may be passed when the lines are already loaded.
+    """
+    fields = [model._meta.get_field(name) for name in INVOICE_LINE_FIELDS[model]]
+    if existing is None:
+        existing = model.objects.filter(invoice=invoice).order_by("pk")
+    current = {line.pk: line for line in existing}
+
+    kept = []
+    changed = []
+    added = []
+    for row in rows:
+        line = current.pop(row["id"], None) if row.get("id") is not None else None
+        if line is None:
+            line = model(invoice=invoice, gst_percent=Decimal("0"))
+            added.append(line)
+        else:
+            kept.append(line)
+
+        dirty = False
+        for field in fields:
+            if field.name not in row:
+                continue
+            value = row[field.name]
+            new_value = value.pk if field.is_relation and value is not None else value
+            if _field_value(line, field) != new_value:
+                setattr(line, field.name, value)
+                dirty = True
+        if dirty and line.pk is not None:
+            changed.append(line)
+
+    # bulk_create / bulk_update skip save(), so amount is set here
+    for line in (*changed, *added):
+        line.amount = line.quantity * line.rate
+
+    if current:
+        model.objects.filter(pk__in=list(current)).delete()
+    if changed:
+        model.objects.bulk_update(changed, [*INVOICE_LINE_FIELDS[model], "amount"])
+    if added:
+        model.objects.bulk_create(added)
+
+    return [*kept, *added]
+
+
+def _buyer_address(customer):
+    parts = [customer.address, customer.city, customer.state, customer.pin_code]
+    return ", ".join(part.strip() for part in parts if part and part.strip())
+
+
+def _ship_to_address(quotation):
+    customer = quotation.customer
+    if customer.site_address and not customer.both_address_is_same:
+        parts = [customer.site_address, customer.site_city, customer.site_state, customer.site_pin_code]
+        return ", ".join(part.strip() for part in parts if part and part.strip())
+    if quotation.site_id and quotation.site.address:
+        return quotation.site.address
+    return None
+
+
+def _invoice_line(model, line, quantity, is_no_gst, **fields):
+    rate = line.unit_price
+    return model(
+        description=line.description,
+        hsn_sac=line.hsn_sac,
+        gst_percent=Decimal("0") if is_no_gst else line.gst_percent,
+        quantity=quantity,
+        unit=line.unit,
+        rate=rate,
+        # bulk_create skips save(), so amount is set here
+        amount=quantity * rate,
+        **fields,
+    )
+
+
+@transaction.atomic
+def convert_quotation_version(version, high_side_quantities=None, low_side_quantities=None,
+                              terms_conditions=None, **invoice_fields):
+    """
+    Bill a quotation revision: one Invoice with its high / low side lines
+    copied over (two bulk inserts) and the totals computed once, before
+    anything is written.
+
+    `*_quantities` map quotation line id -> quantity to bill; a quantity of
+    0 leaves the line out. Lines not in the map are billed in full.
+    `invoice_fields` override the header values taken from the quotation,
+    its customer and the company profile.
+
+    Returns (invoice, summary). Service lines have no invoice counterpart
+    and mathadi / transportation charges no invoice column; both are
+    reported in the summary instead of being billed silently.
+    """
+    from quotation.versioning import HIGH_SIDE, LOW_SIDE, ordered_lines
+
+    high_side_quantities = high_side_quantities or {}
+    low_side_quantities = low_side_quantities or {}
+    quotation = version.quotation
+    customer = quotation.customer
+    is_no_gst = version.gst_type == "NO_GST"
+
+    header = {
+        "invoice_date": timezone.localdate(),
+        "buyer_name": customer.name,
+        "buyer_address": _buyer_address(customer),
+        "buyer_gstin": customer.gst,
+        "buyer_state": customer.state or None,
+        "ship_to_address": _ship_to_address(quotation),
+        "branch_id": quotation.branch_id,
+        "site_id": quotation.site_id,
+        "gst_type": version.gst_type,
+        "work_description": quotation.subject,
+    }
+    company = CompanyProfile.objects.first()
+    if company:
+        header.update(
+            bank_name=company.bank_name,
+            account_no=company.account_no,
+            ifsc_code=company.ifsc_code,
+            declaration=company.declaration,
+        )
+    header.update({key: value for key, value in invoice_fields.items() if value is not None})
+    if not header.get("invoice_no"):
+        header["invoice_no"] = next_invoice_no()
+
+    invoice = Invoice(customer=customer, quotation=quotation, **header)
+
+    taxable_value = Decimal("0")
+    gst_total = Decimal("0")
+    unbilled_charges = Decimal("0")
+
+    def billed_quantity(line, overrides):
+        quantity = overrides.get(line.pk, overrides.get(str(line.pk), line.quantity))
+        return Decimal(str(quantity))
+
+    high_rows = []
+    for line in ordered_lines(HIGH_SIDE, version.high_side_items.all()):
+        quantity = billed_quantity(line, high_side_quantities)
+        if quantity <= 0:
+            continue
+        row = _invoice_line(
+            HighSideInvoiceItem, line, quantity, is_no_gst,
+            product_variant_id=line.product_variant_id,
+        )
+        high_rows.append(row)
+        unbilled_charges += line.mathadi_charges + line.transportation_charges
+
+    low_rows = []
+    for line in ordered_lines(LOW_SIDE, version.low_side_items.all()):
+        quantity = billed_quantity(line, low_side_quantities)
+        if quantity <= 0:
+            continue
+        row = _invoice_line(
+            LowSideInvoiceItem, line, quantity, is_no_gst,
+            item_id=line.item_id,
+        )
+        low_rows.append(row)
+        unbilled_charges += line.mathadi_charges
+
+    for row in (*high_rows, *low_rows):
+        taxable_value += row.amount
+        gst_total += (row.amount * row.gst_percent) / Decimal("100")
+
+    # Totals are known before anything is written: one INSERT for the
+    # invoice, one per line table
+    apply_invoice_totals(invoice, taxable_value, gst_total)
+    invoice.save()
+    if terms_conditions:
+        invoice.terms_conditions.set(terms_conditions)
+
+    for row in (*high_rows, *low_rows):
+        row.invoice = invoice
+    HighSideInvoiceItem.objects.bulk_create(high_rows)
+    LowSideInvoiceItem.objects.bulk_create(low_rows)
+
+    summary = {
+        "quotation_id": quotation.id,
+        "quotation_version_id": version.id,
+        "high_side_lines": len(high_rows),
+        "low_side_lines": len(low_rows),
+        "skipped_service_lines": version.service_items.count(),
+        "unbilled_charges": unbilled_charges,
+    }
+    return invoice, summary
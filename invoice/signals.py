@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from lead_management.models import Customer
+
+from .archive import schedule_first_issue
+from .models import Invoice
+from .receivables import remove_invoice_receivable, sync_invoice_receivable
+from .search import schedule_customer_search_refresh, schedule_search_refresh
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, created=False, raw=False, **kwargs):
+    # Fixture loading: receivables are rebuilt with rebuild_receivables
+    if raw:
+        return
+    sync_invoice_receivable(instance)
+    schedule_search_refresh(instance)
+    if created:
+        schedule_first_issue(instance)
+
+
+@receiver(pre_delete, sender=Invoice)
+def invoice_deleted(sender, instance, **kwargs):
+    remove_invoice_receivable(instance)
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created=False, raw=False, **kwargs):
+    # A new customer has no invoices to re-index
+    if raw or created:
+        return
+    schedule_customer_search_refresh(instance.pk)
@@ -1,3 +1,779 @@
-from django.test import TestCase
+import io
+import random
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from num2words import num2words
+from pypdf import PdfReader
+from rest_framework.test import APIClient
+
+from api.models import BranchManagement, CustomUser
+from documents.amount_words import amount_in_words, number_in_words
+from documents.batch_export import iter_export_pdfs, stream_zip
+from documents.pdf_archive import PDFArchive, pdf_sha256
+from documents.pdf_cache import pdf_cache_key
+from documents.registry import build_document
+from inventory.models import TermsConditions, TermsConditionType
+from lead_management.models import Customer
+from product_management.models import (
+    ProductModel,
+    ProductVariant,
+    acSubTypes,
+    acType,
+    brand,
+    item,
+    item_type,
+    material_type,
+)
+
+from .einvoice import iter_einvoices
+from .gst_returns import build_gstr1
+from .models import (
+    CompanyProfile,
+    CustomerBalance,
+    HighSideInvoiceItem,
+    Invoice,
+    InvoiceReceivable,
+    LowSideInvoiceItem,
+)
+from .receivables import ageing, rebuild_receivables
+from .search import boolean_query
+from .serializers import InvoiceSerializer
+from .service import apply_invoice_totals, compute_invoice_totals, reconcile_invoice_lines
+from .utils.pdf_generator import (
+    PDF_ENGINE_REPORTLAB,
+    PDF_ENGINE_WEASYPRINT,
+    PDF_ENGINES,
+    generate_invoice_pdf,
+    invoice_pdf_engine,
+    render_invoice_html,
+)
+
+
+class InvoiceAPITestCase(TestCase):
+    """Customer, products, items and terms to build invoices from."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email="invoice-tests@example.com", password="x")
+        cls.customer = Customer.objects.create(name="Customer", contact_number="9000000043")
+
+        ac_sub_type = acSubTypes.objects.create(
+            ac_type_id=acType.objects.create(name="VRF System"), name="Cassette"
+        )
+        product_model = ProductModel.objects.create(
+            name="Model", ac_sub_type_id=ac_sub_type, brand_id=brand.objects.create(name="Brand"), model_no="M1"
+        )
+        cls.variants = [
+            ProductVariant.objects.create(product_model=product_model, capacity=f"{i}T", sku=f"INV-TEST-{i}")
+            for i in range(5)
+        ]
+        copper = material_type.objects.create(name="Copper")
+        pipe = item_type.objects.create(name="Pipe")
+        cls.items = [
+            item.objects.create(item_code=f"INV-TEST-{i}", material_type_id=copper, item_type_id=pipe)
+            for i in range(5)
+        ]
+        cls.terms = [
+            TermsConditions.objects.create(
+                terms_condition_type=TermsConditionType.objects.create(name=f"Type {i}"), terms=f"Term {i}"
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _invoice(self, number, lines=1, terms=1):
+        invoice = Invoice.objects.create(
+            invoice_no=f"INV-TEST-{number}",
+            customer=self.customer,
+            invoice_date=date(2026, 4, 1),
+            buyer_name="Buyer",
+            buyer_address="Address",
+            bank_name="Bank",
+            account_no="1",
+            ifsc_code="IFSC",
+        )
+        invoice.terms_conditions.set(self.terms[:terms])
+        for index in range(lines):
+            HighSideInvoiceItem.objects.create(
+                invoice=invoice, product_variant=self.variants[index],
+                gst_percent=Decimal("18"), quantity=Decimal("1"), rate=Decimal("100"),
+            )
+            LowSideInvoiceItem.objects.create(
+                invoice=invoice, item=self.items[index],
+                gst_percent=Decimal("18"), quantity=Decimal("1"), rate=Decimal("10"),
+            )
+        return invoice
+
+    def _query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+class InvoiceQueryCountTests(InvoiceAPITestCase):
+    """The invoice list and detail endpoints run a fixed number of queries."""
+
+    def test_list_is_two_queries_whatever_the_page_holds(self):
+        self._invoice(1)
+        single, _ = self._query_count("/invoice/invoice/")
+        for number in range(2, 10):
+            self._invoice(number, lines=5, terms=5)
+
+        # COUNT(*) for the paginator and the page itself
+        with self.assertNumQueries(2):
+            response = self.client.get("/invoice/invoice/")
+        self.assertEqual(single, 2)
+
+        row = response.data["results"][0]
+        self.assertEqual(row["invoice_no"], "INV-TEST-9")
+        self.assertEqual(row["customer_phone"], "9000000043")
+        self.assertNotIn("high_side_items", row)
+        self.assertNotIn("terms_conditions_details", row)
+
+    def test_detail_does_not_grow_with_lines_or_terms(self):
+        small = self._invoice(1, lines=1, terms=1)
+        large = self._invoice(2, lines=5, terms=5)
+
+        small_count, _ = self._query_count(f"/invoice/invoice/{small.pk}/")
+        large_count, response = self._query_count(f"/invoice/invoice/{large.pk}/")
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.data["high_side_items"]), 5)
+        self.assertEqual(
+            [term["terms_condition_type_name"] for term in response.data["terms_conditions_details"]],
+            [f"Type {i}" for i in range(5)],
+        )
+
+
+class InvoiceLineReconcileTests(InvoiceAPITestCase):
+    """Invoice updates address lines by id instead of replacing them all."""
+
+    def _patch(self, invoice, data):
+        return self.client.patch(f"/invoice/invoice/{invoice.pk}/", data, format="json")
+
+    def _ids(self, invoice, relation="high_side_items"):
+        return list(getattr(invoice, relation).order_by("pk").values_list("pk", flat=True))
+
+    def test_lines_are_kept_added_and_deleted_by_id(self):
+        invoice = self._invoice(60, lines=2)
+        kept, dropped = self._ids(invoice)
+        low_side = self._ids(invoice, "low_side_items")
+
+        response = self._patch(invoice, {"high_side_items": [
+            {"id": kept, "quantity": "2"},
+            {"product_variant": self.variants[3].pk, "quantity": "1", "rate": "50"},
+        ]})
+        self.assertEqual(response.status_code, 200, response.data)
+
+        high_side = self._ids(invoice)
+        self.assertEqual(high_side[0], kept)
+        self.assertNotIn(dropped, high_side)
+        self.assertEqual(len(high_side), 2)
+        line = HighSideInvoiceItem.objects.get(pk=kept)
+        self.assertEqual((line.quantity, line.amount), (Decimal("2"), Decimal("200")))
+        # Lines of the side not submitted are left alone
+        self.assertEqual(self._ids(invoice, "low_side_items"), low_side)
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.taxable_value, Decimal("270.00"))
+
+    def test_patch_without_lines_keeps_them(self):
+        invoice = self._invoice(61, lines=2)
+        InvoiceSerializer().calculate_totals(invoice)
+        high_side, low_side = self._ids(invoice), self._ids(invoice, "low_side_items")
+
+        response = self._patch(invoice, {"buyer_name": "Renamed"})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((self._ids(invoice), self._ids(invoice, "low_side_items")), (high_side, low_side))
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.buyer_name, invoice.taxable_value), ("Renamed", Decimal("220.00")))
+
+    def test_foreign_and_repeated_ids_are_rejected(self):
+        invoice = self._invoice(62)
+        other = self._invoice(63)
+        line = self._ids(invoice)[0]
+
+        response = self._patch(invoice, {"high_side_items": [{"id": self._ids(other)[0], "quantity": "2"}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Lines not in this invoice", str(response.data["high_side_items"]))
+
+        response = self._patch(invoice, {"high_side_items": [{"id": line}, {"id": line, "quantity": "2"}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("only be submitted once", str(response.data["high_side_items"]))
+        self.assertEqual(HighSideInvoiceItem.objects.get(pk=line).quantity, Decimal("1"))
+
+    def test_at_most_three_statements(self):
+        invoice = self._invoice(64, lines=3)
+        lines = list(invoice.high_side_items.order_by("pk"))
+        rows = [
+            {"id": lines[0].pk, "quantity": Decimal("1")},  # unchanged
+            {"id": lines[1].pk, "rate": Decimal("150")},
+            {"product_variant": self.variants[4], "quantity": Decimal("1"), "rate": Decimal("10")},
+        ]
+        with self.assertNumQueries(3):
+            result = reconcile_invoice_lines(invoice, HighSideInvoiceItem, rows, lines)
+        self.assertEqual([line.pk for line in result[:2]], [lines[0].pk, lines[1].pk])
+        self.assertEqual(self._ids(invoice), [line.pk for line in result])
+
+        with self.assertNumQueries(0):
+            reconcile_invoice_lines(invoice, HighSideInvoiceItem, [{"id": line.pk} for line in result], result)
+
+
+class InvoiceSearchTests(InvoiceAPITestCase):
+    """?search= matches the invoice search document, refreshed on commit."""
+
+    def _search(self, term):
+        response = self.client.get("/invoice/invoice/", {"search": term})
+        self.assertEqual(response.status_code, 200)
+        return [row["invoice_no"] for row in response.data["results"]]
+
+    def test_search_by_gstin_phone_and_line_item(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice = self._invoice(7, lines=2)
+            invoice.buyer_gstin = "27ABCDE1234F1Z5"
+            invoice.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._invoice(8, lines=1)
+
+        self.assertEqual(self._search("27ABCDE1234F1Z5"), ["INV-TEST-7"])
+        self.assertEqual(self._search("9000000043"), ["INV-TEST-8", "INV-TEST-7"])
+        # Only invoice 7 has a second line (item / variant INV-TEST-1); the
+        # lines are written after the invoice row and still indexed
+        self.assertEqual(self._search("INV-TEST-1"), ["INV-TEST-7"])
+        self.assertEqual(self._search("INV-TEST-0 Buyer"), ["INV-TEST-8", "INV-TEST-7"])
+        self.assertEqual(self._search("nothing-like-this"), [])
+
+    def test_customer_phone_change_is_reindexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._invoice(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.contact_number = "9111111111"
+            self.customer.save()
+
+        self.assertEqual(self._search("9111111111"), ["INV-TEST-1"])
+        self.assertEqual(self._search("9000000043"), [])
+
+    def test_boolean_query(self):
+        self.assertEqual(
+            boolean_query(["INV-2026-0012", "27ABCDE1234F1Z5", "+cassette*", "ac"]),
+            ('+"INV 2026 0012" +27ABCDE1234F1Z5* +cassette*', ["ac"]),
+        )
+
+
+class ReceivablesLedgerTests(InvoiceAPITestCase):
+    """The incrementally kept balances always equal a rebuild from scratch."""
+
+    def _billed(self, number, total, due_date=date(2026, 4, 1), customer=None):
+        invoice = self._invoice(number)
+        invoice.grand_total = Decimal(total)
+        invoice.due_date = due_date
+        invoice.customer = customer or self.customer
+        invoice.save()
+        return invoice
+
+    def _pay(self, amount, **data):
+        response = self.client.post(
+            "/invoice/payments/",
+            {"customer": self.customer.pk, "payment_date": "2026-05-01", "amount": amount, **data},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data["id"]
+
+    def _outstanding(self, invoice):
+        return InvoiceReceivable.objects.get(invoice=invoice).outstanding
+
+    def _balance(self, customer):
+        balance = CustomerBalance.objects.get(customer=customer)
+        return balance.invoiced, balance.paid, balance.outstanding, balance.unallocated
+
+    def assert_in_sync(self):
+        self.assertEqual(rebuild_receivables(dry_run=True), (0, 0))
+
+    def test_mixed_changes_match_a_rebuild(self):
+        other = Customer.objects.create(name="Other", contact_number="9000000044")
+        first = self._billed(30, "1000.00")
+        second = self._billed(31, "500.00", due_date=date(2026, 5, 1))
+        self.assert_in_sync()
+
+        first.grand_total = Decimal("1200.00")
+        first.save()
+        self.assert_in_sync()
+
+        second.customer = other
+        second.save()
+        self.assert_in_sync()
+        self.assertEqual(self._balance(other), (Decimal("500.00"), 0, Decimal("500.00"), 0))
+
+        # Partial, then oldest first (the other customer's invoice is not a candidate)
+        partial = self._pay("300.00", allocations=[{"invoice": first.pk, "amount": "300.00"}])
+        self.assert_in_sync()
+        self._pay("1000.00", auto_allocate=True)
+        self.assert_in_sync()
+        self.assertEqual(self._outstanding(first), 0)
+        self.assertEqual(self._outstanding(second), Decimal("500.00"))
+        self.assertEqual(
+            self._balance(self.customer), (Decimal("1200.00"), Decimal("1200.00"), 0, Decimal("100.00"))
+        )
+
+        response = self.client.post(
+            "/invoice/payments/",
+            {"customer": self.customer.pk, "payment_date": "2026-05-01", "amount": "10.00",
+             "allocations": [{"invoice": second.pk, "amount": "10.00"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assert_in_sync()
+
+        self.assertEqual(self.client.delete(f"/invoice/payments/{partial}/").status_code, 204)
+        self.assert_in_sync()
+        self.assertEqual(self._outstanding(first), Decimal("300.00"))
+
+        # A paid invoice can't be deleted; an unpaid one can
+        self.assertEqual(self.client.delete(f"/invoice/invoice/{first.pk}/").status_code, 400)
+        self.assertTrue(Invoice.objects.filter(pk=first.pk).exists())
+        self.assert_in_sync()
+        self.assertEqual(self.client.delete(f"/invoice/invoice/{second.pk}/").status_code, 204)
+        self.assert_in_sync()
+        self.assertEqual(self._balance(other), (0, 0, 0, 0))
+
+        # Moving a part paid invoice carries its payments along
+        first.customer = other
+        first.save()
+        self.assert_in_sync()
+        self.assertEqual(self._balance(other), (Decimal("1200.00"), Decimal("900.00"), Decimal("300.00"), 0))
+
+    def test_ageing_bucket_boundaries(self):
+        as_of = date(2026, 6, 30)
+        for number, (days_overdue, total) in enumerate(
+            ((-5, "1"), (30, "2"), (31, "4"), (60, "8"), (61, "16"), (90, "32"), (91, "64"))
+        ):
+            self._billed(40 + number, total, due_date=as_of - timedelta(days=days_overdue))
+
+        rows, totals = ageing(as_of=as_of, customer_id=self.customer.pk)
+        expected = {"0_30": Decimal("3"), "31_60": Decimal("12"), "61_90": Decimal("48"), "90_plus": Decimal("64")}
+        self.assertEqual({key: rows[0][key] for key in expected}, expected)
+        self.assertEqual(totals["total"], Decimal("127"))
+
+        response = self.client.get("/invoice/receivables/ageing/", {"as_of": "2026-06-30"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["totals"]["31_60"], Decimal("12"))
+
+
+class InvoiceTotalsPreviewTests(InvoiceAPITestCase):
+    """The preview runs the save path's engine without touching the database."""
+
+    def test_preview_matches_saved_totals_without_queries(self):
+        invoice = self._invoice(9)
+        HighSideInvoiceItem.objects.filter(invoice=invoice).update(quantity=Decimal("3"), rate=Decimal("333.33"))
+        LowSideInvoiceItem.objects.filter(invoice=invoice).update(
+            quantity=Decimal("1.5"), rate=Decimal("10.05"), gst_percent=Decimal("28")
+        )
+        InvoiceSerializer().calculate_totals(invoice)
+        invoice.refresh_from_db()
+
+        payload = {
+            "gst_type": invoice.gst_type,
+            "high_side_items": [{"quantity": "3", "rate": "333.33", "gst_percent": "18"}],
+            "low_side_items": [{"quantity": "1.5", "rate": "10.05", "gst_percent": "28"}],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/invoice/invoice/preview-totals/", payload, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 0)
+
+        for field in ("taxable_value", "cgst_amount", "sgst_amount", "total_tax", "grand_total"):
+            self.assertEqual(Decimal(response.data[field]), getattr(invoice, field), field)
+        self.assertEqual(response.data["amount_in_words"], invoice.amount_in_words)
+        self.assertEqual(response.data["high_side_items"][0]["amount"], "999.99")
+        self.assertEqual(response.data["low_side_items"][0]["gst_amount"], "4.22")
+
+    def test_words_follow_the_rounded_grand_total(self):
+        totals = compute_invoice_totals("IGST", [(Decimal("1"), Decimal("0.05"), Decimal("10"))])
+        self.assertEqual(totals.grand_total, Decimal("0.06"))
+        self.assertEqual(totals.amount_in_words, amount_in_words(Decimal("0.06")))
+
+
+class GSTR1Tests(InvoiceAPITestCase):
+    """
+    GSTR-1 tables from grouped line sums. Every line's quantity * rate *
+    gst_percent is a multiple of 100: SQLite divides the integers it stores
+    for whole decimals with integer division, MySQL keeps the fraction, and
+    these fixtures give the same tax on both.
+    """
+
+    def _post(self, number, gst_type, lines, gstin="", state_code="27", state="Maharashtra", invoice_date="2026-04-10"):
+        high, low = [], []
+        for kind, index, quantity, rate, gst_percent, hsn_sac in lines:
+            row = {"quantity": quantity, "rate": rate, "gst_percent": gst_percent, "hsn_sac": hsn_sac, "unit": "NOS"}
+            if kind == "high":
+                high.append({"product_variant": self.variants[index].pk, **row})
+            else:
+                low.append({"item": self.items[index].pk, **row})
+        response = self.client.post("/invoice/invoice/", {
+            "invoice_no": f"INV-GSTR-{number}",
+            "customer": self.customer.pk,
+            "invoice_date": invoice_date,
+            "gst_type": gst_type,
+            "buyer_name": f"Buyer {number}",
+            "buyer_address": "Address",
+            "buyer_gstin": gstin,
+            "buyer_state_code": state_code,
+            "buyer_state": state,
+            "bank_name": "Bank",
+            "account_no": "1",
+            "ifsc_code": "IFSC",
+            "high_side_items": high,
+            "low_side_items": low,
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        return Invoice.objects.get(pk=response.data["id"])
+
+    def _rows(self, report, table, *columns):
+        return [tuple(row[name] for name in columns) for row in report["tables"][table]["rows"]]
+
+    def test_tables_and_reconciliation(self):
+        intra = self._post(1, "CGST_SGST", [
+            ("high", 0, "2", "1000", "18", "8415"),
+            ("low", 0, "4", "50", "18", "7411"),
+            ("low", 1, "1", "100", "12", "7411"),
+        ], gstin="27bbbbb1111b1z5 ")
+        inter = self._post(2, "IGST", [("high", 1, "1", "500", "28", "8415")],
+                           gstin="29CCCCC2222C1Z5", state_code="29", state="Karnataka")
+        consumer = self._post(3, "CGST_SGST", [("high", 2, "1", "1000", "18", "8415"), ("low", 0, "2", "50", "18", "7411")])
+        self._post(4, "NO_GST", [("high", 3, "1", "300", "18", "8415")])
+        self._post(5, "IGST", [("high", 0, "1", "100", "18", "8415")], gstin="29CCCCC2222C1Z5", invoice_date="2026-05-01")
+        self.assertEqual((intra.total_tax, inter.total_tax, consumer.total_tax), (Decimal("408"), Decimal("140"), Decimal("198")))
+
+        report = build_gstr1(date(2026, 4, 1), date(2026, 4, 30))
+
+        # B2B: registered buyers, one row per invoice and rate
+        self.assertEqual(
+            self._rows(report, "b2b", "gstin", "invoice_no", "place_of_supply", "rate", "taxable_value", "igst", "cgst", "sgst"),
+            [
+                ("27BBBBB1111B1Z5", "INV-GSTR-1", "27-Maharashtra", Decimal("12"), Decimal("100"), 0, Decimal("6"), Decimal("6")),
+                ("27BBBBB1111B1Z5", "INV-GSTR-1", "27-Maharashtra", Decimal("18"), Decimal("2200"), 0, Decimal("198"), Decimal("198")),
+                ("29CCCCC2222C1Z5", "INV-GSTR-2", "29-Karnataka", Decimal("28"), Decimal("500"), Decimal("140"), 0, 0),
+            ],
+        )
+        self.assertEqual(report["tables"]["b2b"]["rows"][0]["invoice_value"], intra.grand_total)
+        # B2C: NO_GST lines are reported at rate 0 whatever their gst_percent
+        self.assertEqual(
+            self._rows(report, "b2c", "place_of_supply", "supply_type", "rate", "taxable_value", "cgst", "sgst"),
+            [
+                ("27-Maharashtra", "INTRA", Decimal("0"), Decimal("300"), 0, 0),
+                ("27-Maharashtra", "INTRA", Decimal("18"), Decimal("1100"), Decimal("99"), Decimal("99")),
+            ],
+        )
+        # HSN: high and low side lines grouped together
+        self.assertEqual(
+            self._rows(report, "hsn", "hsn_sac", "rate", "total_quantity", "taxable_value", "igst", "cgst", "total_value"),
+            [
+                ("7411", Decimal("12"), Decimal("1"), Decimal("100"), 0, Decimal("6"), Decimal("112")),
+                ("7411", Decimal("18"), Decimal("6"), Decimal("300"), 0, Decimal("27"), Decimal("354")),
+                ("8415", Decimal("0"), Decimal("1"), Decimal("300"), 0, 0, Decimal("300")),
+                ("8415", Decimal("18"), Decimal("3"), Decimal("3000"), 0, Decimal("270"), Decimal("3540")),
+                ("8415", Decimal("28"), Decimal("1"), Decimal("500"), Decimal("140"), 0, Decimal("640")),
+            ],
+        )
+
+        reconciliation = report["reconciliation"]
+        self.assertEqual(
+            {table: (row["invoices"], row["invoice_total_tax"], row["difference"], row["reconciled"])
+             for table, row in reconciliation.items()},
+            {
+                "b2b": (2, Decimal("548"), 0, True),
+                "b2c": (2, Decimal("198"), 0, True),
+                "hsn": (4, Decimal("746"), 0, True),
+            },
+        )
+
+        response = self.client.get(
+            "/invoice/invoice/gstr1/",
+            {"date_from": "2026-04-01", "date_to": "2026-04-30", "table": "b2c", "output": "csv"},
+        )
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[-1], "Total (2 rows),,,1400.00,0.00,99.00,99.00")
+
+
+class EInvoiceTests(InvoiceAPITestCase):
+    """Batch e-invoice payloads, validated against the bundled schema."""
+
+    def _records(self):
+        return list(iter_einvoices(date(2026, 4, 1), date(2026, 4, 30), inline=True))
+
+    def test_b2b_invoices_give_valid_payloads(self):
+        branch = BranchManagement.objects.create(
+            name="Pune", email="einvoice-tests@example.com", primary_contact="9822012345",
+            address="12 FC Road, Pune", city="Pune", state="Maharashtra", pincode="411005",
+            state_code="27", gst_no="27AAAAA0000A1Z5",
+        )
+        CompanyProfile.objects.create(
+            name="Company", address="Pune", gstin="27AAAAA0000A1Z5", pan="AAAAA0000A",
+            bank_name="Bank", account_no="1", ifsc_code="IFSC", branch="Pune",
+        )
+        self.customer.city, self.customer.pin_code = "Mumbai", "400001"
+        self.customer.save()
+        b2b = self._invoice(10, lines=2)
+        Invoice.objects.filter(pk=b2b.pk).update(buyer_gstin="27BBBBB1111B1Z5", buyer_state_code="27", branch=branch)
+        HighSideInvoiceItem.objects.filter(invoice=b2b).update(hsn_sac="8415")
+        LowSideInvoiceItem.objects.filter(invoice=b2b).update(hsn_sac="7411")
+        self._invoice(11)  # B2C: no buyer GSTIN, not e-invoiced
+
+        with self.assertNumQueries(4):
+            records = self._records()
+        self.assertEqual([record["invoice_no"] for record in records], [b2b.invoice_no])
+        self.assertEqual(records[0]["errors"], [])
+        payload = records[0]["payload"]
+        self.assertEqual(len(payload["ItemList"]), 4)
+        self.assertEqual(payload["ValDtls"]["AssVal"], 220.0)
+        self.assertEqual(payload["ValDtls"]["TotInvVal"], 259.6)
+
+        HighSideInvoiceItem.objects.filter(invoice=b2b).update(hsn_sac=None)
+        errors = self._records()[0]["errors"]
+        self.assertEqual(errors, ["ItemList.0: 'HsnCd' is a required property", "ItemList.1: 'HsnCd' is a required property"])
+
+
+@override_settings(
+    PDF_RENDER_WORKERS=0,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class InvoicePDFArchiveTests(InvoiceAPITestCase):
+    """Invoices are issued once on creation and served from the archive afterwards."""
+
+    def setUp(self):
+        super().setUp()
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        storage = self.settings(PDF_ARCHIVE_DIR=root / "archive", PDF_CACHE_DIR=root / "cache")
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+        # What a render of the invoice's current data gives
+        self.pdf = b"%PDF-1.7 as created"
+        patcher = mock.patch(
+            "invoice.archive.render_invoice_pdf",
+            side_effect=lambda invoice, base_url=None, engine=None: (self.pdf, "weasyprint"),
+        )
+        self.render = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _issued(self, number):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self._invoice(number)
+
+    def _download(self, url, **headers):
+        response = self.client.get(url, **headers)
+        body = b"".join(response.streaming_content) if response.status_code == 200 else b""
+        return response, body
+
+    def test_first_issue_on_creation(self):
+        invoice = self._issued(20)
+
+        archive = invoice.pdf_archives.get()
+        self.assertEqual((archive.revision, archive.reason), (1, "First issue"))
+        self.assertEqual((archive.sha256, archive.size), (pdf_sha256(self.pdf), len(self.pdf)))
+        self.assertTrue(PDFArchive().exists(archive.sha256))
+
+        # Edits after the issue do not change the document that went out
+        self.pdf = b"%PDF-1.7 edited"
+        response, body = self._download(f"/invoice/{invoice.pk}/pdf/")
+        self.assertEqual(body, b"%PDF-1.7 as created")
+        self.assertEqual(response["ETag"], f'"{archive.sha256}"')
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertEqual(response["Content-Location"], f"/invoice/{invoice.pk}/pdf/{archive.sha256}/")
+        self.assertEqual(self.render.call_count, 1)
+
+        response, _ = self._download(f"/invoice/{invoice.pk}/pdf/", HTTP_IF_NONE_MATCH=f'"{archive.sha256}"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_download_before_issue_issues_through_a_job(self):
+        invoice = self._invoice(21)  # creation callbacks not run: not issued yet
+        self.assertFalse(invoice.pdf_archives.exists())
+
+        # Still rendering: the usual 202 pointing at the job
+        with mock.patch("invoice.views.first_issue_job") as first_issue_job:
+            first_issue_job.return_value.id = "pending-job"
+            first_issue_job.return_value.wait.return_value = None
+            response = self.client.get(f"/invoice/{invoice.pk}/pdf/?async=1")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["job_id"], "pending-job")
+        first_issue_job.return_value.wait.assert_called_once_with(0)
+        self.assertFalse(invoice.pdf_archives.exists())
+
+        response, body = self._download(f"/invoice/{invoice.pk}/pdf/")
+        self.assertEqual(body, self.pdf)
+        self.assertEqual(invoice.pdf_archives.get().revision, 1)
+
+    def test_reissue_adds_revisions_and_dedupes_by_hash(self):
+        invoice = self._issued(22)
+        url = f"/invoice/invoice/{invoice.pk}/reissue-pdf/"
+
+        self.assertEqual(self.client.post(url, {}, format="json").status_code, 400)
+
+        # Same content: a new revision row, the same stored file
+        response = self.client.post(url, {"reason": "Checked"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        first, same = invoice.pdf_archives.order_by("revision")
+        self.assertEqual((same.revision, same.sha256), (2, first.sha256))
+        self.assertEqual(len(list(PDFArchive().root.rglob("*.pdf"))), 1)
+
+        self.pdf = b"%PDF-1.7 corrected address"
+        self.client.post(url, {"reason": "Address corrected"}, format="json")
+        latest = invoice.pdf_archives.get(revision=3)
+        self.assertEqual(latest.sha256, pdf_sha256(self.pdf))
+        self.assertEqual(len(list(PDFArchive().root.rglob("*.pdf"))), 2)
+
+        _, body = self._download(f"/invoice/{invoice.pk}/pdf/")
+        self.assertEqual(body, self.pdf)
+
+        # A revision URL names its content, so it is served as immutable
+        response, body = self._download(f"/invoice/{invoice.pk}/pdf/{first.sha256}/")
+        self.assertEqual(body, b"%PDF-1.7 as created")
+        self.assertEqual(response["Cache-Control"], "private, max-age=31536000, immutable")
+        self.assertEqual(response["ETag"], f'"{first.sha256}"')
+
+        revisions = self.client.get(f"/invoice/invoice/{invoice.pk}/pdf-revisions/").data
+        self.assertEqual([row["revision"] for row in revisions], [3, 2, 1])
+
+    def test_export_and_pdf_jobs_serve_the_archive(self):
+        invoice = self._issued(23)
+        self.pdf = b"%PDF-1.7 edited"
+
+        self.assertEqual(build_document("invoice", invoice.pk).pdf, b"%PDF-1.7 as created")
+        exported = list(iter_export_pdfs([("invoice", invoice.pk)]))
+        self.assertEqual(exported, [(f"invoice/INV-{invoice.invoice_no}.pdf", b"%PDF-1.7 as created", None)])
+
+        job = self.client.post("/documents/pdf-jobs/", {"doc_type": "invoice", "object_id": invoice.pk}, format="json")
+        self.assertEqual(job.data["status"], "done")
+        response = self.client.get(f"/documents/pdf-jobs/{job.data['job_id']}/download/")
+        self.assertEqual(response.content, b"%PDF-1.7 as created")
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_export_lists_documents_that_fail_to_build(self):
+        broken, issued = self._issued(24), self._issued(25)
+        build = build_document
+
+        def build_or_fail(doc_type, pk, **kwargs):
+            if pk == broken.pk:
+                raise RuntimeError("Template error")
+            return build(doc_type, pk, **kwargs)
+
+        selection = [("invoice", broken.pk), ("invoice", issued.pk)]
+        with mock.patch("documents.batch_export.build_document", side_effect=build_or_fail):
+            archive = b"".join(stream_zip(iter_export_pdfs(selection)))
+
+        with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+            self.assertEqual(zf.namelist(), [f"invoice/INV-{issued.invoice_no}.pdf", "errors.txt"])
+            self.assertEqual(zf.read("errors.txt").decode(), f"invoice/{broken.pk}: Template error\n")
+
+
+class InvoicePDFEngineTests(InvoiceAPITestCase):
+    """The Reportlab engine renders invoices and is picked per endpoint or with ?engine=."""
+
+    def setUp(self):
+        super().setUp()
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        storage = self.settings(PDF_CACHE_DIR=root / "cache")
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+    def test_reportlab_renders_both_sides(self):
+        invoice = self._invoice(30, lines=2, terms=2)
+        apply_invoice_totals(invoice, Decimal("220"), Decimal("39.6"))
+        invoice.save()
+
+        pdf = generate_invoice_pdf(invoice)
+
+        self.assertTrue(pdf.startswith(b"%PDF"))
+        text = "".join(page.extract_text() for page in PdfReader(io.BytesIO(pdf)).pages)
+        for expected in ("INV-TEST-30", "VRF System 0 TR", "VRF System 1 TR", "Copper Pipe", "RS 259.60",
+                         invoice.amount_in_words):
+            self.assertIn(expected, text)
+
+    def test_engine_selection(self):
+        self.assertEqual(invoice_pdf_engine("invoice_pdf", "reportlab"), PDF_ENGINE_REPORTLAB)
+        self.assertEqual(invoice_pdf_engine("pdf_export", "weasyprint"), PDF_ENGINE_WEASYPRINT)
+        engines = {"invoice_pdf": "reportlab", "pdf_jobs": "unknown"}
+        with self.settings(INVOICE_PDF_ENGINES=engines):
+            self.assertEqual(invoice_pdf_engine("invoice_pdf"), PDF_ENGINE_REPORTLAB)
+            self.assertEqual(invoice_pdf_engine("invoice_pdf", "unknown"), PDF_ENGINE_REPORTLAB)
+            # Unknown or unset engines fall back to WeasyPrint
+            self.assertEqual(invoice_pdf_engine("pdf_jobs"), PDF_ENGINE_WEASYPRINT)
+            self.assertEqual(invoice_pdf_engine("pdf_export"), PDF_ENGINE_WEASYPRINT)
+
+    def test_preview_engines_are_cached_apart(self):
+        invoice = self._invoice(31)
+        url = f"/invoice/{invoice.pk}/pdf/?preview=1"
+        html = render_invoice_html(invoice)
+        keys = {engine: pdf_cache_key(html, "http://testserver/", engine=engine) for engine in PDF_ENGINES}
+        self.assertEqual(len(set(keys.values())), len(PDF_ENGINES))
+
+        with mock.patch("invoice.views.generate_invoice_pdf", return_value=b"%PDF-1.4 reportlab") as render:
+            response = self.client.get(f"{url}&engine=reportlab")
+            self.assertEqual(response.content, b"%PDF-1.4 reportlab")
+            self.assertEqual(response["ETag"], f'"{keys[PDF_ENGINE_REPORTLAB]}"')
+            with self.settings(INVOICE_PDF_ENGINES={"invoice_pdf": "reportlab"}):
+                response = self.client.get(url)
+            self.assertEqual(response["ETag"], f'"{keys[PDF_ENGINE_REPORTLAB]}"')
+        # The second request was served from the cache
+        self.assertEqual(render.call_count, 1)
+
+
+class AmountInWordsTests(SimpleTestCase):
+    """documents.amount_words writes amounts exactly as num2words(lang="en_IN") did."""
+
+    def _numbers(self):
+        rng = random.Random(45)
+        edges = [10 ** power + delta for power in range(10) for delta in (-1, 0, 1)]
+        sampled = [rng.randrange(10 ** rng.randint(3, 10)) for _ in range(5000)]
+        return [n for n in list(range(2000)) + edges + sampled if 0 <= n < 10 ** 10]
+
+    def test_numbers_match_num2words(self):
+        for number in self._numbers():
+            self.assertEqual(number_in_words(number), num2words(number, lang="en_IN"), number)
+
+    def test_invoice_amount_in_words_is_unchanged(self):
+        rng = random.Random(45)
+        for _ in range(2000):
+            grand_total = Decimal(rng.randrange(10 ** rng.randint(1, 12))) / 100
+            invoice = Invoice(gst_type="NO_GST")
+            apply_invoice_totals(invoice, grand_total, Decimal("0"))
+
+            rupees = int(grand_total)
+            paise = int((grand_total - rupees) * 100)
+            expected = f"{num2words(rupees, lang='en_IN').title()} Rupees"
+            if paise > 0:
+                expected += f" and {num2words(paise, lang='en_IN').title()} Paise"
+            self.assertEqual(invoice.amount_in_words, f"{expected} Only", grand_total)
+
+    def test_amounts(self):
+        self.assertEqual(amount_in_words(Decimal("0")), "Zero Rupees Only")
+        self.assertEqual(
+            amount_in_words(Decimal("105000.50")), "One Lakh, Five Thousand Rupees and Fifty Paise Only"
+        )
+        # Fractions of a paisa are dropped; floats and strings are accepted
+        self.assertEqual(amount_in_words(Decimal("1.999")), amount_in_words("1.99"))
+        self.assertEqual(amount_in_words(1050.1), "One Thousand And Fifty Rupees and Ten Paise Only")
+
+    def test_beyond_num2words_range(self):
+        self.assertEqual(number_in_words(10 ** 10), "one thousand crore")
+        self.assertEqual(number_in_words(10 ** 12 + 1), "one lakh crore and one")
+
+    def test_invalid_amounts(self):
+        for amount in (Decimal("-1"), "abc", Decimal("NaN")):
+            with self.assertRaises(ValueError):
+                amount_in_words(amount)
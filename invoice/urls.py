@@ -1,11 +1,13 @@
 # invoice/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import InvoiceViewSet, invoice_pdf
+from .views import InvoiceViewSet, PaymentViewSet, ReceivableViewSet, invoice_pdf, invoice_pdf_revision
 
 
 router = DefaultRouter()
 router.register(r'invoice', InvoiceViewSet, basename='invoice')
+router.register(r'payments', PaymentViewSet, basename='payments')
+router.register(r'receivables', ReceivableViewSet, basename='receivables')
 
 urlpatterns = [
     path('', include(router.urls)),  # This will handle all routes properly
@@ -14,5 +16,10 @@ urlpatterns = [
         "<int:pk>/pdf/",
         invoice_pdf,
         name="invoice_pdf"
-)
+),
+    path(
+        "<int:pk>/pdf/<str:sha256>/",
+        invoice_pdf_revision,
+        name="invoice_pdf_revision"
+),
 ]
\ No newline at end of file
@@ -2,29 +2,95 @@
 import io
 from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache
+from xml.sax.saxutils import escape
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm, inch
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+from reportlab.lib.utils import ImageReader
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from django.contrib.humanize.templatetags.humanize import intcomma
 from django.http import HttpResponse
 from django.conf import settings
+from django.template.defaultfilters import floatformat
+from django.template.loader import render_to_string
+from django.utils.formats import localize
+from documents.amount_words import amount_in_words
 import os
 
+PDF_ENGINE_WEASYPRINT = "weasyprint"
+PDF_ENGINE_REPORTLAB = "reportlab"
+PDF_ENGINES = (PDF_ENGINE_WEASYPRINT, PDF_ENGINE_REPORTLAB)
+
+# CSS px -> pt, the template is laid out in px
+PX = 0.75
+
+
+def invoice_pdf_engine(endpoint, requested=None):
+    """Engine for an endpoint: ?engine= if valid, else settings.INVOICE_PDF_ENGINES."""
+    if requested in PDF_ENGINES:
+        return requested
+    engines = getattr(settings, "INVOICE_PDF_ENGINES", {})
+    engine = engines.get(endpoint, PDF_ENGINE_WEASYPRINT)
+    return engine if engine in PDF_ENGINES else PDF_ENGINE_WEASYPRINT
+
+
+def _text(value, fallback=None):
+    """{{ value }} / {{ value|default:fallback }} as the template renders it, escaped for Paragraph."""
+    if fallback is not None and not value:
+        value = fallback
+    return escape(str(localize(value)))
+
+
+def _attr(obj, name):
+    """Template style lookup: a missing related object renders as ''."""
+    if obj is None:
+        return ""
+    return getattr(obj, name, "")
+
+
+def _amount(value):
+    """|floatformat:2|intcomma"""
+    return intcomma(floatformat(value, 2))
+
+
+@lru_cache(maxsize=1)
+def _logo():
+    path = os.path.join(settings.BASE_DIR, "static", "images", "ka-logo.png")
+    if not os.path.exists(path):
+        return None
+    width, height = ImageReader(path).getSize()
+    return path, width, height
+
+
 class InvoicePDFGenerator:
-    def __init__(self, invoice):
+    """
+    Reportlab rendering of templates/pdf/invoice.html.
+
+    Same sections, wording and number formatting as the WeasyPrint template
+    (values go through the same Django filters), laid out with platypus so
+    large invoices render in a fraction of the time and memory.
+    """
+
+    PAGE_MARGIN = 20 * PX
+    BORDER_PADDING = 10 * PX
+
+    def __init__(self, invoice, data=None):
         self.invoice = invoice
+        self.data = data if data is not None else invoice_pdf_data(invoice)
         self.buffer = io.BytesIO()
+        inset = self.PAGE_MARGIN + self.BORDER_PADDING
         self.doc = SimpleDocTemplate(
             self.buffer,
             pagesize=A4,
-            rightMargin=10*mm,
-            leftMargin=10*mm,
-            topMargin=10*mm,
-            bottomMargin=10*mm
+            rightMargin=inset,
+            leftMargin=inset,
+            topMargin=inset,
+            bottomMargin=inset,
+            title=f"Invoice {invoice.invoice_no}",
         )
         self.styles = getSampleStyleSheet()
         self.elements = []
@@ -33,529 +99,458 @@ class InvoicePDFGenerator:
     def setup_styles(self):
         """Setup custom styles for the PDF"""
         self.styles.add(ParagraphStyle(
-            name='CompanyName',
+            name='Body',
             parent=self.styles['Normal'],
-            fontSize=16,
-            textColor=colors.HexColor('#2C3E50'),
-            alignment=TA_CENTER,
-            spaceAfter=2,
-            fontName='Helvetica-Bold'
+            fontName='Helvetica',
+            fontSize=12 * PX,
+            leading=14 * PX,
         ))
-        
+
         self.styles.add(ParagraphStyle(
-            name='InvoiceTitle',
-            parent=self.styles['Normal'],
-            fontSize=24,
-            textColor=colors.HexColor('#E74C3C'),
-            alignment=TA_CENTER,
-            spaceAfter=10,
-            fontName='Helvetica-Bold'
+            name='BodyRight',
+            parent=self.styles['Body'],
+            alignment=TA_RIGHT,
         ))
 
         self.styles.add(ParagraphStyle(
-            name='Address',
-            parent=self.styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#7F8C8D'),
+            name='BodyCenter',
+            parent=self.styles['Body'],
             alignment=TA_CENTER,
-            leading=12
         ))
 
         self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            textColor=colors.HexColor('#2C3E50'),
+            name='InvoiceTitle',
+            parent=self.styles['Body'],
             fontName='Helvetica-Bold',
-            spaceBefore=10,
-            spaceAfter=5
+            fontSize=16 * PX,
+            leading=20 * PX,
+            alignment=TA_CENTER,
         ))
 
         self.styles.add(ParagraphStyle(
-            name='Label',
-            parent=self.styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#7F8C8D'),
-            fontName='Helvetica-Bold'
+            name='Terms',
+            parent=self.styles['Body'],
+            fontSize=10.5 * PX,
+            leading=12.6 * PX,
         ))
 
         self.styles.add(ParagraphStyle(
-            name='Value',
-            parent=self.styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#2C3E50'),
-            leading=14
+            name='HeaderCell',
+            parent=self.styles['Body'],
+            fontName='Helvetica-Bold',
+            alignment=TA_CENTER,
         ))
 
-  
-    # def add_company_header(self):
-    #     """Add company header section using branch data"""
-    
-    #     branch = self.invoice.branch
-    
-    #     company_name = branch.name if branch else ""
-    #     company_address = branch.address if branch else ""
-    #     company_gstin = branch.gst_no if branch else ""
-    #     company_pan = branch.company_pan if branch else ""
-    #     company_msme = branch.msme_number if branch else ""
-    #     company_email = branch.email if branch else ""
-    
-    #     data = [
-    #         [Paragraph(company_name.upper(), self.styles['CompanyName'])],
-    #         [Paragraph(company_address.replace('\n', '<br/>'), self.styles['Address'])],
-    #         [Paragraph(f"GSTIN: {company_gstin or 'N/A'} | PAN: {company_pan or 'N/A'}", self.styles['Address'])],
-    #         [Paragraph(f"MSME: {company_msme or 'N/A'} | Email: {company_email or 'N/A'}", self.styles['Address'])],
-    #     ]
-    
-    #     table = Table(data, colWidths=[self.doc.width])
-    #     table.setStyle(TableStyle([
-    #         ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-    #         ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    #         ('TOPPADDING', (0, 0), (-1, -1), 2),
-    #         ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-    #         ('LINEBELOW', (0, 0), (-1, 0), 1, colors.HexColor('#E74C3C')),
-    #     ]))
-    
-    #     self.elements.append(table)
-    #     self.elements.append(Spacer(1, 10))
-
+    def _p(self, text, style='Body'):
+        return Paragraph(text, self.styles[style])
 
+    def _on_page(self, canvas, doc):
+        """.page-border: 1px frame inside the @page margin on every page."""
+        width, height = doc.pagesize
+        canvas.saveState()
+        canvas.setLineWidth(PX)
+        canvas.rect(
+            self.PAGE_MARGIN,
+            self.PAGE_MARGIN,
+            width - 2 * self.PAGE_MARGIN,
+            height - 2 * self.PAGE_MARGIN,
+        )
+        canvas.restoreState()
 
     def add_company_header(self):
-        """Add company header using BranchManagement"""
-    
-        branch = self.invoice.branch
-    
-        if not branch:
-            return
-    
-        name = branch.name or ""
-        address = branch.address or ""
-        city = branch.city or ""
-        state = branch.state or ""
-        pincode = str(branch.pincode) if branch.pincode else ""
-        state_code = branch.state_code or ""
-    
-        email = branch.email or ""
-        secondary_email = branch.secondary_email or ""
-    
-        phone = branch.primary_contact or ""
-        phone2 = branch.secondary_contact or ""
-    
-        gst = branch.gst_no or ""
-        pan = branch.company_pan or ""
-        msme = branch.msme_number or ""
-    
-        full_address = f"{address}, {city}, {state} - {pincode}"
-    
-        data = [
-            [Paragraph(name.upper(), self.styles['CompanyName'])],
-    
-            [Paragraph(full_address, self.styles['Address'])],
-    
-            [Paragraph(
-                f"State Code: {state_code} | GSTIN: {gst} | PAN: {pan}",
-                self.styles['Address']
-            )],
-    
-            [Paragraph(
-                f"Phone: {phone} / {phone2}",
-                self.styles['Address']
-            )],
-    
-            [Paragraph(
-                f"Email: {email} / {secondary_email}",
-                self.styles['Address']
-            )],
-    
-            [Paragraph(
-                f"MSME: {msme if msme else 'N/A'}",
-                self.styles['Address']
-            )],
-        ]
-    
-        table = Table(data, colWidths=[self.doc.width])
-    
-        table.setStyle(TableStyle([
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('LINEBELOW', (0,0), (-1,0), 1, colors.HexColor('#E74C3C')),
-            ('TOPPADDING', (0,0), (-1,-1), 2),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 2),
-        ]))
-    
-        self.elements.append(table)
-        self.elements.append(Spacer(1, 10))
-
-    def add_invoice_title(self):
-        """Add invoice title and basic info"""
-        # Title
-        self.elements.append(Paragraph("TAX INVOICE", self.styles['InvoiceTitle']))
-        
-        # Invoice details in two columns
-        data = [
-            [
-                Paragraph(f"<b>Invoice No:</b> {self.invoice.invoice_no}", self.styles['Value']),
-                Paragraph(f"<b>Date:</b> {self.invoice.invoice_date.strftime('%d-%m-%Y')}", self.styles['Value'])
-            ],
-            [
-                Paragraph(f"<b>Supplier Ref:</b> {self.invoice.supplier_ref or 'N/A'}", self.styles['Value']),
-                Paragraph(f"<b>Buyer Order No:</b> {self.invoice.buyer_order_no or 'N/A'}", self.styles['Value'])
-            ]
-        ]
-        
-        table = Table(data, colWidths=[self.doc.width/2.0 - 10, self.doc.width/2.0 - 10])
-        table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
+        """Logo on the left, "Tax Invoice" centred below it"""
+        logo = _logo()
+        if logo:
+            path, width, height = logo
+            image = Image(path, width=110 * PX, height=110 * PX * height / width)
+            image.hAlign = 'LEFT'
+            self.elements.append(image)
+        self.elements.append(Spacer(1, 5 * PX))
+        self.elements.append(self._p("Tax Invoice", 'InvoiceTitle'))
+
+    def _terms_text(self, terms):
+        if not terms:
+            return "-"
+        return ", <br/>".join(_text(term.terms) for term in terms)
+
+    def add_info_table(self):
+        """Branch / buyer block on the left, invoice header fields on the right"""
+        invoice = self.invoice
+        branch = invoice.branch
+        customer = invoice.customer
+        site = invoice.site
+
+        left = (
+            "<br/>"
+            f"<b>{_text(_attr(branch, 'name'))}</b><br/>"
+            f"{_text(_attr(branch, 'email'), '-')} , "
+            f"{_text(_attr(branch, 'primary_contact'), '-')} <br/>"
+            f"{_text(_attr(branch, 'address'), '-')},{_text(_attr(branch, 'city'))}, "
+            f"{_text(_attr(branch, 'state'), '-')} - {_text(_attr(branch, 'state_code'), '-')} , "
+            f"{_text(_attr(branch, 'pincode'))}<br/>"
+            f"GST NO : {_text(_attr(branch, 'gst_no'), '-')} | "
+            f"PAN NO : {_text(_attr(branch, 'company_pan'), '-')} <br/>"
+            f"MSME UAN : {_text(_attr(branch, 'msme_number'), '-')} <br/>"
+        )
+        buyer = (
+            "<b>Buyer,</b> <br/><br/>"
+            f"<b>{_text(_attr(customer, 'name'))}</b> <br/>"
+            f"{_text(_attr(customer, 'email'), '-')} , "
+            f"{_text(_attr(customer, 'contact_number'), '-')} | "
+            f"{_text(_attr(customer, 'land_line_no'), '-')} <br/>"
+            f"{_text(_attr(customer, 'address'))}, {_text(_attr(customer, 'city'))}, "
+            f"{_text(invoice.buyer_state, '-')} - {_text(invoice.buyer_state_code, '-')}, "
+            f"{_text(_attr(customer, 'pin_code'))}<br/>"
+            f"GST NO : {_text(invoice.buyer_gstin, '-')} <br/><br/>"
+            f"<b>Site :</b> {_text(_attr(site, 'site_shortcut'), '-')} <br/>"
+        )
+
+        left_cell = Table(
+            [[self._p(left)], [self._p(buyer)]],
+            colWidths=[None],
+        )
+        left_cell.setStyle(TableStyle([
+            ('LINEBELOW', (0, 0), (0, 0), 0.5, colors.grey),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('TOPPADDING', (0, 1), (0, 1), 12 * PX),
         ]))
-        
-        self.elements.append(table)
-        self.elements.append(Spacer(1, 10))
 
-    def add_buyer_details(self):
-        """Add buyer and shipping details"""
-        self.elements.append(Paragraph("Buyer Details", self.styles['SectionHeader']))
-        
-        data = [
-            [
-                Paragraph("<b>Buyer:</b>", self.styles['Label']),
-                Paragraph(self.invoice.buyer_name, self.styles['Value'])
-            ],
-            [
-                Paragraph("<b>Address:</b>", self.styles['Label']),
-                Paragraph(self.invoice.buyer_address.replace('\n', '<br/>'), self.styles['Value'])
-            ],
-            [
-                Paragraph("<b>GSTIN:</b>", self.styles['Label']),
-                Paragraph(self.invoice.buyer_gstin or 'N/A', self.styles['Value'])
-            ],
-            [
-                Paragraph("<b>State:</b>", self.styles['Label']),
-                Paragraph(f"{self.invoice.buyer_state or 'N/A'} (Code: {self.invoice.buyer_state_code or 'N/A'})", self.styles['Value'])
-            ]
+        def field(label, value):
+            return self._p(f"<b>{label}</b><br/>{value}")
+
+        right_rows = [
+            [field("Invoice No ", _text(invoice.invoice_no)),
+             field("Invoice Date ", _text(invoice.invoice_date))],
+            [field("Delivery Note", _text(invoice.delivery_note, '-')),
+             Paragraph(
+                 f"<b>Mode/Terms of Payment</b><br/>{self._terms_text(self.data['invoice_payment_terms'])}",
+                 self.styles['Terms'],
+             )],
+            [field("Supplier's Ref.", _text(invoice.supplier_ref, '-')),
+             field("Other Reference(s)", _text(invoice.other_references, '-'))],
+            [field("Buyer's Order No.", _text(invoice.buyer_order_no, '-')),
+             field("Dated", _text(invoice.buyer_dated, '-'))],
+            [field("Despatch Document No.", _text(invoice.dispatch_doc_no, '-')),
+             field("Delivery Note Date", _text(invoice.delivery_note_date, '-'))],
+            [field("Despatched through", _text(invoice.dispatched_through, '-')),
+             field("Destination", _text(invoice.destination, '-'))],
+            [Paragraph(
+                f"<b>Terms of Delivery</b> <br/>{self._terms_text(self.data['invoice_delivery_terms'])}",
+                self.styles['Terms'],
+            ), ''],
         ]
-        
-        if self.invoice.ship_to_address:
-            data.append([
-                Paragraph("<b>Ship To:</b>", self.styles['Label']),
-                Paragraph(self.invoice.ship_to_address.replace('\n', '<br/>'), self.styles['Value'])
-            ])
-        
-        table = Table(data, colWidths=[60, self.doc.width - 80])
-        table.setStyle(TableStyle([
+
+        left_width = self.doc.width * 0.30
+        right_width = self.doc.width - left_width
+
+        right_cell = Table(right_rows, colWidths=[right_width / 2, right_width / 2])
+        right_cell.setStyle(TableStyle([
             ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#F8F9F9')),
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#BDC3C7')),
+            ('LINEBELOW', (0, 0), (-1, 1), PX, colors.HexColor('#2c2c2c')),
+            ('SPAN', (0, -1), (1, -1)),
+            ('TOPPADDING', (0, 0), (-1, -1), 5 * PX),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5 * PX),
         ]))
-        
-        self.elements.append(table)
-        self.elements.append(Spacer(1, 10))
-
-
-
-    def add_terms_conditions(self):
-        """Add Payment and Delivery Terms separately"""
-    
-        payment_terms = []
-        delivery_terms = []
-    
-        for term in self.invoice.terms_conditions.all():
-    
-            type_name = term.terms_condition_type.name.lower()
-    
-            if "payment" in type_name:
-                payment_terms.append(term.terms)
-    
-            elif "delivery" in type_name:
-                delivery_terms.append(term.terms)
-    
-        if not payment_terms and not delivery_terms:
-            return
-    
-        self.elements.append(
-            Paragraph("Terms & Conditions", self.styles['SectionHeader'])
-        )
-    
-        data = []
-    
-        if payment_terms:
-    
-            payment_text = "<br/>".join(
-                [f"{i+1}. {t}" for i,t in enumerate(payment_terms)]
-            )
-    
-            data.append([
-                Paragraph("<b>Payment Terms</b>", self.styles['Label']),
-                Paragraph(payment_text, self.styles['Value'])
-            ])
-    
-        if delivery_terms:
-    
-            delivery_text = "<br/>".join(
-                [f"{i+1}. {t}" for i,t in enumerate(delivery_terms)]
-            )
-    
-            data.append([
-                Paragraph("<b>Delivery Terms</b>", self.styles['Label']),
-                Paragraph(delivery_text, self.styles['Value'])
-            ])
-    
-        table = Table(data, colWidths=[120, self.doc.width - 140])
-    
+
+        table = Table([[left_cell, right_cell]], colWidths=[left_width, right_width])
         table.setStyle(TableStyle([
-            ('VALIGN',(0,0),(-1,-1),'TOP'),
-            ('BACKGROUND',(0,0),(-1,-1),colors.HexColor('#F8F9F9')),
-            ('BOX',(0,0),(-1,-1),0.5,colors.HexColor('#BDC3C7')),
+            ('GRID', (0, 0), (-1, -1), PX, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (0, 0), 4 * PX),
+            ('RIGHTPADDING', (0, 0), (0, 0), 4 * PX),
+            ('LEFTPADDING', (1, 0), (1, 0), 0),
+            ('RIGHTPADDING', (1, 0), (1, 0), 0),
+            ('TOPPADDING', (1, 0), (1, 0), 0),
+            ('BOTTOMPADDING', (1, 0), (1, 0), 0),
         ]))
-    
+
+        self.elements.append(Spacer(1, 20 * PX))
         self.elements.append(table)
-        self.elements.append(Spacer(1,10))
 
+    def _product_name(self, p):
+        if getattr(p, "item", None):
+            return p.complete_item_name
+        if getattr(p, "product_variant", None):
+            return p.product_variant.get_display_name_for_pdf()
+        return ""
 
     def add_items_table(self):
-        """Add items table combining high side and low side items"""
-    
-        self.elements.append(Paragraph("Items Details", self.styles['SectionHeader']))
-    
-        headers = [[
-            'Sr.',
-            'Description',
-            'HSN/SAC',
-            'Qty',
-            'Unit',
-            'Rate (₹)',
-            'GST%',
-            'Amount (₹)'
+        """Item lines, totals, tax lines and the tax breakdown (one table, header repeats)"""
+        invoice = self.invoice
+        data = self.data
+        body, right, center, header = (
+            self.styles['Body'], self.styles['BodyRight'], self.styles['BodyCenter'], self.styles['HeaderCell']
+        )
+
+        rows = [[
+            Paragraph("S.N.", header),
+            Paragraph("Description of <br/> Goods and Services", header),
+            Paragraph("HSN/SAC", header),
+            Paragraph("GST Rate", header),
+            Paragraph("Qty", header),
+            Paragraph("Rate", header),
+            Paragraph("Per", header),
+            Paragraph("Amount", header),
         ]]
-    
-        data = headers.copy()
-    
-        sr = 1
-    
-        # HIGH SIDE ITEMS
-        for item in self.invoice.high_side_items.all():
-    
-            product_name = ""
-            
-            if item.product_variant:
-                product_name = item.product_variant.get_display_name_for_pdf() if item.product_variant else ""
-            
-            description = product_name
-            
-            if item.description:
-                description += f"<br/>{item.description}"
-    
-            data.append([
-                str(sr),
-                Paragraph(description, self.styles['Value']),
-                item.hsn_sac or "",
-                str(item.quantity),
-                item.unit,
-                f"{item.rate:,.2f}",
-                f"{item.gst_percent}%",
-                f"{item.amount:,.2f}"
-            ])
-    
-            sr += 1
-    
-        # LOW SIDE ITEMS
-        for item in self.invoice.low_side_items.all():
-    
-            item_name = ""
-            
-            if item.item:
-                item_name = item.item.item_code
-            
-            description = item_name
-            
-            if item.description:
-                description += f"<br/>{item.description}"
-    
-            data.append([
-                str(sr),
-                Paragraph(description, self.styles['Value']),
-                "",  # low side may not have hsn
-                str(item.quantity),
-                item.unit,
-                f"{item.rate:,.2f}",
-                f"{item.gst_percent}%",
-                f"{item.amount:,.2f}"
+        style = [
+            ('GRID', (0, 0), (-1, -1), PX, colors.black),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12 * PX),
+            ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
+            ('VALIGN', (0, 1), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 4 * PX),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 4 * PX),
+            ('TOPPADDING', (0, 0), (-1, -1), 4 * PX),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4 * PX),
+        ]
+
+        for counter, p in enumerate(data["products"], start=1):
+            rows.append([
+                str(counter),
+                Paragraph(f"{_text(self._product_name(p))}<br/>{_text(p.description)}", body),
+                p.hsn_sac or '-',
+                f"{floatformat(p.gst_percent, 0)}%",
+                floatformat(p.quantity, 2),
+                floatformat(p.rate, 2),
+                p.unit,
+                _amount(p.amount),
             ])
-    
-            sr += 1
-    
-        col_widths = [25, 200, 60, 40, 40, 60, 45, 70]
-    
-        table = Table(data, colWidths=col_widths)
-    
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495E')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-            ('ALIGN', (7, 0), (7, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#BDC3C7')),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F8F9F9')),
-        ]))
-    
-        self.elements.append(table)
-        self.elements.append(Spacer(1, 10))
-    
-
-    def add_tax_summary(self):
-        """Add tax summary using stored invoice totals"""
-    
-        self.elements.append(Paragraph("Tax Summary", self.styles['SectionHeader']))
-    
-        if self.invoice.gst_type == "CGST_SGST":
-    
-            data = [
-                ['Taxable Value', 'CGST', 'SGST', 'Total Tax'],
-    
-                [
-                    f"₹{self.invoice.taxable_value:,.2f}",
-                    f"₹{self.invoice.cgst_amount:,.2f}",
-                    f"₹{self.invoice.sgst_amount:,.2f}",
-                    f"₹{self.invoice.total_tax:,.2f}"
-                ]
-            ]
-    
-        else:
-    
-            data = [
-                ['Taxable Value', 'IGST', 'Total Tax'],
-    
-                [
-                    f"₹{self.invoice.taxable_value:,.2f}",
-                    f"₹{self.invoice.igst_amount:,.2f}",
-                    f"₹{self.invoice.total_tax:,.2f}"
-                ]
-            ]
-    
-        col_widths = [self.doc.width / len(data[0])] * len(data[0])
-    
-        table = Table(data, colWidths=col_widths)
-    
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#BDC3C7')),
-            ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#EBF5FB')),
-        ]))
-    
-        self.elements.append(table)
-        self.elements.append(Spacer(1, 10))        
-   
+        # Plain strings (not Paragraphs) for single-line cells keep long invoices fast
+        style += [
+            ('ALIGN', (5, 1), (5, len(rows) - 1), 'RIGHT'),
+            ('ALIGN', (7, 1), (7, len(rows) - 1), 'RIGHT'),
+        ]
 
-    def add_grand_total(self):
-        """Add grand total section"""
-        data = [
-            [
-                Paragraph("<b>Grand Total (in words):</b>", self.styles['Value']),
-                Paragraph(f"<b>{self.invoice.amount_in_words or ''}</b>", self.styles['Value'])
-            ],
-            [
-                Paragraph("<b>Grand Total (₹):</b>", self.styles['Value']),
-                Paragraph(f"<b>₹{self.invoice.grand_total:,.2f}</b>", self.styles['Value'])
-            ]
+        if not data["products"]:
+            rows.append([Paragraph("No Products", center), '', '', '', '', '', '', ''])
+            style.append(('SPAN', (0, len(rows) - 1), (-1, len(rows) - 1)))
+
+        def full_width(label, value, value_style=right):
+            rows.append([Paragraph(label, right), '', '', '', '', '', '', Paragraph(value, value_style)])
+            style.append(('SPAN', (0, len(rows) - 1), (6, len(rows) - 1)))
+
+        rows.append([
+            Paragraph("<b>Total</b>", right), '', '', '',
+            Paragraph(f"<b>{floatformat(data['total_qty'], 2)}</b>", right),
+            '', '',
+            Paragraph(f"<b>{_amount(invoice.taxable_value)}</b>", right),
+        ])
+        style.append(('SPAN', (0, len(rows) - 1), (3, len(rows) - 1)))
+
+        if invoice.gst_type == "CGST_SGST":
+            full_width(f"<b>Output CGST @ {floatformat(data['cgst'], 0)}% :</b>", _amount(invoice.cgst_amount))
+            full_width(f"<b>Output SGST @ {floatformat(data['sgst'], 0)}% :</b>", _amount(invoice.sgst_amount))
+        elif invoice.gst_type == "IGST":
+            full_width(f"<b>GST @ {floatformat(data['igst'], 0)}% :</b>", _amount(invoice.igst_amount))
+
+        full_width("<b>Grand Total</b>", f"<b>RS {_amount(invoice.grand_total)}</b>")
+
+        rows.append([
+            Paragraph(f"Amount Chargeable (in words) : <b>{_text(invoice.amount_in_words)} </b>", body),
+            '', '', '', '', '', '',
+            Paragraph("E. &amp; O.E", right),
+        ])
+        words_row = len(rows) - 1
+        style.append(('SPAN', (0, words_row), (6, words_row)))
+
+        # Tax breakdown block
+        first = len(rows)
+        rows.append([
+            Paragraph("Taxable Value", header), '',
+            Paragraph("Central Tax", header), '',
+            Paragraph("State Tax", header), '',
+            Paragraph("Total <br/> Tax Amount", header), '',
+        ])
+        rows.append([
+            '', '',
+            Paragraph("Rate", header), Paragraph("Amount", header),
+            Paragraph("Rate", header), Paragraph("Amount", header),
+            '', '',
+        ])
+        style += [
+            ('SPAN', (0, first), (1, first + 1)),
+            ('SPAN', (2, first), (3, first)),
+            ('SPAN', (4, first), (5, first)),
+            ('SPAN', (6, first), (7, first + 1)),
+            ('VALIGN', (0, first), (-1, first + 1), 'MIDDLE'),
         ]
-        
-        table = Table(data, colWidths=[120, self.doc.width - 140])
-        table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#FDEBD0')),
-            ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#E67E22')),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        
+
+        rows.append([
+            '',
+            Paragraph(_amount(invoice.taxable_value), body),
+            Paragraph(f"{floatformat(data['cgst'], 0)}%", center),
+            Paragraph(_amount(invoice.cgst_amount), right),
+            Paragraph(f"{floatformat(data['sgst'], 0)}%", center),
+            Paragraph(_amount(invoice.sgst_amount), right),
+            Paragraph(_amount(invoice.total_tax), right),
+            '',
+        ])
+        style.append(('SPAN', (6, len(rows) - 1), (7, len(rows) - 1)))
+
+        rows.append([
+            Paragraph("<b>Total</b>", body),
+            Paragraph(f" {_amount(invoice.taxable_value)} ", center),
+            '',
+            Paragraph(f"<b>{_amount(invoice.cgst_amount)}</b>", right),
+            '',
+            Paragraph(f"<b>{_amount(invoice.sgst_amount)}</b>", right),
+            Paragraph(f"<b>{_amount(invoice.total_tax)}</b>", right),
+            '',
+        ])
+        style.append(('SPAN', (6, len(rows) - 1), (7, len(rows) - 1)))
+
+        rows.append([
+            Paragraph(f"Tax Amount (in words) : <b>{_text(data['total_tax_in_words'])} </b>", body),
+            '', '', '', '', '', '', '',
+        ])
+        style.append(('SPAN', (0, len(rows) - 1), (7, len(rows) - 1)))
+
+        widths = [30, 160, 50, 60, 55, 65, 40]
+        widths.append(self.doc.width - sum(widths))
+
+        table = Table(rows, colWidths=widths, repeatRows=1)
+        table.setStyle(TableStyle(style))
+
+        self.elements.append(Spacer(1, 5 * PX))
         self.elements.append(table)
-        self.elements.append(Spacer(1, 10))
 
     def add_bank_details(self):
-    
-        branch_name = self.invoice.branch.name if self.invoice.branch else ""
-    
-        data = [
-            [Paragraph("<b>Bank Details:</b>", self.styles['Label'])],
-            [
-                Paragraph(
-                    f"Bank: {self.invoice.bank_name}<br/>"
-                    f"Account No: {self.invoice.account_no}<br/>"
-                    f"IFSC: {self.invoice.ifsc_code}<br/>"
-                    f"Branch: {branch_name}",
-                    self.styles['Value']
-                )
-            ]
-        ]
-    
-        if self.invoice.declaration:
-            data.append([
-                Paragraph(f"<b>Declaration:</b> {self.invoice.declaration}", self.styles['Value'])
-            ])
-    
-        table = Table(data, colWidths=[self.doc.width])
+        """Declaration and company bank details"""
+        invoice = self.invoice
+        declaration = self._p(
+            "<b>Declaration</b><br/><br/>"
+            "We declare that this invoice shows the actual price of the goods."
+        )
+        bank = self._p(
+            "<b>Company's Bank Details</b><br/><br/>"
+            f"Bank Name : {_text(invoice.bank_name)}<br/>"
+            f"A/C No : {_text(invoice.account_no)}<br/>"
+            f"IFSC : {_text(invoice.ifsc_code)} <br/>"
+            f"Branch : {_text(getattr(invoice, 'branch_name', ''))}"
+        )
+
+        table = Table(
+            [[declaration, bank]],
+            colWidths=[self.doc.width * 0.55, self.doc.width * 0.45],
+        )
         table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#F4F6F7')),
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#BDC3C7')),
+            ('BOX', (0, 0), (-1, -1), PX, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 0), (-1, -1), 5 * PX),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5 * PX),
         ]))
-    
+
+        self.elements.append(Spacer(1, 10 * PX))
         self.elements.append(table)
 
     def add_footer(self):
-        """Add footer with signature"""
+        """Customer seal / authorised signatory box"""
         data = [
             [
-                Paragraph("<b>For Krishna Airconditioning</b>", self.styles['Value']),
-                ''
+                self._p("Customer's Seal and Signature"),
+                self._p(
+                    "<b>For Krisna Airconditioning.</b><br/><br/><br/>Authorised Signatory<br/><br/><br/>",
+                    'BodyRight',
+                ),
             ],
-            [
-                Paragraph("Authorised Signatory", self.styles['Label']),
-                Paragraph("(This is a Computer Generated Invoice)", self.styles['Label'])
-            ]
+            [self._p("This is a Computer Generated Invoice", 'BodyCenter'), ''],
         ]
-        
-        table = Table(data, colWidths=[self.doc.width/2, self.doc.width/2])
+
+        table = Table(data, colWidths=[self.doc.width / 2, self.doc.width / 2])
         table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
-            ('LINEABOVE', (0, 1), (-1, 1), 1, colors.HexColor('#2C3E50')),
+            ('LINEABOVE', (0, 0), (-1, 0), PX, colors.black),
+            ('LINEBEFORE', (0, 0), (0, -1), PX, colors.black),
+            ('LINEAFTER', (-1, 0), (-1, -1), PX, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('SPAN', (0, 1), (1, 1)),
         ]))
-        
+
+        self.elements.append(Spacer(1, 20 * PX))
         self.elements.append(table)
 
     def generate(self):
         """Generate the PDF"""
         self.add_company_header()
-        self.add_invoice_title()
-        self.add_buyer_details()
+        self.add_info_table()
         self.add_items_table()
-        self.add_tax_summary()
-        self.add_terms_conditions()
-        self.add_grand_total()
         self.add_bank_details()
         self.add_footer()
-        
-        
-        self.doc.build(self.elements)
+
+        self.doc.build(self.elements, onFirstPage=self._on_page, onLaterPages=self._on_page)
         pdf = self.buffer.getvalue()
         self.buffer.close()
         return pdf
 
 
-def generate_invoice_pdf(invoice):
-    """Generate PDF for invoice"""
-    generator = InvoicePDFGenerator(invoice)
-    return generator.generate()
\ No newline at end of file
+def generate_invoice_pdf(invoice, data=None):
+    """Generate PDF for invoice (Reportlab engine)"""
+    generator = InvoicePDFGenerator(invoice, data=data)
+    return generator.generate()
+
+
+def render_invoice_pdf_by_id(invoice_id):
+    """Reportlab render for background workers, which only get the id."""
+    from invoice.models import Invoice
+
+    invoice = Invoice.objects.select_related("customer", "branch", "site").get(pk=invoice_id)
+    return generate_invoice_pdf(invoice)
+
+
+def invoice_pdf_data(invoice):
+    """Everything templates/pdf/invoice.html reads besides the invoice itself."""
+
+    high_items = list(invoice.high_side_items.select_related(
+        "product_variant__product_model__brand_id",
+        "product_variant__product_model__ac_sub_type_id__ac_type_id"
+    ).all())
+    low_items = list(invoice.low_side_items.select_related(
+        "item__material_type_id",
+        "item__item_type_id",
+        "item__feature_type_id",
+        "item__item_class_id"
+    ).all())
+
+    products = high_items + low_items
+
+    total_qty = sum(p.quantity for p in products)
+
+    # One query for both term groups
+    terms = list(invoice.terms_conditions.select_related("terms_condition_type"))
+    invoice_payment_terms = [
+        t for t in terms if t.terms_condition_type.name == "Invoice Payment"
+    ]
+    invoice_delivery_terms = [
+        t for t in terms if t.terms_condition_type.name == "Invoice Delivery"
+    ]
+
+    # Initialize
+    cgst = None
+    sgst = None
+    igst = None
+
+    if invoice.gst_type == "CGST_SGST":
+        cgst = invoice.gst_percentage / Decimal(2)
+        sgst = invoice.gst_percentage / Decimal(2)
+
+    else:
+        igst = invoice.gst_percentage
+
+    total_tax_in_words = amount_in_words(invoice.total_tax)
+    return {
+        "products": products,
+        "total_qty": total_qty,
+        "total_tax_in_words": total_tax_in_words,
+        "cgst": cgst,
+        "sgst": sgst,
+        "igst": igst,
+        "invoice_payment_terms": invoice_payment_terms,
+        "invoice_delivery_terms": invoice_delivery_terms,
+    }
+
+
+def render_invoice_html(invoice, data=None):
+    """Render templates/pdf/invoice.html for an invoice (WeasyPrint engine)."""
+    if data is None:
+        data = invoice_pdf_data(invoice)
+    return render_to_string("pdf/invoice.html", {"invoice": invoice, **data})
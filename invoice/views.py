@@ -1,20 +1,43 @@
-from rest_framework import viewsets, filters
+from rest_framework import viewsets
 from django_filters.rest_framework import DjangoFilterBackend
-from .filters import InvoiceFilter
+from .filters import InvoiceFilter, InvoiceSearchFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from django.db.models import Prefetch
+from django.utils import timezone
 
 import invoice
 
-from .models import Invoice  
-from .serializers import InvoiceSerializer
-from django.http import HttpResponse
+from .models import CustomerBalance, Invoice, InvoicePDFArchive, Payment, PaymentAllocation
+from .serializers import (
+    AgeingQuerySerializer,
+    CustomerBalanceSerializer,
+    EInvoiceExportSerializer,
+    GSTR1ExportSerializer,
+    InvoiceListSerializer,
+    InvoicePDFArchiveSerializer,
+    InvoicePDFReissueSerializer,
+    InvoiceSerializer,
+    InvoiceTotalsPreviewSerializer,
+    InvoiceTotalsSerializer,
+    PaymentAllocateSerializer,
+    PaymentSerializer,
+    QuotationInvoiceConversionSerializer,
+)
+from .receivables import AGEING_BUCKETS, AllocationError, ageing, allocate_payment, delete_payment
+from .gst_returns import GSTR1_TABLES, build_gstr1, iter_gstr1_csv, iter_gstr1_json
+from .einvoice import iter_einvoice_ndjson, iter_einvoices
+from .archive import first_issue_job, latest_invoice_pdf, reissue_invoice_pdf
+from .service import INVOICE_TOTAL_FIELDS, compute_invoice_totals, convert_quotation_version
+from rest_framework.response import Response
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
 from rest_framework.decorators import action
 from .utils.pdf_generator import generate_invoice_pdf
 from rest_framework.views import APIView
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.permissions import IsAuthenticated
@@ -29,33 +52,156 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, InvoiceSearchFilter]
     filterset_class = InvoiceFilter
 
+    # What the search document covers (besides line descriptions and item
+    # codes); InvoiceSearchFilter searches the document, not these columns
     search_fields = [
         "invoice_no",
         "buyer_name",
-        "site_name",
+        "buyer_gstin",
+        "customer__contact_number",
+        "site__name",
     ]
 
     def get_queryset(self):
 
-        return (
-            Invoice.objects
-            .select_related("customer","branch","site")
-            .prefetch_related(
-                "terms_conditions",
-                "high_side_items__product_variant__product_model__brand_id",
-                "high_side_items__product_variant__product_model__ac_sub_type_id__ac_type_id",
-                "low_side_items__item__material_type_id",
-                "low_side_items__item__item_type_id",
-                "low_side_items__item__feature_type_id",
-                "low_side_items__item__item_class_id",
-                
-            )
-            .order_by("-id")
+        # The grid only shows header fields; lines and terms are loaded for
+        # a single invoice (retrieve / update) only
+        serializer_class = self.get_serializer_class()
+        return serializer_class.setup_eager_loading(Invoice.objects.all()).order_by("-id")
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return InvoiceListSerializer
+        return InvoiceSerializer
+
+    def perform_destroy(self, instance):
+        if instance.allocations.exists():
+            raise ValidationError({"detail": "Payments are allocated to this invoice, delete those payments first"})
+        instance.delete()
+
+    @action(detail=False, methods=["post"], url_path="from-quotation")
+    def from_quotation(self, request):
+        """
+        Bill a quotation version in one call: lines are copied server side
+        (optionally with per line quantities) and totals computed once.
+        """
+        serializer = QuotationInvoiceConversionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        data = dict(serializer.validated_data)
+        version = data.pop("quotation_version")
+        invoice, summary = convert_quotation_version(version, **data)
+
+        response = self.get_serializer(self.get_queryset().get(pk=invoice.pk)).data
+        response["conversion"] = summary
+        return Response(response, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="preview-totals")
+    def preview_totals(self, request):
+        """
+        Totals of a draft invoice, computed exactly as a save would compute
+        them, without reading or writing any invoice rows.
+        """
+        serializer = InvoiceTotalsPreviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        high_items = data["high_side_items"]
+        low_items = data["low_side_items"]
+        totals = compute_invoice_totals(
+            data["gst_type"],
+            [(row["quantity"], row["rate"], row["gst_percent"]) for row in (*high_items, *low_items)],
         )
-    
+
+        lines = [
+            {"amount": line.amount, "gst_amount": line.gst_amount, "total": line.amount + line.gst_amount}
+            for line in totals.lines
+        ]
+        result = {"gst_type": data["gst_type"]}
+        result.update({field: getattr(totals, field) for field in INVOICE_TOTAL_FIELDS})
+        result["high_side_items"] = lines[:len(high_items)]
+        result["low_side_items"] = lines[len(high_items):]
+        return Response(InvoiceTotalsSerializer(result).data)
+
+    @action(detail=False, methods=["get"], url_path="gstr1")
+    def gstr1(self, request):
+        """
+        GSTR-1 B2B / B2C / HSN summary of the invoices dated in a period,
+        with each table reconciled against the invoices' total_tax.
+
+        GET /invoice/invoice/gstr1/?date_from=2026-04-01&date_to=2026-04-30[&branch=1]
+            [&table=hsn][&output=csv]
+        """
+        serializer = GSTR1ExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        table = data.get("table")
+        report = build_gstr1(
+            data["date_from"],
+            data["date_to"],
+            tables=(table,) if table else GSTR1_TABLES,
+            branch_id=data.get("branch"),
+        )
+
+        name = f"gstr1-{table or 'all'}-{data['date_from']:%Y%m%d}-{data['date_to']:%Y%m%d}"
+        if data["output"] == "csv":
+            response = StreamingHttpResponse(iter_gstr1_csv(report, table), content_type="text/csv")
+            response["Content-Disposition"] = f'attachment; filename="{name}.csv"'
+        else:
+            response = StreamingHttpResponse(iter_gstr1_json(report), content_type="application/json")
+            response["Content-Disposition"] = f'inline; filename="{name}.json"'
+        return response
+
+    @action(detail=False, methods=["get"], url_path="einvoice")
+    def einvoice(self, request):
+        """
+        E-invoice (INV-01) payloads of the B2B invoices dated in a period,
+        each validated against the bundled schema, streamed as NDJSON.
+
+        GET /invoice/invoice/einvoice/?date_from=2026-04-01&date_to=2026-04-30[&branch=1]
+        """
+        serializer = EInvoiceExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        records = iter_einvoices(data["date_from"], data["date_to"], branch_id=data.get("branch"))
+        response = StreamingHttpResponse(iter_einvoice_ndjson(records), content_type="application/x-ndjson")
+        name = f"einvoice-{data['date_from']:%Y%m%d}-{data['date_to']:%Y%m%d}"
+        response["Content-Disposition"] = f'attachment; filename="{name}.ndjson"'
+        return response
+
+    @action(detail=True, methods=["get"], url_path="pdf-revisions")
+    def pdf_revisions(self, request, pk=None):
+        """Issued PDFs of the invoice, latest first."""
+        invoice = get_object_or_404(Invoice, pk=pk)
+        archives = invoice.pdf_archives.select_related("issued_by")
+        return Response(InvoicePDFArchiveSerializer(archives, many=True, context={"request": request}).data)
+
+    @action(detail=True, methods=["post"], url_path="reissue-pdf")
+    def reissue_pdf(self, request, pk=None):
+        """
+        Render the invoice from its current data as a new PDF revision.
+        Until then /invoice/<id>/pdf/ keeps serving the PDF as issued.
+        """
+        serializer = InvoicePDFReissueSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        invoice = get_object_or_404(Invoice.objects.select_related("customer", "branch", "site"), pk=pk)
+        archive = reissue_invoice_pdf(
+            invoice,
+            base_url=request.build_absolute_uri("/"),
+            user=request.user,
+            reason=serializer.validated_data["reason"],
+        )
+        return Response(
+            InvoicePDFArchiveSerializer(archive, context={"request": request}).data,
+            status=status.HTTP_201_CREATED,
+        )
+
 
     # In views.py - update the download_pdf method
     # @action(detail=True, methods=['get'], url_path='pdf')
@@ -126,79 +272,138 @@ class InvoiceViewSet(viewsets.ModelViewSet):
 #         return response
 
 
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from weasyprint import HTML
-from decimal import Decimal
 from .models import Invoice
-from num2words import num2words
+from .utils.pdf_generator import (
+    PDF_ENGINE_REPORTLAB,
+    generate_invoice_pdf,
+    invoice_pdf_data,
+    invoice_pdf_engine,
+    render_invoice_html,
+)
+from documents.responses import archived_pdf_response, pdf_job_accepted, pdf_response
 
 def invoice_pdf(request, pk):
 
-    invoice = Invoice.objects.get(pk=pk)
-
-    high_items = list(invoice.high_side_items.select_related(
-        "product_variant__product_model__brand_id",
-        "product_variant__product_model__ac_sub_type_id__ac_type_id"
-    ).all())
-    low_items = list(invoice.low_side_items.select_related(
-        "item__material_type_id",
-        "item__item_type_id",
-        "item__feature_type_id",
-        "item__item_class_id"
-    ).all())
+    invoice = get_object_or_404(Invoice.objects.select_related("customer", "branch", "site"), pk=pk)
+    filename = f"INV-{invoice.invoice_no}.pdf"
+    as_attachment = bool(request.GET.get("download"))
+
+    # The issued PDF is served from the archive; ?preview=1 renders the
+    # current data instead (e.g. to check an edit before reissuing)
+    if not request.GET.get("preview"):
+        archive = latest_invoice_pdf(invoice)
+        if archive is None:
+            # Not issued yet (its first issue job is queued on creation):
+            # wait for it like any other render, else answer 202 + job id
+            job = first_issue_job(invoice)
+            timeout = 0 if request.GET.get("async") else settings.PDF_RENDER_WAIT_TIMEOUT
+            if job.wait(timeout) is None:
+                return pdf_job_accepted(request, job)
+            archive = latest_invoice_pdf(invoice)
+        response = archived_pdf_response(request, archive.sha256, filename, as_attachment=as_attachment)
+        response["Content-Location"] = reverse("invoice_pdf_revision", args=[invoice.pk, archive.sha256])
+        return response
+
+    # settings.INVOICE_PDF_ENGINES["invoice_pdf"], overridable with ?engine=
+    engine = invoice_pdf_engine("invoice_pdf", request.GET.get("engine"))
+    data = invoice_pdf_data(invoice)
+
+    render = None
+    if engine == PDF_ENGINE_REPORTLAB:
+        render = lambda: generate_invoice_pdf(invoice, data=data)
+
+    return pdf_response(
+        request,
+        render_invoice_html(invoice, data=data),
+        filename,
+        base_url=request.build_absolute_uri("/"),
+        as_attachment=as_attachment,
+        engine=engine,
+        render=render,
+    )
 
-    products = high_items + low_items
 
-    total_qty = sum(p.quantity for p in products)
-    invoice_payment_terms = invoice.terms_conditions.filter(
-    terms_condition_type__name="Invoice Payment"
-        )
-    
-    invoice_delivery_terms = invoice.terms_conditions.filter(
-    terms_condition_type__name="Invoice Delivery"
-        )
-    
-    # Initialize
-    cgst = None
-    sgst = None
-    igst = None
-
-    if invoice.gst_type == "CGST_SGST":
-        cgst = invoice.gst_percentage / Decimal(2)
-        sgst = invoice.gst_percentage / Decimal(2)
-
-    else:
-        igst = invoice.gst_percentage
-
-
-    total_tax_in_words = num2words(invoice.total_tax, lang='en').capitalize() + " Rupees Only"
-    html_string = render_to_string(
-        "pdf/invoice.html",
-        {
-            "invoice": invoice,
-            "products": products,
-            "total_qty": total_qty,
-            "total_tax_in_words": total_tax_in_words,
-            "cgst": cgst,
-            "sgst": sgst,
-            "igst": igst,   
-            "invoice_payment_terms": invoice_payment_terms,
-            "invoice_delivery_terms": invoice_delivery_terms,
-
-        }
+def invoice_pdf_revision(request, pk, sha256):
+    """An issued revision by content hash; the URL never changes meaning, so it is cached for good."""
+    archive = InvoicePDFArchive.objects.filter(invoice_id=pk, sha256=sha256).select_related("invoice").first()
+    if archive is None:
+        raise Http404("No such invoice PDF.")
+    return archived_pdf_response(
+        request,
+        archive.sha256,
+        f"INV-{archive.invoice.invoice_no}-r{archive.revision}.pdf",
+        as_attachment=bool(request.GET.get("download")),
+        immutable=True,
     )
 
-    pdf = HTML(
-        string=html_string,
-        base_url=request.build_absolute_uri("/")
-    ).write_pdf()
 
-    response = HttpResponse(pdf, content_type="application/pdf")
+class PaymentViewSet(viewsets.ModelViewSet):
+    """
+    Customer payments. Created with their allocations, never edited:
+    delete the payment (its allocations are reversed) and record it again.
+    """
+    serializer_class = PaymentSerializer
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    http_method_names = ["get", "post", "delete", "head", "options"]
+
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["customer", "payment_date", "mode"]
+
+    def get_queryset(self):
+        return (
+            Payment.objects
+            .select_related("customer")
+            .prefetch_related(Prefetch("allocations", queryset=PaymentAllocation.objects.select_related("invoice")))
+            .order_by("-payment_date", "-id")
+        )
 
-    if request.GET.get("download"):
-        response["Content-Disposition"] = f'attachment; filename="INV-{invoice.invoice_no}.pdf"'
-    else:
-        response["Content-Disposition"] = f'inline; filename="INV-{invoice.invoice_no}.pdf"'
+    def perform_destroy(self, instance):
+        delete_payment(instance)
+
+    @action(detail=True, methods=["post"], url_path="allocate")
+    def allocate(self, request, pk=None):
+        """Allocate the payment's unallocated amount: {"allocations": [{invoice, amount}]} or {} for oldest first."""
+        payment = self.get_object()
+        serializer = PaymentAllocateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            allocate_payment(payment, serializer.validated_data["allocations"])
+        except AllocationError as e:
+            return Response({"allocations": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(self.get_queryset().get(pk=payment.pk)).data)
+
+
+class ReceivableViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Outstanding balance per customer (maintained incrementally, see
+    invoice/receivables.py) and the aged-debt report.
+    """
+    serializer_class = CustomerBalanceSerializer
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
 
-    return response
\ No newline at end of file
+    def get_queryset(self):
+        qs = CustomerBalance.objects.select_related("customer").order_by("-outstanding", "customer_id")
+        if self.action == "list" and not self.request.query_params.get("all"):
+            qs = qs.exclude(outstanding=0, unallocated=0)
+        return qs
+
+    @action(detail=False, methods=["get"], url_path="ageing")
+    def ageing(self, request):
+        """
+        Open balance per customer in 0-30 / 31-60 / 61-90 / 90+ days past due.
+
+        GET /invoice/receivables/ageing/?as_of=2026-09-30[&customer=12]
+        """
+        serializer = AgeingQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        rows, totals = ageing(as_of=data.get("as_of"), customer_id=data.get("customer"))
+        return Response({
+            "as_of": data.get("as_of") or timezone.localdate(),
+            "buckets": [key for key, _, _ in AGEING_BUCKETS],
+            "results": rows,
+            "totals": totals,
+        })
@@ -69,6 +69,7 @@ INSTALLED_APPS = [
     'invoice',
     'inventory',
     'amc',
+    'documents',
 ] 
 
 SITE_ID = 1
@@ -235,6 +236,42 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered PDF cache (content-addressed by rendered HTML, LRU evicted)
+PDF_CACHE_DIR = MEDIA_ROOT / 'pdf_cache'
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+PDF_CACHE_MAX_FILES = int(os.getenv("PDF_CACHE_MAX_FILES", 5000))
+# Bump to invalidate every cached PDF (e.g. after a font/CSS change outside the templates)
+PDF_CACHE_VERSION = os.getenv("PDF_CACHE_VERSION", "1")
+
+# Issued invoice PDFs (write-once, named by SHA-256, never evicted)
+PDF_ARCHIVE_DIR = MEDIA_ROOT / 'pdf_archive'
+
+# Directories the PDF renderer serves /static/ assets (logo, fonts) from, read once per process
+PDF_ASSET_DIRS = [BASE_DIR / 'static', Path(STATIC_ROOT)]
+
+# Background PDF rendering: processes per web worker (0 = render inline),
+# how long sync PDF endpoints wait before answering 202 + job id, job record TTL
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", 2))
+PDF_RENDER_WAIT_TIMEOUT = float(os.getenv("PDF_RENDER_WAIT_TIMEOUT", 20))
+PDF_JOB_TTL = int(os.getenv("PDF_JOB_TTL", 24 * 60 * 60))
+
+# E-invoice JSON schema validation: processes per web worker (0 = validate inline)
+EINVOICE_VALIDATION_WORKERS = int(os.getenv("EINVOICE_VALIDATION_WORKERS", 2))
+
+# Quotations with this many BOQ lines or more are rendered section by section
+# (summary, BOQ chunks of QUOTATION_PDF_SECTION_ROWS lines, terms) and merged,
+# so render memory is bounded by the section size instead of the page count
+QUOTATION_PDF_SECTIONED_MIN_LINES = int(os.getenv("QUOTATION_PDF_SECTIONED_MIN_LINES", 300))
+QUOTATION_PDF_SECTION_ROWS = int(os.getenv("QUOTATION_PDF_SECTION_ROWS", 150))
+
+# Invoice PDF engine per endpoint: "weasyprint" (templates/pdf/invoice.html)
+# or "reportlab" (invoice/utils/pdf_generator.py, much faster for long invoices)
+INVOICE_PDF_ENGINES = {
+    "invoice_pdf": os.getenv("INVOICE_PDF_ENGINE", "weasyprint"),
+    "pdf_jobs": os.getenv("INVOICE_PDF_JOBS_ENGINE", "weasyprint"),
+    "pdf_export": os.getenv("INVOICE_PDF_EXPORT_ENGINE", "reportlab"),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0013_alter_productvariant_star_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='price_updated_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
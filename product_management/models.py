@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 
 
@@ -57,11 +58,25 @@ class ProductVariant(models.Model):
   mrp = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
   dp = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
   is_active = models.BooleanField(default=True)
+  # Last DP/MRP change, used to find quotations that need repricing
+  price_updated_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+  @classmethod
+  def from_db(cls, db, field_names, values):
+     instance = super().from_db(db, field_names, values)
+     instance._loaded_prices = (instance.__dict__.get('dp'), instance.__dict__.get('mrp'))
+     return instance
 
   def save(self, *args, **kwargs):
      if not self.sku:
         self.sku  = self.generate_sku()
+     if getattr(self, '_loaded_prices', (None, None)) != (self.dp, self.mrp):
+        self.price_updated_at = timezone.now()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+           kwargs['update_fields'] = {*update_fields, 'price_updated_at'}
      super().save(*args, **kwargs)  
+     self._loaded_prices = (self.dp, self.mrp)
 
   
   def generate_sku(self):
@@ -0,0 +1,225 @@
+"""
+Quotation pipeline rollups.
+
+QuotationRollup holds value and counts per branch x month x AC type x
+status. It is rebuilt a month at a time: a build only recomputes the
+months of quotations that were created, revised or converted since the
+previous build, plus the months marked dirty by a deletion (see
+quotation/signals.py), with one grouped query per month range. The
+analytics endpoint reads nothing but the rollup table.
+"""
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, Exists, Max, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from api.dates import start_of_day
+
+from .models import (
+    Quotation,
+    QuotationRollup,
+    QuotationRollupDirtyMonth,
+    QuotationVersion,
+    QuotationVersionHighSideItem,
+)
+
+ROLLUP_DIMENSIONS = ("month", "branch", "ac_type", "status")
+
+
+def month_start(value):
+    if isinstance(value, datetime):
+        value = timezone.localtime(value)
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def _status(quotation_ref):
+    from invoice.models import Invoice
+
+    return Case(
+        When(
+            Exists(Invoice.objects.filter(quotation_id=OuterRef(quotation_ref))),
+            then=Value(QuotationRollup.STATUS_CONVERTED),
+        ),
+        default=Value(QuotationRollup.STATUS_OPEN),
+    )
+
+
+def last_build():
+    return QuotationRollup.objects.aggregate(last=Max("built_at"))["last"]
+
+
+def mark_month_dirty(quotation_created_at):
+    """Have the next build recompute the month of a quotation created at `quotation_created_at`."""
+    QuotationRollupDirtyMonth.objects.bulk_create(
+        [QuotationRollupDirtyMonth(month=month_start(quotation_created_at), marked_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=["month"],
+        update_fields=["marked_at"],
+    )
+
+
+def changed_months(since):
+    """Months (of quotation creation) touched by activity after `since`, or marked dirty."""
+    from invoice.models import Invoice
+
+    created = QuotationVersion.objects.filter(created_at__gte=since).values_list(
+        "quotation__created_at", flat=True
+    )
+    converted = Invoice.objects.filter(
+        created_at__gte=since, quotation__isnull=False
+    ).values_list("quotation__created_at", flat=True)
+    dirty = QuotationRollupDirtyMonth.objects.values_list("month", flat=True)
+    return sorted({*(month_start(value) for value in [*created, *converted]), *dirty})
+
+
+def all_months():
+    return sorted({
+        month_start(value)
+        for value in Quotation.objects.annotate(month=TruncMonth("created_at"))
+        .values_list("month", flat=True)
+        .distinct()
+    })
+
+
+def _month_rows(months, built_at):
+    """Aggregate rows (not yet saved) for the quotations created in `months`."""
+    date_filter = Q()
+    for month in months:
+        date_filter |= Q(
+            created_at__gte=start_of_day(month), created_at__lt=start_of_day(_next_month(month))
+        )
+
+    # Totals per quotation (all AC types): active version grand totals
+    total_rows = (
+        QuotationVersion.objects.filter(is_active=True)
+        .filter(quotation__in=Quotation.objects.filter(date_filter))
+        .annotate(month=TruncMonth("quotation__created_at"), status=_status("quotation_id"))
+        .values("quotation__branch_id", "month", "status")
+        .annotate(
+            quotation_count=Count("quotation_id", distinct=True),
+            value=Coalesce(Sum("grand_total"), Value(0), output_field=DecimalField()),
+        )
+    )
+
+    # Per AC type: high side lines of the active versions
+    type_rows = (
+        QuotationVersionHighSideItem.objects.filter(
+            quotation_version__is_active=True,
+            quotation_version__quotation__in=Quotation.objects.filter(date_filter),
+        )
+        .annotate(
+            month=TruncMonth("quotation_version__quotation__created_at"),
+            status=_status("quotation_version__quotation_id"),
+        )
+        .values(
+            "quotation_version__quotation__branch_id",
+            "month",
+            "high_side_item__product_variant__product_model__ac_sub_type_id__ac_type_id",
+            "status",
+        )
+        .annotate(
+            quotation_count=Count("quotation_version__quotation_id", distinct=True),
+            value=Coalesce(
+                Sum("high_side_item__total_with_gst"), Value(0), output_field=DecimalField()
+            ),
+        )
+    )
+
+    rows = [
+        QuotationRollup(
+            branch_id=row["quotation__branch_id"],
+            month=month_start(row["month"]),
+            ac_type_id=None,
+            status=row["status"],
+            quotation_count=row["quotation_count"],
+            value=row["value"],
+            built_at=built_at,
+        )
+        for row in total_rows
+    ]
+    rows += [
+        QuotationRollup(
+            branch_id=row["quotation_version__quotation__branch_id"],
+            month=month_start(row["month"]),
+            ac_type_id=row["high_side_item__product_variant__product_model__ac_sub_type_id__ac_type_id"],
+            status=row["status"],
+            quotation_count=row["quotation_count"],
+            value=row["value"],
+            built_at=built_at,
+        )
+        for row in type_rows
+    ]
+    return rows
+
+
+def build_rollups(months, full=False, dry_run=False):
+    """
+    Recompute the rollup rows of `months` (with `full`, replace the whole
+    table). Returns the rows written.
+    """
+    built_at = timezone.now()
+    rows = _month_rows(months, built_at) if months else []
+    if dry_run:
+        return rows
+    with transaction.atomic():
+        stale = QuotationRollup.objects.all() if full else QuotationRollup.objects.filter(month__in=months)
+        stale.delete()
+        QuotationRollup.objects.bulk_create(rows)
+        # Marks made while this build was reading stay for the next one
+        dirty = QuotationRollupDirtyMonth.objects.filter(marked_at__lt=built_at)
+        if not full:
+            dirty = dirty.filter(month__in=months)
+        dirty.delete()
+    return rows
+
+
+def pipeline_summary(group_by=("month",), date_from=None, date_to=None, branch_id=None, ac_type_id=None):
+    """
+    Read the rollups grouped by any of ROLLUP_DIMENSIONS. Without AC type
+    grouping / filtering the per quotation total rows are used, so
+    quotations are never counted twice.
+    """
+    by_type = "ac_type" in group_by or ac_type_id is not None
+    rows = QuotationRollup.objects.filter(ac_type__isnull=not by_type)
+    if date_from:
+        rows = rows.filter(month__gte=month_start(date_from))
+    if date_to:
+        rows = rows.filter(month__lte=month_start(date_to))
+    if branch_id is not None:
+        rows = rows.filter(branch_id=branch_id)
+    if ac_type_id is not None:
+        rows = rows.filter(ac_type_id=ac_type_id)
+
+    fields = []
+    for dimension in group_by:
+        fields.append(dimension)
+        if dimension in ("branch", "ac_type"):
+            fields.append(f"{dimension}__name")
+
+    converted = Q(status=QuotationRollup.STATUS_CONVERTED)
+    results = []
+    for row in (
+        rows.values(*fields)
+        .annotate(
+            quotations=Sum("quotation_count"),
+            pipeline_value=Sum("value"),
+            converted_quotations=Coalesce(Sum("quotation_count", filter=converted), 0),
+            converted_value=Coalesce(
+                Sum("value", filter=converted), Value(0), output_field=DecimalField()
+            ),
+        )
+        .order_by(*fields)
+    ):
+        quotations = row["quotations"] or 0
+        row["value"] = row.pop("pipeline_value")
+        row["conversion_rate"] = (
+            round(row["converted_quotations"] * 100 / quotations, 2) if quotations else 0
+        )
+        results.append(row)
+    return results
@@ -0,0 +1,60 @@
+"""
+Cached, versioned snapshot of the service catalogue (ServiceMaster + items).
+
+The quotation form loads the whole catalogue every time it opens. The
+serialized catalogue is stored in the cache under its version number; any
+change to a ServiceMaster, its item links or the items themselves bumps
+the version (see quotation/signals.py), so a stale snapshot is never served
+and clients can revalidate with the version as an ETag.
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import ServiceMaster
+
+VERSION_KEY = "service_catalogue:version"
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+
+def _snapshot_key(version):
+    return f"service_catalogue:snapshot:{version}"
+
+
+def catalogue_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a lost counter never reuses an old version
+        cache.add(VERSION_KEY, int(time.time()), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # Counter missing (first use or evicted)
+        cache.add(VERSION_KEY, int(time.time()), timeout=None)
+        return cache.get(VERSION_KEY)
+
+
+def build_catalogue():
+    from .serializers import ServiceMasterSerializer
+
+    queryset = ServiceMasterSerializer.setup_eager_loading(ServiceMaster.objects.all())
+    return ServiceMasterSerializer(queryset, many=True).data
+
+
+def get_catalogue_snapshot():
+    """Return (version, serialized catalogue), building it on a cache miss."""
+    version = catalogue_version()
+    key = _snapshot_key(version)
+
+    results = cache.get(key)
+    if results is None:
+        results = build_catalogue()
+        # Only store if nothing changed while we were building
+        if catalogue_version() == version:
+            cache.set(key, results, timeout=SNAPSHOT_TIMEOUT)
+    return version, results
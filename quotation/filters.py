@@ -1,24 +1,25 @@
+from datetime import timedelta
+
 import django_filters
-from .models import Quotation
+
+from api.dates import start_of_day
+
+from .models import Quotation, QuotationServiceItem
 
 
 class QuotationFilter(django_filters.FilterSet):
     """
     Filter set for Quotation model.
     Supports date range on created_at (quotation creation date).
-    created_at is a DateTimeField so we use DateTimeFromToRangeFilter
-    or cast via DateFilter with the 'date' transform.
+    created_at is a DateTimeField, so the dates are turned into a half-open
+    datetime range [date_from 00:00, date_to + 1 day 00:00) in the server
+    timezone. Comparing the raw column (instead of created_at__date) keeps
+    the filter sargable, so the created_at index is used.
     """
 
-    # Quotation creation date range — compare against date portion of DateTimeField
-    date_from = django_filters.DateFilter(
-        field_name="created_at",
-        lookup_expr="date__gte"
-    )
-    date_to = django_filters.DateFilter(
-        field_name="created_at",
-        lookup_expr="date__lte"
-    )
+    # Quotation creation date range
+    date_from = django_filters.DateFilter(method="filter_date_from")
+    date_to = django_filters.DateFilter(method="filter_date_to")
 
     class Meta:
         model = Quotation
@@ -26,3 +27,22 @@ class QuotationFilter(django_filters.FilterSet):
             "date_from",
             "date_to",
         ]
+
+    def filter_date_from(self, queryset, name, value):
+        return queryset.filter(created_at__gte=start_of_day(value))
+
+    def filter_date_to(self, queryset, name, value):
+        return queryset.filter(created_at__lt=start_of_day(value + timedelta(days=1)))
+
+
+class QuotationServiceItemFilter(django_filters.FilterSet):
+    """
+    Service lines of a revision. Rows are shared between revisions, so the
+    version is matched through the version links, not the row's own FK.
+    """
+
+    quotation_version = django_filters.NumberFilter(field_name="quotation_versions")
+
+    class Meta:
+        model = QuotationServiceItem
+        fields = ["quotation_version"]
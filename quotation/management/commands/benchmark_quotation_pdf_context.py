@@ -0,0 +1,157 @@
+"""
+Benchmark quotation PDF context build time against BOQ size.
+
+Builds synthetic, unsaved VRF-style quotations (ODUs, IDUs, controllers,
+refnet joints, low side material and service lines) in memory and times
+the context builder only, so the numbers are not skewed by the database.
+
+Usage:
+    python manage.py benchmark_quotation_pdf_context
+    python manage.py benchmark_quotation_pdf_context --sizes 100 500 2000 --repeat 10
+"""
+
+import time
+from decimal import Decimal
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.models import TermsConditions, TermsConditionType
+from lead_management.models import Customer
+from product_management.models import (
+    ProductModel,
+    ProductVariant,
+    acSubTypes,
+    acType,
+    brand,
+    item,
+    item_type,
+    material_type,
+)
+from quotation.models import (
+    Quotation,
+    QuotationHighSideItem,
+    QuotationLowSideItem,
+    QuotationServiceItem,
+    QuotationVersion,
+    ServiceMaster,
+)
+from quotation.utils.pdf_generator import _assemble_quotation_pdf_context
+
+
+HIGH_SIDE_SHAPES = [
+    # (sub type, model name, model_no_odu, model_no_idu)
+    ('VRF ODU', 'Outdoor Condensing Unit', 'RXYQ12', None),
+    ('Cassette', 'Cassette Indoor Unit', None, 'FXFQ50'),
+    ('Hi-Wall', 'Hi-Wall Indoor Unit', None, 'FXAQ32'),
+    ('Ductable', 'Ductable Indoor Unit', None, 'FXSQ63'),
+    ('Accessories', 'Wired Remote Controller', None, None),
+    ('Accessories', 'Refnet Joint', None, None),
+]
+
+
+def _synthetic_rows(size):
+    vrf = acType(id=1, name='VRF System')
+    maker = brand(id=1, name='Daikin')
+    copper = material_type(id=1, name='Copper')
+    pipe = item_type(id=1, name='Pipe')
+    low_item = item(
+        id=1, item_code='CU-PI-12.7MM', material_type_id=copper, item_type_id=pipe,
+        size='12.7', size_unit='mm',
+    )
+    service = ServiceMaster(id=1, name='Refrigerant Piping', category='PIPING', unit='RMT')
+
+    variants = []
+    for idx, (sub_name, model_name, odu, idu) in enumerate(HIGH_SIDE_SHAPES, start=1):
+        sub_type = acSubTypes(id=idx, name=sub_name, ac_type_id=vrf)
+        model = ProductModel(
+            id=idx, name=model_name, ac_sub_type_id=sub_type, brand_id=maker,
+            model_no=f'MDL-{idx}', model_no_odu=odu, model_no_idu=idu, inverter=True,
+        )
+        variants.append(ProductVariant(
+            id=idx, product_model=model, capacity='12', unit='HP', sku=f'SKU-{idx}',
+        ))
+
+    high_count = max(size // 2, 1)
+    low_count = max(size // 3, 1)
+    service_count = max(size - high_count - low_count, 1)
+
+    high_side_items = []
+    for i in range(high_count):
+        base = Decimal('45000.00')
+        gst = base * Decimal('0.18')
+        high_side_items.append(QuotationHighSideItem(
+            id=i + 1, product_variant=variants[i % len(variants)], quantity=1,
+            unit_price=base, gst_percent=Decimal('18'), base_amount=base,
+            gst_amount=gst, total_with_gst=base + gst,
+        ))
+
+    low_side_items = []
+    for i in range(low_count):
+        base = Decimal('850.00') * 10
+        gst = base * Decimal('0.18')
+        low_side_items.append(QuotationLowSideItem(
+            id=i + 1, item=low_item, quantity=10, unit='RMT', unit_price=Decimal('850.00'),
+            gst_percent=Decimal('18'), base_amount=base, gst_amount=gst,
+            total_with_gst=base + gst,
+        ))
+
+    service_items = []
+    for i in range(service_count):
+        base = Decimal('300.00') * 5
+        gst = base * Decimal('0.18')
+        service_items.append(QuotationServiceItem(
+            id=i + 1, service=service, quantity=Decimal('5'), unit='RMT',
+            unit_price=Decimal('300.00'), gst_percentage=Decimal('18'),
+            base_amount=base, gst_amount=gst, total_with_gst=base + gst,
+        ))
+
+    payment = TermsConditionType(id=1, name='Quotation Payment')
+    terms = [TermsConditions(id=1, terms_condition_type=payment, terms='50% advance')]
+    material_to_ac_types = {low_item.id: [vrf.name]}
+
+    return high_side_items, low_side_items, service_items, material_to_ac_types, terms
+
+
+class Command(BaseCommand):
+    help = 'Benchmark quotation PDF context build time versus line item count'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[50, 200, 500, 1000, 2000],
+            help='Total line counts to benchmark',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per size (median is reported)',
+        )
+
+    def handle(self, *args, **options):
+        customer = Customer(id=1, name='Benchmark Customer', contact_number='9999999999')
+        quotation = Quotation(
+            id=1, quotation_no='KA/VRF/26/01-BENCH', customer=customer,
+            subject='VRF system supply and installation',
+        )
+        version = QuotationVersion(id=1, quotation=quotation, version_no='R1', created_at=timezone.now())
+
+        self.stdout.write(f'{"lines":>8} {"median ms":>12} {"per line us":>12}')
+        for size in options['sizes']:
+            rows = _synthetic_rows(size)
+            timings = []
+            for _ in range(max(options['repeat'], 1)):
+                started = time.perf_counter()
+                _assemble_quotation_pdf_context(quotation, version, *rows)
+                timings.append(time.perf_counter() - started)
+
+            elapsed = median(timings)
+            self.stdout.write(
+                f'{size:>8} {elapsed * 1000:>12.2f} {elapsed / size * 1_000_000:>12.1f}'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,115 @@
+"""
+Benchmark peak memory of quotation PDF rendering, whole document vs sections.
+
+Each mode / size pair renders a synthetic, unsaved quotation (see
+benchmark_quotation_pdf_context) in a fresh process, so peak RSS belongs to
+that render alone. "single" renders the whole template in one WeasyPrint
+pass; "sections" renders the summary, BOQ chunks of --section-rows lines and
+the terms separately and merges the pages. Peak RSS of "sections" should
+stay flat as the BOQ grows, "single" grows with the page count.
+
+Usage:
+    python manage.py benchmark_quotation_pdf_memory
+    python manage.py benchmark_quotation_pdf_memory --sizes 500 1000 2000 --section-rows 100
+    python manage.py benchmark_quotation_pdf_memory --modes sections
+"""
+
+import resource
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.pdf_jobs import new_render_pool
+
+MODES = ('single', 'sections')
+
+
+def _measure(mode, size, section_rows):
+    """Runs in a fresh worker process: (seconds, RSS before MB, peak RSS MB, pages, PDF size)."""
+    from io import BytesIO
+
+    from django.template.loader import render_to_string
+    from django.test import override_settings
+    from django.utils import timezone
+    from pypdf import PdfReader
+
+    from documents.pdf_render import render_pdf
+    from lead_management.models import Customer
+    from quotation.management.commands.benchmark_quotation_pdf_context import _synthetic_rows
+    from quotation.models import Quotation, QuotationVersion
+    from quotation.utils.pdf_generator import (
+        _assemble_quotation_pdf_context,
+        render_quotation_pdf_sections,
+    )
+
+    customer = Customer(id=1, name='Benchmark Customer', contact_number='9999999999')
+    quotation = Quotation(
+        id=1, quotation_no='KA/VRF/26/01-BENCH', customer=customer,
+        subject='VRF system supply and installation',
+    )
+    version = QuotationVersion(id=1, quotation=quotation, version_no='R1', created_at=timezone.now())
+    context = _assemble_quotation_pdf_context(quotation, version, *_synthetic_rows(size))
+
+    # ru_maxrss is in KB on Linux
+    before_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    started = time.perf_counter()
+    if mode == 'sections':
+        with override_settings(QUOTATION_PDF_SECTION_ROWS=section_rows):
+            pdf = render_quotation_pdf_sections(quotation, version, base_url='/', context=context)
+    else:
+        pdf = render_pdf(render_to_string('pdf/quotation.html', context), base_url='/')
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    return elapsed, before_mb, peak_mb, len(PdfReader(BytesIO(pdf)).pages), len(pdf)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark quotation PDF peak RSS for single-pass and sectioned rendering'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[100, 500, 1000, 2000],
+            help='Total line counts to benchmark',
+        )
+        parser.add_argument(
+            '--modes',
+            nargs='+',
+            choices=MODES,
+            default=list(MODES),
+            help='Render modes to benchmark',
+        )
+        parser.add_argument(
+            '--section-rows',
+            type=int,
+            default=150,
+            help='BOQ lines per section in "sections" mode',
+        )
+
+    def handle(self, *args, **options):
+        section_rows = max(options['section_rows'], 1)
+
+        self.stdout.write(
+            f'{"mode":>9} {"lines":>6} {"seconds":>8} {"base MB":>8} {"peak MB":>8} {"pages":>6} {"PDF KB":>7}'
+        )
+        for size in options['sizes']:
+            for mode in options['modes']:
+                # New process per run so ru_maxrss is this render's peak only
+                with new_render_pool(1) as pool:
+                    try:
+                        elapsed, before_mb, peak_mb, pages, pdf_bytes = pool.submit(
+                            _measure, mode, size, section_rows
+                        ).result()
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f'{mode:>9} {size:>6} failed: {str(e)}'))
+                        continue
+
+                self.stdout.write(
+                    f'{mode:>9} {size:>6} {elapsed:>8.2f} {before_mb:>8.1f} {peak_mb:>8.1f} '
+                    f'{pages:>6} {pdf_bytes / 1024:>7.0f}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
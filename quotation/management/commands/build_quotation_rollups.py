@@ -0,0 +1,66 @@
+"""
+Build the quotation pipeline rollups read by the analytics endpoint.
+
+Only the months with quotations created, revised or converted since the
+last build, or with deletions since, are recomputed, so this is cheap
+enough to run daily (cron).
+The first run, or --full, rebuilds every month.
+
+Usage:
+    python manage.py build_quotation_rollups
+    python manage.py build_quotation_rollups --full
+    python manage.py build_quotation_rollups --month 2026-03 --month 2026-04
+    python manage.py build_quotation_rollups --dry-run
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quotation.analytics import all_months, build_rollups, changed_months, last_build
+
+
+def _month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Invalid --month value: {value} (expected YYYY-MM)')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild quotation pipeline rollups (branch x month x AC type x status)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every month')
+        parser.add_argument('--month', dest='months', action='append', type=_month,
+                            help='Rebuild this month, YYYY-MM (repeatable)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show which months would be rebuilt without writing',
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        if options['months']:
+            months = sorted(set(options['months']))
+        else:
+            since = None if full else last_build()
+            full = since is None
+            months = all_months() if full else changed_months(since)
+            if not full:
+                self.stdout.write(f'Changes since {since:%Y-%m-%d %H:%M}')
+
+        if not months and not full:
+            self.stdout.write('Rollups are up to date')
+            return
+
+        self.stdout.write(
+            f"Rebuilding {len(months)} months: {', '.join(f'{month:%Y-%m}' for month in months)}"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be saved'))
+
+        rows = build_rollups(months, full=full, dry_run=options['dry_run'])
+        self.stdout.write(f'{len(rows)} rollup rows')
+        self.stdout.write(self.style.SUCCESS('Done!'))
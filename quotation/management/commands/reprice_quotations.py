@@ -0,0 +1,112 @@
+"""
+Reprice open quotations after DP/MRP changes on product variants.
+
+Every active quotation revision quoting a changed variant gets a new
+revision (R+1) with those high side lines at the current list price.
+Other lines are shared with the previous revision. Work is done in batches,
+one transaction per batch, and the grand total change is reported per
+quotation.
+
+Usage:
+    python manage.py reprice_quotations --since 2026-04-01
+    python manage.py reprice_quotations --brand 3 --price-field mrp
+    python manage.py reprice_quotations --variant 12 --variant 15 --dry-run
+    python manage.py reprice_quotations --since 2026-04-01 --report reprice.csv
+
+Variants are picked by id, by brand, and/or by price_updated_at (set when DP
+or MRP is saved). Lines already at the list price are left alone, so the
+command can safely be run again.
+"""
+
+import csv
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from product_management.models import ProductVariant
+from quotation.repricing import PRICE_FIELDS, reprice_quotations
+
+
+def _since(value):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid --since value: {value}')
+    if len(value) == 10:
+        parsed = datetime.combine(parsed.date(), time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Reprice active quotation revisions that quote variants with changed DP/MRP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--variant', dest='variants', type=int, action='append',
+                            help='Product variant id (repeatable)')
+        parser.add_argument('--brand', type=int, help='Every variant of this brand id')
+        parser.add_argument('--since', help='Variants whose price changed on/after this date or datetime')
+        parser.add_argument('--price-field', choices=PRICE_FIELDS, default='dp',
+                            help='List price to quote (default: dp, falls back to the other)')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Quotation revisions per transaction (default: 100)')
+        parser.add_argument('--report', help='Also write the per quotation report to this CSV file')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the price changes without writing new revisions',
+        )
+
+    def handle(self, *args, **options):
+        if not (options['variants'] or options['brand'] or options['since']):
+            raise CommandError('Pass at least one of --variant, --brand or --since')
+
+        variants = ProductVariant.objects.all()
+        if options['variants']:
+            variants = variants.filter(pk__in=options['variants'])
+        if options['brand']:
+            variants = variants.filter(product_model__brand_id=options['brand'])
+        if options['since']:
+            variants = variants.filter(price_updated_at__gte=_since(options['since']))
+        variant_ids = list(variants.values_list('pk', flat=True))
+
+        self.stdout.write(f'{len(variant_ids)} variants selected')
+        if not variant_ids:
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be saved'))
+
+        results = []
+        for result in reprice_quotations(
+            variant_ids,
+            price_field=options['price_field'],
+            batch_size=max(options['batch_size'], 1),
+            dry_run=options['dry_run'],
+        ):
+            results.append(result)
+            self.stdout.write(
+                f'  {result.quotation_no}: {result.from_version_no} -> {result.to_version_no}, '
+                f'{result.lines_repriced} lines, '
+                f'{result.old_grand_total} -> {result.new_grand_total} ({result.delta:+})'
+            )
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as fh:
+                writer = csv.writer(fh)
+                writer.writerow([
+                    'quotation_id', 'quotation_no', 'from_version', 'to_version',
+                    'lines_repriced', 'old_grand_total', 'new_grand_total', 'delta',
+                ])
+                for result in results:
+                    writer.writerow([
+                        result.quotation_id, result.quotation_no, result.from_version_no,
+                        result.to_version_no, result.lines_repriced, result.old_grand_total,
+                        result.new_grand_total, result.delta,
+                    ])
+
+        total_delta = sum((result.delta for result in results), 0)
+        self.stdout.write(f'{len(results)} quotations repriced, total change {total_delta:+}')
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_customuser_staff_profile_fields'),
+        ('inventory', '0022_purchaseorderproduct_hsn_sac'),
+        ('lead_management', '0022_customer_salutation_designation_remark'),
+        ('quotation', '0004_alter_quotationversion_gst_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['created_at'], name='quotation_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,160 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:49
+
+import hashlib
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# (line model, link model, link FK, fingerprint fields) - frozen copy of
+# LineFingerprintMixin.FINGERPRINT_FIELDS at the time of this migration
+LINE_TABLES = (
+    ('QuotationHighSideItem', 'QuotationVersionHighSideItem', 'high_side_item', (
+        'product_variant', 'quantity', 'unit_price', 'gst_percent', 'unit',
+        'mathadi_charges', 'transportation_charges', 'description', 'hsn_sac',
+    )),
+    ('QuotationLowSideItem', 'QuotationVersionLowSideItem', 'low_side_item', (
+        'item', 'quantity', 'unit_price', 'unit', 'hsn_sac',
+        'mathadi_charges', 'description', 'gst_percent',
+    )),
+    ('QuotationServiceItem', 'QuotationVersionServiceItem', 'service_item', (
+        'service', 'quantity', 'unit', 'unit_price', 'description',
+        'gst_percentage', 'mathadi_charges', 'transportation_charges',
+    )),
+)
+
+
+def _fingerprint(obj, field_names):
+    parts = []
+    for name in field_names:
+        field = obj._meta.get_field(name)
+        value = getattr(obj, field.attname)
+        if value is None:
+            value = ""
+        elif isinstance(field, models.DecimalField):
+            value = Decimal(str(value)).quantize(Decimal(1).scaleb(-field.decimal_places))
+        parts.append(f"{name}={value}")
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def link_existing_lines(apps, schema_editor):
+    """Every existing row belongs to exactly one revision: link it there, in id order."""
+    for line_name, link_name, link_field, field_names in LINE_TABLES:
+        Line = apps.get_model('quotation', line_name)
+        Link = apps.get_model('quotation', link_name)
+
+        positions = {}
+        links = []
+        lines = []
+        for line in Line.objects.order_by('quotation_version_id', 'id').iterator(chunk_size=2000):
+            line.fingerprint = _fingerprint(line, field_names)
+            lines.append(line)
+            position = positions.get(line.quotation_version_id, 0)
+            positions[line.quotation_version_id] = position + 1
+            links.append(Link(
+                quotation_version_id=line.quotation_version_id,
+                position=position,
+                **{f"{link_field}_id": line.id},
+            ))
+            if len(lines) >= 2000:
+                Line.objects.bulk_update(lines, ['fingerprint'])
+                Link.objects.bulk_create(links)
+                lines, links = [], []
+        Line.objects.bulk_update(lines, ['fingerprint'])
+        Link.objects.bulk_create(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotation', '0005_quotation_quotation_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quotationhighsideitem',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='quotationlowsideitem',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='quotationserviceitem',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='quotationhighsideitem',
+            name='quotation_version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_high_side_items', to='quotation.quotationversion'),
+        ),
+        migrations.AlterField(
+            model_name='quotationlowsideitem',
+            name='quotation_version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_low_side_items', to='quotation.quotationversion'),
+        ),
+        migrations.AlterField(
+            model_name='quotationserviceitem',
+            name='quotation_version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_service_items', to='quotation.quotationversion'),
+        ),
+        migrations.CreateModel(
+            name='QuotationVersionHighSideItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('high_side_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='version_links', to='quotation.quotationhighsideitem')),
+                ('quotation_version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='high_side_links', to='quotation.quotationversion')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='quotationversion',
+            name='high_side_items',
+            field=models.ManyToManyField(blank=True, related_name='quotation_versions', through='quotation.QuotationVersionHighSideItem', to='quotation.quotationhighsideitem'),
+        ),
+        migrations.CreateModel(
+            name='QuotationVersionLowSideItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('low_side_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='version_links', to='quotation.quotationlowsideitem')),
+                ('quotation_version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_side_links', to='quotation.quotationversion')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='quotationversion',
+            name='low_side_items',
+            field=models.ManyToManyField(blank=True, related_name='quotation_versions', through='quotation.QuotationVersionLowSideItem', to='quotation.quotationlowsideitem'),
+        ),
+        migrations.CreateModel(
+            name='QuotationVersionServiceItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('quotation_version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='service_links', to='quotation.quotationversion')),
+                ('service_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='version_links', to='quotation.quotationserviceitem')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='quotationversion',
+            name='service_items',
+            field=models.ManyToManyField(blank=True, related_name='quotation_versions', through='quotation.QuotationVersionServiceItem', to='quotation.quotationserviceitem'),
+        ),
+        migrations.AddConstraint(
+            model_name='quotationversionhighsideitem',
+            constraint=models.UniqueConstraint(fields=('quotation_version', 'high_side_item'), name='unique_version_high_side_item'),
+        ),
+        migrations.AddConstraint(
+            model_name='quotationversionlowsideitem',
+            constraint=models.UniqueConstraint(fields=('quotation_version', 'low_side_item'), name='unique_version_low_side_item'),
+        ),
+        migrations.AddConstraint(
+            model_name='quotationversionserviceitem',
+            constraint=models.UniqueConstraint(fields=('quotation_version', 'service_item'), name='unique_version_service_item'),
+        ),
+        migrations.RunPython(link_existing_lines, migrations.RunPython.noop),
+    ]
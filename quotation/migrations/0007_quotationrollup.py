@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_customuser_staff_profile_fields'),
+        ('product_management', '0014_productvariant_price_updated_at'),
+        ('quotation', '0006_copy_on_write_version_lines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('CONVERTED', 'Converted')], max_length=20)),
+                ('quotation_count', models.PositiveIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('built_at', models.DateTimeField()),
+                ('ac_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='quotation_rollups', to='product_management.actype')),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='quotation_rollups', to='api.branchmanagement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'branch'], name='quotation_rollup_month_idx')],
+            },
+        ),
+    ]
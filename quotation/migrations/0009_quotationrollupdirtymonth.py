@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotation', '0008_quotationnumbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotationRollupDirtyMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('marked_at', models.DateTimeField()),
+            ],
+        ),
+    ]
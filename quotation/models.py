@@ -1,3 +1,6 @@
+import hashlib
+from decimal import Decimal
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from product_management.models import ProductVariant ,item
@@ -43,6 +46,12 @@ class Quotation(models.Model):
     declaration = models.TextField(default="We declare that this quotation shows the actual price for the services.")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Date range filters on the quotation list
+            models.Index(fields=["created_at"], name="quotation_created_at_idx"),
+        ]
+
     def __str__(self):
         return self.quotation_no
 
@@ -91,6 +100,28 @@ class QuotationVersion(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Line rows are shared between revisions (copy-on-write): a revision
+    # links the unchanged rows of its predecessor and only stores new rows
+    # for lines that were added or edited.
+    high_side_items = models.ManyToManyField(
+        "QuotationHighSideItem",
+        through="QuotationVersionHighSideItem",
+        related_name="quotation_versions",
+        blank=True
+    )
+    low_side_items = models.ManyToManyField(
+        "QuotationLowSideItem",
+        through="QuotationVersionLowSideItem",
+        related_name="quotation_versions",
+        blank=True
+    )
+    service_items = models.ManyToManyField(
+        "QuotationServiceItem",
+        through="QuotationVersionServiceItem",
+        related_name="quotation_versions",
+        blank=True
+    )
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -99,15 +130,53 @@ class QuotationVersion(models.Model):
             )
         ]
 
+    def delete(self, *args, **kwargs):
+        # Rows first stored by this revision may still be used by later ones
+        from .versioning import hand_over_lines
+        hand_over_lines(self)
+        return super().delete(*args, **kwargs)
+
+
+class LineFingerprintMixin:
+    """
+    Hash of the fields that make up a quotation line. Two rows with the same
+    fingerprint are interchangeable, which is what lets revisions share rows
+    and what the revision diff compares.
+    """
+
+    FINGERPRINT_FIELDS = ()
+
+    def compute_fingerprint(self):
+        parts = []
+        for name in self.FINGERPRINT_FIELDS:
+            field = self._meta.get_field(name)
+            value = getattr(self, field.attname)
+            if value is None:
+                value = ""
+            elif isinstance(field, models.DecimalField):
+                value = Decimal(str(value)).quantize(Decimal(1).scaleb(-field.decimal_places))
+            parts.append(f"{name}={value}")
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.fingerprint = self.compute_fingerprint()
+        super().save(*args, **kwargs)
+
 
 
 
 
-class QuotationHighSideItem(models.Model):
+class QuotationHighSideItem(LineFingerprintMixin, models.Model):
 
+    FINGERPRINT_FIELDS = (
+        "product_variant", "quantity", "unit_price", "gst_percent", "unit",
+        "mathadi_charges", "transportation_charges", "description", "hsn_sac",
+    )
+
+    # Revision that first stored this row; see QuotationVersion.high_side_items
     quotation_version = models.ForeignKey(
         QuotationVersion,
-        related_name="high_side_items",
+        related_name="created_high_side_items",
         on_delete=models.CASCADE
     )
 
@@ -133,12 +202,19 @@ class QuotationHighSideItem(models.Model):
     gst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_with_gst = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False)
+
 
-class QuotationLowSideItem(models.Model):
+class QuotationLowSideItem(LineFingerprintMixin, models.Model):
+
+    FINGERPRINT_FIELDS = (
+        "item", "quantity", "unit_price", "unit", "hsn_sac",
+        "mathadi_charges", "description", "gst_percent",
+    )
 
     quotation_version = models.ForeignKey(
         QuotationVersion,
-        related_name="low_side_items",
+        related_name="created_low_side_items",
         on_delete=models.CASCADE
     )
 
@@ -160,6 +236,8 @@ class QuotationLowSideItem(models.Model):
     gst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_with_gst = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False)
+
 class ServiceMaster(models.Model):
     SERVICE_TYPES = [
         ('MATERIAL', 'Material Based'),
@@ -185,8 +263,13 @@ class ServiceMaster(models.Model):
     def __str__(self):
         return self.name
 
-class QuotationServiceItem(models.Model):
-    quotation_version = models.ForeignKey('QuotationVersion', on_delete=models.CASCADE, related_name='service_items')
+class QuotationServiceItem(LineFingerprintMixin, models.Model):
+    FINGERPRINT_FIELDS = (
+        'service', 'quantity', 'unit', 'unit_price', 'description',
+        'gst_percentage', 'mathadi_charges', 'transportation_charges',
+    )
+
+    quotation_version = models.ForeignKey('QuotationVersion', on_delete=models.CASCADE, related_name='created_service_items')
     service = models.ForeignKey(ServiceMaster, on_delete=models.CASCADE)
     
     # Quantities and pricing
@@ -203,6 +286,8 @@ class QuotationServiceItem(models.Model):
     transportation_charges = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_with_gst = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -215,3 +300,153 @@ class QuotationServiceItem(models.Model):
     
     def __str__(self):
         return f"{self.service.name} - {self.quantity} {self.unit}"
+
+
+# =====================================================
+# QUOTATION NUMBERING
+# =====================================================
+class QuotationNumberSequence(models.Model):
+    """
+    Last number handed out per quotation number prefix (KA/<AC code>/<yy>/<mm>),
+    locked with SELECT ... FOR UPDATE while a quotation is created.
+    """
+
+    prefix = models.CharField(max_length=40, unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefix} {self.last_value}"
+
+
+# =====================================================
+# PIPELINE ANALYTICS ROLLUP
+# =====================================================
+class QuotationRollup(models.Model):
+    """
+    Pre-aggregated quotation pipeline, one row per branch x month x AC type
+    x status, rebuilt by the build_quotation_rollups command. Rows with an
+    empty ac_type are the per quotation totals (every AC type together);
+    rows with an AC type only cover that type's high side lines, so a
+    quotation with several AC types is counted once per type.
+    """
+
+    STATUS_OPEN = "OPEN"
+    STATUS_CONVERTED = "CONVERTED"
+    STATUS_CHOICES = (
+        (STATUS_OPEN, "Open"),
+        (STATUS_CONVERTED, "Converted"),
+    )
+
+    branch = models.ForeignKey(
+        "api.BranchManagement",
+        on_delete=models.CASCADE,
+        related_name="quotation_rollups",
+        null=True,
+        blank=True
+    )
+    month = models.DateField()
+    ac_type = models.ForeignKey(
+        "product_management.acType",
+        on_delete=models.CASCADE,
+        related_name="quotation_rollups",
+        null=True,
+        blank=True
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+
+    quotation_count = models.PositiveIntegerField(default=0)
+    value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    # Start of the build that wrote the row; the next build picks up changes from here
+    built_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["month", "branch"], name="quotation_rollup_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.status}"
+
+
+class QuotationRollupDirtyMonth(models.Model):
+    """
+    Month (of quotation creation) to recompute at the next rollup build
+    because a quotation, revision or invoice of it was deleted; deletions
+    leave no created_at behind for the build to find.
+    """
+
+    month = models.DateField(unique=True)
+    marked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}"
+
+
+# =====================================================
+# VERSION <-> LINE LINKS (ordered BOQ of each revision)
+# =====================================================
+class QuotationVersionHighSideItem(models.Model):
+    quotation_version = models.ForeignKey(
+        QuotationVersion,
+        related_name="high_side_links",
+        on_delete=models.CASCADE
+    )
+    high_side_item = models.ForeignKey(
+        QuotationHighSideItem,
+        related_name="version_links",
+        on_delete=models.CASCADE
+    )
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["quotation_version", "high_side_item"],
+                name="unique_version_high_side_item"
+            )
+        ]
+
+
+class QuotationVersionLowSideItem(models.Model):
+    quotation_version = models.ForeignKey(
+        QuotationVersion,
+        related_name="low_side_links",
+        on_delete=models.CASCADE
+    )
+    low_side_item = models.ForeignKey(
+        QuotationLowSideItem,
+        related_name="version_links",
+        on_delete=models.CASCADE
+    )
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["quotation_version", "low_side_item"],
+                name="unique_version_low_side_item"
+            )
+        ]
+
+
+class QuotationVersionServiceItem(models.Model):
+    quotation_version = models.ForeignKey(
+        QuotationVersion,
+        related_name="service_links",
+        on_delete=models.CASCADE
+    )
+    service_item = models.ForeignKey(
+        QuotationServiceItem,
+        related_name="version_links",
+        on_delete=models.CASCADE
+    )
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["quotation_version", "service_item"],
+                name="unique_version_service_item"
+            )
+        ]
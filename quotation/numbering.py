@@ -0,0 +1,92 @@
+"""
+Quotation numbers: KA/<AC type code>/<yy>/<mm><sequence>.
+
+The number is assigned before the quotation is inserted. The AC type code
+comes from a cached product model -> code map (no variant -> model ->
+sub type -> AC type walk per create) and the sequence from a per-prefix
+counter row locked for the rest of the transaction, so concurrent creates
+never see the same number. A prefix's counter starts after the highest
+number already issued under it, which keeps numbers from the old
+id-based scheme unique.
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from product_management.models import ProductModel
+
+from .models import Quotation, QuotationNumberSequence
+
+AC_CODE_MAP_KEY = "quotation_numbering:ac_codes"
+AC_CODE_MAP_TIMEOUT = 24 * 60 * 60
+
+
+def ac_code(ac_type_name):
+    return (ac_type_name or "").strip()[:3].upper()
+
+
+def build_ac_code_map():
+    return {
+        model_id: ac_code(name)
+        for model_id, name in ProductModel.objects.values_list(
+            "pk", "ac_sub_type_id__ac_type_id__name"
+        )
+    }
+
+
+def ac_code_map():
+    """{product model id: AC type code}, cached until a model / sub type / AC type changes."""
+    codes = cache.get(AC_CODE_MAP_KEY)
+    if codes is None:
+        codes = build_ac_code_map()
+        cache.set(AC_CODE_MAP_KEY, codes, timeout=AC_CODE_MAP_TIMEOUT)
+    return codes
+
+
+def invalidate_ac_code_map():
+    cache.delete(AC_CODE_MAP_KEY)
+
+
+def ac_code_for_variant(product_variant):
+    code = ac_code_map().get(product_variant.product_model_id)
+    if code is None:
+        # Model added since the map was cached (invalidation is after commit)
+        invalidate_ac_code_map()
+        code = ac_code_map().get(product_variant.product_model_id, "")
+    return code
+
+
+def quotation_prefix(code, when=None):
+    when = timezone.localtime(when)
+    return f"KA/{code}/{when:%y}/{when:%m}"
+
+
+def _highest_issued(prefix):
+    highest = 0
+    for quotation_no in Quotation.objects.filter(quotation_no__startswith=prefix).values_list(
+        "quotation_no", flat=True
+    ):
+        suffix = quotation_no[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def next_quotation_no(code, when=None):
+    """Reserve the next number for `code`. Must run inside the creating transaction."""
+    prefix = quotation_prefix(code, when)
+    counters = QuotationNumberSequence.objects.select_for_update()
+    # Locking reads only: on MySQL (REPEATABLE READ) a plain read would see
+    # the transaction's snapshot, without a counter another request created
+    sequence = counters.filter(prefix=prefix).first()
+    if sequence is None:
+        highest = _highest_issued(prefix)
+        try:
+            with transaction.atomic():
+                sequence = counters.create(prefix=prefix, last_value=highest)
+        except IntegrityError:
+            # Created by a concurrent request since our read
+            sequence = counters.get(prefix=prefix)
+    sequence.last_value += 1
+    sequence.save(update_fields=["last_value"])
+    return f"{prefix}{sequence.last_value}"
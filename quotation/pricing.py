@@ -0,0 +1,37 @@
+"""
+Quotation pricing rules, shared by QuotationSerializer.calculate_totals and
+the bulk repricing job so both always produce the same numbers.
+"""
+
+
+def line_amounts(quantity, unit_price, gst_percent, mathadi=0, transport=0):
+    """
+    (base_amount, gst_amount, total_with_gst) of one line. GST is charged
+    on the base price only; mathadi and transportation are added on top.
+    """
+    base_amount = quantity * unit_price
+    gst_amount = (base_amount * gst_percent) / 100
+    total_with_gst = base_amount + gst_amount + mathadi + transport
+    return base_amount, gst_amount, total_with_gst
+
+
+def apply_version_totals(version, subtotal, gst_total):
+    """Split the GST by the version's gst_type and set every total field."""
+    if version.gst_type == "NO_GST":
+        version.cgst_amount = 0
+        version.sgst_amount = 0
+        version.igst_amount = 0
+        gst_total = 0
+    elif version.gst_type == "CGST_SGST":
+        version.cgst_amount = gst_total / 2
+        version.sgst_amount = gst_total / 2
+        version.igst_amount = 0
+    else:
+        version.igst_amount = gst_total
+        version.cgst_amount = 0
+        version.sgst_amount = 0
+
+    version.subtotal = subtotal
+    version.gst_amount = gst_total
+    version.total_amount = subtotal + gst_total
+    version.grand_total = version.total_amount
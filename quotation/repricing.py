@@ -0,0 +1,230 @@
+"""
+Bulk repricing of open quotations after a DP/MRP revision.
+
+Active revisions quoting one of the changed variants are found through the
+version links, a batch at a time. For each of them a new revision is
+written with the high side lines of those variants priced at the current
+list price; every other line is shared with the previous revision
+(copy-on-write), so only the repriced rows are stored again. Totals use
+the same rules as QuotationSerializer.calculate_totals.
+"""
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import transaction
+
+from product_management.models import ProductVariant
+
+from .models import QuotationVersion
+from .pricing import apply_version_totals, line_amounts
+from .versioning import HIGH_SIDE, LINE_KINDS, bulk_create_lines
+
+PRICE_FIELDS = ("dp", "mrp")
+
+
+class RepriceResult(NamedTuple):
+    quotation_id: int
+    quotation_no: str
+    from_version_no: str
+    to_version_no: str
+    lines_repriced: int
+    old_grand_total: Decimal
+    new_grand_total: Decimal
+
+    @property
+    def delta(self):
+        return self.new_grand_total - self.old_grand_total
+
+
+def list_prices(variant_ids, price_field="dp"):
+    """
+    Current list price per variant. Like the inventory rate lookup, DP falls
+    back to MRP (and the other way round); variants with neither are left out.
+    """
+    fallback = "mrp" if price_field == "dp" else "dp"
+    prices = {}
+    for pk, price, other in ProductVariant.objects.filter(pk__in=variant_ids).values_list(
+        "pk", price_field, fallback
+    ):
+        price = price if price is not None else other
+        if price is not None:
+            prices[pk] = price
+    return prices
+
+
+def affected_version_ids(variant_ids):
+    """Active revisions quoting any of the variants, oldest first."""
+    return list(
+        QuotationVersion.objects.filter(
+            is_active=True,
+            high_side_links__high_side_item__product_variant_id__in=variant_ids,
+        )
+        .order_by("pk")
+        .values_list("pk", flat=True)
+        .distinct()
+    )
+
+
+def next_version_no(version):
+    current_r = int(version.version_no.split("-R")[-1])
+    return f"{version.quotation.quotation_no}-R{current_r + 1}"
+
+
+def _repriced_line(line, price, is_no_gst):
+    gst_percent = 0 if is_no_gst else line.gst_percent
+    base_amount, gst_amount, total_with_gst = line_amounts(
+        line.quantity, price, gst_percent, line.mathadi_charges, line.transportation_charges
+    )
+    new_line = HIGH_SIDE.model(
+        product_variant_id=line.product_variant_id,
+        quantity=line.quantity,
+        unit_price=price,
+        gst_percent=gst_percent,
+        unit=line.unit,
+        mathadi_charges=line.mathadi_charges,
+        transportation_charges=line.transportation_charges,
+        description=line.description,
+        hsn_sac=line.hsn_sac,
+        base_amount=base_amount,
+        gst_amount=gst_amount,
+        total_with_gst=total_with_gst,
+    )
+    new_line.fingerprint = new_line.compute_fingerprint()
+    return new_line
+
+
+def _line_subtotal(line):
+    return line.base_amount + line.mathadi_charges + getattr(line, "transportation_charges", 0)
+
+
+def reprice_batch(version_ids, prices, dry_run=False):
+    """
+    Reprice one batch of revisions in a single transaction. Revisions that
+    were revised (or had nothing to reprice) in the meantime are skipped.
+    """
+    with transaction.atomic():
+        versions = list(
+            QuotationVersion.objects.select_for_update()
+            .filter(pk__in=version_ids, is_active=True)
+            .select_related("quotation")
+            .order_by("pk")
+        )
+        if not versions:
+            return []
+
+        # Current links of every revision in the batch, one query per line type
+        links = {}
+        for kind in LINE_KINDS:
+            rows = (
+                kind.link_model.objects.filter(quotation_version__in=versions)
+                .select_related(kind.link_field)
+                .order_by("quotation_version_id", "position")
+            )
+            for link in rows:
+                links.setdefault((kind.name, link.quotation_version_id), []).append(
+                    getattr(link, kind.link_field)
+                )
+
+        results = []
+        plans = []
+        for version in versions:
+            is_no_gst = version.gst_type == "NO_GST"
+            high_lines = []
+            repriced = 0
+            for line in links.get((HIGH_SIDE.name, version.pk), []):
+                price = prices.get(line.product_variant_id)
+                if price is not None and line.unit_price != price:
+                    line = _repriced_line(line, price, is_no_gst)
+                    repriced += 1
+                high_lines.append(line)
+            if not repriced:
+                continue
+
+            new_version = QuotationVersion(
+                quotation=version.quotation,
+                version_no=next_version_no(version),
+                is_active=True,
+                gst_type=version.gst_type,
+            )
+            other_lines = {
+                kind.name: links.get((kind.name, version.pk), [])
+                for kind in LINE_KINDS
+                if kind is not HIGH_SIDE
+            }
+            subtotal = sum(
+                (_line_subtotal(line) for lines in [high_lines, *other_lines.values()] for line in lines),
+                Decimal("0"),
+            )
+            gst_total = sum(
+                (line.gst_amount for lines in [high_lines, *other_lines.values()] for line in lines),
+                Decimal("0"),
+            )
+            apply_version_totals(new_version, subtotal, gst_total)
+
+            plans.append((version, new_version, high_lines, other_lines))
+            results.append(RepriceResult(
+                quotation_id=version.quotation_id,
+                quotation_no=version.quotation.quotation_no,
+                from_version_no=version.version_no,
+                to_version_no=new_version.version_no,
+                lines_repriced=repriced,
+                old_grand_total=version.grand_total,
+                new_grand_total=Decimal(new_version.grand_total).quantize(Decimal("0.01")),
+            ))
+
+        if dry_run or not plans:
+            return results
+
+        # Old revisions off, new ones in: one statement each for the batch
+        QuotationVersion.objects.filter(
+            pk__in=[version.pk for version, *_ in plans]
+        ).update(is_active=False)
+        new_versions = [new_version for _, new_version, *_ in plans]
+        QuotationVersion.objects.bulk_create(new_versions)
+        if any(new_version.pk is None for new_version in new_versions):
+            stored = dict(
+                QuotationVersion.objects.filter(
+                    quotation_id__in=[v.quotation_id for v in new_versions],
+                    version_no__in=[v.version_no for v in new_versions],
+                ).values_list("version_no", "pk")
+            )
+            for new_version in new_versions:
+                new_version.pk = stored[new_version.version_no]
+
+        new_rows = []
+        for _, new_version, high_lines, _ in plans:
+            for line in high_lines:
+                if line.pk is None:
+                    line.quotation_version = new_version
+                    new_rows.append(line)
+        bulk_create_lines(HIGH_SIDE, new_rows)
+
+        for kind in LINE_KINDS:
+            kind.link_model.objects.bulk_create([
+                kind.link_model(
+                    quotation_version_id=new_version.pk,
+                    position=position,
+                    **{f"{kind.link_field}_id": line.pk},
+                )
+                for _, new_version, high_lines, other_lines in plans
+                for position, line in enumerate(
+                    high_lines if kind is HIGH_SIDE else other_lines[kind.name]
+                )
+            ])
+
+        return results
+
+
+def reprice_quotations(variant_ids, price_field="dp", batch_size=100, dry_run=False):
+    """Reprice every affected active revision, yielding a RepriceResult per quotation."""
+    if price_field not in PRICE_FIELDS:
+        raise ValueError(f"Unsupported price field: {price_field}")
+
+    prices = list_prices(variant_ids, price_field)
+    if not prices:
+        return
+
+    version_ids = affected_version_ids(list(prices))
+    for start in range(0, len(version_ids), batch_size):
+        yield from reprice_batch(version_ids[start:start + batch_size], prices, dry_run=dry_run)
+
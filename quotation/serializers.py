@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
 import random
-from datetime import datetime
 from product_management.models import ProductVariant, item as ProductItem
 from inventory.models import TermsConditions
 from inventory.serializers import TermsConditionsSerializer
@@ -13,7 +14,19 @@ from .models import (
     QuotationLowSideItem,
 )
 
+from .analytics import mark_month_dirty
 from .models import ServiceMaster, QuotationServiceItem
+from .numbering import ac_code_for_variant, next_quotation_no
+from .pricing import apply_version_totals, line_amounts
+from .versioning import (
+    HIGH_SIDE,
+    LOW_SIDE,
+    SERVICE,
+    append_line,
+    bulk_create_lines,
+    recalculate_version_totals,
+    store_version_lines,
+)
 
 # =====================================================
 # HIGH SIDE SERIALIZER
@@ -105,36 +118,71 @@ class ServiceMasterSerializer(serializers.ModelSerializer):
     class Meta:
         model = ServiceMaster
         fields = '__all__'
-    
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Prefetch items with every FK the item fields below read."""
+        return queryset.prefetch_related(
+            Prefetch(
+                'items',
+                queryset=ProductItem.objects.select_related(
+                    'material_type_id',
+                    'item_type_id',
+                    'feature_type_id',
+                    'item_class_id',
+                    'brand',
+                ),
+            )
+        )
+
+    def _item_fields(self, obj):
+        """All item-derived fields, built in one pass and reused by the getters."""
+        cached = getattr(obj, '_service_item_fields', None)
+        if cached is not None:
+            return cached
+
+        from product_management.serializers import ItemSerializer
+
+        items = list(obj.items.all())
+        codes = []
+        descriptions = []
+        for item in items:
+            codes.append(item.item_code)
+
+            parts = []
+            if item.material_type_id:
+                parts.append(str(item.material_type_id))
+            if item.item_type_id:
+                parts.append(str(item.item_type_id))
+            if item.feature_type_id:
+                parts.append(str(item.feature_type_id))
+            if item.size:
+                parts.append(f"{item.size}{item.size_unit or ''}")
+            if item.brand:
+                parts.append(str(item.brand))
+            descriptions.append(' - '.join(parts) if parts else item.item_code)
+
+        code_text = ", ".join(codes)
+        obj._service_item_fields = {
+            'items': ItemSerializer(items, many=True).data,
+            'item_code': code_text,
+            'item_name': code_text,
+            'item_description': ", ".join(descriptions) if descriptions else None,
+        }
+        return obj._service_item_fields
+
     # ✅ Add this method to return items data
     def get_items(self, obj):
-        from product_management.serializers import ItemSerializer
-        return ItemSerializer(obj.items.all(), many=True).data
+        return self._item_fields(obj)['items']
     
     def get_item_code(self, obj):
-        return ", ".join([i.item_code for i in obj.items.all()])
+        return self._item_fields(obj)['item_code']
         
     def get_item_name(self, obj):
-        return ", ".join([i.item_code for i in obj.items.all()])
+        return self._item_fields(obj)['item_name']
     
     def get_item_description(self, obj):
-        descriptions = []
-        for item in obj.items.all():
-            parts = []
-            if hasattr(item, 'material_type_id') and item.material_type_id:
-                parts.append(str(item.material_type_id))
-            if hasattr(item, 'item_type_id') and item.item_type_id:
-                parts.append(str(item.item_type_id))
-            if hasattr(item, 'feature_type_id') and item.feature_type_id:
-                parts.append(str(item.feature_type_id))
-            if hasattr(item, 'size') and item.size:
-                size_str = f"{item.size}{item.size_unit or ''}"
-                parts.append(size_str)
-            if hasattr(item, 'brand') and item.brand:
-                parts.append(str(item.brand))
-            desc = ' - '.join(parts) if parts else item.item_code
-            descriptions.append(desc)
-        return ", ".join(descriptions) if descriptions else None
+        return self._item_fields(obj)['item_description']
 
     def create(self, validated_data):
         request = self.context.get("request")
@@ -176,9 +224,16 @@ class QuotationServiceItemSerializer(serializers.ModelSerializer):
         model = QuotationServiceItem
         fields = '__all__'
         read_only_fields = ['quotation_version', 'base_amount', 'gst_amount', 'total_with_gst']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Service and its item codes for every row, in two queries."""
+        return queryset.select_related('service').prefetch_related(
+            Prefetch('service__items', queryset=ProductItem.objects.only('id', 'item_code'))
+        )
         
     def get_item_code(self, obj):
-        if obj.service and obj.service.items.exists():
+        if obj.service:
             return ", ".join([i.item_code for i in obj.service.items.all()])
         return ""
 
@@ -196,7 +251,186 @@ class QuotationServiceItemCreateSerializer(serializers.ModelSerializer):
         if not validated_data.get('unit_price'):
             validated_data['unit_price'] = service.total_rate
             
-        return super().create(validated_data)
+        service_item = super().create(validated_data)
+        append_line(service_item.quotation_version, SERVICE, service_item)
+        return service_item
+
+
+class QuotationServiceItemBulkLineSerializer(serializers.Serializer):
+    """One row of a bulk edit: `id` updates a line of the version, no `id` adds one."""
+    EDIT_FIELDS = (
+        'service', 'quantity', 'unit_price', 'description', 'gst_percentage',
+        'mathadi_charges', 'transportation_charges',
+    )
+
+    id = serializers.IntegerField(required=False)
+    # Plain ids, resolved for every row in one query by the parent serializer
+    service = serializers.IntegerField(required=False)
+    quantity = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    gst_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, required=False)
+    mathadi_charges = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    transportation_charges = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+
+    def validate(self, attrs):
+        if 'id' not in attrs:
+            missing = [name for name in ('service', 'quantity') if name not in attrs]
+            if missing:
+                raise serializers.ValidationError(
+                    {name: "This field is required for new lines." for name in missing}
+                )
+        return attrs
+
+
+class QuotationServiceItemBulkSerializer(serializers.Serializer):
+    """
+    Add, edit and remove any number of service lines of one quotation
+    version in a single transaction; the version totals are recomputed once.
+
+    Lines shared with other revisions are copied before they are edited or
+    dropped (copy-on-write), so those revisions keep their values.
+    """
+    quotation_version = serializers.PrimaryKeyRelatedField(queryset=QuotationVersion.objects.all())
+    upsert = QuotationServiceItemBulkLineSerializer(many=True, required=False)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, attrs):
+        version = attrs['quotation_version']
+        upserts = attrs.setdefault('upsert', [])
+        delete_ids = attrs.setdefault('delete', [])
+
+        line_ids = set(
+            SERVICE.link_model.objects.filter(quotation_version=version)
+            .values_list('service_item_id', flat=True)
+        )
+        edit_ids = [row['id'] for row in upserts if 'id' in row]
+        unknown = sorted({*edit_ids, *delete_ids} - line_ids)
+        if unknown:
+            raise serializers.ValidationError(
+                {"upsert": f"Service items {unknown} are not lines of version {version.pk}"}
+            )
+        if len(set(edit_ids)) != len(edit_ids) or set(edit_ids) & set(delete_ids):
+            raise serializers.ValidationError(
+                {"upsert": "Each service item may only be updated or deleted once"}
+            )
+
+        service_ids = {row['service'] for row in upserts if 'service' in row}
+        services = ServiceMaster.objects.in_bulk(service_ids)
+        missing = sorted(service_ids - set(services))
+        if missing:
+            raise serializers.ValidationError({"upsert": f"Unknown services {missing}"})
+        for row in upserts:
+            if 'service' in row:
+                row['service'] = services[row['service']]
+        return attrs
+
+    @staticmethod
+    def _price(line, is_no_gst):
+        if is_no_gst:
+            line.gst_percentage = 0
+        line.base_amount, line.gst_amount, line.total_with_gst = line_amounts(
+            line.quantity, line.unit_price, line.gst_percentage,
+            line.mathadi_charges, line.transportation_charges,
+        )
+        line.fingerprint = line.compute_fingerprint()
+        return line
+
+    @transaction.atomic
+    def create(self, validated_data):
+        # Serialize concurrent bulk edits of the same version
+        version = QuotationVersion.objects.select_for_update().get(pk=validated_data['quotation_version'].pk)
+        is_no_gst = version.gst_type == "NO_GST"
+        updates = {row['id']: row for row in validated_data['upsert'] if 'id' in row}
+        additions = [row for row in validated_data['upsert'] if 'id' not in row]
+        delete_ids = set(validated_data['delete'])
+
+        current = [
+            link.service_item
+            for link in SERVICE.link_model.objects.filter(quotation_version=version)
+            .select_related('service_item__service')
+            .order_by('position', 'pk')
+        ]
+        shared = set(
+            SERVICE.link_model.objects.filter(service_item_id__in=[*updates, *delete_ids])
+            .exclude(quotation_version=version)
+            .values_list('service_item_id', flat=True)
+        )
+
+        lines = []
+        in_place = []
+        copies = []
+        for line in current:
+            if line.pk in delete_ids:
+                continue
+            row = updates.get(line.pk)
+            if row is not None:
+                if line.pk in shared:
+                    line.pk = None
+                    line.quotation_version = version
+                    copies.append(line)
+                else:
+                    in_place.append(line)
+                for name in QuotationServiceItemBulkLineSerializer.EDIT_FIELDS:
+                    if name in row and not (name == 'unit_price' and row[name] is None):
+                        setattr(line, name, row[name])
+                if 'service' in row:
+                    line.unit = row['service'].unit or line.unit
+                self._price(line, is_no_gst)
+            lines.append(line)
+
+        for row in additions:
+            service = row['service']
+            line = QuotationServiceItem(
+                quotation_version=version,
+                service=service,
+                unit=service.unit,
+                **{
+                    name: row[name]
+                    for name in QuotationServiceItemBulkLineSerializer.EDIT_FIELDS
+                    if name in row and name != 'service'
+                }
+            )
+            if line.unit_price is None:
+                line.unit_price = service.labor_rate
+            copies.append(self._price(line, is_no_gst))
+            lines.append(line)
+
+        if in_place:
+            now = timezone.now()
+            for line in in_place:
+                line.updated_at = now
+            QuotationServiceItem.objects.bulk_update(
+                in_place,
+                [*QuotationServiceItemBulkLineSerializer.EDIT_FIELDS, 'unit', 'base_amount',
+                 'gst_amount', 'total_with_gst', 'fingerprint', 'updated_at'],
+            )
+        if copies:
+            existing_pks = QuotationServiceItem.objects.filter(
+                quotation_version=version
+            ).values_list('pk', flat=True)
+            bulk_create_lines(SERVICE, copies, existing_pks=list(existing_pks))
+
+        # Relink the whole BOQ in its new order, then drop rows nobody uses
+        SERVICE.link_model.objects.filter(quotation_version=version).delete()
+        SERVICE.link_model.objects.bulk_create([
+            SERVICE.link_model(quotation_version=version, position=position, service_item_id=line.pk)
+            for position, line in enumerate(lines)
+        ])
+        orphaned = delete_ids - shared
+        if orphaned:
+            QuotationServiceItem.objects.filter(pk__in=orphaned).delete()
+
+        recalculate_version_totals(version)
+        if version.is_active:
+            # The grand total changed in place, which changed_months() can't see
+            mark_month_dirty(version.quotation.created_at)
+        self.summary = {
+            "created": len(additions),
+            "updated": len(updates),
+            "deleted": len(delete_ids),
+        }
+        return version
 
 
 # =====================================================
@@ -223,6 +457,40 @@ class QuotationVersionSerializer(serializers.ModelSerializer):
         return f"{obj.quotation.quotation_no}-R{obj.version_no}"    
 
 
+def serialize_version_diff(from_version, to_version, diff, context=None):
+    """JSON shape of versioning.diff_versions for the revision diff endpoint."""
+    line_serializers = {
+        "high_side_items": QuotationHighSideItemSerializer,
+        "low_side_items": QuotationLowSideItemSerializer,
+        "service_items": QuotationServiceItemSerializer,
+    }
+    data = {
+        "from_version": {"id": from_version.id, "version_no": from_version.version_no},
+        "to_version": {"id": to_version.id, "version_no": to_version.version_no},
+        "totals": diff["totals"],
+    }
+    for name, serializer_class in line_serializers.items():
+        lines = diff[name]
+
+        def dump(rows):
+            return serializer_class(rows, many=True, context=context).data
+
+        data[name] = {
+            "added": dump(lines["added"]),
+            "removed": dump(lines["removed"]),
+            "changed": [
+                {
+                    "from": dump([change["from"]])[0],
+                    "to": dump([change["to"]])[0],
+                    "fields": change["fields"],
+                }
+                for change in lines["changed"]
+            ],
+            "unchanged": lines["unchanged"],
+        }
+    return data
+
+
 # =====================================================
 # MAIN QUOTATION SERIALIZER
 # =====================================================
@@ -281,7 +549,11 @@ class QuotationSerializer(serializers.ModelSerializer):
     # =====================================================
     # 🔥 CORE CALCULATION ENGINE
     # =====================================================
-    def calculate_totals(self, version, high_items, low_items, service_items=None):
+    def calculate_totals(self, version, high_items, low_items, service_items=None, base_version=None):
+        """
+        Price the lines, store them for `version` and set the version totals.
+        With `base_version` (a revision), unchanged lines reuse its rows.
+        """
     
         version_subtotal = 0
         version_gst_total = 0
@@ -290,6 +562,7 @@ class QuotationSerializer(serializers.ModelSerializer):
         # =============================
         # HIGH SIDE
         # =============================
+        high_lines = []
         for item in high_items:
     
             qty = item["quantity"]
@@ -302,27 +575,25 @@ class QuotationSerializer(serializers.ModelSerializer):
             mathadi = item.get("mathadi_charges", 0)
             transport = item.get("transportation_charges", 0)
     
-            base_amount = qty * price
-    
             # GST ONLY ON BASE PRICE
-            gst_value = (base_amount * gst_percent) / 100
-    
-            total_with_gst = base_amount + gst_value + mathadi + transport
+            base_amount, gst_value, total_with_gst = line_amounts(
+                qty, price, gst_percent, mathadi, transport
+            )
     
             version_subtotal += base_amount + mathadi + transport
             version_gst_total += gst_value
     
-            QuotationHighSideItem.objects.create(
-                quotation_version=version,
+            high_lines.append(QuotationHighSideItem(
                 base_amount=base_amount,
                 gst_amount=gst_value,
                 total_with_gst=total_with_gst,
                 **item
-            )
+            ))
     
         # =============================
         # LOW SIDE
         # =============================
+        low_lines = []
         for item in low_items:
     
             qty = item["quantity"]
@@ -334,25 +605,24 @@ class QuotationSerializer(serializers.ModelSerializer):
             
             mathadi = item.get("mathadi_charges", 0)
     
-            base_amount = qty * price
-            gst_value = (base_amount * gst_percent) / 100
-    
-            total_with_gst = base_amount + gst_value + mathadi
+            base_amount, gst_value, total_with_gst = line_amounts(
+                qty, price, gst_percent, mathadi
+            )
     
             version_subtotal += base_amount + mathadi
             version_gst_total += gst_value
     
-            QuotationLowSideItem.objects.create(
-                quotation_version=version,
+            low_lines.append(QuotationLowSideItem(
                 base_amount=base_amount,
                 gst_amount=gst_value,
                 total_with_gst=total_with_gst,
                 **item
-            )
+            ))
             
         # =============================
         # SERVICE ITEMS
         # =============================
+        service_lines = []
         if service_items:
             for item in service_items:
                 qty = item["quantity"]
@@ -365,42 +635,31 @@ class QuotationSerializer(serializers.ModelSerializer):
                 mathadi = item.get("mathadi_charges", 0)
                 transport = item.get("transportation_charges", 0)
                 
-                base_amount = qty * price
-                gst_value = (base_amount * gst_percent) / 100
-                total_with_gst = base_amount + gst_value + mathadi + transport
+                base_amount, gst_value, total_with_gst = line_amounts(
+                    qty, price, gst_percent, mathadi, transport
+                )
                 
                 version_subtotal += base_amount + mathadi + transport
                 version_gst_total += gst_value
                 
-                QuotationServiceItem.objects.create(
-                    quotation_version=version,
+                service_lines.append(QuotationServiceItem(
                     base_amount=base_amount,
                     gst_amount=gst_value,
                     total_with_gst=total_with_gst,
                     **item
-                )
+                ))
+
+        # =============================
+        # STORE (copy-on-write)
+        # =============================
+        store_version_lines(version, HIGH_SIDE, high_lines, base_version)
+        store_version_lines(version, LOW_SIDE, low_lines, base_version)
+        store_version_lines(version, SERVICE, service_lines, base_version)
     
         # =============================
         # GST SPLIT
         # =============================
-        if is_no_gst:
-            version.cgst_amount = 0
-            version.sgst_amount = 0
-            version.igst_amount = 0
-            version_gst_total = 0
-        elif version.gst_type == "CGST_SGST":
-            version.cgst_amount = version_gst_total / 2
-            version.sgst_amount = version_gst_total / 2
-            version.igst_amount = 0
-        else:
-            version.igst_amount = version_gst_total
-            version.cgst_amount = 0
-            version.sgst_amount = 0
-    
-        version.subtotal = version_subtotal
-        version.gst_amount = version_gst_total
-        version.total_amount = version_subtotal + version_gst_total
-        version.grand_total = version.total_amount
+        apply_version_totals(version, version_subtotal, version_gst_total)
     
         version.save()
        
@@ -428,45 +687,19 @@ class QuotationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("At least one high side item is required")
     
         # ======================================
-        # STEP 1️⃣ CREATE QUOTATION FIRST
+        # STEP 1️⃣ NUMBER FROM THE FIRST HIGH SIDE ITEM'S AC TYPE
         # ======================================
 
+        ac_code = ac_code_for_variant(high_items[0]["product_variant"])
         quotation = Quotation.objects.create(
-            quotation_no="TEMP",   # temporary value
+            quotation_no=next_quotation_no(ac_code),
             **validated_data
         )
 
-        
         # Set many-to-many field after creation
         if terms_conditions:
             quotation.terms_conditions.set(terms_conditions)
-    
-        # ======================================
-        # STEP 2️⃣ BUILD NUMBER USING DB ID
-        # ======================================
-    
-        first_variant = high_items[0]["product_variant"]
-    
-        ac_type_name = (
-            first_variant
-            .product_model
-            .ac_sub_type_id
-            .ac_type_id
-            .name
-        )
-    
-        ac_code = ac_type_name[:3].upper()
-    
-        now = datetime.now()
-        year = str(now.year)[-2:]
-        month = str(now.month).zfill(2)
-    
-        # ⭐ USE DATABASE ID INSTEAD OF RANDOM
-        quotation_no = f"KA/{ac_code}/{year}/{month}{quotation.id}"
-    
-        quotation.quotation_no = quotation_no
-        quotation.save(update_fields=["quotation_no"])
-    
+
         # ======================================
         # CREATE VERSION
         # ======================================
@@ -538,6 +771,9 @@ class QuotationSerializer(serializers.ModelSerializer):
             **version_data
         )
 
-        self.calculate_totals(new_version, high_items, low_items, service_items)
+        # Unchanged lines keep pointing at the rows of the previous revision
+        self.calculate_totals(
+            new_version, high_items, low_items, service_items, base_version=old_version
+        )
 
         return instance
@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from product_management.models import (
+    ProductModel,
+    acSubTypes,
+    acType,
+    brand,
+    feature_type,
+    item,
+    item_class,
+    item_type,
+    material_type,
+)
+
+from .analytics import mark_month_dirty
+from .catalogue import bump_catalogue_version
+from .models import Quotation, QuotationVersion, ServiceMaster
+from .numbering import invalidate_ac_code_map
+
+
+def _invalidate_catalogue(**kwargs):
+    # After commit, so a concurrent request can't re-cache pre-commit data
+    transaction.on_commit(bump_catalogue_version)
+
+
+# Services themselves and the items / item attributes shown in the catalogue
+for model in (ServiceMaster, item, material_type, item_type, feature_type, item_class, brand):
+    post_save.connect(_invalidate_catalogue, sender=model, dispatch_uid=f"catalogue_save_{model.__name__}")
+    post_delete.connect(_invalidate_catalogue, sender=model, dispatch_uid=f"catalogue_delete_{model.__name__}")
+
+
+@receiver(m2m_changed, sender=ServiceMaster.items.through)
+def service_items_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        _invalidate_catalogue()
+
+
+def _invalidate_ac_codes(**kwargs):
+    transaction.on_commit(invalidate_ac_code_map)
+
+
+# Product model -> AC type code map used for quotation numbers
+for model in (ProductModel, acSubTypes, acType):
+    post_save.connect(_invalidate_ac_codes, sender=model, dispatch_uid=f"ac_codes_save_{model.__name__}")
+    post_delete.connect(_invalidate_ac_codes, sender=model, dispatch_uid=f"ac_codes_delete_{model.__name__}")
+
+
+# Pipeline rollups: builds find new and revised quotations by created_at,
+# deletions have to leave a mark on the month instead
+@receiver(post_delete, sender=Quotation)
+def quotation_deleted(sender, instance, **kwargs):
+    mark_month_dirty(instance.created_at)
+
+
+def _mark_quotation_month(quotation_id):
+    created_at = Quotation.objects.filter(pk=quotation_id).values_list("created_at", flat=True).first()
+    # Gone already: the quotation's own post_delete marks the month
+    if created_at is not None:
+        mark_month_dirty(created_at)
+
+
+@receiver(post_delete, sender=QuotationVersion)
+def quotation_version_deleted(sender, instance, **kwargs):
+    # Another revision becomes the active one
+    _mark_quotation_month(instance.quotation_id)
+
+
+@receiver(post_delete, sender="invoice.Invoice")
+def invoice_deleted(sender, instance, **kwargs):
+    # The quotation goes back from converted to open
+    if instance.quotation_id:
+        _mark_quotation_month(instance.quotation_id)
@@ -1,3 +1,964 @@
-from django.test import TestCase
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from pypdf import PdfReader, PdfWriter
+from rest_framework.test import APIClient
+
+from api.models import CustomUser
+from invoice.filters import InvoiceFilter
+from invoice.models import Invoice
+from invoice.service import INVOICE_TOTAL_FIELDS
+from lead_management.models import Customer
+from product_management.models import (
+    ProductModel,
+    ProductVariant,
+    acSubTypes,
+    acType,
+    brand,
+    item,
+    item_type,
+    material_type,
+)
+
+from .analytics import all_months, build_rollups, changed_months, last_build
+from .catalogue import get_catalogue_snapshot
+from .filters import QuotationFilter
+from .models import (
+    Quotation,
+    QuotationHighSideItem,
+    QuotationLowSideItem,
+    QuotationNumberSequence,
+    QuotationRollup,
+    QuotationRollupDirtyMonth,
+    QuotationServiceItem,
+    QuotationVersion,
+    ServiceMaster,
+)
+from .numbering import ac_code_for_variant, next_quotation_no, quotation_prefix
+from .repricing import reprice_batch
+from .utils.pdf_generator import (
+    PDF_ENGINE_SECTIONS,
+    PDF_ENGINE_WEASYPRINT,
+    _build_quotation_pdf_context,
+    _chunk_groups,
+    iter_quotation_html_sections,
+    quotation_pdf_source,
+    render_quotation_html,
+    render_quotation_pdf_sections,
+)
+from .versioning import (
+    HIGH_SIDE,
+    LINE_KINDS,
+    LOW_SIDE,
+    SERVICE,
+    VERSION_TOTAL_FIELDS,
+    detach_line,
+    diff_versions,
+    version_lines,
+)
+
+
+class DateRangeFilterIndexTests(TestCase):
+    """
+    Date filters on the quotation and invoice lists must compare the raw
+    indexed column (no DATE() cast) so the database can do a range scan.
+    """
+
+    START = date(2025, 1, 1)
+    DAYS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name="Index Test Customer", contact_number="9000000001")
+        tz = timezone.get_current_timezone()
+
+        Quotation.objects.bulk_create([
+            Quotation(
+                quotation_no=f"IDX-Q-{i}",
+                customer=customer,
+                subject="Index test",
+                thank_you_note="Thanks",
+            )
+            for i in range(cls.DAYS)
+        ])
+        # created_at is auto_now_add, spread the rows over the test period afterwards
+        for i, pk in enumerate(Quotation.objects.order_by("pk").values_list("pk", flat=True)):
+            Quotation.objects.filter(pk=pk).update(
+                created_at=timezone.make_aware(
+                    datetime.combine(cls.START + timedelta(days=i), time(10, 30)), tz
+                )
+            )
+
+        Invoice.objects.bulk_create([
+            Invoice(
+                invoice_no=f"IDX-I-{i}",
+                customer=customer,
+                invoice_date=cls.START + timedelta(days=i),
+                buyer_name="Buyer",
+                buyer_address="Address",
+                bank_name="Bank",
+                account_no="0000",
+                ifsc_code="IFSC0000",
+            )
+            for i in range(cls.DAYS)
+        ])
+
+    def explain(self, queryset):
+        return queryset.explain().lower()
+
+    def assert_uses_index(self, queryset, index_name):
+        plan = self.explain(queryset)
+        self.assertIn(index_name, plan, plan)
+        if connection.vendor == "mysql":
+            # EXPLAIN type column: range scan, not a full table scan (ALL)
+            self.assertIn("range", plan, plan)
+
+    def test_quotation_date_filter_is_half_open_range(self):
+        qs = QuotationFilter(
+            {"date_from": "2025-02-01", "date_to": "2025-02-07"},
+            queryset=Quotation.objects.all(),
+        ).qs
+
+        sql = str(qs.query).lower()
+        self.assertNotIn("date(", sql)
+        self.assertNotIn("cast_date", sql)
+        self.assertEqual(qs.count(), 7)
+
+    def test_quotation_date_to_includes_whole_day(self):
+        qs = QuotationFilter({"date_to": "2025-01-01"}, queryset=Quotation.objects.all()).qs
+        self.assertEqual(list(qs.values_list("quotation_no", flat=True)), ["IDX-Q-0"])
+
+    @skipUnless(connection.vendor in ("mysql", "sqlite"), "EXPLAIN output is checked for MySQL and SQLite")
+    def test_quotation_date_filter_uses_created_at_index(self):
+        qs = QuotationFilter(
+            {"date_from": "2025-02-01", "date_to": "2025-02-07"},
+            queryset=Quotation.objects.all(),
+        ).qs
+        self.assert_uses_index(qs, "quotation_created_at_idx")
+
+    @skipUnless(connection.vendor in ("mysql", "sqlite"), "EXPLAIN output is checked for MySQL and SQLite")
+    def test_invoice_date_filter_uses_invoice_date_index(self):
+        qs = InvoiceFilter(
+            {"date_from": "2025-02-01", "date_to": "2025-02-07"},
+            queryset=Invoice.objects.all(),
+        ).qs
+        self.assertEqual(qs.count(), 7)
+        self.assert_uses_index(qs, "invoice_invoice_date_idx")
+
+
+class QuotationAPITestCase(TestCase):
+    """Customer, products, items and services to build quotations from through the API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email="quotation-tests@example.com", password="x")
+        cls.customer = Customer.objects.create(name="Customer", contact_number="9000000033")
+
+        cls.ac_type = acType.objects.create(name="VRF System")
+        cls.product_model = ProductModel.objects.create(
+            name="Model",
+            ac_sub_type_id=acSubTypes.objects.create(ac_type_id=cls.ac_type, name="Cassette"),
+            brand_id=brand.objects.create(name="Brand"),
+            model_no="M1",
+        )
+        cls.variants = [
+            ProductVariant.objects.create(product_model=cls.product_model, capacity=f"{i}T", sku=f"QUO-TEST-{i}")
+            for i in range(4)
+        ]
+        copper = material_type.objects.create(name="Copper")
+        pipe = item_type.objects.create(name="Pipe")
+        cls.items = [
+            item.objects.create(item_code=f"QUO-TEST-{i}", material_type_id=copper, item_type_id=pipe)
+            for i in range(3)
+        ]
+        cls.services = [
+            ServiceMaster.objects.create(name=f"Service {i}", unit="NOS", labor_rate=Decimal("500"))
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _high(self, index, unit_price="1000.00", quantity=2):
+        return {
+            "product_variant": self.variants[index].pk, "quantity": quantity,
+            "unit_price": unit_price, "gst_percent": "18",
+        }
+
+    def _low(self, index, unit_price="50.00", quantity=3):
+        return {"item": self.items[index].pk, "quantity": quantity, "unit_price": unit_price, "gst_percent": "18"}
+
+    def _service(self, index, unit_price="500.00", quantity="1.00"):
+        return {
+            "service": self.services[index].pk, "quantity": quantity, "unit": "NOS",
+            "unit_price": unit_price, "gst_percentage": "18",
+        }
+
+    def _payload(self, high, low=(), services=(), gst_type="CGST_SGST"):
+        return {
+            "customer": self.customer.pk,
+            "subject": "Subject",
+            "thank_you_note": "Thanks",
+            "versions": [{
+                "gst_type": gst_type,
+                "high_side_items": list(high),
+                "low_side_items": list(low),
+                "service_items": list(services),
+            }],
+        }
+
+    def _create(self, high, low=(), services=(), **kwargs):
+        response = self.client.post("/quotation/quotation/", self._payload(high, low, services, **kwargs), format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        return Quotation.objects.get(pk=response.data["id"])
+
+    def _revise(self, quotation, high, low=(), services=(), **kwargs):
+        """PUT a new revision; returns it (the active version)."""
+        response = self.client.put(
+            f"/quotation/quotation/{quotation.pk}/", self._payload(high, low, services, **kwargs), format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return quotation.versions.get(is_active=True)
+
+    def _line_ids(self, version, kind=HIGH_SIDE):
+        return list(version_lines(version, kind).values_list("pk", flat=True))
+
+    @staticmethod
+    def _without_returned_pks(model):
+        """Patch model.objects.bulk_create to leave pks unset, as on MySQL (no INSERT ... RETURNING)."""
+        bulk_create = model.objects.bulk_create
+
+        def without_pks(objs, *args, **kwargs):
+            created = bulk_create(objs, *args, **kwargs)
+            for obj in objs:
+                obj.pk = None
+            return created
+
+        return mock.patch.object(model.objects, "bulk_create", side_effect=without_pks)
+
+
+class CopyOnWriteVersionTests(QuotationAPITestCase):
+    """Revisions share unchanged line rows and only store added or edited lines."""
+
+    def test_revision_reuses_unchanged_rows(self):
+        quotation = self._create(
+            [self._high(0), self._high(1), self._high(2)], [self._low(0), self._low(1)], [self._service(0)]
+        )
+        first = quotation.versions.get()
+        first_high = self._line_ids(first)
+
+        # One price edited, the BOQ reordered; low side and services untouched
+        second = self._revise(
+            quotation,
+            [self._high(2), self._high(0), self._high(1, unit_price="1200.00")],
+            [self._low(0), self._low(1)],
+            [self._service(0)],
+        )
+        second_high = self._line_ids(second)
+
+        self.assertFalse(QuotationVersion.objects.get(pk=first.pk).is_active)
+        self.assertEqual(QuotationHighSideItem.objects.count(), 4)
+        self.assertEqual(QuotationLowSideItem.objects.count(), 2)
+        self.assertEqual(QuotationServiceItem.objects.count(), 1)
+        self.assertEqual(second_high[:2], [first_high[2], first_high[0]])
+        self.assertNotIn(second_high[2], first_high)
+        self.assertEqual(self._line_ids(second, SERVICE), self._line_ids(first, SERVICE))
+        # The earlier revision still reads its own lines
+        self.assertEqual(self._line_ids(first), first_high)
+        self.assertEqual(
+            [line.unit_price for line in version_lines(first, HIGH_SIDE)], [Decimal("1000.00")] * 3
+        )
+        self.assertEqual(second.grand_total - first.grand_total, Decimal("472.00"))
+
+    def test_deleting_a_revision_keeps_rows_later_ones_use(self):
+        quotation = self._create([self._high(0), self._high(1)])
+        first = quotation.versions.get()
+        second = self._revise(quotation, [self._high(0), self._high(1, unit_price="1200.00")])
+        third = self._revise(quotation, [self._high(0), self._high(1, unit_price="1300.00")])
+        shared = self._line_ids(first)[0]
+
+        first.delete()
+
+        # The shared row moves to the oldest revision still linking it
+        self.assertEqual(QuotationHighSideItem.objects.get(pk=shared).quotation_version_id, second.pk)
+        self.assertEqual(QuotationHighSideItem.objects.count(), 3)
+        self.assertEqual(self._line_ids(second)[0], shared)
+        self.assertEqual(self._line_ids(third)[0], shared)
+
+        # And again through the endpoint, deleting the revision that now owns it
+        response = self.client.delete(f"/quotation/quotation/{quotation.pk}/version/{second.pk}/delete/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(QuotationHighSideItem.objects.get(pk=shared).quotation_version_id, third.pk)
+        self.assertEqual(
+            [line.unit_price for line in version_lines(third, HIGH_SIDE)],
+            [Decimal("1000.00"), Decimal("1300.00")],
+        )
+
+    def test_editing_a_shared_line_copies_it(self):
+        quotation = self._create([self._high(0)], services=[self._service(0), self._service(1)])
+        first = quotation.versions.get()
+        second = self._revise(quotation, [self._high(0)], services=[self._service(0), self._service(1)])
+        shared = QuotationServiceItem.objects.get(pk=self._line_ids(first, SERVICE)[1])
+
+        # Through the endpoint: the edit applies to the newest revision only
+        response = self.client.patch(
+            f"/quotation/quotation-service-items/{shared.pk}/", {"quantity": "4.00"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        copy_id = response.data["id"]
+        self.assertNotEqual(copy_id, shared.pk)
+        self.assertEqual(self._line_ids(second, SERVICE), [self._line_ids(first, SERVICE)[0], copy_id])
+        self.assertEqual(QuotationServiceItem.objects.get(pk=shared.pk).quantity, Decimal("1.00"))
+        copy = QuotationServiceItem.objects.get(pk=copy_id)
+        self.assertEqual((copy.quantity, copy.base_amount), (Decimal("4.00"), Decimal("2000.00")))
+        self.assertEqual(copy.fingerprint, copy.compute_fingerprint())
+
+        # A row used by this revision alone is edited in place
+        self.assertEqual(detach_line(second, SERVICE, copy), copy)
+        self.assertEqual(QuotationServiceItem.objects.count(), 3)
+
+    def test_rows_get_their_pks_when_bulk_create_returns_none(self):
+        quotation = self._create([self._high(0)])
+
+        # Two identical new lines: interchangeable rows, each linked once
+        with self._without_returned_pks(QuotationHighSideItem) as patched:
+            second = self._revise(
+                quotation, [self._high(0), self._high(1, quantity=1), self._high(1, quantity=1)]
+            )
+        patched.assert_called_once()
+
+        line_ids = self._line_ids(second)
+        self.assertEqual(len(set(line_ids)), 3)
+        self.assertEqual(
+            set(QuotationHighSideItem.objects.filter(quotation_version=second).values_list("pk", flat=True)),
+            set(line_ids[1:]),
+        )
+
+    def test_migration_links_existing_rows_in_id_order(self):
+        quotation = self._create(
+            [self._high(0), self._high(1), self._high(2)], [self._low(0)], [self._service(0), self._service(1)]
+        )
+        version = quotation.versions.get()
+        expected = {kind.name: sorted(self._line_ids(version, kind)) for kind in LINE_KINDS}
+        # As before the migration: rows owned by their version, no links or fingerprints
+        for kind in LINE_KINDS:
+            kind.link_model.objects.all().delete()
+            kind.model.objects.update(fingerprint="")
+
+        migration = import_module("quotation.migrations.0006_copy_on_write_version_lines")
+        migration.link_existing_lines(apps, None)
+
+        for kind in LINE_KINDS:
+            self.assertEqual(self._line_ids(version, kind), expected[kind.name])
+            for line in kind.model.objects.all():
+                self.assertEqual(line.fingerprint, line.compute_fingerprint())
+
+    def test_diff_versions(self):
+        quotation = self._create([self._high(0), self._high(1), self._high(2)], services=[self._service(0)])
+        first = quotation.versions.get()
+        second = self._revise(
+            quotation,
+            [self._high(0), self._high(1, unit_price="1200.00"), self._high(3)],
+            services=[self._service(0)],
+        )
+
+        diff = diff_versions(first, second)
+        high = diff["high_side_items"]
+        self.assertEqual(high["unchanged"], 1)
+        self.assertEqual([line.product_variant_id for line in high["added"]], [self.variants[3].pk])
+        self.assertEqual([line.product_variant_id for line in high["removed"]], [self.variants[2].pk])
+        self.assertEqual(len(high["changed"]), 1)
+        self.assertEqual(
+            high["changed"][0]["fields"],
+            {"unit_price": {"from": Decimal("1000.00"), "to": Decimal("1200.00")}},
+        )
+        self.assertEqual(diff["service_items"]["unchanged"], 1)
+        self.assertEqual(diff["low_side_items"], {"added": [], "removed": [], "changed": [], "unchanged": 0})
+        self.assertEqual(diff["totals"]["subtotal"]["delta"], Decimal("400.00"))
+        self.assertEqual(diff["totals"]["grand_total"]["delta"], Decimal("472.00"))
+
+        response = self.client.get(f"/quotation/quotation/{quotation.pk}/diff/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["from_version"]["id"], first.pk)
+        self.assertEqual(response.data["high_side_items"]["changed"][0]["to"]["unit_price"], "1200.00")
+
+
+class QuotationRollupTests(QuotationAPITestCase):
+    """An incremental rollup build gives the same rows as a full rebuild."""
+
+    def _rollups(self):
+        return sorted(
+            QuotationRollup.objects.values_list("branch_id", "month", "ac_type_id", "status", "quotation_count", "value"),
+            key=str,
+        )
+
+    def assert_matches_full_rebuild(self):
+        build_rollups(changed_months(last_build()))
+        incremental = self._rollups()
+        self.assertFalse(QuotationRollupDirtyMonth.objects.exists())
+
+        build_rollups(all_months(), full=True)
+        self.assertEqual(incremental, self._rollups())
+        return incremental
+
+    def _in_march(self, quotation):
+        Quotation.objects.filter(pk=quotation.pk).update(
+            created_at=timezone.make_aware(datetime(2026, 3, 10, 12, 0), timezone.get_current_timezone())
+        )
+
+    def _convert(self, quotation):
+        return Invoice.objects.create(
+            invoice_no=f"ROLLUP-{quotation.pk}",
+            quotation=quotation,
+            customer=self.customer,
+            invoice_date=date(2026, 4, 1),
+            buyer_name="Buyer",
+            buyer_address="Address",
+            bank_name="Bank",
+            account_no="1",
+            ifsc_code="IFSC",
+        )
+
+    def test_rollups_follow_deletions(self):
+        revised = self._create([self._high(0)])
+        first = revised.versions.get()
+        second = self._revise(revised, [self._high(0, unit_price="3000.00")])
+        converted = self._create([self._high(1)])
+        dropped = self._create([self._high(2)])
+        self._in_march(revised)
+        self._in_march(dropped)
+        build_rollups(all_months(), full=True)
+
+        invoice = self._convert(converted)
+        rows = self.assert_matches_full_rebuild()
+        self.assertIn(QuotationRollup.STATUS_CONVERTED, [row[3] for row in rows])
+
+        # Converted back to open
+        invoice.delete()
+        rows = self.assert_matches_full_rebuild()
+        self.assertNotIn(QuotationRollup.STATUS_CONVERTED, [row[3] for row in rows])
+
+        # The older revision (created before the last build) is active again
+        response = self.client.delete(f"/quotation/quotation/{revised.pk}/version/{second.pk}/delete/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(QuotationVersion.objects.get(pk=first.pk).is_active)
+        self.assert_matches_full_rebuild()
+
+        dropped.delete()
+        rows = self.assert_matches_full_rebuild()
+        march = [row for row in rows if row[1] == date(2026, 3, 1) and row[2] is None]
+        self.assertEqual([(row[4], row[5]) for row in march], [(1, first.grand_total)])
+
+    def test_rollups_follow_bulk_service_edits(self):
+        quotation = self._create([self._high(0)], services=[self._service(0)])
+        version = quotation.versions.get()
+        build_rollups(all_months(), full=True)
+
+        response = self.client.post(
+            "/quotation/quotation-service-items/bulk/",
+            {"quotation_version": version.pk, "upsert": [{"service": self.services[1].pk, "quantity": "2.00"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+        rows = self.assert_matches_full_rebuild()
+        version.refresh_from_db()
+        self.assertEqual([row[5] for row in rows if row[2] is None], [version.grand_total])
+
+
+class RepricingTests(QuotationAPITestCase):
+    """reprice_quotations writes R+1 revisions sharing every line it doesn't reprice."""
+
+    def setUp(self):
+        super().setUp()
+        self.quotation = self._create(
+            [self._high(0), self._high(1)], [self._low(0)], [self._service(0)]
+        )
+        self.old = self.quotation.versions.get()
+        ProductVariant.objects.filter(pk=self.variants[0].pk).update(dp=Decimal("1100.00"))
+
+    def _reprice(self, *args):
+        out = StringIO()
+        call_command("reprice_quotations", "--variant", str(self.variants[0].pk), *args, stdout=out)
+        return out.getvalue()
+
+    def _assert_repriced(self, new):
+        old_high = self._line_ids(self.old)
+        new_high = self._line_ids(new)
+        self.assertEqual(new.version_no, f"{self.quotation.quotation_no}-R2")
+        self.assertFalse(QuotationVersion.objects.get(pk=self.old.pk).is_active)
+        self.assertNotIn(new_high[0], old_high)
+        self.assertEqual(new_high[1], old_high[1])
+        for kind in (LOW_SIDE, SERVICE):
+            self.assertEqual(self._line_ids(new, kind), self._line_ids(self.old, kind))
+        self.assertEqual(QuotationHighSideItem.objects.count(), 3)
+        self.assertEqual(
+            [line.unit_price for line in version_lines(new, HIGH_SIDE)], [Decimal("1100.00"), Decimal("1000.00")]
+        )
+
+    def test_reprice_writes_a_revision_sharing_untouched_lines(self):
+        self.assertIn("DRY RUN", self._reprice("--dry-run"))
+        self.assertEqual(self.quotation.versions.count(), 1)
+        self.assertEqual(QuotationHighSideItem.objects.count(), 2)
+
+        self._reprice()
+        new = self.quotation.versions.get(is_active=True)
+        self._assert_repriced(new)
+
+        # Same totals as a quotation saved through the serializer at these prices
+        saved = self._create(
+            [self._high(0, unit_price="1100.00"), self._high(1)], [self._low(0)], [self._service(0)]
+        ).versions.get()
+        for field in VERSION_TOTAL_FIELDS:
+            self.assertEqual(getattr(new, field), getattr(saved, field), field)
+
+        # Already at the list price: nothing left to do
+        self._reprice()
+        self.assertEqual(self.quotation.versions.count(), 2)
+
+    def test_versions_and_lines_get_their_pks_when_bulk_create_returns_none(self):
+        with self._without_returned_pks(QuotationVersion), self._without_returned_pks(QuotationHighSideItem):
+            results = reprice_batch([self.old.pk], {self.variants[0].pk: Decimal("1100.00")})
+
+        self.assertEqual([result.lines_repriced for result in results], [1])
+        self.assertEqual(results[0].delta, Decimal("236.00"))
+        self._assert_repriced(self.quotation.versions.get(is_active=True))
+
+
+class QuotationNumberingTests(QuotationAPITestCase):
+    """KA/<AC code>/<yy>/<mm><n> numbers from a per-prefix counter."""
+
+    WHEN = datetime(2026, 4, 15, 12, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_counter_starts_after_old_numbers(self):
+        for quotation_no in ("KA/VRF/26/047", "KA/VRF/26/0412", "KA/VRF/26/0412-OLD", "KA/SPL/26/0499"):
+            Quotation.objects.create(
+                quotation_no=quotation_no, customer=self.customer, subject="Old", thank_you_note="Thanks"
+            )
+
+        self.assertEqual(next_quotation_no("VRF", self.WHEN), "KA/VRF/26/0413")
+        self.assertEqual(next_quotation_no("VRF", self.WHEN), "KA/VRF/26/0414")
+        self.assertEqual(next_quotation_no("VRF", self.WHEN + timedelta(days=30)), "KA/VRF/26/051")
+        self.assertEqual(next_quotation_no("CAS", self.WHEN), "KA/CAS/26/041")
+
+        quotation = self._create([self._high(0)])
+        self.assertRegex(quotation.quotation_no, r"^KA/VRF/\d{2}/\d{2}\d+$")
+        self.assertEqual(quotation.versions.get().version_no, f"{quotation.quotation_no}-R1")
+
+    def test_counter_created_concurrently(self):
+        prefix = quotation_prefix("VRF", self.WHEN)
+
+        def created_meanwhile(prefix):
+            # Another request creates the counter after our locking read found none
+            QuotationNumberSequence.objects.create(prefix=prefix, last_value=7)
+            return 0
+
+        with mock.patch("quotation.numbering._highest_issued", side_effect=created_meanwhile):
+            self.assertEqual(next_quotation_no("VRF", self.WHEN), f"{prefix}8")
+        self.assertEqual(QuotationNumberSequence.objects.get(prefix=prefix).last_value, 8)
+
+    @override_settings(TIME_ZONE="Asia/Kolkata")
+    def test_month_is_local(self):
+        # 20:00 UTC on 31 March is 1:30 on 1 April in India
+        self.assertEqual(quotation_prefix("VRF", datetime(2026, 3, 31, 20, 0, tzinfo=dt_timezone.utc)), "KA/VRF/26/04")
+
+    def test_ac_code_map_follows_product_changes(self):
+        variant = self.variants[0]
+        self.assertEqual(ac_code_for_variant(variant), "VRF")
+        with self.assertNumQueries(0):
+            self.assertEqual(ac_code_for_variant(variant), "VRF")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ac_type.name = "Ductable"
+            self.ac_type.save()
+        self.assertEqual(ac_code_for_variant(variant), "DUC")
+
+        # Moved to another sub type / AC type
+        other = acSubTypes.objects.create(ac_type_id=acType.objects.create(name="Split"), name="Wall")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product_model.ac_sub_type_id = other
+            self.product_model.save()
+        self.assertEqual(ac_code_for_variant(variant), "SPL")
+
+        # A model added after the map was cached is looked up anyway
+        new_model = ProductModel.objects.create(
+            name="New", ac_sub_type_id=other, brand_id=self.product_model.brand_id, model_no="M2"
+        )
+        cache.set("quotation_numbering:ac_codes", {self.product_model.pk: "SPL"})
+        new_variant = ProductVariant.objects.create(product_model=new_model, capacity="2T", sku="QUO-TEST-NEW")
+        self.assertEqual(ac_code_for_variant(new_variant), "SPL")
+
+
+class ServiceItemBulkEditTests(QuotationAPITestCase):
+    """Bulk service line edits are copy-on-write and recompute the totals once."""
+
+    def _bulk(self, version, upsert=(), delete=()):
+        return self.client.post(
+            "/quotation/quotation-service-items/bulk/",
+            {"quotation_version": version.pk, "upsert": list(upsert), "delete": list(delete)},
+            format="json",
+        )
+
+    def _values(self, version):
+        return [(line.pk, line.service_id, line.quantity) for line in version_lines(version, SERVICE)]
+
+    def test_edits_leave_earlier_revisions_unchanged(self):
+        services = [self._service(0), self._service(1), self._service(2)]
+        quotation = self._create([self._high(0)], services=services)
+        first = quotation.versions.get()
+        second = self._revise(quotation, [self._high(0)], services=services)
+        before = self._values(first)
+        kept, edited, deleted = [pk for pk, *_ in before]
+
+        response = self._bulk(
+            second,
+            upsert=[{"id": edited, "quantity": "3.00"}, {"service": self.services[0].pk, "quantity": "2.00"}],
+            delete=[deleted],
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["summary"], {"created": 1, "updated": 1, "deleted": 1})
+
+        self.assertEqual(self._values(first), before)
+        lines = self._values(second)
+        self.assertEqual(lines[0], before[0])
+        self.assertNotEqual(lines[1][0], edited)
+        self.assertEqual(lines[1][1:], (self.services[1].pk, Decimal("3.00")))
+        self.assertEqual(lines[2][1:], (self.services[0].pk, Decimal("2.00")))
+        self.assertTrue(QuotationServiceItem.objects.filter(pk=deleted).exists())
+        self.assertEqual([row["id"] for row in response.data["service_items"]], [pk for pk, *_ in lines])
+
+        # 2000 high side + 500 + 1500 + 1000 services, 18% GST
+        second.refresh_from_db()
+        self.assertEqual(
+            (second.subtotal, second.cgst_amount, second.grand_total),
+            (Decimal("5000.00"), Decimal("450.00"), Decimal("5900.00")),
+        )
+        self.assertEqual(Decimal(response.data["grand_total"]), second.grand_total)
+        first.refresh_from_db()
+        self.assertEqual(first.grand_total, Decimal("4130.00"))
+
+        # The copy belongs to this revision alone: edited in place now
+        rows = QuotationServiceItem.objects.count()
+        response = self._bulk(second, upsert=[{"id": lines[1][0], "quantity": "4.00"}], delete=[lines[2][0]])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self._values(second), [before[0], (lines[1][0], self.services[1].pk, Decimal("4.00"))])
+        self.assertEqual(QuotationServiceItem.objects.count(), rows - 1)
+
+    def test_invalid_ids_are_rejected(self):
+        quotation = self._create([self._high(0)], services=[self._service(0), self._service(1)])
+        version = quotation.versions.get()
+        line, other_line = self._line_ids(version, SERVICE)
+        foreign = self._line_ids(self._create([self._high(1)], services=[self._service(2)]).versions.get(), SERVICE)
+
+        response = self._bulk(version, upsert=[{"id": foreign[0], "quantity": "2.00"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("are not lines of version", str(response.data["upsert"]))
+
+        response = self._bulk(version, delete=foreign)
+        self.assertEqual(response.status_code, 400)
+
+        for upsert, delete in (([{"id": line, "quantity": "2.00"}], [line]), ([{"id": line}, {"id": line}], [])):
+            response = self._bulk(version, upsert=upsert, delete=delete)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("only be updated or deleted once", str(response.data["upsert"]))
+
+        response = self._bulk(version, upsert=[{"service": 999999, "quantity": "1.00"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._line_ids(version, SERVICE), [line, other_line])
+
+
+class QuotationInvoiceConversionTests(QuotationAPITestCase):
+    """POST /invoice/invoice/from-quotation/ bills the active revision server side."""
+
+    BANK = {"bank_name": "Bank", "account_no": "1", "ifsc_code": "IFSC"}
+
+    def _convert(self, version, **data):
+        return self.client.post(
+            "/invoice/invoice/from-quotation/", {"quotation_version": version.pk, **self.BANK, **data}, format="json"
+        )
+
+    def test_quantities_totals_and_summary(self):
+        quotation = self._create(
+            [
+                self._high(0),
+                {**self._high(1, unit_price="500.00", quantity=1), "mathadi_charges": "100", "transportation_charges": "50"},
+            ],
+            [{**self._low(0), "mathadi_charges": "20"}, self._low(1)],
+            [self._service(0)],
+        )
+        version = quotation.versions.get()
+        high, low = self._line_ids(version), self._line_ids(version, LOW_SIDE)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self._convert(
+                version, invoice_no="CONV-1",
+                high_side_quantities={str(high[0]): "1.00"}, low_side_quantities={str(low[1]): "0"},
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+
+        # One INSERT for the invoice and none of the totals written afterwards
+        table = connection.ops.quote_name(Invoice._meta.db_table)
+        writes = [
+            query["sql"].split()[0] for query in queries.captured_queries
+            if query["sql"].startswith((f"INSERT INTO {table}", f"UPDATE {table}"))
+        ]
+        self.assertEqual(writes, ["INSERT"])
+
+        invoice = Invoice.objects.get(pk=response.data["id"])
+        self.assertEqual((invoice.quotation_id, invoice.customer_id), (quotation.pk, self.customer.pk))
+        self.assertEqual(
+            [(line.product_variant_id, line.quantity, line.rate) for line in invoice.high_side_items.order_by("pk")],
+            [(self.variants[0].pk, Decimal("1.00"), Decimal("1000.00")), (self.variants[1].pk, Decimal("1.00"), Decimal("500.00"))],
+        )
+        self.assertEqual(
+            [(line.item_id, line.quantity) for line in invoice.low_side_items.all()], [(self.items[0].pk, Decimal("3.00"))]
+        )
+        self.assertEqual(
+            response.data["conversion"],
+            {
+                "quotation_id": quotation.pk,
+                "quotation_version_id": version.pk,
+                "high_side_lines": 2,
+                "low_side_lines": 1,
+                "skipped_service_lines": 1,
+                # Mathadi / transportation of the billed lines only
+                "unbilled_charges": Decimal("170.00"),
+            },
+        )
+
+        # The same lines saved through InvoiceSerializer give the same totals
+        def lines(queryset, key):
+            return [
+                {key: getattr(line, f"{key}_id"), "quantity": line.quantity, "rate": line.rate, "gst_percent": line.gst_percent}
+                for line in queryset.all()
+            ]
+
+        response = self.client.post("/invoice/invoice/", {
+            "invoice_no": "CONV-2",
+            "customer": self.customer.pk,
+            "invoice_date": str(invoice.invoice_date),
+            "gst_type": invoice.gst_type,
+            "buyer_name": invoice.buyer_name,
+            "buyer_address": "Address",
+            **self.BANK,
+            "high_side_items": lines(invoice.high_side_items, "product_variant"),
+            "low_side_items": lines(invoice.low_side_items, "item"),
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        typed = Invoice.objects.get(pk=response.data["id"])
+        self.assertEqual(
+            [getattr(invoice, name) for name in INVOICE_TOTAL_FIELDS],
+            [getattr(typed, name) for name in INVOICE_TOTAL_FIELDS],
+        )
+        # 1000 + 500 + 150 taxable, 18% GST
+        self.assertEqual((invoice.taxable_value, invoice.grand_total), (Decimal("1650.00"), Decimal("1947.00")))
+
+    def test_only_the_active_revision_is_billed(self):
+        quotation = self._create([self._high(0)])
+        first = quotation.versions.get()
+        second = self._revise(quotation, [self._high(0, unit_price="1200.00")])
+
+        response = self._convert(first)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("quotation_version", response.data)
+
+        # Line ids must belong to the version being billed
+        other = self._create([self._high(1)]).versions.get()
+        response = self._convert(second, high_side_quantities={str(self._line_ids(other)[0]): "1.00"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("high_side_quantities", response.data)
+
+        self.assertFalse(Invoice.objects.exists())
+        response = self._convert(second)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Invoice.objects.get().grand_total, Decimal("2832.00"))
+
+
+@override_settings(QUOTATION_PDF_SECTIONED_MIN_LINES=10, QUOTATION_PDF_SECTION_ROWS=3)
+class QuotationPDFSectionTests(QuotationAPITestCase):
+    """Long BOQs render as HTML sections of at most QUOTATION_PDF_SECTION_ROWS lines, merged into one PDF."""
+
+    # Sr. No. cells of BOQ rows: "7" on the high side, "2.1" on the low side
+    ROW_NUMBER = re.compile(r'>([\d.]+)</td>\s*<td style="border: 1px solid #000; padding: 5px 8px;">')
+
+    def setUp(self):
+        super().setUp()
+        # 7 high side lines in one AC type group; the low side has the items
+        # (grouped under that AC type) and one group per service
+        self.quotation = self._create(
+            [self._high(i % 4) for i in range(7)],
+            [self._low(i % 3) for i in range(4)],
+            [self._service(0), self._service(0), self._service(1)],
+        )
+        self.version = self.quotation.versions.get()
+
+    def _rows(self, html):
+        return self.ROW_NUMBER.findall(html)
+
+    def test_chunk_groups(self):
+        groups = [{"part_no": 1, "items": list("abcde")}, {"part_no": 2, "items": list("fghi")}]
+        sections = _chunk_groups(groups, 3)
+        self.assertEqual(
+            [
+                [(group["part_no"], "".join(group["items"]), group["row_offset"], group["continued"], group["has_more"])
+                 for group in section]
+                for section in sections
+            ],
+            [
+                [(1, "abc", 0, False, True)],
+                [(1, "de", 3, True, False), (2, "f", 0, False, True)],
+                [(2, "ghi", 1, True, False)],
+            ],
+        )
+        self.assertEqual(_chunk_groups([], 3), [[]])
+
+    def test_sections_number_rows_continuously(self):
+        context = _build_quotation_pdf_context(self.quotation, self.version)
+        sections = list(iter_quotation_html_sections(context))
+        full = render_quotation_html(self.quotation, self.version)
+
+        # Summary, three high side and three low side chunks, terms
+        self.assertEqual(len(sections), 8)
+        self.assertIn("ANNEXURE I:", sections[0])
+        self.assertNotIn("ANNEXURE II:", sections[0])
+        self.assertIn("ANNEXURE IV:", sections[-1])
+        self.assertEqual(["ANNEXURE II:" in html for html in sections[1:-1]], [True] * 3 + [False] * 3)
+        self.assertEqual(["(Contd.)" in html for html in sections[1:-1]], [False, True, True] * 2)
+
+        boq_rows = [row for html in sections[1:-1] for row in self._rows(html)]
+        self.assertEqual(boq_rows[:7], [str(n) for n in range(1, 8)])
+        self.assertEqual(boq_rows[7:], ["1.1", "1.2", "1.3", "1.4", "2.1", "2.2", "3.1"])
+        # Nothing lost or repeated compared with the single document
+        self.assertEqual(boq_rows, self._rows(full[full.index("ANNEXURE II:"):]))
+
+        # Part headers on the first fragment of a group, subtotals on the last
+        high = "".join(sections[1:4])
+        self.assertEqual(high.count("Part - A1 :"), 1)
+        self.assertEqual(high.count("(A1) Sub Total"), 1)
+        self.assertIn("(A1) Sub Total", sections[3])
+        self.assertIn("Grand Total of High Side Equipment", sections[3])
+        low = "".join(sections[4:7])
+        self.assertEqual(low.count("Part - B :"), 1)
+        self.assertEqual(low.count("Sub Total of"), 1)
+        self.assertIn("Sub Total of", sections[6])
+
+    def test_engine_switch_and_merge(self):
+        _, engine, renderer = quotation_pdf_source(self.quotation, self.version)
+        self.assertEqual(engine, PDF_ENGINE_SECTIONS)
+        self.assertEqual(renderer[1:], (self.quotation.pk, self.version.pk))
+        with self.settings(QUOTATION_PDF_SECTIONED_MIN_LINES=100):
+            self.assertEqual(quotation_pdf_source(self.quotation, self.version)[1:], (PDF_ENGINE_WEASYPRINT, None))
+
+        rendered = []
+
+        def one_page(html, base_url=None):
+            # A page per section, its width numbering the section
+            rendered.append(html)
+            writer = PdfWriter()
+            writer.add_blank_page(width=100 + len(rendered), height=100)
+            output = BytesIO()
+            writer.write(output)
+            return output.getvalue()
+
+        with mock.patch("documents.pdf_sections.render_pdf", side_effect=one_page):
+            inline = render_quotation_pdf_sections(self.quotation, self.version)
+            count = len(rendered)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                pooled = render_quotation_pdf_sections(self.quotation, self.version, executor=executor)
+
+        self.assertEqual(count, 8)
+        self.assertEqual([float(page.mediabox.width) for page in PdfReader(BytesIO(inline)).pages], list(range(101, 109)))
+        self.assertEqual(len(PdfReader(BytesIO(pooled)).pages), 8)
+
+
+class ServiceCatalogueTests(QuotationAPITestCase):
+    """The catalogue snapshot is built in one pass and replaced whenever what it shows changes."""
+
+    URL = "/quotation/service-masters/catalogue/"
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.services[0].items.add(self.items[0], self.items[1])
+        self.services[1].items.add(self.items[2])
+
+    def _get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(self.URL, **headers)
+
+    def _service(self, results, index):
+        return next(row for row in results if row["id"] == self.services[index].pk)
+
+    def test_snapshot_query_count(self):
+        for i in range(5):
+            ServiceMaster.objects.create(name=f"Extra {i}", unit="NOS", labor_rate=Decimal("100")).items.add(
+                *self.items
+            )
+
+        # Services, then their items with every attribute the fields read
+        with self.assertNumQueries(2):
+            version, results = get_catalogue_snapshot()
+        self.assertEqual(len(results), 8)
+        self.assertEqual(self._service(results, 0)["item_code"], "QUO-TEST-0, QUO-TEST-1")
+        self.assertEqual(self._service(results, 0)["item_description"], "Copper - Pipe, Copper - Pipe")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_catalogue_snapshot(), (version, results))
+
+    def test_etag_and_invalidation(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(etag, f'"catalogue-{response.data["version"]}"')
+        self.assertEqual(self._get(etag).status_code, 304)
+
+        def changed(change):
+            nonlocal etag
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            response = self._get(etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+            return response.data["results"]
+
+        service = self.services[0]
+        service.name = "Renamed"
+        self.assertEqual(self._service(changed(service.save), 0)["name"], "Renamed")
+
+        self.items[0].size = "12"
+        results = changed(self.items[0].save)
+        self.assertEqual(self._service(results, 0)["item_description"], "Copper - Pipe - 12, Copper - Pipe")
+
+        copper = self.items[0].material_type_id
+        copper.name = "Cu"
+        results = changed(copper.save)
+        self.assertEqual(self._service(results, 1)["item_description"], "Cu - Pipe")
+
+        # Saving the item regenerated its code
+        codes = [row.item_code for row in self.items]
+        results = changed(lambda: service.items.add(self.items[2]))
+        self.assertEqual(self._service(results, 0)["item_code"], ", ".join(codes))
+        results = changed(lambda: service.items.remove(self.items[0]))
+        self.assertEqual(self._service(results, 0)["item_code"], ", ".join(codes[1:]))
+
+        self.assertEqual(self._get(etag).status_code, 304)
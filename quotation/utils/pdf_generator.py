@@ -1,12 +1,19 @@
 # quotation/utils/pdf_generator.py
 from django.template.loader import render_to_string
-from weasyprint import HTML
 from decimal import Decimal
 from django.conf import settings
+from documents.amount_words import amount_in_words
+from documents.pdf_cache import get_or_render_pdf, pdf_cache_key
+from documents.pdf_sections import render_sectioned_pdf
+from ..versioning import HIGH_SIDE, LOW_SIDE, SERVICE, version_lines
 import logging
 
 logger = logging.getLogger(__name__)
 
+PDF_ENGINE_WEASYPRINT = 'weasyprint'
+# Same template, rendered section by section and merged (large BOQs)
+PDF_ENGINE_SECTIONS = 'weasyprint-sections'
+
 
 def _format_capacity(product_variant):
     capacity = getattr(product_variant, 'capacity', None)
@@ -163,83 +170,69 @@ def _classify_high_side_item(item):
     return 'ACCESSORIES'
 
 
-def _build_quotation_pdf_context(quotation, version):
-    high_side_items = list(
-        version.high_side_items.select_related('product_variant__product_model').all()
-    )
-    low_side_items = list(
-        version.low_side_items.select_related(
-            'item__material_type_id',
-            'item__item_type_id',
-            'item__feature_type_id',
-            'item__brand',
-        ).all()
-    )
-    service_items = list(version.service_items.select_related('service').all())
+def _ac_type_of(product_variant):
+    product_model = getattr(product_variant, 'product_model', None) if product_variant else None
+    ac_sub_type = getattr(product_model, 'ac_sub_type_id', None) if product_model else None
+    return getattr(ac_sub_type, 'ac_type_id', None) if ac_sub_type else None
 
-    high_side_total = sum((_item_base_amount(i) for i in high_side_items), Decimal('0'))
-    low_side_total = sum((_item_base_amount(i) for i in low_side_items), Decimal('0'))
-    service_total = sum((_item_base_amount(i) for i in service_items), Decimal('0'))
 
-    high_side_grand_total = sum((i.total_with_gst for i in high_side_items), Decimal('0'))
-    low_side_grand_total = sum((i.total_with_gst for i in low_side_items), Decimal('0'))
-    service_grand_total = sum((i.total_with_gst for i in service_items), Decimal('0'))
+def _load_quotation_pdf_rows(quotation, version):
+    """
+    Fetch everything the quotation PDF needs in a fixed number of queries.
+    The full variant -> model -> sub type -> AC type / brand chain is joined
+    up front so the context builder never triggers lazy loads per item.
+    """
+    from product_management.models import AcMaterials
 
-    # Group High Side Items by AC Type for proposal summary
-    high_side_groups = {}
-    for item in high_side_items:
-        product_variant = getattr(item, 'product_variant', None)
-        product_model = getattr(product_variant, 'product_model', None) if product_variant else None
-        ac_sub_type = getattr(product_model, 'ac_sub_type_id', None) if product_model else None
-        ac_type = getattr(ac_sub_type, 'ac_type_id', None) if ac_sub_type else None
-        ac_type_name = getattr(ac_type, 'name', None) if ac_type else None
-        
-        if not ac_type_name:
-            ac_type_name = "AC Equipment"
-        
-        ac_type_name = ac_type_name.strip().upper()
-        amount = _item_base_amount(item)
-        high_side_groups[ac_type_name] = high_side_groups.get(ac_type_name, Decimal('0')) + amount
+    # Lines are shared between revisions; the version links give the order
+    high_side_items = list(version_lines(version, HIGH_SIDE))
+    low_side_items = list(version_lines(version, LOW_SIDE))
+    service_items = list(version_lines(version, SERVICE))
 
-    high_side_summary = [
-        {'description': name, 'amount': amount}
-        for name, amount in high_side_groups.items()
-    ]
+    material_to_ac_types = {}
+    for material_id, ac_type_name in AcMaterials.objects.values_list('material_id', 'ac_type__name'):
+        material_to_ac_types.setdefault(material_id, []).append(ac_type_name.strip())
 
-    # Group Low Side Items by Item Type for proposal summary
-    low_side_groups = {}
-    for item in low_side_items:
-        item_obj = getattr(item, 'item', None)
-        item_type = getattr(item_obj, 'item_type_id', None) if item_obj else None
-        item_type_name = getattr(item_type, 'name', None) if item_type else None
-        
-        if not item_type_name:
-            item_type_name = "MISCELLANEOUS WORK"
-            
-        item_type_name = item_type_name.strip().upper()
-        amount = _item_base_amount(item)
-        low_side_groups[item_type_name] = low_side_groups.get(item_type_name, Decimal('0')) + amount
+    terms = list(quotation.terms_conditions.select_related('terms_condition_type').all())
 
-    low_side_summary = [
-        {'description': name, 'amount': amount}
-        for name, amount in low_side_groups.items()
-    ]
+    return high_side_items, low_side_items, service_items, material_to_ac_types, terms
 
-    # Group Service Items by Category for proposal summary
-    service_groups = {}
-    for item in service_items:
-        service_obj = getattr(item, 'service', None)
-        category_name = getattr(service_obj, 'category', None) if service_obj else 'SERVICES'
-        category_name = str(category_name).strip().upper()
-        amount = _item_base_amount(item)
-        service_groups[category_name] = service_groups.get(category_name, Decimal('0')) + amount
 
-    service_summary = [
-        {'description': name, 'amount': amount}
-        for name, amount in service_groups.items()
-    ]
+def _build_quotation_pdf_context(quotation, version):
+    high_side_items, low_side_items, service_items, material_to_ac_types, terms = (
+        _load_quotation_pdf_rows(quotation, version)
+    )
+    return _assemble_quotation_pdf_context(
+        quotation,
+        version,
+        high_side_items,
+        low_side_items,
+        service_items,
+        material_to_ac_types,
+        terms,
+    )
+
+
+def _assemble_quotation_pdf_context(quotation, version, high_side_items, low_side_items,
+                                    service_items, material_to_ac_types, terms):
+    """
+    Build the template context from already loaded rows without touching the
+    database. Each item list is walked once and every derived field
+    (description, base amount, AC type, display SKU) is computed once per item.
+    """
+    # =============================
+    # HIGH SIDE (single pass)
+    # =============================
+    high_side_total = Decimal('0')
+    high_side_grand_total = Decimal('0')
+    high_side_gst_total = Decimal('0')
+    high_side_summary_groups = {}
+    high_side_all_items = []
+    high_side_section_items = []
+    high_side_items_list = []
+    high_side_by_type = {}
+    ac_type_names = []
 
-    # Classify and group high side items for BOQ
     odus = []
     idus = []
     controllers = []
@@ -247,26 +240,40 @@ def _build_quotation_pdf_context(quotation, version):
     accessories = []
 
     for item in high_side_items:
-        category = _classify_high_side_item(item)
         variant = item.product_variant
-        ac_type_name_val = None
-        if variant and variant.product_model and variant.product_model.ac_sub_type_id and variant.product_model.ac_sub_type_id.ac_type_id:
-            ac_type_name_val = variant.product_model.ac_sub_type_id.ac_type_id.name
-            
+        ac_type = _ac_type_of(variant)
+        raw_ac_type_name = getattr(ac_type, 'name', None) if ac_type else None
+
+        description = _high_side_description(item)
+        amount = _item_base_amount(item)
+        sku = variant.get_display_name_for_pdf() if variant else ''
+
+        high_side_total += amount
+        high_side_grand_total += item.total_with_gst
+        high_side_gst_total += getattr(item, 'gst_amount', Decimal('0')) or Decimal('0')
+
+        # Proposal summary grouped by AC type
+        summary_key = (raw_ac_type_name or "AC Equipment").strip().upper()
+        high_side_summary_groups[summary_key] = (
+            high_side_summary_groups.get(summary_key, Decimal('0')) + amount
+        )
+
+        # BOQ classification
         item_data = {
-            'description': _high_side_description(item),
-            'product_variant': item.product_variant,
+            'description': description,
+            'product_variant': variant,
             'quantity': item.quantity,
             'unit': item.unit,
             'rate': item.unit_price,
-            'amount': _item_base_amount(item),
-            'sku': item.product_variant.get_display_name_for_pdf() if item.product_variant else '',
-            'ac_type': ac_type_name_val or "AC Equipment"
+            'amount': amount,
+            'sku': sku,
+            'ac_type': raw_ac_type_name or "AC Equipment"
         }
+        category = _classify_high_side_item(item)
         if category == 'ODU':
             odus.append(item_data)
         elif category == 'IDU':
-            sub_type = getattr(item.product_variant.product_model, 'ac_sub_type_id', None)
+            sub_type = getattr(variant.product_model, 'ac_sub_type_id', None)
             item_data['sub_type_name'] = getattr(sub_type, 'name', 'Indoor Unit')
             idus.append(item_data)
         elif category == 'CONTROLLER':
@@ -276,167 +283,75 @@ def _build_quotation_pdf_context(quotation, version):
         else:
             accessories.append(item_data)
 
-    # Group IDUs by sub_type_name
-    idu_groups = []
-    from collections import defaultdict
-    grouped_idus = defaultdict(list)
-    for item in idus:
-        grouped_idus[item['sub_type_name']].append(item)
-    
-    for sub_name, items in grouped_idus.items():
-        idu_groups.append({
-            'sub_type_name': sub_name,
-            'items': items
-        })
-
-    ac_type_names = []
-    for item in high_side_items:
-        variant = getattr(item, 'product_variant', None)
-        product_model = getattr(variant, 'product_model', None) if variant else None
-        ac_sub_type = getattr(product_model, 'ac_sub_type_id', None) if product_model else None
-        ac_type = getattr(ac_sub_type, 'ac_type_id', None) if ac_sub_type else None
-        ac_type_name_val = getattr(ac_type, 'name', None) if ac_type else None
-        if ac_type_name_val:
-            ac_type_name_val = ac_type_name_val.strip()
-            if ac_type_name_val not in ac_type_names:
-                ac_type_names.append(ac_type_name_val)
-    ac_type_name = " / ".join(ac_type_names) if ac_type_names else "Air Conditioning"
-
-    subtotal = version.subtotal or (high_side_total + low_side_total + service_total)
-    gst_amount = version.gst_amount or Decimal('0')
-    grand_total = version.grand_total or version.total_amount or (subtotal + gst_amount)
-
-    if subtotal and gst_amount:
-        gst_percentage = (gst_amount / subtotal) * Decimal('100')
-    else:
-        gst_percentage = Decimal('18')
-
-    all_items = []
+        if raw_ac_type_name:
+            stripped_name = raw_ac_type_name.strip()
+            if stripped_name not in ac_type_names:
+                ac_type_names.append(stripped_name)
 
-    for item in high_side_items:
-        all_items.append({
-            'description': _high_side_description(item),
-            'product_variant': item.product_variant,
+        high_side_all_items.append({
+            'description': description,
+            'product_variant': variant,
             'quantity': item.quantity,
             'unit': item.unit,
             'rate': item.unit_price,
-            'amount': _item_base_amount(item),
+            'amount': amount,
         })
 
-    for item in low_side_items:
-        all_items.append({
-            'description': item.description or str(item.item.item_code),
-            'item': item.item,
+        high_side_section_items.append({
+            'description': description,
+            'amount': amount,
+        })
+
+        # Table separation by AC type
+        type_key = raw_ac_type_name.strip() if raw_ac_type_name else "AC Equipment"
+        high_side_by_type.setdefault(type_key, []).append({
+            'description': description,
+            'product_variant': variant,
             'quantity': item.quantity,
             'unit': item.unit,
             'rate': item.unit_price,
-            'amount': _item_base_amount(item),
+            'amount': amount,
+            'gst_amount': getattr(item, 'gst_amount', 0) or 0,
+            'gst_percent': getattr(item, 'gst_percent', 18),
+            'sku': sku
         })
 
-    for item in service_items:
-        all_items.append({
-            'description': item.description or item.service.name,
+        high_side_items_list.append({
+            'description': description,
+            'product_variant': variant,
             'quantity': item.quantity,
             'unit': item.unit,
             'rate': item.unit_price,
-            'amount': _item_base_amount(item),
+            'amount': amount,
+            'sku': sku,
+            'ac_type': ac_type.name if ac_type else "AC Equipment"
         })
 
-    customer = quotation.customer
-    site = quotation.site
-    site_name = (
-        getattr(site, 'name', None)
-        or getattr(site, 'site_name', None)
-        or quotation.site_name
-        or '-'
-    )
-
-    summary_sections = []
-
-    if high_side_items:
-        summary_sections.append({
-            'title': 'Part A: High Side Air Conditioning Equipment',
-            'items': [
-                {
-                    'description': _high_side_description(item),
-                    'amount': _item_base_amount(item),
-                }
-                for item in high_side_items
-            ],
-            'total': high_side_total,
-            'gst_amount': sum((getattr(i, 'gst_amount', Decimal('0')) or Decimal('0') for i in high_side_items), Decimal('0')),
-            'subtotal_with_gst': high_side_grand_total,
-        })
-
-    if low_side_items:
-        summary_sections.append({
-            'title': 'Part B: Low Side Installation Work' if service_items else 'Part B: Low Side',
-            'items': [
-                {
-                    'description': _low_side_description(item),
-                    'amount': _item_base_amount(item),
-                }
-                for item in low_side_items
-            ],
-            'total': low_side_total,
-            'gst_amount': sum((getattr(i, 'gst_amount', Decimal('0')) or Decimal('0') for i in low_side_items), Decimal('0')),
-            'subtotal_with_gst': low_side_grand_total,
-        })
-
-    if service_items:
-        grouped_items = {}
-        for item in service_items:
-            desc = f"{item.service.name} ({item.service.category})" if item.service and item.service.category else (item.service.name if item.service else "Service Work")
-            amount = _item_base_amount(item)
-            grouped_items[desc] = grouped_items.get(desc, Decimal('0')) + amount
-
-        summary_sections.append({
-            'title': 'Part B: Low Side Installation Work',
-            'items': [
-                {
-                    'description': desc,
-                    'amount': amount,
-                }
-                for desc, amount in grouped_items.items()
-            ],
-            'total': service_total,
-            'gst_amount': sum((getattr(i, 'gst_amount', Decimal('0')) or Decimal('0') for i in service_items), Decimal('0')),
-            'subtotal_with_gst': service_grand_total,
-        })
+    high_side_summary = [
+        {'description': name, 'amount': amount}
+        for name, amount in high_side_summary_groups.items()
+    ]
 
-    # Group High Side Items by AC Type for table separation
-    def _get_ac_type_name(item):
-        variant = getattr(item, 'product_variant', None)
-        product_model = getattr(variant, 'product_model', None) if variant else None
-        ac_sub_type = getattr(product_model, 'ac_sub_type_id', None) if product_model else None
-        ac_type = getattr(ac_sub_type, 'ac_type_id', None) if ac_sub_type else None
-        ac_type_name = getattr(ac_type, 'name', None) if ac_type else None
-        return ac_type_name.strip() if ac_type_name else "AC Equipment"
+    # Group IDUs by sub_type_name
+    grouped_idus = {}
+    for item_data in idus:
+        grouped_idus.setdefault(item_data['sub_type_name'], []).append(item_data)
+    idu_groups = [
+        {'sub_type_name': sub_name, 'items': items}
+        for sub_name, items in grouped_idus.items()
+    ]
 
-    high_side_by_type = {}
-    for item in high_side_items:
-        t_name = _get_ac_type_name(item)
-        if t_name not in high_side_by_type:
-            high_side_by_type[t_name] = []
-        high_side_by_type[t_name].append({
-            'description': _high_side_description(item),
-            'product_variant': item.product_variant,
-            'quantity': item.quantity,
-            'unit': item.unit,
-            'rate': item.unit_price,
-            'amount': _item_base_amount(item),
-            'gst_amount': getattr(item, 'gst_amount', 0) or 0,
-            'gst_percent': getattr(item, 'gst_percent', 18),
-            'sku': item.product_variant.get_display_name_for_pdf() if item.product_variant else ''
-        })
+    ac_type_name = " / ".join(ac_type_names) if ac_type_names else "Air Conditioning"
 
     high_side_groups = []
-    for t_name, items in high_side_by_type.items():
+    for part_no, (t_name, items) in enumerate(high_side_by_type.items(), start=1):
         sub_total_val = sum(i['amount'] for i in items)
         gst_total_val = sum(i['gst_amount'] for i in items)
         gst_percent_val = items[0]['gst_percent'] if items else 18
         high_side_groups.append({
             'ac_type': t_name,
+            'part_no': part_no,
+            'row_offset': 0,
             'items': items,
             'subtotal': sub_total_val,
             'gst_total': gst_total_val,
@@ -444,20 +359,53 @@ def _build_quotation_pdf_context(quotation, version):
             'total_with_gst': sub_total_val + gst_total_val,
         })
 
-    # Group Low Side Items by AC Type using AcMaterials
-    from product_management.models import AcMaterials
-    material_to_ac_types = {}
-    for am in AcMaterials.objects.select_related('ac_type', 'material').all():
-        m_id = am.material_id
-        t_name = am.ac_type.name.strip()
-        if m_id not in material_to_ac_types:
-            material_to_ac_types[m_id] = []
-        material_to_ac_types[m_id].append(t_name)
-
+    # =============================
+    # LOW SIDE (single pass)
+    # =============================
+    low_side_total = Decimal('0')
+    low_side_grand_total = Decimal('0')
+    low_side_gst_total = Decimal('0')
+    low_side_summary_groups = {}
+    low_side_all_items = []
+    low_side_section_items = []
+    low_side_items_list = []
     low_side_by_type = {}
+    default_low_side_type = next(iter(high_side_by_type), "AC Equipment")
+
     for item in low_side_items:
-        assigned_type = None
         item_obj = item.item
+        description = _low_side_description(item)
+        amount = _item_base_amount(item)
+        gst_amount = getattr(item, 'gst_amount', 0) or 0
+
+        low_side_total += amount
+        low_side_grand_total += item.total_with_gst
+        low_side_gst_total += getattr(item, 'gst_amount', Decimal('0')) or Decimal('0')
+
+        # Proposal summary grouped by item type
+        item_type = getattr(item_obj, 'item_type_id', None) if item_obj else None
+        item_type_name = getattr(item_type, 'name', None) if item_type else None
+        summary_key = (item_type_name or "MISCELLANEOUS WORK").strip().upper()
+        low_side_summary_groups[summary_key] = (
+            low_side_summary_groups.get(summary_key, Decimal('0')) + amount
+        )
+
+        low_side_all_items.append({
+            'description': item.description or str(item_obj.item_code),
+            'item': item_obj,
+            'quantity': item.quantity,
+            'unit': item.unit,
+            'rate': item.unit_price,
+            'amount': amount,
+        })
+
+        low_side_section_items.append({
+            'description': description,
+            'amount': amount,
+        })
+
+        # Assign to an AC type using AcMaterials, preferring types quoted on the high side
+        assigned_type = None
         if item_obj and item_obj.id in material_to_ac_types:
             for t_name in material_to_ac_types[item_obj.id]:
                 if t_name in high_side_by_type:
@@ -466,41 +414,95 @@ def _build_quotation_pdf_context(quotation, version):
             if not assigned_type:
                 assigned_type = material_to_ac_types[item_obj.id][0]
         if not assigned_type:
-            assigned_type = list(high_side_by_type.keys())[0] if high_side_by_type else "AC Equipment"
-            
-        if assigned_type not in low_side_by_type:
-            low_side_by_type[assigned_type] = []
-        low_side_by_type[assigned_type].append({
-            'description': _low_side_description(item),
+            assigned_type = default_low_side_type
+
+        low_side_by_type.setdefault(assigned_type, []).append({
+            'description': description,
             'quantity': item.quantity,
             'unit': item.unit,
             'rate': item.unit_price,
-            'amount': _item_base_amount(item),
-            'gst_amount': getattr(item, 'gst_amount', 0) or 0,
+            'amount': amount,
+            'gst_amount': gst_amount,
             'gst_percent': getattr(item, 'gst_percent', 18),
         })
 
+        low_side_items_list.append({
+            'description': description,
+            'quantity': item.quantity,
+            'unit': item.unit,
+            'rate': item.unit_price,
+            'amount': amount,
+        })
+
+    low_side_summary = [
+        {'description': name, 'amount': amount}
+        for name, amount in low_side_summary_groups.items()
+    ]
+
+    # =============================
+    # SERVICE ITEMS (single pass)
+    # =============================
+    service_total = Decimal('0')
+    service_grand_total = Decimal('0')
+    service_gst_total = Decimal('0')
+    service_summary_groups = {}
+    service_section_groups = {}
+    service_all_items = []
+
     for item in service_items:
-        service_name = f"{item.service.name} ({item.service.category})" if item.service and item.service.category else (item.service.name if item.service else "Service Work")
-        if service_name not in low_side_by_type:
-            low_side_by_type[service_name] = []
-        low_side_by_type[service_name].append({
-            'description': item.description or (item.service.name if item.service else "Service Work"),
+        service_obj = item.service
+        amount = _item_base_amount(item)
+
+        service_total += amount
+        service_grand_total += item.total_with_gst
+        service_gst_total += getattr(item, 'gst_amount', Decimal('0')) or Decimal('0')
+
+        category_name = getattr(service_obj, 'category', None) if service_obj else 'SERVICES'
+        category_name = str(category_name).strip().upper()
+        service_summary_groups[category_name] = (
+            service_summary_groups.get(category_name, Decimal('0')) + amount
+        )
+
+        if service_obj and service_obj.category:
+            service_name = f"{service_obj.name} ({service_obj.category})"
+        else:
+            service_name = service_obj.name if service_obj else "Service Work"
+        service_section_groups[service_name] = (
+            service_section_groups.get(service_name, Decimal('0')) + amount
+        )
+
+        service_all_items.append({
+            'description': item.description or service_obj.name,
+            'quantity': item.quantity,
+            'unit': item.unit,
+            'rate': item.unit_price,
+            'amount': amount,
+        })
+
+        low_side_by_type.setdefault(service_name, []).append({
+            'description': item.description or (service_obj.name if service_obj else "Service Work"),
             'quantity': item.quantity,
             'unit': item.unit,
             'rate': item.unit_price,
-            'amount': _item_base_amount(item),
+            'amount': amount,
             'gst_amount': getattr(item, 'gst_amount', 0) or 0,
             'gst_percent': getattr(item, 'gst_percentage', 18),
         })
 
+    service_summary = [
+        {'description': name, 'amount': amount}
+        for name, amount in service_summary_groups.items()
+    ]
+
     low_side_groups = []
-    for t_name, items in low_side_by_type.items():
+    for part_no, (t_name, items) in enumerate(low_side_by_type.items(), start=1):
         sub_total_val = sum(i['amount'] for i in items)
         gst_total_val = sum(i['gst_amount'] for i in items)
         gst_percent_val = items[0]['gst_percent'] if items else 18
         low_side_groups.append({
             'ac_type': t_name,
+            'part_no': part_no,
+            'row_offset': 0,
             'items': items,
             'subtotal': sub_total_val,
             'gst_total': gst_total_val,
@@ -508,15 +510,69 @@ def _build_quotation_pdf_context(quotation, version):
             'total_with_gst': sub_total_val + gst_total_val,
         })
 
+    # =============================
+    # TOTALS & SUMMARY SECTIONS
+    # =============================
+    subtotal = version.subtotal or (high_side_total + low_side_total + service_total)
+    gst_amount = version.gst_amount or Decimal('0')
+    grand_total = version.grand_total or version.total_amount or (subtotal + gst_amount)
+
+    if subtotal and gst_amount:
+        gst_percentage = (gst_amount / subtotal) * Decimal('100')
+    else:
+        gst_percentage = Decimal('18')
+
+    all_items = high_side_all_items + low_side_all_items + service_all_items
+
+    customer = quotation.customer
+    site = quotation.site
+    site_name = (
+        getattr(site, 'name', None)
+        or getattr(site, 'site_name', None)
+        or quotation.site_name
+        or '-'
+    )
+
+    summary_sections = []
+
+    if high_side_items:
+        summary_sections.append({
+            'title': 'Part A: High Side Air Conditioning Equipment',
+            'items': high_side_section_items,
+            'total': high_side_total,
+            'gst_amount': high_side_gst_total,
+            'subtotal_with_gst': high_side_grand_total,
+        })
+
+    if low_side_items:
+        summary_sections.append({
+            'title': 'Part B: Low Side Installation Work' if service_items else 'Part B: Low Side',
+            'items': low_side_section_items,
+            'total': low_side_total,
+            'gst_amount': low_side_gst_total,
+            'subtotal_with_gst': low_side_grand_total,
+        })
+
+    if service_items:
+        summary_sections.append({
+            'title': 'Part B: Low Side Installation Work',
+            'items': [
+                {
+                    'description': desc,
+                    'amount': amount,
+                }
+                for desc, amount in service_section_groups.items()
+            ],
+            'total': service_total,
+            'gst_amount': service_gst_total,
+            'subtotal_with_gst': service_grand_total,
+        })
+
     # Group terms & conditions by category type
     terms_by_type = {}
-    for term in quotation.terms_conditions.select_related('terms_condition_type').all():
+    for term in terms:
         t_type = term.terms_condition_type.name if term.terms_condition_type else "Other"
-        if t_type not in terms_by_type:
-            terms_by_type[t_type] = []
-        terms_by_type[t_type].append(term.terms)
-
-    # Already calculated early in this function: high_side_grand_total, low_side_grand_total
+        terms_by_type.setdefault(t_type, []).append(term.terms)
 
     return {
         'high_side_groups': high_side_groups,
@@ -553,42 +609,15 @@ def _build_quotation_pdf_context(quotation, version):
         'controllers': controllers,
         'joints': joints,
         'accessories': accessories,
-        'low_side_items': [
-            {
-                'description': _low_side_description(item),
-                'quantity': item.quantity,
-                'unit': item.unit,
-                'rate': item.unit_price,
-                'amount': _item_base_amount(item),
-            }
-            for item in low_side_items
-        ],
-        'high_side_items_list': [
-            {
-                'description': _high_side_description(item),
-                'product_variant': item.product_variant,
-                'quantity': item.quantity,
-                'unit': item.unit,
-                'rate': item.unit_price,
-                'amount': _item_base_amount(item),
-                'sku': item.product_variant.get_display_name_for_pdf() if item.product_variant else '',
-                'ac_type': (
-                    item.product_variant.product_model.ac_sub_type_id.ac_type_id.name
-                    if (item.product_variant and
-                        item.product_variant.product_model and
-                        item.product_variant.product_model.ac_sub_type_id and
-                        item.product_variant.product_model.ac_sub_type_id.ac_type_id)
-                    else "AC Equipment"
-                )
-            }
-            for item in high_side_items
-        ],
+        'low_side_items': low_side_items_list,
+        'high_side_items_list': high_side_items_list,
         'summary_sections': summary_sections,
         'quotation_items': all_items,
         'subtotal': subtotal,
         'gst_amount': gst_amount,
         'gst_percentage': gst_percentage,
         'grand_total': grand_total,
+        'grand_total_in_words': amount_in_words(grand_total),
         'total_quantity': sum(
             (Decimal(str(item.get('quantity', 0) or 0)) for item in all_items),
             Decimal('0'),
@@ -596,17 +625,137 @@ def _build_quotation_pdf_context(quotation, version):
     }
 
 
+def render_quotation_html(quotation, version):
+    """Render the quotation template to an HTML string (no PDF work)."""
+    context = _build_quotation_pdf_context(quotation, version)
+    return render_to_string('pdf/quotation.html', context)
+
+
+def _boq_line_count(context):
+    return sum(
+        len(group['items'])
+        for group in (*context['high_side_groups'], *context['low_side_groups'])
+    )
+
+
+def _chunk_groups(groups, rows_per_section):
+    """
+    Split BOQ groups into sections of at most `rows_per_section` item rows.
+    A group cut in two is continued in the next section: its header row is
+    only on the first fragment, its subtotal rows only on the last.
+    """
+    sections = []
+    current = []
+    rows = 0
+    for group in groups:
+        items = group['items']
+        start = 0
+        while True:
+            taken = items[start:start + rows_per_section - rows]
+            current.append({
+                **group,
+                'items': taken,
+                'row_offset': start,
+                'continued': start > 0,
+                'has_more': start + len(taken) < len(items),
+            })
+            rows += len(taken)
+            start += len(taken)
+            if rows >= rows_per_section:
+                sections.append(current)
+                current = []
+                rows = 0
+            if start >= len(items):
+                break
+    if current or not sections:
+        sections.append(current)
+    return sections
+
+
+def iter_quotation_html_sections(context, rows_per_section=None):
+    """
+    The quotation as separate HTML documents: the summary, the high side
+    BOQ and low side BOQ in chunks of `rows_per_section` lines, then the
+    terms. Each one starts on a new page in the full document as well.
+    """
+    rows_per_section = rows_per_section or settings.QUOTATION_PDF_SECTION_ROWS
+
+    yield render_to_string('pdf/quotation.html', {**context, 'section': 'summary'})
+
+    for side in ('high_side', 'low_side'):
+        groups = context[f'{side}_groups']
+        if side == 'low_side' and not groups:
+            continue
+        chunks = _chunk_groups(groups, rows_per_section)
+        for index, chunk in enumerate(chunks):
+            yield render_to_string('pdf/quotation.html', {
+                **context,
+                'section': side,
+                f'{side}_groups': chunk,
+                f'{side}_continued': index > 0,
+                f'{side}_has_more': index < len(chunks) - 1,
+            })
+
+    yield render_to_string('pdf/quotation.html', {**context, 'section': 'terms'})
+
+
+def render_quotation_pdf_sections(quotation, version, base_url=None, executor=None, context=None):
+    """Render the quotation section by section (see documents.pdf_sections) into one PDF."""
+    context = context or _build_quotation_pdf_context(quotation, version)
+    return render_sectioned_pdf(
+        iter_quotation_html_sections(context),
+        base_url=base_url or getattr(settings, 'ABSOLUTE_URL', '/'),
+        executor=executor,
+    )
+
+
+def render_quotation_pdf_by_id(quotation_id, version_id):
+    """Render pool entry point for sectioned quotation PDFs (see quotation_pdf_source)."""
+    from ..models import Quotation, QuotationVersion
+
+    quotation = Quotation.objects.select_related('customer', 'site').get(pk=quotation_id)
+    version = QuotationVersion.objects.get(pk=version_id, quotation=quotation)
+    return render_quotation_pdf_sections(quotation, version)
+
+
+def quotation_pdf_source(quotation, version):
+    """
+    (html, engine, renderer) for the PDF endpoints. The HTML keys the PDF
+    cache; BOQs of QUOTATION_PDF_SECTIONED_MIN_LINES lines or more are
+    rendered section by section in the render pool instead of as one
+    document.
+    """
+    context = _build_quotation_pdf_context(quotation, version)
+    html = render_to_string('pdf/quotation.html', context)
+    if _boq_line_count(context) < settings.QUOTATION_PDF_SECTIONED_MIN_LINES:
+        return html, PDF_ENGINE_WEASYPRINT, None
+    return html, PDF_ENGINE_SECTIONS, (
+        'quotation.utils.pdf_generator.render_quotation_pdf_by_id', quotation.pk, version.pk,
+    )
+
+
 def generate_quotation_pdf(quotation, version, base_url=None):
     """
     Generate quotation PDF using WeasyPrint with HTML template (existing design).
+    Served from the shared PDF cache when the rendered HTML is unchanged.
     """
     try:
+        base_url = base_url or getattr(settings, 'ABSOLUTE_URL', '/')
         context = _build_quotation_pdf_context(quotation, version)
         html_string = render_to_string('pdf/quotation.html', context)
-        pdf = HTML(
-            string=html_string,
-            base_url=base_url or getattr(settings, 'ABSOLUTE_URL', '/'),
-        ).write_pdf()
+        render = None
+        engine = PDF_ENGINE_WEASYPRINT
+        if _boq_line_count(context) >= settings.QUOTATION_PDF_SECTIONED_MIN_LINES:
+            engine = PDF_ENGINE_SECTIONS
+            render = lambda: render_quotation_pdf_sections(  # noqa: E731
+                quotation, version, base_url=base_url, context=context
+            )
+        _, pdf = get_or_render_pdf(
+            html_string,
+            base_url=base_url,
+            key=pdf_cache_key(html_string, base_url, engine=engine),
+            render=render,
+        )
         return pdf
     except Exception as e:
         logger.error(f"Error generating quotation PDF: {str(e)}", exc_info=True)
@@ -0,0 +1,368 @@
+"""
+Copy-on-write storage for quotation revisions.
+
+A revision does not own its line rows, it links an ordered set of them
+through the QuotationVersion*Item tables. Revising a quotation reuses every
+row of the previous revision whose fingerprint still matches an incoming
+line and only inserts rows for lines that were added or edited, so changing
+one price on a 500 line BOQ stores one new line row (plus the small link
+rows that give the new revision its order).
+
+The same fingerprints drive the revision diff.
+"""
+from collections import defaultdict, deque
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db.models import F, Max, Min, Prefetch, Sum
+
+from .models import (
+    QuotationHighSideItem,
+    QuotationLowSideItem,
+    QuotationServiceItem,
+    QuotationVersionHighSideItem,
+    QuotationVersionLowSideItem,
+    QuotationVersionServiceItem,
+)
+from .pricing import apply_version_totals
+
+
+class LineKind(NamedTuple):
+    name: str            # relation on QuotationVersion, e.g. "high_side_items"
+    model: type
+    link_model: type
+    link_field: str      # FK on the link model pointing at the line
+    key_field: str       # identifies "the same line" when its values change
+    select_related: tuple
+
+
+HIGH_SIDE = LineKind(
+    "high_side_items",
+    QuotationHighSideItem,
+    QuotationVersionHighSideItem,
+    "high_side_item",
+    "product_variant",
+    (
+        "product_variant__product_model__ac_sub_type_id__ac_type_id",
+        "product_variant__product_model__brand_id",
+    ),
+)
+LOW_SIDE = LineKind(
+    "low_side_items",
+    QuotationLowSideItem,
+    QuotationVersionLowSideItem,
+    "low_side_item",
+    "item",
+    (
+        "item__material_type_id",
+        "item__item_type_id",
+        "item__feature_type_id",
+        "item__item_class_id",
+        "item__brand",
+    ),
+)
+SERVICE = LineKind(
+    "service_items",
+    QuotationServiceItem,
+    QuotationVersionServiceItem,
+    "service_item",
+    "service",
+    ("service",),
+)
+
+LINE_KINDS = (HIGH_SIDE, LOW_SIDE, SERVICE)
+
+VERSION_TOTAL_FIELDS = (
+    "subtotal",
+    "cgst_amount",
+    "sgst_amount",
+    "igst_amount",
+    "gst_amount",
+    "total_amount",
+    "grand_total",
+)
+
+
+# =====================================================
+# READ
+# =====================================================
+def ordered_lines(kind, queryset=None):
+    """Line queryset for use on a version's relation, in BOQ order."""
+    if queryset is None:
+        queryset = kind.model.objects.select_related(*kind.select_related)
+    return queryset.order_by("version_links__position", "pk")
+
+
+def version_lines(version, kind):
+    return ordered_lines(kind, getattr(version, kind.name).select_related(*kind.select_related))
+
+
+def version_lines_prefetch(prefix=""):
+    """Prefetch objects loading every line relation of the versions in order."""
+    return [
+        Prefetch(
+            f"{prefix}{kind.name}",
+            queryset=ordered_lines(
+                kind,
+                kind.model.objects.select_related(*kind.select_related).prefetch_related(
+                    *(("service__items",) if kind is SERVICE else ())
+                ),
+            ),
+        )
+        for kind in LINE_KINDS
+    ]
+
+
+# =====================================================
+# WRITE
+# =====================================================
+def bulk_create_lines(kind, lines, existing_pks=()):
+    """
+    bulk_create line rows of freshly created versions and make sure every
+    instance has its pk afterwards. When the versions already had rows,
+    pass their pks as `existing_pks`.
+    """
+    kind.model.objects.bulk_create(lines)
+    if all(line.pk is not None for line in lines):
+        return
+
+    # Backends without INSERT ... RETURNING (MySQL) leave pk unset. The
+    # versions are new, so their rows are exactly the ones just inserted;
+    # identical rows are interchangeable, so (version, fingerprint) is enough.
+    stored = defaultdict(deque)
+    for pk, version_id, fingerprint in (
+        kind.model.objects.filter(quotation_version_id__in={line.quotation_version_id for line in lines})
+        .exclude(pk__in=existing_pks)
+        .order_by("pk")
+        .values_list("pk", "quotation_version_id", "fingerprint")
+    ):
+        stored[(version_id, fingerprint)].append(pk)
+    for line in lines:
+        line.pk = stored[(line.quotation_version_id, line.fingerprint)].popleft()
+
+
+def store_version_lines(version, kind, lines, base_version=None):
+    """
+    Link `lines` (unsaved instances, in BOQ order, amounts already set) to
+    `version`. Rows of `base_version` with a matching fingerprint are reused
+    instead of inserting a copy. Returns the number of rows inserted.
+    """
+    reusable = defaultdict(deque)
+    if base_version is not None:
+        for pk, fingerprint in (
+            kind.link_model.objects.filter(quotation_version=base_version)
+            .order_by("position")
+            .values_list(f"{kind.link_field}_id", f"{kind.link_field}__fingerprint")
+        ):
+            reusable[fingerprint].append(pk)
+
+    new_lines = []
+    for line in lines:
+        line.fingerprint = line.compute_fingerprint()
+        if reusable[line.fingerprint]:
+            line.pk = reusable[line.fingerprint].popleft()
+        else:
+            line.quotation_version = version
+            new_lines.append(line)
+
+    if new_lines:
+        bulk_create_lines(kind, new_lines)
+
+    kind.link_model.objects.bulk_create([
+        kind.link_model(
+            quotation_version=version,
+            position=position,
+            **{f"{kind.link_field}_id": line.pk},
+        )
+        for position, line in enumerate(lines)
+    ])
+    return len(new_lines)
+
+
+def append_line(version, kind, line):
+    """Link an already saved line at the end of `version`'s BOQ."""
+    last = kind.link_model.objects.filter(quotation_version=version).aggregate(
+        last=Max("position")
+    )["last"]
+    kind.link_model.objects.create(
+        quotation_version=version,
+        position=0 if last is None else last + 1,
+        **{kind.link_field: line},
+    )
+
+
+def editing_version(line):
+    """The revision an edit made directly on a line row applies to."""
+    return line.quotation_versions.order_by("-is_active", "-pk").first() or line.quotation_version
+
+
+def detach_line(version, kind, line):
+    """
+    Return a row that can be modified for `version` without touching other
+    revisions: `line` itself if nobody else links it, otherwise a copy that
+    replaces it in `version`.
+    """
+    shared = kind.link_model.objects.filter(**{kind.link_field: line}).exclude(
+        quotation_version=version
+    )
+    if not shared.exists():
+        return line
+
+    copy = kind.model.objects.get(pk=line.pk)
+    copy.pk = None
+    copy.quotation_version = version
+    copy.save()
+    kind.link_model.objects.filter(
+        quotation_version=version, **{kind.link_field: line}
+    ).update(**{kind.link_field: copy})
+    return copy
+
+
+def remove_line(version, kind, line):
+    """Drop `line` from `version`; the row is deleted once no revision uses it."""
+    kind.link_model.objects.filter(quotation_version=version, **{kind.link_field: line}).delete()
+    if not kind.link_model.objects.filter(**{kind.link_field: line}).exists():
+        line.delete()
+
+
+def hand_over_lines(version):
+    """
+    Before `version` is deleted, move rows it first stored (and that would
+    cascade with it) to the oldest other revision still linking them.
+    """
+    for kind in LINE_KINDS:
+        new_owners = (
+            kind.link_model.objects.filter(**{f"{kind.link_field}__quotation_version": version})
+            .exclude(quotation_version=version)
+            .values(f"{kind.link_field}_id")
+            .annotate(owner=Min("quotation_version_id"))
+            .values_list(f"{kind.link_field}_id", "owner")
+        )
+        by_owner = defaultdict(list)
+        for line_id, owner in new_owners:
+            by_owner[owner].append(line_id)
+        for owner, line_ids in by_owner.items():
+            kind.model.objects.filter(pk__in=line_ids).update(quotation_version_id=owner)
+
+
+def recalculate_version_totals(version):
+    """
+    Set `version`'s totals from the lines it links (one aggregate query per
+    line type, same rules as calculate_totals) and save them.
+    """
+    subtotal = Decimal("0")
+    gst_total = Decimal("0")
+    for kind in LINE_KINDS:
+        charges = [
+            f"{kind.link_field}__{field.name}"
+            for field in kind.model._meta.concrete_fields
+            if field.name in ("base_amount", "mathadi_charges", "transportation_charges")
+        ]
+        sums = kind.link_model.objects.filter(quotation_version=version).aggregate(
+            subtotal=Sum(sum((F(name) for name in charges[1:]), F(charges[0]))),
+            gst=Sum(f"{kind.link_field}__gst_amount"),
+        )
+        subtotal += sums["subtotal"] or 0
+        gst_total += sums["gst"] or 0
+
+    apply_version_totals(version, subtotal, gst_total)
+    version.save(update_fields=list(VERSION_TOTAL_FIELDS))
+
+
+# =====================================================
+# DIFF
+# =====================================================
+def _line_index(kind, version):
+    return list(
+        kind.link_model.objects.filter(quotation_version=version)
+        .order_by("position")
+        .values_list(
+            f"{kind.link_field}_id",
+            f"{kind.link_field}__fingerprint",
+            f"{kind.link_field}__{kind.key_field}_id",
+        )
+    )
+
+
+def _field_changes(kind, old, new):
+    changes = {}
+    for name in kind.model.FINGERPRINT_FIELDS:
+        attname = kind.model._meta.get_field(name).attname
+        before, after = getattr(old, attname), getattr(new, attname)
+        if before != after:
+            changes[name] = {"from": before, "to": after}
+    return changes
+
+
+def diff_lines(kind, from_version, to_version):
+    """
+    Compare the lines of two revisions. Lines with the same fingerprint are
+    unchanged (shared rows always are); a remaining line whose product /
+    item / service is still present on the other side counts as changed,
+    everything else is added or removed. Only the rows that differ are
+    loaded in full.
+    """
+    old = _line_index(kind, from_version)
+    new = _line_index(kind, to_version)
+
+    old_by_fingerprint = defaultdict(deque)
+    for pk, fingerprint, key in old:
+        old_by_fingerprint[fingerprint].append(pk)
+
+    matched_old = set()
+    unmatched_new = []
+    for pk, fingerprint, key in new:
+        if old_by_fingerprint[fingerprint]:
+            matched_old.add(old_by_fingerprint[fingerprint].popleft())
+        else:
+            unmatched_new.append((pk, key))
+
+    old_by_key = defaultdict(deque)
+    for pk, fingerprint, key in old:
+        if pk not in matched_old:
+            old_by_key[key].append(pk)
+
+    changed_pairs = []
+    added_ids = []
+    for pk, key in unmatched_new:
+        if old_by_key[key]:
+            changed_pairs.append((old_by_key[key].popleft(), pk))
+        else:
+            added_ids.append(pk)
+    paired_old = {old_pk for old_pk, _ in changed_pairs}
+    removed_ids = [
+        pk for pk, fingerprint, key in old
+        if pk not in matched_old and pk not in paired_old
+    ]
+
+    ids = set(added_ids) | set(removed_ids)
+    for old_pk, new_pk in changed_pairs:
+        ids.update((old_pk, new_pk))
+    rows = kind.model.objects.select_related(*kind.select_related).in_bulk(ids) if ids else {}
+
+    return {
+        "added": [rows[pk] for pk in added_ids],
+        "removed": [rows[pk] for pk in removed_ids],
+        "changed": [
+            {
+                "from": rows[old_pk],
+                "to": rows[new_pk],
+                "fields": _field_changes(kind, rows[old_pk], rows[new_pk]),
+            }
+            for old_pk, new_pk in changed_pairs
+        ],
+        "unchanged": len(matched_old),
+    }
+
+
+def diff_versions(from_version, to_version):
+    diff = {kind.name: diff_lines(kind, from_version, to_version) for kind in LINE_KINDS}
+    diff["totals"] = {
+        field: {
+            "from": getattr(from_version, field),
+            "to": getattr(to_version, field),
+            "delta": getattr(to_version, field) - getattr(from_version, field),
+        }
+        for field in VERSION_TOTAL_FIELDS
+    }
+    return diff
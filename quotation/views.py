@@ -4,13 +4,13 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action, api_view
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from .filters import QuotationFilter
-from django.http import HttpResponse
+from .filters import QuotationFilter, QuotationServiceItemFilter
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import quote_etag
 from django.shortcuts import get_object_or_404
 from django.db.models import Prefetch
 import logging
-from django.template.loader import render_to_string
-from weasyprint import HTML
+from datetime import datetime
 from decimal import Decimal
 from .models import Quotation
 # from rest_framework.decorators import api_view, authentication_classes, permission_classes
@@ -23,18 +23,43 @@ from .models import (
     QuotationHighSideItem,
     QuotationLowSideItem,
 )
-from .serializers import QuotationSerializer
-from .utils.pdf_generator import generate_quotation_pdf as build_quotation_pdf
+from .serializers import QuotationSerializer, serialize_version_diff
+from .versioning import (
+    SERVICE,
+    VERSION_TOTAL_FIELDS,
+    detach_line,
+    diff_versions,
+    editing_version,
+    remove_line,
+    version_lines_prefetch,
+)
+from .utils.pdf_generator import quotation_pdf_source
+from documents.responses import pdf_response
+from .catalogue import get_catalogue_snapshot
+from .analytics import ROLLUP_DIMENSIONS, last_build, pipeline_summary
 
 from .models import ServiceMaster, QuotationServiceItem
 from .serializers import (
     ServiceMasterSerializer, 
     QuotationServiceItemSerializer,
-    QuotationServiceItemCreateSerializer
+    QuotationServiceItemCreateSerializer,
+    QuotationServiceItemBulkSerializer,
 )
 
 logger = logging.getLogger(__name__)
 
+
+def _parse_month_param(value):
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%Y-%m"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date: {value}")
+
+
 def quotation_pdf_view(request, quotation_id):
     """Legacy URL: Generate Quotation PDF using WeasyPrint."""
     try:
@@ -49,20 +74,20 @@ def quotation_pdf_view(request, quotation_id):
         return HttpResponse("No active version found", status=404)
 
     try:
-        pdf_content = build_quotation_pdf(
-            quotation,
-            version,
+        html, engine, renderer = quotation_pdf_source(quotation, version)
+        return pdf_response(
+            request,
+            html,
+            f"{quotation.quotation_no}.pdf",
             base_url=request.build_absolute_uri('/'),
+            engine=engine,
+            renderer=renderer,
+            as_attachment=True,
         )
     except Exception as e:
         logger.error(f"PDF generation error: {str(e)}")
         return HttpResponse(f"Error generating PDF: {str(e)}", status=500)
 
-    filename = f"{quotation.quotation_no}.pdf"
-    response = HttpResponse(pdf_content, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
-
 @api_view(['GET'])
 def thank_you_suggestions(request):
     search = request.GET.get('search', '')
@@ -111,14 +136,30 @@ class QuotationViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Simplified queryset - let the serializer handle nested relations"""
         try:
-            # Just get quotations with customer, let serializer handle the rest
-            return Quotation.objects.all().select_related("customer").order_by("-id")
+            # Versions and their (shared) line rows in BOQ order, a fixed
+            # number of queries for the whole page
+            return Quotation.objects.all().select_related(
+                "customer", "branch", "site"
+            ).prefetch_related(
+                Prefetch(
+                    "versions",
+                    queryset=QuotationVersion.objects.prefetch_related(*version_lines_prefetch()),
+                ),
+                "terms_conditions__terms_condition_type",
+            ).order_by("-id")
         except Exception as e:
             logger.error(f"Error in get_queryset: {str(e)}")
             return Quotation.objects.none()
 
     def perform_create(self, serializer):
         serializer.save()
+        # Respond from the prefetching queryset instead of lazy loading
+        # every line's product chain
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
 
     @action(detail=True, methods=["get"], url_path="latest-version")
     def latest_version(self, request, pk=None):
@@ -141,33 +182,25 @@ class QuotationViewSet(viewsets.ModelViewSet):
         try:
             quotation = Quotation.objects.select_related('customer', 'site').get(pk=pk)
 
+            # Line items are loaded (with their full FK chain) by the PDF builder
             version = QuotationVersion.objects.filter(
                 quotation=quotation,
                 is_active=True
-            ).prefetch_related(
-                'high_side_items__product_variant__product_model',
-                'high_side_items__product_variant',
-                'low_side_items__item',
-                'low_side_items__item__material_type_id',
-                'low_side_items__item__item_type_id',
-                'low_side_items__item__feature_type_id',
-                'low_side_items__item__brand'
             ).first()
 
             if not version:
                 return HttpResponse("No active version found", status=404)
 
-            pdf_content = build_quotation_pdf(
-                quotation,
-                version,
+            html, engine, renderer = quotation_pdf_source(quotation, version)
+            return pdf_response(
+                request,
+                html,
+                f"quotation_{quotation.quotation_no}_v{version.version_no}.pdf",
                 base_url=request.build_absolute_uri('/'),
+                engine=engine,
+                renderer=renderer,
             )
 
-            response = HttpResponse(pdf_content, content_type='application/pdf')
-            response['Content-Disposition'] = f'inline; filename="quotation_{quotation.quotation_no}_v{version.version_no}.pdf"'
-
-            return response
-
         except Exception as e:
             logger.error(f"PDF generation error: {str(e)}")
             return HttpResponse(f"Error generating PDF: {str(e)}", status=500)
@@ -178,29 +211,20 @@ class QuotationViewSet(viewsets.ModelViewSet):
         try:
             quotation = self.get_object()
             version = get_object_or_404(
-                QuotationVersion.objects.prefetch_related(
-                    'high_side_items__product_variant__product_model',
-                    'high_side_items__product_variant',
-                    'low_side_items__item',
-                    'low_side_items__item__material_type_id',
-                    'low_side_items__item__item_type_id',
-                    'low_side_items__item__feature_type_id',
-                    'low_side_items__item__brand'
-                ), 
-                pk=version_id, 
+                QuotationVersion,
+                pk=version_id,
                 quotation=quotation
             )
             
-            pdf_content = build_quotation_pdf(
-                quotation,
-                version,
+            html, engine, renderer = quotation_pdf_source(quotation, version)
+            return pdf_response(
+                request,
+                html,
+                f"quotation_{quotation.quotation_no}_v{version.version_no}.pdf",
                 base_url=request.build_absolute_uri('/'),
+                engine=engine,
+                renderer=renderer,
             )
-            
-            response = HttpResponse(pdf_content, content_type='application/pdf')
-            response['Content-Disposition'] = f'inline; filename="quotation_{quotation.quotation_no}_v{version.version_no}.pdf"'
-            
-            return response
         except Exception as e:
             logger.error(f"Version PDF generation error: {str(e)}")
             return HttpResponse(
@@ -208,6 +232,88 @@ class QuotationViewSet(viewsets.ModelViewSet):
                 status=500
             )
 
+    @action(detail=False, methods=["get"], url_path="analytics")
+    def analytics(self, request):
+        """
+        Pipeline value, counts and conversion rate from the rollup table
+        (see build_quotation_rollups). Query params: group_by (comma list of
+        month, branch, ac_type, status; default month), date_from / date_to
+        (YYYY-MM or YYYY-MM-DD), branch, ac_type.
+        """
+        params = request.query_params
+        group_by = [
+            dimension.strip()
+            for dimension in params.get("group_by", "month").split(",")
+            if dimension.strip()
+        ]
+        unknown = [dimension for dimension in group_by if dimension not in ROLLUP_DIMENSIONS]
+        if unknown:
+            return Response(
+                {"error": f"Unknown group_by: {', '.join(unknown)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            dates = {
+                key: _parse_month_param(params.get(key))
+                for key in ("date_from", "date_to")
+            }
+            ids = {
+                key: int(params[key]) if params.get(key) else None
+                for key in ("branch", "ac_type")
+            }
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = pipeline_summary(
+            group_by=group_by,
+            date_from=dates["date_from"],
+            date_to=dates["date_to"],
+            branch_id=ids["branch"],
+            ac_type_id=ids["ac_type"],
+        )
+        return Response({"built_at": last_build(), "results": results})
+
+    @action(detail=True, methods=["get"], url_path="diff")
+    def diff(self, request, pk=None):
+        """
+        Line and totals differences between two revisions:
+        ?from=<version_id>&to=<version_id>. Defaults compare the active
+        revision with the one before it.
+        """
+        quotation = get_object_or_404(Quotation, pk=pk)
+        versions = quotation.versions.order_by("id")
+
+        to_id = request.query_params.get("to")
+        from_id = request.query_params.get("from")
+        try:
+            if to_id:
+                to_version = versions.get(pk=to_id)
+            else:
+                to_version = versions.filter(is_active=True).first() or versions.last()
+            if from_id:
+                from_version = versions.get(pk=from_id)
+            else:
+                from_version = versions.filter(id__lt=to_version.id).last() if to_version else None
+        except (QuotationVersion.DoesNotExist, ValueError):
+            return Response(
+                {"error": "Version not found for this quotation"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if not from_version or not to_version:
+            return Response(
+                {"error": "Two versions are required to compare"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        diff = diff_versions(from_version, to_version)
+        return Response(
+            serialize_version_diff(
+                from_version, to_version, diff, context=self.get_serializer_context()
+            )
+        )
+
     @action(detail=True, methods=["delete"], url_path="version/(?P<version_id>[^/.]+)/delete")
     def delete_version(self, request, pk=None, version_id=None):
     
@@ -239,7 +345,7 @@ class QuotationViewSet(viewsets.ModelViewSet):
         return Response({"message": "Version deleted"})
 
 class ServiceMasterViewSet(viewsets.ModelViewSet):
-    queryset = ServiceMaster.objects.all().prefetch_related('items')
+    queryset = ServiceMasterSerializer.setup_eager_loading(ServiceMaster.objects.all())
     serializer_class = ServiceMasterSerializer
     pagination_class = None  # Disable pagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -247,24 +353,50 @@ class ServiceMasterViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'category', 'subcategory']
     permission_classes = [IsAuthenticated]
 
+    @action(detail=False, methods=['get'], url_path='catalogue')
+    def catalogue(self, request):
+        """
+        Whole service catalogue from the cache, tagged with its version.
+        Send the ETag back as If-None-Match to get a 304 when unchanged.
+        """
+        version, results = get_catalogue_snapshot()
+        etag = quote_etag(f"catalogue-{version}")
+
+        if request.META.get('HTTP_IF_NONE_MATCH') in (etag, f"W/{etag}"):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        response = Response({"version": version, "results": results})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
 class ServiceMasterCreateViewSet(viewsets.ModelViewSet):
-    queryset = ServiceMaster.objects.all().prefetch_related('items')
+    queryset = ServiceMasterSerializer.setup_eager_loading(ServiceMaster.objects.all())
     serializer_class = ServiceMasterSerializer
     pagination_class = None
     permission_classes = [IsAuthenticated]
 
 class QuotationServiceItemViewSet(viewsets.ModelViewSet):
-    queryset = QuotationServiceItem.objects.all().select_related(
-        'service', 'quotation_version'
-    ).prefetch_related('service__items')
+    queryset = QuotationServiceItemSerializer.setup_eager_loading(QuotationServiceItem.objects.all())
     serializer_class = QuotationServiceItemSerializer
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['quotation_version']
+    filterset_class = QuotationServiceItemFilter
     
     def get_serializer_class(self):
         if self.action == 'create':
             return QuotationServiceItemCreateSerializer
+        if self.action == 'bulk':
+            return QuotationServiceItemBulkSerializer
         return QuotationServiceItemSerializer
+
+    def _version_items(self, version_id):
+        return self.queryset.filter(
+            version_links__quotation_version_id=version_id
+        ).order_by('version_links__position', 'pk')
     
     @action(detail=False, methods=['get'])
     def by_quotation_version(self, request):
@@ -272,10 +404,38 @@ class QuotationServiceItemViewSet(viewsets.ModelViewSet):
         if not version_id:
             return Response({'error': 'version_id is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        items = self.queryset.filter(quotation_version_id=version_id)
-        serializer = self.get_serializer(items, many=True)
+        serializer = QuotationServiceItemSerializer(self._version_items(version_id), many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Edit a version's service lines in one request:
+        {"quotation_version": id, "upsert": [{"id"?, "service", "quantity", ...}], "delete": [ids]}.
+        Rows with an id update that line, rows without one are appended.
+        Returns the version totals and its service lines in BOQ order.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        version = serializer.save()
+
+        return Response({
+            "quotation_version": version.pk,
+            **{field: getattr(version, field) for field in VERSION_TOTAL_FIELDS},
+            "summary": serializer.summary,
+            "service_items": QuotationServiceItemSerializer(self._version_items(version.pk), many=True).data,
+        })
+
+    # Rows can be shared by several revisions: an edit made here only
+    # applies to the newest revision using the row, older ones keep theirs.
+    def perform_update(self, serializer):
+        line = serializer.instance
+        serializer.instance = detach_line(editing_version(line), SERVICE, line)
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        remove_line(editing_version(instance), SERVICE, instance)
+
 
 class QuotationCustomerViewSet(viewsets.ReadOnlyModelViewSet):
     from lead_management.models import Customer